@@ -0,0 +1,152 @@
+"""Backup benchmark: foreground write latency while a large database is backed up.
+
+Grows a SQLite conversation store to the requested size, then saves
+conversations in a loop, as the API does, while the database is idle, while
+it is copied under a write lock (what a plain file copy needs to be
+consistent), and while ``create_backup`` copies it online, unthrottled and
+rate limited. Reports each backup's duration and the writer's latency
+percentiles and failures.
+
+The bulk of the store is filler rows with incompressible message blobs, which
+is all a page-level copy sees; the writer saves real conversations.
+
+Usage:
+    python -m benchmarks.bench_backup --size-gb 2 --max-mb-per-second 64
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from src.conversation.backup import create_backup
+from src.conversation.repository import SQLiteConversationRepository
+from benchmarks.datasets import make_conversation
+
+ROW_BYTES = 64 * 1024
+
+
+def fill(repository: SQLiteConversationRepository, size_bytes: int) -> None:
+    # The codec and indexes are exercised by a few real conversations
+    for i in range(100):
+        repository.save_conversation(make_conversation(f"conv-{i}", 20, seed=i, image_rate=0))
+    rows = max(0, (size_bytes - os.path.getsize(repository.db_path)) // ROW_BYTES)
+    with sqlite3.connect(repository.db_path) as conn:
+        for start in range(0, rows, 1000):
+            conn.executemany(
+                "INSERT INTO conversations (conversation_id, conversation_name, messages, last_updated, change_seq) "
+                "VALUES (?, 'Filler', randomblob(?), '2024-01-01T00:00:00+00:00', 0)",
+                ((f"filler-{i}", ROW_BYTES) for i in range(start, min(rows, start + 1000))),
+            )
+            conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+class Writer(threading.Thread):
+    """Saves a conversation every few milliseconds, recording latency and failures"""
+
+    def __init__(self, db_path: str):
+        super().__init__(daemon=True)
+        self.repository = SQLiteConversationRepository(db_path=db_path)
+        self.conversation = make_conversation("writer", 20, seed=-1, image_rate=0)
+        self.latencies = []
+        self.failures = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            try:
+                self.repository.save_conversation(self.conversation)
+            except sqlite3.OperationalError:
+                self.failures += 1
+            self.latencies.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    def summary(self) -> str:
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return "no writes completed"
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        return (
+            f"{len(latencies):6d} writes | p50 {statistics.median(latencies) * 1000:6.1f} ms "
+            f"p99 {percentile(0.99):7.1f} ms max {latencies[-1] * 1000:7.1f} ms | {self.failures} failed"
+        )
+
+
+def with_writer(db_path: str, during):
+    writer = Writer(db_path)
+    writer.start()
+    started = time.perf_counter()
+    try:
+        during()
+    finally:
+        elapsed = time.perf_counter() - started
+        writer.stop.set()
+        writer.join()
+    return elapsed, writer.summary()
+
+
+def locked_copy(db_path: str, destination: str) -> None:
+    """A consistent plain copy: hold the write lock until the file is copied"""
+    with sqlite3.connect(db_path, isolation_level=None) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        shutil.copyfile(db_path, destination)
+        if os.path.exists(db_path + "-wal"):
+            shutil.copyfile(db_path + "-wal", destination + "-wal")
+        conn.execute("ROLLBACK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-gb", type=float, default=2.0)
+    parser.add_argument("--pages-per-step", type=int, default=256)
+    parser.add_argument("--max-mb-per-second", type=float, default=64)
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--workdir", help="Where to build the store (default: a temporary directory)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        repository = SQLiteConversationRepository(db_path=os.path.join(workdir, "conversations.db"))
+        started = time.perf_counter()
+        fill(repository, int(args.size_gb * 1e9))
+        print(
+            f"store: {os.path.getsize(repository.db_path) / 1e9:.2f} GB, "
+            f"filled in {time.perf_counter() - started:.0f} s"
+        )
+        db_path = repository.db_path
+        backup_dir = os.path.join(workdir, "backups")
+        rate = int(args.max_mb_per_second * 1024 * 1024)
+
+        def online(max_bytes_per_second):
+            def run():
+                result = create_backup(
+                    db_path, backup_dir, pages_per_step=args.pages_per_step, max_bytes_per_second=max_bytes_per_second
+                )
+                shutil.rmtree(result.path)
+
+            return run
+
+        def locked():
+            locked_copy(db_path, os.path.join(workdir, "copy.db"))
+            os.remove(os.path.join(workdir, "copy.db"))
+
+        runs = [
+            ("idle", lambda: time.sleep(args.idle_seconds)),
+            ("copy under write lock", locked),
+            ("online, unthrottled", online(0)),
+            (f"online, {args.max_mb_per_second:g} MB/s", online(rate)),
+        ]
+        for name, during in runs:
+            elapsed, summary = with_writer(db_path, during)
+            print(f"{name:>24}: {elapsed:6.1f} s | writer {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Sidebar refresh benchmark: full conversation list against delta sync.
+
+Usage:
+    python -m benchmarks.bench_changes --conversations 10000
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.conversation.repository import SQLiteConversationRepository
+from src.conversation.routes import router, get_conversation_service
+from src.conversation.service import ConversationService
+from benchmarks.datasets import make_conversation
+
+
+def measure(label, fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = fn()
+        timings.append(time.perf_counter() - started)
+    print(f"{label:<44} median {statistics.median(timings) * 1000:8.2f} ms  {len(response.content):>9} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        repository = SQLiteConversationRepository(db_path=os.path.join(db_dir, "bench.db"))
+        template = make_conversation("template", 2, image_rate=0)
+        for i in range(args.conversations):
+            template.conversation_id = f"c{i}"
+            repository.save_conversation(template)
+
+        app = FastAPI()
+        app.include_router(router)
+        app.dependency_overrides[get_conversation_service] = lambda: ConversationService(
+            repository=repository, ai_provider=None
+        )
+        client = TestClient(app)
+        cursor = repository.get_change_sequence()
+        template.conversation_id = "c0"
+        repository.save_conversation(template)
+
+        print(f"{args.conversations} conversations, one changed since the last sync")
+        measure("GET /api/conversations", lambda: client.get("/api/conversations"), args.repeat)
+        measure(
+            "GET /api/conversations/changes?since=cursor",
+            lambda: client.get("/api/conversations/changes", params={"since": cursor}),
+            args.repeat,
+        )
+
+
+if __name__ == "__main__":
+    main()
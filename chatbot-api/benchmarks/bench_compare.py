@@ -0,0 +1,62 @@
+"""Side-by-side comparison benchmark: one /chat/compare call vs serial streams.
+
+Sends the same prompt to several models, first one /chat/stream request after
+another as the UI did, then as a single /chat/compare request, against the app
+under uvicorn and the fake LLM.
+
+Usage:
+    python -m benchmarks.bench_compare --models 3 --repeat 3
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+import httpx
+from benchmarks.bench_e2e import start_servers
+
+PROMPT = [{"role": "user", "content": "Compare these models"}]
+
+
+def stream(client: httpx.Client, path: str, body: dict) -> float:
+    started = time.perf_counter()
+    with client.stream("POST", path, json=body) as response:
+        response.raise_for_status()
+        for _ in response.iter_raw():
+            pass
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-second", type=float, default=100)
+    parser.add_argument("--completion-tokens", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    models = [f"model-{i}" for i in range(args.models)]
+    with tempfile.TemporaryDirectory() as workdir:
+        fake_llm, app, base_url = start_servers(args, workdir)
+        try:
+            with httpx.Client(base_url=base_url, timeout=120) as client:
+                serial, compare = [], []
+                for _ in range(args.repeat):
+                    serial.append(sum(
+                        stream(client, "/chat/stream", {"messages": [{**PROMPT[0], "model": model}]})
+                        for model in models
+                    ))
+                    compare.append(stream(client, "/chat/compare", {"messages": PROMPT, "models": models}))
+            print(f"{args.models} models, serial /chat/stream : {statistics.median(serial) * 1000:8.1f} ms")
+            print(f"{args.models} models, /chat/compare       : {statistics.median(compare) * 1000:8.1f} ms")
+        finally:
+            app.terminate()
+            fake_llm.terminate()
+            app.wait()
+            fake_llm.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Response compression benchmark across size classes and levels.
+
+Compresses serialized conversations of several sizes with each available
+encoding at a range of levels and reports the ratio and the time per response.
+
+Usage:
+    python -m benchmarks.bench_compression --repeat 5
+"""
+
+import argparse
+import statistics
+import time
+from src.compression import SIZE_CLASS_LEVELS, available_encodings, compress, level_for
+from src.conversation.routes import ConversationSchema
+from benchmarks.datasets import make_conversation
+
+DATASETS = (
+    ("20 text messages", dict(messages=20, image_rate=0)),
+    ("300 text messages", dict(messages=300, image_rate=0)),
+    ("100 messages with images", dict(messages=100, image_rate=0.2, image_bytes=200_000)),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    levels = sorted({level for _, by_encoding in SIZE_CLASS_LEVELS for level in by_encoding.values()})
+    for label, options in DATASETS:
+        body = ConversationSchema.model_validate(
+            make_conversation("bench", **options)
+        ).model_dump_json().encode()
+        print(f"{label}: {len(body) / 1024:.0f} KiB")
+        for encoding in available_encodings():
+            chosen = level_for(encoding, len(body))
+            for level in levels:
+                timings = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    compressed = compress(body, encoding, level)
+                    timings.append(time.perf_counter() - started)
+                marker = " <- used" if level == chosen else ""
+                print(
+                    f"  {encoding:<5} level {level}  ratio {len(compressed) / len(body):6.1%}"
+                    f"  {statistics.median(timings) * 1000:8.2f} ms{marker}"
+                )
+
+
+if __name__ == "__main__":
+    main()
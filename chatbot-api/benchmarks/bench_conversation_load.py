@@ -0,0 +1,71 @@
+"""Conversation load/save benchmark for a single long conversation.
+
+Measures the repository decode, the previous validate-and-serialize route path,
+the raw JSON fast path and the full HTTP round trip.
+
+Usage:
+    python -m benchmarks.bench_conversation_load --messages 10000
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.conversation.repository import SQLiteConversationRepository
+from src.conversation.routes import router, get_conversation_service, ConversationSchema
+from src.conversation.service import ConversationService
+from benchmarks.datasets import make_conversation
+
+
+def measure(label, fn, repeat):
+    fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    print(
+        f"{label:<40} median {statistics.median(timings) * 1000:8.2f} ms"
+        f"   min {min(timings) * 1000:8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--image-rate", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    conversation = make_conversation("bench", args.messages, image_rate=args.image_rate)
+    with tempfile.TemporaryDirectory() as db_dir:
+        repository = SQLiteConversationRepository(db_path=os.path.join(db_dir, "bench.db"))
+        repository.save_conversation(conversation)
+
+        app = FastAPI()
+        app.include_router(router)
+        app.dependency_overrides[get_conversation_service] = lambda: ConversationService(
+            repository=repository, ai_provider=None
+        )
+        client = TestClient(app)
+        payload = ConversationSchema.model_validate(conversation).model_dump(mode="json")
+
+        print(f"{args.messages} messages")
+        measure("repository.get_conversation", lambda: repository.get_conversation("bench"), args.repeat)
+        measure(
+            "get_conversation + schema + dump_json",
+            lambda: ConversationSchema.model_validate(
+                repository.get_conversation("bench")
+            ).model_dump_json(),
+            args.repeat,
+        )
+        measure("repository.get_conversation_json", lambda: repository.get_conversation_json("bench"), args.repeat)
+        measure("GET /api/conversations/{id}", lambda: client.get("/api/conversations/bench"), args.repeat)
+        measure("POST /api/conversations", lambda: client.post("/api/conversations", json=payload), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""End-to-end HTTP benchmark against the full app and a fake LLM.
+
+Starts ``benchmarks.fake_llm`` and the real app (``src.main:app``) under uvicorn
+in subprocesses, seeds conversations, then drives each endpoint at a fixed
+concurrency and reports p50/p95/p99 latency, throughput, errors and server RSS.
+Results can be saved as a baseline and later compared against it; the run exits
+with status 1 when a scenario regresses by more than the tolerance.
+
+Usage:
+    python -m benchmarks.bench_e2e --requests 200 --concurrency 20
+    python -m benchmarks.bench_e2e --save-baseline benchmarks/baselines/e2e.json
+    python -m benchmarks.bench_e2e --compare benchmarks/baselines/e2e.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional
+import httpx
+from src.conversation.routes import ConversationSchema
+from benchmarks.datasets import make_conversation
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("chat", "chat_stream", "list_conversations", "get_conversation")
+
+
+@dataclass
+class ScenarioResult:
+    requests: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    rps: float
+    rss_mb: Optional[float]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process, from /proc where available"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def wait_for(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def uvicorn_command(port: int) -> List[str]:
+    return [
+        sys.executable, "-m", "uvicorn", "src.main:app",
+        "--port", str(port),
+        "--log-level", "warning",
+        "--no-access-log",
+    ]
+
+
+def start_servers(args, workdir: str, app_command: Callable[[int], List[str]] = uvicorn_command, **env_overrides):
+    llm_port, app_port = free_port(), free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        OPENAI_API_KEY="fake",
+        OPENAI_API_BASE=f"http://127.0.0.1:{llm_port}/v1",
+        **env_overrides,
+    )
+    fake_llm = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_llm",
+            "--port", str(llm_port),
+            "--ttft-ms", str(args.ttft_ms),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--completion-tokens", str(args.completion_tokens),
+            "--error-rate", str(args.error_rate),
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    app = subprocess.Popen(app_command(app_port), cwd=workdir, env=env)
+    base_url = f"http://127.0.0.1:{app_port}"
+    wait_for(f"http://127.0.0.1:{llm_port}/docs")
+    wait_for(f"{base_url}/api/conversations")
+    return fake_llm, app, base_url
+
+
+def chat_body(i: int) -> dict:
+    return {"messages": [{"role": "user", "content": f"Benchmark question {i}", "model": "gpt-4o"}]}
+
+
+def scenario_requests(args) -> Dict[str, Callable]:
+    def chat(client: httpx.AsyncClient, i: int):
+        return client.post("/chat/", json=chat_body(i))
+
+    async def chat_stream(client: httpx.AsyncClient, i: int):
+        async with client.stream("POST", "/chat/stream", json=chat_body(i)) as response:
+            async for _ in response.aiter_raw():
+                pass
+            return response
+
+    def list_conversations(client: httpx.AsyncClient, i: int):
+        return client.get("/api/conversations")
+
+    def get_conversation(client: httpx.AsyncClient, i: int):
+        return client.get(f"/api/conversations/bench-{i % args.conversations}")
+
+    return {
+        "chat": chat,
+        "chat_stream": chat_stream,
+        "list_conversations": list_conversations,
+        "get_conversation": get_conversation,
+    }
+
+
+async def run_scenario(base_url: str, request, requests: int, concurrency: int):
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal next_index, errors
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await request(client, i)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return sorted(latencies), errors, elapsed
+
+
+def seed_conversations(base_url: str, count: int, messages: int) -> None:
+    with httpx.Client(base_url=base_url, timeout=60.0) as client:
+        for i in range(count):
+            conversation = make_conversation(f"bench-{i}", messages, seed=i, image_rate=0)
+            payload = ConversationSchema.model_validate(conversation).model_dump(mode="json")
+            client.post("/api/conversations", json=payload).raise_for_status()
+
+
+def compare(results: Dict[str, ScenarioResult], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Describe every metric that is worse than the baseline by more than the tolerance"""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if getattr(result, metric) > expected[metric] * (1 + tolerance):
+                regressions.append(f"{name}.{metric}: {getattr(result, metric):.1f} > {expected[metric]:.1f}")
+        if result.rps < expected["rps"] * (1 - tolerance):
+            regressions.append(f"{name}.rps: {result.rps:.1f} < {expected['rps']:.1f}")
+        if result.errors > expected["errors"]:
+            regressions.append(f"{name}.errors: {result.errors} > {expected['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=40, help="Messages per seeded conversation")
+    parser.add_argument("--ttft-ms", type=float, default=50)
+    parser.add_argument("--tokens-per-second", type=float, default=500)
+    parser.add_argument("--completion-tokens", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    requests = scenario_requests(args)
+    unknown = set(args.scenarios.split(",")) - set(requests)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    results: Dict[str, ScenarioResult] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        fake_llm, app, base_url = start_servers(args, workdir)
+        try:
+            seed_conversations(base_url, args.conversations, args.messages)
+            print(f"{args.requests} requests per scenario, concurrency {args.concurrency}")
+            for name in args.scenarios.split(","):
+                asyncio.run(run_scenario(base_url, requests[name], min(50, args.requests), args.concurrency))
+                latencies, errors, elapsed = asyncio.run(
+                    run_scenario(base_url, requests[name], args.requests, args.concurrency)
+                )
+                result = ScenarioResult(
+                    requests=len(latencies),
+                    errors=errors,
+                    p50_ms=percentile(latencies, 50) * 1000,
+                    p95_ms=percentile(latencies, 95) * 1000,
+                    p99_ms=percentile(latencies, 99) * 1000,
+                    rps=len(latencies) / elapsed,
+                    rss_mb=rss_mb(app.pid),
+                )
+                results[name] = result
+                rss = f"{result.rss_mb:7.1f} MB" if result.rss_mb is not None else "    n/a"
+                print(
+                    f"  {name:<20} p50 {result.p50_ms:8.1f} ms  p95 {result.p95_ms:8.1f} ms"
+                    f"  p99 {result.p99_ms:8.1f} ms  {result.rps:8.1f} req/s"
+                    f"  errors {errors:4d}  rss {rss}"
+                )
+        finally:
+            app.terminate()
+            fake_llm.terminate()
+            app.wait()
+            fake_llm.wait()
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or ".", exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(
+                {
+                    name: {k: round(v, 2) if isinstance(v, float) else v for k, v in asdict(r).items()}
+                    for name, r in results.items()
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%} of {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Local inference benchmark: tokens per second against concurrent streams.
+
+Streams from ``LocalProvider`` at several concurrency levels, once through the
+continuously batching engine and once with a batch of one, where requests are
+served one after another. Reports aggregate generated tokens per second, time
+to first token and the mean batch size of the engine's forward passes.
+
+The model is randomly initialized at the requested size unless ``--model``
+names a saved one (``python -m src.inference.model init``); its speed depends
+on its size, not on its weights. EOS is never sampled, so every stream
+generates exactly ``--tokens`` tokens.
+
+Usage:
+    python -m benchmarks.bench_local --concurrency 1,8,32 --dim 512 --layers 8 --tokens 64
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from src.chat.models import Message
+from src.inference.engine import BatchingEngine
+from src.inference.model import EOS, LocalModel, ModelConfig
+from src.inference.provider import LocalProvider
+
+
+class NoEOSEngine(BatchingEngine):
+    """Never samples EOS, so that streams have a fixed length"""
+
+    @staticmethod
+    def _sample(generation, logits):
+        logits[EOS] = -float("inf")
+        return BatchingEngine._sample(generation, logits)
+
+
+async def run(model: LocalModel, concurrency: int, max_batch: int, args) -> str:
+    engine = NoEOSEngine(model, max_batch=max_batch, token_budget=max(256, max_batch * 2), max_new_tokens=args.tokens)
+    provider = LocalProvider(engine, temperature=0.7)
+    ttfts = []
+
+    async def stream(i):
+        messages = [Message(role="user", content=f"Question {i}: " + "tell me more " * (args.prompt_tokens // 13))]
+        started = time.perf_counter()
+        first = None
+        async for _ in provider.generate_stream(messages):
+            if first is None:
+                first = time.perf_counter()
+        ttfts.append(first - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(stream(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    engine.stop()
+    ttfts.sort()
+    return (
+        f"{concurrency * args.tokens / elapsed:7.0f} tok/s | TTFT p50 {statistics.median(ttfts) * 1000:6.0f} ms "
+        f"max {ttfts[-1] * 1000:6.0f} ms | {engine.tokens / engine.steps:5.1f} tokens per pass"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--model", help="A saved model (default: a random one of the size below)")
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--layers", type=int, default=8)
+    parser.add_argument("--heads", type=int, default=8)
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens generated per stream")
+    parser.add_argument("--prompt-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    if args.model:
+        model = LocalModel.load(args.model)
+    else:
+        hidden = (args.dim * 8 // 3 + 63) // 64 * 64
+        model = LocalModel.random(ModelConfig(dim=args.dim, layers=args.layers, heads=args.heads, hidden=hidden))
+    print(f"{model.config}, {os.cpu_count()} CPUs")
+    for concurrency in (int(count) for count in args.concurrency.split(",")):
+        for name, max_batch in (("batched", concurrency), ("one at a time", 1)):
+            result = asyncio.run(run(model, concurrency, max_batch, args))
+            print(f"{concurrency:3d} streams, {name:>13}: {result}")
+            if concurrency == 1:
+                break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Memory footprint of domain models, measured with tracemalloc.
+
+Compares the slotted models with equivalent ``__dict__``-based dataclasses.
+
+Usage:
+    python -m benchmarks.bench_memory --messages 10000
+"""
+
+import argparse
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+from src.chat.models import Message, TextContent, ImageContent
+from src.conversation.models import Conversation
+from src.chat.schemas import ChatRequestSchema
+from src.chat.routes import to_domain_message
+
+
+@dataclass
+class DictMessage:
+    role: str
+    content: Any
+    model: Optional[str] = None
+    timestamp: datetime = datetime.now(timezone.utc)
+
+
+@dataclass
+class DictTextContent:
+    type: str = "text"
+    text: str = ""
+
+
+@dataclass
+class DictImageContent:
+    type: str = "image_url"
+    image_url: Any = None
+
+
+def traced(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return result, size
+
+
+def roles(n):
+    # Fresh strings, as produced by a JSON decoder
+    return ["".join(["user" if i % 2 == 0 else "assistant"]) for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10_000)
+    args = parser.parse_args()
+    n = args.messages
+    now = datetime.now(timezone.utc)
+    url = {"url": "data:image/png;base64,AAAA"}
+
+    cases = {
+        "dict dataclass, text": lambda r: [DictMessage(role=x, content="hi", model="gpt-4o", timestamp=now) for x in r],
+        "slotted, text": lambda r: [Message(role=x, content="hi", model="gpt-4o", timestamp=now) for x in r],
+        "dict dataclass, text+image parts": lambda r: [
+            DictMessage(role=x, content=[DictTextContent(text="hi"), DictImageContent(image_url=url)], timestamp=now)
+            for x in r
+        ],
+        "slotted, text+image parts": lambda r: [
+            Message(role=x, content=[TextContent(text="hi"), ImageContent(image_url=url)], timestamp=now)
+            for x in r
+        ],
+    }
+    print(f"Retained bytes per {n} messages")
+    for label, build in cases.items():
+        role_list = roles(n)
+        _, size = traced(lambda: build(role_list))
+        print(f"  {label:<36} {size / 1024:10.1f} KiB")
+
+    request = ChatRequestSchema.model_validate(
+        {
+            "messages": [
+                {"role": "user", "content": [{"type": "text", "text": "hi"}, {"type": "image_url", "image_url": url}]}
+                for _ in range(n)
+            ]
+        }
+    )
+    _, size = traced(lambda: [to_domain_message(m, now) for m in request.messages])
+    print(f"  {'schema -> domain (shared content)':<36} {size / 1024:10.1f} KiB")
+    _, size = traced(
+        lambda: Conversation(
+            conversation_id="bench",
+            conversation_name="bench",
+            messages=[Message(role=x, content="hi", timestamp=now) for x in roles(n)],
+        )
+    )
+    print(f"  {'Conversation of slotted messages':<36} {size / 1024:10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Prompt prefix caching benchmark: time to first token over long conversations.
+
+Plays multi-turn conversations through ChatService against the fake LLM with a
+prefill cost per uncached prompt token and a prefix cache, the way vLLM or
+llama.cpp reuse KV-cache for a repeated prompt prefix. The history is echoed
+back each turn the way the web client sends it. Reports the median time to
+first token for early and late turns and the share of prompt tokens the
+upstream served from its cache, with and without retrieved context.
+
+Usage:
+    python -m benchmarks.bench_prompt_cache --turns 16 --message-chars 2000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from prometheus_client import REGISTRY
+from src.chat.models import Message
+from src.chat.provider import OpenAIProvider
+from src.chat.service import ChatService
+from benchmarks.bench_e2e import ROOT, free_port, wait_for
+
+IMAGE = "data:image/png;base64," + "iVBORw0KGgo" * 200
+
+
+class StubRetrieval:
+    """Retrieved context that differs for every question"""
+
+    def build_context_message(self, query: str) -> Message:
+        return Message(role="system", content=f"Relevant excerpts for: {query}\n" + "excerpt " * 150)
+
+
+def tokens(model: str, direction: str) -> float:
+    labels = {"model": model, "backend": "openai", "direction": direction}
+    return REGISTRY.get_sample_value("llm_tokens_total", labels) or 0.0
+
+
+async def conversation(service: ChatService, model: str, turns: int, message_chars: int) -> list:
+    """Time to first token of every turn"""
+    history, ttfts = [], []
+    for turn in range(turns):
+        text = f"{model} question {turn}: " + "lorem ipsum " * (message_chars // 12)
+        images = [IMAGE] if turn == 0 else None
+        started = time.perf_counter()
+        first_token, reply = None, []
+        async for chunk in service.stream_response(
+            text=text, images=images, model=model, conversation_messages=list(history)
+        ):
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            reply.append(chunk)
+        ttfts.append(first_token)
+        # The client echoes the turn back with the parts in its own order
+        content = text
+        if images:
+            content = [{"image_url": {"url": IMAGE}, "type": "image_url"}, {"text": text, "type": "text"}]
+        history += [
+            Message(role="user", content=content, model=model),
+            Message(role="assistant", content="".join(reply), model=model),
+        ]
+    return ttfts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=16)
+    parser.add_argument("--message-chars", type=int, default=2000)
+    parser.add_argument("--conversations", type=int, default=3)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=5000)
+    args = parser.parse_args()
+
+    port = free_port()
+    fake_llm = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_llm", "--port", str(port), "--ttft-ms", "20",
+         "--tokens-per-second", "2000", "--completion-tokens", "200",
+         "--prefill-tokens-per-second", str(args.prefill_tokens_per_second),
+         "--prefix-cache-tokens", "10000000"],
+        cwd=ROOT,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+    )
+    try:
+        wait_for(f"http://127.0.0.1:{port}/docs")
+        provider = OpenAIProvider(api_key="fake", api_base=f"http://127.0.0.1:{port}/v1")
+        for name, retrieval in (("history only", None), ("with retrieval", StubRetrieval())):
+            service = ChatService(ai_provider=provider, retrieval_service=retrieval)
+            early, late, cached, prompt = [], [], 0.0, 0.0
+            for i in range(args.conversations):
+                model = f"{name.replace(' ', '-')}-{i}"
+                ttfts = asyncio.run(conversation(service, model, args.turns, args.message_chars))
+                early += ttfts[1:4]
+                late += ttfts[-4:]
+                cached += tokens(model, "cached")
+                prompt += tokens(model, "in")
+            print(
+                f"{name:>15}: TTFT turns 2-4 {statistics.median(early) * 1000:7.1f} ms | "
+                f"last 4 turns {statistics.median(late) * 1000:7.1f} ms | "
+                f"cached prompt tokens {cached / prompt if prompt else 0:6.1%}"
+            )
+    finally:
+        fake_llm.terminate()
+        fake_llm.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Repository backend benchmark: write throughput, read latency and size on disk.
+
+Runs the same workload against every ConversationRepository backend: saves,
+point reads (decoded and raw JSON), listing, a delta sync scan and concurrent
+reads from a thread pool, as the API's sync route handlers would issue them.
+
+Usage:
+    python -m benchmarks.bench_repositories --conversations 1000 --messages 40 --backend sqlite --backend log
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from src.conversation.cache import CachingConversationRepository
+from src.conversation.repository import create_repository
+from benchmarks.datasets import make_dataset
+
+BACKENDS = {
+    "sqlite": lambda path: create_repository(f"sqlite:///{path}/conversations.db"),
+    "log": lambda path: create_repository(f"log:///{path}/conversations"),
+    "sqlite+cache": lambda path: CachingConversationRepository(
+        create_repository(f"sqlite:///{path}/conversations.db")
+    ),
+    "sqlite+shards": lambda path: create_repository(f"sqlite:///{path}/conversations.db", shards=4),
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def timings(operation, arguments):
+    samples = []
+    for argument in arguments:
+        started = time.perf_counter()
+        operation(argument)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    )
+
+
+def run(name, dataset, reads, threads):
+    with tempfile.TemporaryDirectory() as path:
+        repository = BACKENDS[name](path)
+        started = time.perf_counter()
+        for conversation in dataset:
+            repository.save_conversation(conversation)
+        writes_per_second = len(dataset) / (time.perf_counter() - started)
+
+        ids = [random.choice(dataset).conversation_id for _ in range(reads)]
+        json_reads = timings(repository.get_conversation_json, ids)
+        decoded_reads = timings(repository.get_conversation, ids[: reads // 4])
+        listing = timings(lambda _: repository.get_conversations(), range(10))
+        changes = timings(lambda _: repository.get_changes(0, limit=500), range(10))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(repository.get_conversation_json, ids))
+        concurrent_reads = len(ids) / (time.perf_counter() - started)
+
+        print(
+            f"{name:>12}: write {writes_per_second:7.0f}/s | "
+            f"json p50 {percentile(json_reads, 0.5) * 1000:6.3f} p99 {percentile(json_reads, 0.99) * 1000:6.3f} ms | "
+            f"decoded p50 {percentile(decoded_reads, 0.5) * 1000:6.3f} ms | "
+            f"{threads} threads {concurrent_reads:7.0f}/s | "
+            f"list {statistics.median(listing) * 1000:6.2f} ms | "
+            f"changes {statistics.median(changes) * 1000:6.2f} ms | "
+            f"disk {directory_size(path) / 1e6:6.2f} MB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--image-rate", type=float, default=0.0)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--backend", action="append", choices=list(BACKENDS))
+    args = parser.parse_args()
+
+    random.seed(0)
+    dataset = make_dataset(args.conversations, args.messages, image_rate=args.image_rate)
+    for name in args.backend or list(BACKENDS):
+        run(name, dataset, args.reads, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Retrieval latency benchmark.
+
+Builds an index of synthetic embeddings and measures search latency.
+
+Usage:
+    python -m benchmarks.bench_retrieval --chunks 1000000 --dimension 256
+"""
+
+import argparse
+import tempfile
+import time
+import numpy as np
+from src.retrieval.index import VectorIndex, VectorIndexWriter
+from src.retrieval.models import Chunk
+
+
+def percentile(samples, pct):
+    return float(np.percentile(np.array(samples) * 1000, pct))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as index_dir:
+        started = time.perf_counter()
+        writer = VectorIndexWriter(index_dir, dimension=args.dimension)
+        batch_size = 10_000
+        for start in range(0, args.chunks, batch_size):
+            count = min(batch_size, args.chunks - start)
+            vectors = rng.standard_normal((count, args.dimension)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            chunks = [Chunk(text=f"chunk {start + i}", source="synthetic", position=start + i) for i in range(count)]
+            writer.add(chunks, vectors)
+        writer.close()
+        print(f"Built index of {args.chunks} x {args.dimension} in {time.perf_counter() - started:.1f}s")
+
+        index = VectorIndex(index_dir, nprobe=args.nprobe)
+        queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        for query in queries[:10]:
+            index.search(query, k=args.k)
+
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, k=args.k)
+            timings.append(time.perf_counter() - started)
+        print(
+            f"search k={args.k} nprobe={args.nprobe}: "
+            f"p50={percentile(timings, 50):.2f}ms "
+            f"p95={percentile(timings, 95):.2f}ms "
+            f"p99={percentile(timings, 99):.2f}ms"
+        )
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
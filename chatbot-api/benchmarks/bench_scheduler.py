@@ -0,0 +1,132 @@
+"""Scheduler benchmark: interactive time to first token while a batch job saturates the backend.
+
+Simulates an upstream that runs a fixed number of generations at once and
+queues the rest first come, first served, as a provider at its concurrency
+limit does. A batch job keeps many long streams outstanding while interactive
+streams arrive at random. Reports the interactive TTFT percentiles, measured
+from the call to the first chunk and so including any queueing, and the batch
+job's completed streams per second:
+
+- with no batch job, as the reference,
+- with the batch job going straight to the provider,
+- with every call going through an ``UpstreamScheduler`` holding the
+  provider's concurrency, some of it reserved for interactive requests.
+
+Usage:
+    python -m benchmarks.bench_scheduler --capacity 8 --reserved 2 --batch-workers 32 --seconds 20
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from src.chat.models import Message
+from src.chat.scheduler import Priority, ScheduledProvider, UpstreamScheduler
+
+MESSAGES = [Message(role="user", content="Hello")]
+
+
+class LimitedBackend:
+    """Generates at most ``capacity`` streams at once, queueing the rest in arrival order"""
+
+    def __init__(self, capacity: int, ttft: float, interval: float):
+        self.slots = asyncio.Semaphore(capacity)
+        self.ttft = ttft
+        self.interval = interval
+
+
+class PacedProvider:
+    """Streams a fixed number of tokens from a LimitedBackend"""
+
+    def __init__(self, backend: LimitedBackend, tokens: int):
+        self.backend = backend
+        self.tokens = tokens
+
+    def generate_response(self, messages):
+        raise NotImplementedError
+
+    async def generate_stream(self, messages):
+        async with self.backend.slots:
+            await asyncio.sleep(self.backend.ttft)
+            for i in range(self.tokens):
+                if i:
+                    await asyncio.sleep(self.backend.interval)
+                yield f"token{i} "
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run(args, with_batch: bool, scheduled: bool) -> str:
+    backend = LimitedBackend(args.capacity, args.ttft, args.interval)
+    scheduler = UpstreamScheduler(max_concurrency=args.capacity, reserved_interactive=args.reserved)
+
+    def provider(tokens, priority, user):
+        paced = PacedProvider(backend, tokens)
+        return ScheduledProvider(paced, scheduler, priority, user) if scheduled else paced
+
+    deadline = time.perf_counter() + args.seconds
+    ttfts = []
+    batch_done = 0
+
+    async def batch_worker():
+        nonlocal batch_done
+        batch = provider(args.batch_tokens, Priority.BATCH, "batch-job")
+        while time.perf_counter() < deadline:
+            async for _ in batch.generate_stream(MESSAGES):
+                pass
+            batch_done += 1
+
+    async def interactive(n):
+        chat = provider(args.chat_tokens, Priority.INTERACTIVE, f"user-{n % 50}")
+        started = time.perf_counter()
+        first = None
+        async for _ in chat.generate_stream(MESSAGES):
+            if first is None:
+                first = time.perf_counter()
+                ttfts.append(first - started)
+
+    rng = random.Random(0)
+    workers = [asyncio.create_task(batch_worker()) for _ in range(args.batch_workers if with_batch else 0)]
+    chats = []
+    n = 0
+    while time.perf_counter() < deadline:
+        chats.append(asyncio.create_task(interactive(n)))
+        n += 1
+        await asyncio.sleep(rng.expovariate(args.chats_per_second))
+    await asyncio.gather(*chats)
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    return (
+        f"{len(ttfts):5d} chats | TTFT p50 {statistics.median(ttfts) * 1000:7.0f} ms "
+        f"p99 {percentile(ttfts, 0.99) * 1000:7.0f} ms | batch {batch_done / args.seconds:5.1f} streams/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--capacity", type=int, default=8, help="Generations the backend runs at once")
+    parser.add_argument("--reserved", type=int, default=2, help="Slots reserved for interactive requests")
+    parser.add_argument("--batch-workers", type=int, default=32, help="Batch streams kept outstanding")
+    parser.add_argument("--batch-tokens", type=int, default=200)
+    parser.add_argument("--chat-tokens", type=int, default=50)
+    parser.add_argument("--chats-per-second", type=float, default=2)
+    parser.add_argument("--ttft", type=float, default=0.2, help="Backend time to first token, in seconds")
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between streamed tokens")
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+
+    for name, with_batch, scheduled in (
+        ("no batch job", False, False),
+        ("batch job, unscheduled", True, False),
+        (f"batch job, scheduled ({args.reserved} reserved)", True, True),
+    ):
+        print(f"{name:>34}: {asyncio.run(run(args, with_batch, scheduled))}")
+
+
+if __name__ == "__main__":
+    main()
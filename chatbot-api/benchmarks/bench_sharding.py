@@ -0,0 +1,83 @@
+"""Sharding benchmark: aggregate save throughput against shard count.
+
+Starts several writer processes, as API workers would be, each saving
+conversations for tenants picked at random, against a store spread over 1, 2,
+4... shards. Reports saves per second across all writers and save latency.
+With one shard every save waits for the same SQLite writer lock; spreading
+tenants over shards lets saves for different tenants commit in parallel.
+
+Usage:
+    python -m benchmarks.bench_sharding --shards 1,2,4,8 --writers 8 --seconds 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from src.conversation.sharding import ShardedConversationRepository
+from benchmarks.datasets import make_conversation
+
+
+def writer(db_path: str, shards: int, tenants: int, messages: int, seconds: float, seed: int, start, results) -> None:
+    repository = ShardedConversationRepository(db_path=db_path, shards=shards)
+    rng = random.Random(seed)
+    conversations = [make_conversation(f"conv-{seed}-{i}", messages, seed=seed * 100 + i, image_rate=0) for i in range(20)]
+    latencies = []
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        view = repository.for_tenant(f"tenant-{rng.randrange(tenants)}")
+        started = time.perf_counter()
+        view.save_conversation(rng.choice(conversations))
+        latencies.append(time.perf_counter() - started)
+    results.put(latencies)
+
+
+def run(shards: int, args) -> str:
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        db_path = os.path.join(workdir, "conversations.db")
+        # Create the schema once, before the writers race to
+        ShardedConversationRepository(db_path=db_path, shards=shards)
+        start = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=writer,
+                args=(db_path, shards, args.tenants, args.messages, args.seconds, seed, start, results),
+            )
+            for seed in range(args.writers)
+        ]
+        for process in processes:
+            process.start()
+        time.sleep(1)
+        start.set()
+        latencies = sorted(latency for _ in processes for latency in results.get())
+        for process in processes:
+            process.join()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return (
+        f"{shards:3d} shards: {len(latencies) / args.seconds:8.0f} saves/s | "
+        f"p50 {statistics.median(latencies) * 1000:6.2f} ms p99 {p99 * 1000:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", default="1,2,4,8")
+    parser.add_argument("--writers", type=int, default=8, help="Writer processes")
+    parser.add_argument("--tenants", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=20, help="Messages per saved conversation")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workdir", help="Where to put the shards (default: a temporary directory)")
+    args = parser.parse_args()
+
+    print(f"{args.writers} writer processes, {args.tenants} tenants, {os.cpu_count()} CPUs")
+    for shards in (int(count) for count in args.shards.split(",")):
+        print(run(shards, args))
+
+
+if __name__ == "__main__":
+    main()
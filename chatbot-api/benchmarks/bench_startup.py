@@ -0,0 +1,88 @@
+"""Cold start benchmark: import time, time to ready and first-request latency.
+
+Each measurement runs in a fresh interpreter. The first-request numbers start
+the app under uvicorn against the fake LLM, with and without client warm-up.
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from benchmarks.bench_e2e import ROOT, chat_body, free_port, uvicorn_command, wait_for
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import src.main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def import_time(env: dict, workdir: str) -> float:
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=workdir, env=env)
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def cold_start(env: dict, workdir: str) -> tuple:
+    """Seconds from spawn to ready, and the latency of the first and second chat requests"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    app = subprocess.Popen(uvicorn_command(port), cwd=workdir, env=env)
+    try:
+        wait_for(f"{base_url}/docs", timeout=60)
+        ready = time.perf_counter() - started
+        latencies = []
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            for i in range(2):
+                request_started = time.perf_counter()
+                client.post("/chat/", json=chat_body(i)).raise_for_status()
+                latencies.append(time.perf_counter() - request_started)
+        return ready, latencies[0], latencies[1]
+    finally:
+        app.terminate()
+        app.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    llm_port = free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        OPENAI_API_KEY="fake",
+        OPENAI_API_BASE=f"http://127.0.0.1:{llm_port}/v1",
+    )
+    fake_llm = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_llm", "--port", str(llm_port), "--ttft-ms", "0",
+         "--tokens-per-second", "100000", "--completion-tokens", "10"],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        wait_for(f"http://127.0.0.1:{llm_port}/docs")
+        with tempfile.TemporaryDirectory() as workdir:
+            imports = [import_time(env, workdir) for _ in range(args.repeat)]
+            print(f"import src.main          median {statistics.median(imports) * 1000:8.1f} ms")
+            for warm_up in ("false", "true"):
+                runs = [cold_start(dict(env, WARM_UP_CLIENTS=warm_up), workdir) for _ in range(args.repeat)]
+                ready, first, second = (statistics.median(values) for values in zip(*runs))
+                print(
+                    f"WARM_UP_CLIENTS={warm_up:<5}  ready {ready * 1000:8.1f} ms"
+                    f"  first request {first * 1000:8.1f} ms  second {second * 1000:8.1f} ms"
+                )
+    finally:
+        fake_llm.terminate()
+        fake_llm.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Conversation storage benchmark: on-disk size and read/write latency per codec.
+
+Usage:
+    python -m benchmarks.bench_storage --conversations 200 --messages 100
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from src.conversation.codec import MessageCodec, zstandard
+from src.conversation.repository import SQLiteConversationRepository
+from benchmarks.datasets import make_dataset
+
+
+class LegacyCodec(MessageCodec):
+    """The pre-codec layout: double-encoded JSON text"""
+
+    def encode(self, messages):
+        return json.dumps(messages)
+
+
+def route_encoded(conversation):
+    """Apply the double encoding done by the save_conversation route"""
+    for message in conversation.messages:
+        if not isinstance(message.content, str):
+            message.content = json.dumps(message.content)
+    return conversation
+
+
+def run(name, codec, dataset, db_dir):
+    db_path = os.path.join(db_dir, f"{name}.db")
+    repository = SQLiteConversationRepository(db_path=db_path, codec=codec)
+    writes, reads = [], []
+    for conversation in dataset:
+        started = time.perf_counter()
+        repository.save_conversation(conversation)
+        writes.append(time.perf_counter() - started)
+    for conversation in dataset:
+        started = time.perf_counter()
+        repository.get_conversation(conversation.conversation_id)
+        reads.append(time.perf_counter() - started)
+    size = os.path.getsize(db_path)
+    print(
+        f"{name:>7}: db {size / 1e6:8.2f} MB | "
+        f"write mean {statistics.mean(writes) * 1000:6.2f} ms | "
+        f"read mean {statistics.mean(reads) * 1000:6.2f} ms"
+    )
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--image-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    dataset = [
+        route_encoded(c)
+        for c in make_dataset(args.conversations, args.messages, image_rate=args.image_rate)
+    ]
+    codecs = [("legacy", LegacyCodec(compression="none")), ("zlib", MessageCodec("zlib"))]
+    if zstandard is not None:
+        codecs.append(("zstd", MessageCodec("zstd")))
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        sizes = {name: run(name, codec, dataset, db_dir) for name, codec in codecs}
+    for name, size in sizes.items():
+        if name != "legacy":
+            print(f"{name} size reduction: {(1 - size / sizes['legacy']) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
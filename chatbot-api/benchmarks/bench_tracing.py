@@ -0,0 +1,86 @@
+"""Tracing overhead benchmark.
+
+Measures per-span cost and request throughput for a conversation load at
+several sample rates.
+
+Usage:
+    python -m benchmarks.bench_tracing --requests 3000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.conversation.repository import SQLiteConversationRepository
+from src.conversation.routes import router, get_conversation_service
+from src.conversation.service import ConversationService
+from src.observability import tracing
+from src.observability.tracing import SpanExporter, Tracer, TracingMiddleware
+from benchmarks.datasets import make_conversation
+
+
+class DiscardExporter(SpanExporter):
+    """Runs the export path (queue + background encoding) and drops the output"""
+
+    def write(self, payload: dict) -> None:
+        pass
+
+
+def span_cost(tracer: Tracer, iterations: int = 100_000) -> float:
+    tracing.configure_tracing(tracer)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with tracing.start_span("root"):
+            with tracing.start_span("child"):
+                pass
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def throughput(client: TestClient, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get("/api/conversations/bench")
+    return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+
+    configs = [
+        ("disabled", Tracer()),
+        ("sample 0.01", Tracer(DiscardExporter(), sample_rate=0.01)),
+        ("sample 0.1", Tracer(DiscardExporter(), sample_rate=0.1)),
+        ("sample 1.0", Tracer(DiscardExporter(), sample_rate=1.0)),
+    ]
+    print("Cost of a root span with one child")
+    for label, tracer in configs:
+        print(f"  {label:<12} {span_cost(tracer):6.2f} us")
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        repository = SQLiteConversationRepository(db_path=os.path.join(db_dir, "bench.db"))
+        repository.save_conversation(make_conversation("bench", 20, image_rate=0))
+        app = FastAPI()
+        app.include_router(router)
+        app.add_middleware(TracingMiddleware)
+        app.dependency_overrides[get_conversation_service] = lambda: ConversationService(
+            repository=repository, ai_provider=None
+        )
+        client = TestClient(app)
+
+        print(f"GET /api/conversations/{{id}} throughput over {args.requests} requests")
+        throughput(client, 1000)  # warm up
+        baseline = None
+        for label, tracer in configs:
+            tracing.configure_tracing(tracer)
+            rate = throughput(client, args.requests)
+            baseline = baseline or rate
+            print(f"  {label:<12} {rate:8.0f} req/s ({(rate / baseline - 1) * 100:+.1f}%)")
+    tracing.configure_tracing(Tracer())
+
+
+if __name__ == "__main__":
+    main()
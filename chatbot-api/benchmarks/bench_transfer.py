@@ -0,0 +1,149 @@
+"""Bulk transfer benchmark: NDJSON export and import of a large conversation store.
+
+Fills a SQLite store, then exports it to a dump file, compared with fetching
+every conversation one at a time, and imports the dump into an empty store.
+Reports throughput and how far the process grows in memory during each step,
+and the latency of a concurrent writer while the export's read transaction
+is open.
+
+Usage:
+    python -m benchmarks.bench_transfer --conversations 20000 --messages 50 --dump conversations.ndjson.zst
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from src.conversation.repository import SQLiteConversationRepository
+from src.conversation.transfer import decode_lines, ndjson_chunks, open_dump, split_lines, CHUNK_BYTES
+from benchmarks.datasets import make_conversation
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class MemoryPeak:
+    """Largest RSS growth over the baseline while the block runs"""
+
+    def __enter__(self):
+        self.baseline = self.peak = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(0.02):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.growth = max(self.peak, rss_bytes()) - self.baseline
+
+
+class Writer(threading.Thread):
+    """Saves conversations in a loop, recording each save's latency"""
+
+    def __init__(self, db_path: str, messages: int):
+        super().__init__(daemon=True)
+        self.repository = SQLiteConversationRepository(db_path=db_path)
+        self.conversation = make_conversation("writer", messages, seed=-1, image_rate=0)
+        self.latencies = []
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            self.repository.save_conversation(self.conversation)
+            self.latencies.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+
+def writer_latency(db_path: str, messages: int, during) -> str:
+    writer = Writer(db_path, messages)
+    writer.start()
+    try:
+        result = during()
+    finally:
+        writer.stop.set()
+        writer.join()
+    latencies = sorted(writer.latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0
+    return result, f"{len(latencies)} writes, p50 {statistics.median(latencies) * 1000:.1f} ms p99 {p99 * 1000:.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--image-rate", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dump", default="conversations.ndjson.zst", help="Dump file name; .gz and .zst compress")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source = SQLiteConversationRepository(db_path=os.path.join(workdir, "source.db"))
+        started = time.perf_counter()
+        ids = []
+        for i in range(args.conversations):
+            conversation = make_conversation(f"conv-{i}", args.messages, seed=i, image_rate=args.image_rate)
+            source.save_conversation(conversation)
+            ids.append(conversation.conversation_id)
+        total_messages = args.conversations * args.messages
+        print(
+            f"store: {args.conversations} conversations, {total_messages} messages, "
+            f"{os.path.getsize(source.db_path) / 1e6:.0f} MB, filled in {time.perf_counter() - started:.0f} s"
+        )
+        _, idle = writer_latency(source.db_path, args.messages, lambda: time.sleep(2))
+        print(f"writer while idle     : {idle}")
+
+        with MemoryPeak() as memory:
+            started = time.perf_counter()
+            for conversation_id in ids:
+                source.get_conversation_json(conversation_id)
+            elapsed = time.perf_counter() - started
+        print(
+            f"one at a time         : {elapsed:6.1f} s ({args.conversations / elapsed:7.0f} conversations/s) | "
+            f"memory +{memory.growth / 1e6:.0f} MB"
+        )
+
+        dump = os.path.join(workdir, args.dump)
+
+        def export():
+            with open_dump(dump, "wb") as f:
+                for chunk in ndjson_chunks(source.export_json()):
+                    f.write(chunk)
+
+        with MemoryPeak() as memory:
+            started = time.perf_counter()
+            _, during = writer_latency(source.db_path, args.messages, export)
+            elapsed = time.perf_counter() - started
+        print(
+            f"export                : {elapsed:6.1f} s ({args.conversations / elapsed:7.0f} conversations/s, "
+            f"{total_messages / elapsed:8.0f} messages/s) | {os.path.getsize(dump) / 1e6:.0f} MB dump | "
+            f"memory +{memory.growth / 1e6:.0f} MB"
+        )
+        print(f"writer during export  : {during}")
+
+        target = SQLiteConversationRepository(db_path=os.path.join(workdir, "target.db"))
+        with MemoryPeak() as memory, open_dump(dump, "rb") as f:
+            started = time.perf_counter()
+            chunks = iter(lambda: f.read(CHUNK_BYTES), b"")
+            imported = target.import_conversations(decode_lines(split_lines(chunks)), args.batch_size)
+            elapsed = time.perf_counter() - started
+        print(
+            f"import                : {elapsed:6.1f} s ({imported / elapsed:7.0f} conversations/s, "
+            f"{total_messages / elapsed:8.0f} messages/s) | memory +{memory.growth / 1e6:.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
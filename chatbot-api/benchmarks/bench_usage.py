@@ -0,0 +1,94 @@
+"""Usage accounting benchmark: per-request overhead of recording token usage.
+
+Records upstream calls from several threads, as concurrent requests do, and
+compares the time each call spends in accounting when it is only appended to
+``UsageRecorder`` with writing one row per request to SQLite. Also reports
+how long a batched flush takes and how many rows it writes.
+
+Usage:
+    python -m benchmarks.bench_usage --calls 100000 --threads 8 --users 1000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from src.usage.accounting import UsageRecorder, UsageStore
+
+MODELS = ["gpt-4o", "gpt-4o-mini", "deepseek-r1-distill-llama-70b"]
+
+
+def run_threads(threads: int, calls: int, users: int, record) -> list:
+    """Call ``record`` ``calls`` times spread over threads; returns each call's duration"""
+    durations = []
+    lock = threading.Lock()
+
+    def work(seed):
+        rng = random.Random(seed)
+        local = []
+        for _ in range(calls // threads):
+            user, model = f"user-{rng.randrange(users)}", rng.choice(MODELS)
+            started = time.perf_counter_ns()
+            record(user, model, rng.randrange(100, 4000), rng.randrange(10, 800), rng.randrange(0, 100))
+            local.append(time.perf_counter_ns() - started)
+        with lock:
+            durations.extend(local)
+
+    workers = [threading.Thread(target=work, args=(seed,)) for seed in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sorted(durations)
+
+
+def summary(durations: list) -> str:
+    p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+    return f"mean {statistics.fmean(durations) / 1000:8.2f} us  p50 {statistics.median(durations) / 1000:8.2f} us  p99 {p99 / 1000:8.2f} us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        store = UsageStore(os.path.join(workdir, "usage.db"))
+        recorder = UsageRecorder(store)
+        durations = run_threads(args.threads, args.calls, args.users, recorder.record)
+        print(f"{'recorder':>18}: {summary(durations)}")
+        started = time.perf_counter()
+        rows = recorder.flush()
+        print(f"{'':>18}  flush of {len(durations)} calls: {rows} rows in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        db_path = os.path.join(workdir, "per-request.db")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE calls (at REAL, user_id TEXT, model TEXT, prompt_tokens INTEGER, "
+                "completion_tokens INTEGER, cached_tokens INTEGER)"
+            )
+        local = threading.local()
+
+        def insert(user, model, prompt, completion, cached):
+            conn = getattr(local, "conn", None)
+            if conn is None:
+                conn = local.conn = sqlite3.connect(db_path, timeout=30)
+            with conn:
+                conn.execute(
+                    "INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?)", (time.time(), user, model, prompt, completion, cached)
+                )
+
+        calls = min(args.calls, 20_000)
+        durations = run_threads(args.threads, calls, args.users, insert)
+        print(f"{'row per request':>18}: {summary(durations)}  ({len(durations)} calls)")
+
+
+if __name__ == "__main__":
+    main()
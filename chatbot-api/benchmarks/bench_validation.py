@@ -0,0 +1,135 @@
+"""Request validation benchmark: parsing 1,000-message chat and conversation bodies.
+
+Times body validation with the undiscriminated content unions the routes used
+before against the shared discriminated MessageSchema, for text-only and mixed
+text and image histories, and the cost of refusing an oversized body with the
+pre-validation limit check instead of validating it in full.
+
+Usage:
+    python -m benchmarks.bench_validation --messages 1000 --repeat 50
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+from typing import List, Optional, Union
+from pydantic import BaseModel, ConfigDict, ValidationError
+from src.chat.schemas import ChatRequestSchema, ImageUrlSchema
+from src.conversation.routes import ConversationSchema
+from src.limits import RequestLimits, check_messages
+
+IMAGE = "data:image/png;base64," + "iVBORw0KGgo" * 2000
+
+
+class LegacyImageContent(BaseModel):
+    type: str = "image_url"
+    image_url: ImageUrlSchema
+    model_config = ConfigDict(from_attributes=True)
+
+
+class LegacyTextContent(BaseModel):
+    type: str = "text"
+    text: str
+    model_config = ConfigDict(from_attributes=True)
+
+
+class LegacyChatMessage(BaseModel):
+    role: str
+    content: Union[str, List[Union[LegacyTextContent, LegacyImageContent]]]
+    model: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
+
+
+class LegacyChatRequest(BaseModel):
+    messages: List[LegacyChatMessage]
+
+
+class LegacyConversationMessage(BaseModel):
+    role: str
+    content: str | dict | list[dict]
+    model: str | None = None
+    timestamp: datetime | None = None
+
+
+class LegacyConversation(BaseModel):
+    conversation_id: str
+    conversation_name: str | None = None
+    messages: List[LegacyConversationMessage]
+    last_updated: datetime | None = None
+
+
+def make_messages(n: int, image_rate: float) -> list:
+    messages = []
+    for i in range(n):
+        role = "user" if i % 2 == 0 else "assistant"
+        text = f"message {i} " + "lorem ipsum dolor sit amet " * 10
+        if role == "user" and image_rate and i % int(1 / image_rate) == 0:
+            content = [
+                {"type": "image_url", "image_url": {"url": IMAGE}},
+                {"type": "text", "text": text},
+            ]
+        elif role == "user":
+            content = [{"type": "text", "text": text}]
+        else:
+            content = text
+        messages.append({"role": role, "content": content, "model": "gpt-4o", "timestamp": "2024-05-01T12:00:00Z"})
+    return messages
+
+
+def errors(schema, payload) -> int:
+    try:
+        schema.model_validate(payload)
+    except ValidationError as error:
+        return error.error_count()
+    return 0
+
+
+def median_ms(function, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for label, image_rate in (("text", 0.0), ("text+images", 0.1)):
+        messages = make_messages(args.messages, image_rate)
+        cases = (
+            ("chat", LegacyChatRequest, ChatRequestSchema, {"messages": messages}),
+            ("conversation", LegacyConversation, ConversationSchema, {"conversation_id": "c", "messages": messages}),
+        )
+        for name, legacy, shared, payload in cases:
+            # FastAPI decodes the body before validating it; only validation is timed
+            before = median_ms(lambda: legacy.model_validate(payload), args.repeat)
+            after = median_ms(lambda: shared.model_validate(payload), args.repeat)
+            invalid = {**payload, "messages": messages[:-1] + [{"role": "user", "content": [{"type": "audio"}]}]}
+            before_invalid = median_ms(lambda: errors(legacy, invalid), args.repeat)
+            after_invalid = median_ms(lambda: errors(shared, invalid), args.repeat)
+            print(
+                f"{label:>11} {name:>12}: {len(json.dumps(payload)) / 1e6:5.2f} MB | "
+                f"undiscriminated {before:6.2f} ms (invalid part {before_invalid:6.2f} ms) | "
+                f"discriminated {after:6.2f} ms (invalid part {after_invalid:6.2f} ms)"
+            )
+
+    oversized = make_messages(args.messages * 10, 0.0)
+    limits = RequestLimits(max_messages=args.messages)
+    validate = median_ms(lambda: ChatRequestSchema.model_validate({"messages": oversized}), args.repeat)
+    reject = median_ms(lambda: check_messages(oversized, limits), args.repeat)
+    print(
+        f"{len(oversized)} messages over a {args.messages}-message limit: "
+        f"full validation {validate:7.2f} ms | limit check {reject:7.4f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Chat transport benchmark: SSE connections vs multiplexed WebSocket streams.
+
+Opens the same number of concurrent generations against the chat routers
+under uvicorn, once as one ``POST /chat/stream`` connection each and once
+multiplexed over a few ``/ws/chat`` connections. The server streams from a
+paced in-process provider so that the transport, not an upstream, is measured.
+Reports server memory per stream at peak, server CPU time per chunk and
+delivered chunks per second.
+
+Usage:
+    python -m benchmarks.bench_websocket --streams 10000 --streams-per-socket 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+from benchmarks.bench_e2e import ROOT, free_port, wait_for
+
+
+class PacedProvider:
+    """Streams a fixed number of chunks at a fixed rate per generation"""
+
+    def __init__(self, chunks: int, interval: float):
+        self.chunks = chunks
+        self.interval = interval
+
+    def generate_response(self, messages):
+        raise NotImplementedError
+
+    async def generate_stream(self, messages):
+        for i in range(self.chunks):
+            await asyncio.sleep(self.interval)
+            yield f"token{i} "
+
+
+def serve(port: int, chunks: int, interval: float) -> None:
+    import uvicorn
+    from fastapi import FastAPI
+    from src.chat.routes import router as chat_router, get_chat_service
+    from src.chat.service import ChatService
+    from src.chat.websocket import router as websocket_router, get_max_streams
+
+    app = FastAPI()
+    app.include_router(chat_router)
+    app.include_router(websocket_router)
+    service = ChatService(ai_provider=PacedProvider(chunks, interval))
+    app.dependency_overrides[get_chat_service] = lambda: service
+    app.dependency_overrides[get_max_streams] = lambda: 0
+
+    @app.get("/ready")
+    async def ready() -> dict:
+        return {}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=16384)
+
+
+def rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+BODY = {"messages": [{"role": "user", "content": "Hello", "model": "paced"}]}
+
+
+async def sse_streams(base_url: str, streams: int) -> int:
+    limits = httpx.Limits(max_connections=streams, max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+
+        async def one() -> int:
+            received = 0
+            async with client.stream("POST", "/chat/stream", json=BODY) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("data: "):
+                        received += 1
+            return received
+
+        return sum(await asyncio.gather(*(one() for _ in range(streams))))
+
+
+async def websocket_streams(base_url: str, streams: int, per_socket: int) -> int:
+    import websockets
+
+    url = base_url.replace("http://", "ws://") + "/ws/chat"
+
+    async def socket(count: int) -> int:
+        received = 0
+        async with websockets.connect(url, max_size=None) as websocket:
+            for i in range(count):
+                await websocket.send(json.dumps({"type": "start", "id": str(i), **BODY}))
+            remaining = count
+            while remaining:
+                for event in json.loads(await websocket.recv()):
+                    if "content" in event:
+                        received += 1
+                    elif event.get("done"):
+                        remaining -= 1
+        return received
+
+    sizes = [per_socket] * (streams // per_socket) + ([streams % per_socket] if streams % per_socket else [])
+    return sum(await asyncio.gather(*(socket(size) for size in sizes)))
+
+
+async def measure(name: str, run, server_pid: int, streams: int, chunks: int) -> None:
+    baseline = rss_bytes(server_pid)
+    cpu_before = cpu_seconds(server_pid)
+    peak = baseline
+
+    async def sample():
+        nonlocal peak
+        while True:
+            peak = max(peak, rss_bytes(server_pid))
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample())
+    started = time.perf_counter()
+    received = await run()
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    cpu = cpu_seconds(server_pid) - cpu_before
+    print(
+        f"{name:>22}: {received}/{streams * chunks} chunks in {elapsed:6.2f} s "
+        f"({received / elapsed:8.0f} chunks/s) | server memory {(peak - baseline) / streams / 1024:6.1f} KiB/stream "
+        f"(peak {peak / 1e6:6.1f} MB) | server CPU {cpu / max(received, 1) * 1e6:6.1f} us/chunk"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=10000)
+    parser.add_argument("--streams-per-socket", type=int, default=100)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--interval-ms", type=float, default=250)
+    parser.add_argument("--transport", action="append", choices=["sse", "websocket"])
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.chunks, args.interval_ms / 1000)
+        return
+
+    for transport in args.transport or ["sse", "websocket"]:
+        # A fresh server per transport, so that memory is not carried over
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_websocket", "--serve", str(port),
+             "--chunks", str(args.chunks), "--interval-ms", str(args.interval_ms)],
+            cwd=ROOT,
+            env=dict(os.environ, PYTHONPATH=ROOT),
+        )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            wait_for(f"{base_url}/ready")
+            if transport == "sse":
+                name = f"{args.streams} SSE connections"
+                run = lambda: sse_streams(base_url, args.streams)
+            else:
+                sockets = -(-args.streams // args.streams_per_socket)
+                name = f"{args.streams} streams / {sockets} ws"
+                run = lambda: websocket_streams(base_url, args.streams, args.streams_per_socket)
+            asyncio.run(measure(name, run, server.pid, args.streams, args.chunks))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Throughput scaling against worker count.
+
+Runs ``python -m src.serve`` with 1, 2, 4, ... workers against the fake LLM and
+reports throughput for each scenario. Throughput can only scale up to the
+number of available cores.
+
+Usage:
+    python -m benchmarks.bench_workers --workers 1,2,4 --requests 400
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+from benchmarks.bench_e2e import SCENARIOS, run_scenario, scenario_requests, seed_conversations, start_servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--scenarios", default="chat_stream,get_conversation")
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--ttft-ms", type=float, default=50)
+    parser.add_argument("--tokens-per-second", type=float, default=500)
+    parser.add_argument("--completion-tokens", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    names = args.scenarios.split(",")
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    requests = scenario_requests(args)
+    baseline = {}
+    print(f"{args.requests} requests per scenario, concurrency {args.concurrency}")
+    for workers in (int(w) for w in args.workers.split(",")):
+
+        def serve(port, workers=workers):
+            return [
+                sys.executable, "-m", "src.serve",
+                "--workers", str(workers),
+                "--port", str(port),
+                "--log-level", "warning",
+            ]
+
+        with tempfile.TemporaryDirectory() as workdir:
+            fake_llm, app, base_url = start_servers(args, workdir, app_command=serve)
+            try:
+                seed_conversations(base_url, args.conversations, args.messages)
+                for name in names:
+                    asyncio.run(run_scenario(base_url, requests[name], min(50, args.requests), args.concurrency))
+                    latencies, errors, elapsed = asyncio.run(
+                        run_scenario(base_url, requests[name], args.requests, args.concurrency)
+                    )
+                    rps = len(latencies) / elapsed
+                    baseline.setdefault(name, rps)
+                    print(
+                        f"  workers {workers:<3} {name:<20} {rps:8.1f} req/s"
+                        f"  x{rps / baseline[name]:.2f}  errors {errors}"
+                    )
+            finally:
+                app.terminate()
+                fake_llm.terminate()
+                app.wait()
+                fake_llm.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Synthetic but realistic conversation data for benchmarks"""
+
+import base64
+import random
+from datetime import datetime, timedelta, timezone
+from src.chat.models import Message
+from src.conversation.models import Conversation
+
+WORDS = (
+    "the model answer code python function data request response error value list "
+    "table query user system image token stream cache latency memory server client "
+    "because however therefore example return import class async await while for"
+).split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def paragraph(rng: random.Random) -> str:
+    text = " ".join(sentence(rng, rng.randint(6, 18)) for _ in range(rng.randint(2, 8)))
+    if rng.random() < 0.3:
+        text += "\n\n```python\n" + "\n".join(
+            f"def f{i}(x):\n    return x * {i}" for i in range(rng.randint(2, 10))
+        ) + "\n```"
+    return text
+
+
+def image_url(rng: random.Random, size: int) -> str:
+    """A data URL wrapping incompressible bytes, like an embedded JPEG"""
+    return "data:image/jpeg;base64," + base64.b64encode(rng.randbytes(size)).decode()
+
+
+def make_message(rng: random.Random, index: int, image_rate: float, image_bytes: int) -> Message:
+    role = "user" if index % 2 == 0 else "assistant"
+    timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=index)
+    if role == "user" and rng.random() < image_rate:
+        content = [
+            {"type": "text", "text": sentence(rng, 10)},
+            {"type": "image_url", "image_url": {"url": image_url(rng, image_bytes)}},
+        ]
+    elif role == "user":
+        content = sentence(rng, rng.randint(5, 30))
+    else:
+        content = paragraph(rng)
+    return Message(role=role, content=content, model="gpt-4o", timestamp=timestamp)
+
+
+def make_conversation(
+    conversation_id: str,
+    messages: int,
+    seed: int = 0,
+    image_rate: float = 0.05,
+    image_bytes: int = 50_000,
+) -> Conversation:
+    rng = random.Random(seed)
+    return Conversation(
+        conversation_id=conversation_id,
+        conversation_name=sentence(rng, 3),
+        messages=[make_message(rng, i, image_rate, image_bytes) for i in range(messages)],
+        last_updated=datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(hours=seed),
+    )
+
+
+def make_dataset(conversations: int, messages: int, **kwargs):
+    return [
+        make_conversation(f"conv-{i}", messages, seed=i, **kwargs) for i in range(conversations)
+    ]
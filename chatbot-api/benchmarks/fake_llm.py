@@ -0,0 +1,218 @@
+"""Deterministic OpenAI-compatible chat completions server for benchmarks.
+
+Serves ``POST /v1/chat/completions`` (plain and streaming) with a configurable
+time to first token, token rate, completion length, token size and error rate.
+The completion text and injected errors depend only on the seed and the request
+messages, so repeated runs see the same responses.
+
+With a prefill rate set, time to first token also grows with the prompt, and a
+prefix cache stands in for the KV-cache reuse of vLLM or llama.cpp: prompt
+prefixes are cached at message boundaries, exactly as received, and only the
+uncached suffix pays for prefill. Usage reports the cached prompt tokens.
+
+Usage:
+    python -m benchmarks.fake_llm --port 8100 --ttft-ms 200 --tokens-per-second 50
+    python -m benchmarks.fake_llm --ttft-ms 20 --prefill-tokens-per-second 5000 --prefix-cache-tokens 1000000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "the model answer code python function data request response error value list "
+    "table query user system token stream cache latency memory server client"
+).split()
+
+
+@dataclass
+class FakeLLMConfig:
+    ttft: float = 0.2
+    tokens_per_second: float = 50.0
+    completion_tokens: int = 100
+    token_size: int = 5
+    error_rate: float = 0.0
+    error_status: int = 500
+    seed: int = 0
+    # Prompt tokens processed per second before the first token; 0 makes prefill free
+    prefill_tokens_per_second: float = 0.0
+    # Capacity of the prefix cache in prompt tokens; 0 disables it
+    prefix_cache_tokens: int = 0
+
+
+class PrefixCache:
+    """LRU of prompt prefixes, keyed by a running hash at each message boundary"""
+
+    def __init__(self, capacity_tokens: int):
+        self.capacity_tokens = capacity_tokens
+        self.tokens = 0
+        self._entries: "OrderedDict[bytes, int]" = OrderedDict()
+
+    def lookup(self, messages: list) -> tuple:
+        """Return (prompt tokens, cached prompt tokens) and cache every prefix of the prompt"""
+        digest = hashlib.sha256()
+        total = cached = 0
+        matching = True
+        for message in messages:
+            data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+            digest.update(data)
+            key = digest.digest()
+            tokens = max(1, len(data) // 4)
+            total += tokens
+            if matching and key in self._entries:
+                cached += tokens
+                self._entries.move_to_end(key)
+                continue
+            matching = False
+            if self.capacity_tokens:
+                self._entries[key] = tokens
+                self.tokens += tokens
+        while self.tokens > self.capacity_tokens and self._entries:
+            self.tokens -= self._entries.popitem(last=False)[1]
+        return total, cached
+
+
+def _request_rng(config: FakeLLMConfig, body: dict) -> random.Random:
+    key = json.dumps(body.get("messages", []), sort_keys=True).encode("utf-8")
+    return random.Random(config.seed ^ zlib.crc32(key))
+
+
+def _tokens(rng: random.Random, config: FakeLLMConfig) -> list:
+    tokens = []
+    for _ in range(config.completion_tokens):
+        word = rng.choice(WORDS)
+        tokens.append(" " + (word * (config.token_size // len(word) + 1))[: config.token_size - 1])
+    return tokens
+
+
+def _prompt_tokens(body: dict) -> int:
+    return max(1, len(json.dumps(body.get("messages", []))) // 4)
+
+
+def _error(config: FakeLLMConfig) -> JSONResponse:
+    return JSONResponse(
+        status_code=config.error_status,
+        content={"error": {"message": "Injected failure", "type": "server_error", "code": None}},
+    )
+
+
+def create_app(config: FakeLLMConfig) -> FastAPI:
+    app = FastAPI(title="Fake LLM")
+    prefix_cache = PrefixCache(config.prefix_cache_tokens)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        rng = _request_rng(config, body)
+        if rng.random() < config.error_rate:
+            return _error(config)
+        tokens = _tokens(rng, config)
+        model = body.get("model", "fake")
+        completion_id = f"chatcmpl-{rng.getrandbits(48):012x}"
+        created = int(time.time())
+        prompt_tokens, cached_tokens = prefix_cache.lookup(body.get("messages", []))
+        if not config.prefix_cache_tokens:
+            prompt_tokens = _prompt_tokens(body)
+        ttft = config.ttft
+        if config.prefill_tokens_per_second:
+            ttft += (prompt_tokens - cached_tokens) / config.prefill_tokens_per_second
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + len(tokens) / config.tokens_per_second)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: dict, finish_reason=None, chunk_usage=None) -> bytes:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+            }
+            if chunk_usage is not None:
+                data["usage"] = chunk_usage
+            return b"data: " + json.dumps(data).encode("utf-8") + b"\n\n"
+
+        async def stream():
+            await asyncio.sleep(ttft)
+            yield chunk({"role": "assistant", "content": ""})
+            interval = 1 / config.tokens_per_second
+            next_at = time.monotonic()
+            for token in tokens:
+                yield chunk({"content": token})
+                next_at += interval
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk(None, chunk_usage=usage)
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--ttft-ms", type=float, default=200)
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--completion-tokens", type=int, default=100)
+    parser.add_argument("--token-size", type=int, default=5, help="Characters per streamed token")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0)
+    parser.add_argument("--prefix-cache-tokens", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeLLMConfig(
+        ttft=args.ttft_ms / 1000,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        token_size=args.token_size,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        prefix_cache_tokens=args.prefix_cache_tokens,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,38 @@
 from dataclasses import dataclass
-from typing import List, Optional, Union, Dict
+from typing import Any, List, Optional, Union, Dict
 from datetime import datetime, timezone
+import sys
 
 
-@dataclass
+@dataclass(slots=True)
 class ImageContent:
     type: str = "image_url"
     image_url: Dict[str, str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class TextContent:
     type: str = "text"
     text: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class Message:
     role: str
-    content: Union[str, List[Union[TextContent, ImageContent]]]
+    # Content parts may also be API schema objects or stored dicts; anything
+    # with a ``type`` field is accepted so that routes can pass them through
+    content: Union[str, List[Union[TextContent, ImageContent, Any]]]
     model: Optional[str] = None
     timestamp: datetime = datetime.now(timezone.utc)
 
+    def __post_init__(self):
+        # Roles and model names repeat across every message of a history
+        self.role = sys.intern(self.role)
+        if self.model is not None:
+            self.model = sys.intern(self.model)
 
-@dataclass
+
+@dataclass(slots=True)
 class ChatResponse:
     content: str
     model: str
@@ -0,0 +1,77 @@
+"""Prompt assembly that keeps conversation prefixes byte-stable across turns.
+
+Upstream servers (OpenAI, vLLM, llama.cpp) reuse cached prompt state only for
+an identical prefix, so the request for turn N+1 must start with exactly the
+bytes sent for turn N. Messages are therefore rendered canonically (fixed key
+order, normalized image URLs, parts kept in order), system preamble is
+pinned first, and per-request content such as retrieved context goes right
+before the final turn instead of in front of the history.
+"""
+
+from typing import Any, List, Optional
+import hashlib
+import json
+from .models import Message
+
+
+def _canonical_value(value: Any) -> Any:
+    """Unknown structures with their keys in sorted order"""
+    if isinstance(value, dict):
+        return {key: _canonical_value(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [_canonical_value(item) for item in value]
+    return value
+
+
+def canonical_part(part: Any) -> dict:
+    """Render a content part; parts may be domain models, API schemas or plain dicts"""
+    if isinstance(part, dict):
+        kind, text, image_url = part.get("type"), part.get("text"), part.get("image_url")
+    else:
+        kind, text, image_url = part.type, getattr(part, "text", None), getattr(part, "image_url", None)
+    if kind == "text":
+        return {"type": "text", "text": text}
+    if kind == "image_url":
+        if isinstance(image_url, dict):
+            url, detail = image_url.get("url", ""), image_url.get("detail")
+        else:
+            url, detail = image_url.url, getattr(image_url, "detail", None)
+        image = {"url": url.strip()}
+        if detail:
+            image["detail"] = detail
+        return {"type": "image_url", "image_url": image}
+    return _canonical_value(part)
+
+
+def canonical_message(message: Message) -> dict:
+    """Format a message for the chat completions API, byte-stable across turns"""
+    if isinstance(message.content, str):
+        return {"role": message.role, "content": message.content}
+    # Part order is meaning: text and images may be interleaved on purpose
+    parts = [canonical_part(part) for part in message.content]
+    if len(parts) == 1 and parts[0]["type"] == "text":
+        return {"role": message.role, "content": parts[0]["text"]}
+    return {"role": message.role, "content": parts}
+
+
+def order_messages(messages: List[Message], context: Optional[Message] = None) -> List[Message]:
+    """System preamble first, then the turns, with per-request context just before the last turn"""
+    if not messages:
+        return [context] if context is not None else []
+    *history, current = messages
+    preamble = [message for message in history if message.role == "system"]
+    turns = [message for message in history if message.role != "system"]
+    return [*preamble, *turns, *([context] if context is not None else []), current]
+
+
+def cache_key(formatted: List[dict], scope: str = "") -> str:
+    """Stable key for a conversation, derived from its first non-system turn and ``scope``.
+
+    System messages are skipped because retrieved context is a system message
+    that sits in front of the first turn only on the first request. ``scope``
+    (the user or tenant) keeps unrelated conversations that open the same way
+    ("hi") from sharing one key, and so one replica.
+    """
+    first_turn = next((message for message in formatted if message["role"] != "system"), None)
+    data = json.dumps([scope, first_turn], separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:32]
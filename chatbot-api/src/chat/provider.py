@@ -1,11 +1,81 @@
-from typing import Protocol, AsyncIterator, List
-from openai import OpenAI
-from .models import Message, ChatResponse, TextContent, ImageContent
+from dataclasses import dataclass
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional, Protocol, AsyncIterator, List, Tuple
+from .models import Message, ChatResponse
+from .prompt import cache_key, canonical_message
+from ..observability.metrics import llm_metrics
+from ..observability.tracing import start_span, SPAN_KIND_CLIENT
+import asyncio
 import logging
+import threading
+import time
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+    from ..usage.accounting import UsageRecorder
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_USER = ""
+
+
+class _Failure:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_DONE = object()
+
+
+async def stream_in_thread(open_stream: Callable[[], Iterable[Any]]) -> AsyncIterator[Any]:
+    """Iterate a blocking stream on a thread of its own.
+
+    The OpenAI client blocks while waiting for each chunk; running the stream
+    off the event loop lets other requests, and other streams of the same
+    request, proceed meanwhile. Closing the generator stops the thread after
+    its current chunk and closes the upstream stream.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def put(item) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass  # The event loop is gone; nobody is listening
+
+    def produce() -> None:
+        stream = None
+        try:
+            stream = open_stream()
+            for item in stream:
+                if stopped.is_set():
+                    break
+                put(item)
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+    threading.Thread(target=produce, name="llm-stream", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+
 
 class AIProvider(Protocol):
     """Protocol for AI providers"""
@@ -15,45 +85,134 @@ class AIProvider(Protocol):
 
 
 class OpenAIProvider:
-    """OpenAI implementation of AIProvider"""
+    """OpenAI implementation of AIProvider.
+
+    Clients are created on first use of each backend, so the ``openai`` import
+    and the client setup are paid by the first request that needs them rather
+    than at startup, and unused backends are never built. With a usage
+    recorder, every call's tokens are accounted to the ``user`` it was made
+    for; ``for_user`` binds one.
+    """
+
+    def __init__(self, api_key: str, api_base: str | None = None, groq_api_key: str | None = None, groq_api_base: str | None = None, github_api_key: str | None = None, github_api_base: str | None = None, prompt_cache_hints: bool = True, usage: Optional["UsageRecorder"] = None):
+        self.api_key = api_key
+        self.api_base = api_base
+        self.groq_api_key = groq_api_key
+        self.groq_api_base = groq_api_base
+        self.github_api_key = github_api_key
+        self.github_api_base = github_api_base
+        self.prompt_cache_hints = prompt_cache_hints
+        self.usage = usage
+
+    def for_user(self, user: str) -> "UserProvider":
+        """This provider, accounting usage to ``user``"""
+        return UserProvider(self, user)
+
+    @staticmethod
+    def _create_client(api_key: str | None, base_url: str | None) -> "OpenAI":
+        from openai import OpenAI
+
+        return OpenAI(api_key=api_key, base_url=base_url)
+
+    @cached_property
+    def client(self) -> "OpenAI":
+        return self._create_client(self.api_key, self.api_base)
+
+    @cached_property
+    def groq_client(self) -> "OpenAI":
+        return self._create_client(self.groq_api_key, self.groq_api_base)
+
+    @cached_property
+    def github_client(self) -> "OpenAI":
+        return self._create_client(self.github_api_key, self.github_api_base)
 
-    def __init__(self, api_key: str, api_base: str | None = None, groq_api_key: str | None = None, groq_api_base: str | None = None, github_api_key: str | None = None, github_api_base: str | None = None):
-        self.client = OpenAI(api_key=api_key, base_url=api_base)
-        self.groq_client = OpenAI(api_key=groq_api_key, base_url=groq_api_base)
-        self.github_client = OpenAI(api_key=github_api_key, base_url=github_api_base)
     def _format_message(self, message: Message) -> dict:
-        """Format message for OpenAI API"""
-        if isinstance(message.content, str):
-            return {"role": message.role, "content": message.content}
-
-        # For messages with text and images
-        formatted_content = []
-        for item in message.content:
-            if isinstance(item, TextContent):
-                formatted_content.append({"type": "text", "text": item.text})
-            elif isinstance(item, ImageContent):
-                formatted_content.append(
-                    {"type": "image_url", "image_url": item.image_url}
-                )
-        return {"role": message.role, "content": formatted_content}
+        """Format message for OpenAI API, rendered canonically so prompt prefixes stay cacheable"""
+        return canonical_message(message)
 
-    def generate_response(self, messages: List[Message]) -> ChatResponse:
+    def _client_for(self, model: str) -> Tuple["OpenAI", str]:
+        """Pick the client serving a model and the backend name used in metrics"""
+        if model == "deepseek-r1-distill-llama-70b":
+            return self.groq_client, "groq"
+        if model == "Deepseek-r1":
+            return self.github_client, "github"
+        return self.client, "openai"
+
+    def _format_messages(self, messages: List[Message]) -> List[dict]:
+        with start_span("OpenAIProvider.format_messages", messages=len(messages)):
+            return [self._format_message(m) for m in messages]
+
+    def _request_options(self, span, backend: str, formatted_messages: List[dict], user: str) -> dict:
+        """Trace propagation and prompt cache hints for the upstream request.
+
+        The affinity header lets a load balancer pin a conversation to one
+        replica, whose prefix cache holds its history; the key is scoped to
+        ``user`` so conversations of different users spread. ``prompt_cache_key`` is
+        only sent to the default backend; other providers may reject it.
+        """
+        headers = {}
+        options = {}
+        if span.sampled:
+            headers["traceparent"] = span.traceparent
+        if self.prompt_cache_hints:
+            key = cache_key(formatted_messages, user)
+            headers["X-Session-Affinity"] = key
+            if backend == "openai":
+                options["extra_body"] = {"prompt_cache_key": key}
+        if headers:
+            options["extra_headers"] = headers
+        return options
+
+    @staticmethod
+    def _record_usage(metrics, span, usage) -> None:
+        """Count prompt tokens, and how many of them the upstream served from its prompt cache"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+        metrics.tokens_in.inc(usage.prompt_tokens)
+        metrics.tokens_cached.inc(cached)
+        span.set_attribute("prompt_tokens", usage.prompt_tokens)
+        span.set_attribute("cached_prompt_tokens", cached)
+
+    def _account(self, user: str, model: str, formatted_messages: List[dict], usage, completion_tokens: int) -> None:
+        """Record a call's usage as reported by the upstream, or estimated when it reported none"""
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+            self.usage.record(user, model, usage.prompt_tokens, usage.completion_tokens, cached)
+        else:
+            from ..usage.accounting import estimate_prompt_tokens
+
+            self.usage.record(
+                user, model, estimate_prompt_tokens(formatted_messages), completion_tokens, estimated=True
+            )
+
+    def generate_response(self, messages: List[Message], user: str = DEFAULT_USER) -> ChatResponse:
         """Generate a response for messages"""
         # Use the model from the latest message
         model = messages[-1].model if messages and messages[-1].model else "claude-3-5-sonnet"
-        formatted_messages = [self._format_message(m) for m in messages]
-        if model == "deepseek-r1-distill-llama-70b":  
-            response = self.groq_client.chat.completions.create(
-                model=model, messages=formatted_messages
-            )
-        elif model == "Deepseek-r1":
-            response = self.github_client.chat.completions.create(
-                model=model, messages=formatted_messages
-            )
-        else:
-            response = self.client.chat.completions.create(
-                model=model, messages=formatted_messages
-            )
+        client, backend = self._client_for(model)
+        metrics = llm_metrics(model, backend)
+        with start_span(
+            "OpenAIProvider.generate_response", kind=SPAN_KIND_CLIENT, model=model, backend=backend
+        ) as span:
+            formatted_messages = self._format_messages(messages)
+            started = time.perf_counter()
+            try:
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=formatted_messages,
+                    **self._request_options(span, backend, formatted_messages, user),
+                )
+            except Exception:
+                metrics.errors.inc()
+                raise
+            metrics.complete_duration.observe(time.perf_counter() - started)
+            if response.usage is not None:
+                self._record_usage(metrics, span, response.usage)
+                metrics.tokens_out.inc(response.usage.completion_tokens)
+            if self.usage is not None:
+                content = response.choices[0].message.content or ""
+                self._account(user, model, formatted_messages, response.usage, len(content) // 4)
 
         return ChatResponse(
             content=response.choices[0].message.content,
@@ -61,30 +220,71 @@ class OpenAIProvider:
             timestamp=datetime.utcnow(),
         )
 
-    async def generate_stream(self, messages: List[Message]) -> AsyncIterator[str]:
+    async def generate_stream(self, messages: List[Message], user: str = DEFAULT_USER) -> AsyncIterator[str]:
         """Stream response for messages"""
-        try:
-            model = messages[-1].model
-            logger.info(f"Using model: {model}")
-            formatted_messages = [self._format_message(m) for m in messages]
-            
-            if model == "deepseek-r1-distill-llama-70b":
-                stream = self.groq_client.chat.completions.create(
-                    model=model, messages=formatted_messages, stream=True
-                )
-            elif model == "Deepseek-r1":
-                stream = self.github_client.chat.completions.create(
-                    model=model, messages=formatted_messages, stream=True
-                )
-            else:
-                stream = self.client.chat.completions.create(
-                    model=model, messages=formatted_messages, stream=True
+        model = messages[-1].model
+        logger.info(f"Using model: {model}")
+        client, backend = self._client_for(model)
+        metrics = llm_metrics(model, backend)
+        with start_span(
+            "OpenAIProvider.generate_stream", kind=SPAN_KIND_CLIENT, model=model, backend=backend
+        ) as span:
+            formatted_messages = self._format_messages(messages)
+            started = time.perf_counter()
+            first_token = None
+            tokens = 0
+            usage = None
+            stream = None
+            try:
+                metrics.in_flight.inc()
+                options = self._request_options(span, backend, formatted_messages, user)
+                stream = stream_in_thread(
+                    lambda: client.chat.completions.create(
+                        model=model,
+                        messages=formatted_messages,
+                        stream=True,
+                        # The final chunk then carries usage, including cached prompt tokens
+                        stream_options={"include_usage": True},
+                        **options,
+                    )
                 )
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                        self._record_usage(metrics, span, usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        content = chunk.choices[0].delta.content
+                        if first_token is None:
+                            first_token = time.perf_counter()
+                            metrics.ttft.observe(first_token - started)
+                            span.add_event("first_token")
+                        tokens += 1  # providers stream roughly one token per chunk
+                        yield content
+            except Exception as e:
+                metrics.errors.inc()
+                logger.error(f"Error in stream: {str(e)}")
+                raise
+            finally:
+                # Stops the upstream stream when the consumer goes away early
+                if stream is not None:
+                    await stream.aclose()
+                metrics.in_flight.dec()
+                metrics.observe_stream(started, first_token, time.perf_counter(), tokens)
+                span.set_attribute("tokens", tokens)
+                if self.usage is not None and (usage is not None or tokens):
+                    # A stream closed before its final chunk is counted from what was streamed
+                    self._account(user, model, formatted_messages, usage, tokens)
+
+
+@dataclass
+class UserProvider:
+    """A provider whose calls are accounted to one user; its methods take a ``user``"""
+
+    provider: AIProvider
+    user: str
+
+    def generate_response(self, messages: List[Message]) -> ChatResponse:
+        return self.provider.generate_response(messages, user=self.user)
 
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    yield content
-        except Exception as e:
-            logger.error(f"Error in stream: {str(e)}")
-            raise
+    def generate_stream(self, messages: List[Message]) -> AsyncIterator[str]:
+        return self.provider.generate_stream(messages, user=self.user)
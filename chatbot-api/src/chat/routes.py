@@ -1,18 +1,27 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from typing import List, Union, Dict
+from typing import List, Optional, Union, Dict
 from .schemas import (
     ChatRequestSchema,
     ChatResponseSchema,
+    CompareRequestSchema,
     MessageSchema,
     TextContentSchema,
     ImageContentSchema,
 )
+from .scheduler import DeadlineExceeded
 from .service import ChatService
-from .models import Message, TextContent, ImageContent
+from .models import Message
+from ..limits import enforce_request_limits
+from ..observability.tracing import start_span
+from ..shared.rate_limit import RateLimiter
+from ..shared.replay import StreamReplayBuffer
+from ..shared.store import SharedStore
 from datetime import datetime
 import logging
 import json
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +33,37 @@ async def get_chat_service() -> ChatService:
     raise NotImplementedError("Chat service not configured")
 
 
+async def get_rate_limiter() -> Optional[RateLimiter]:
+    # Overridden in main.py when rate limiting is enabled
+    return None
+
+
+async def get_replay_buffer() -> Optional[StreamReplayBuffer]:
+    # Overridden in main.py when stream replay is enabled
+    return None
+
+
+async def get_shared_state() -> Optional[SharedStore]:
+    # Overridden in main.py; lets any worker cancel part of a comparison
+    return None
+
+
+async def enforce_rate_limit(
+    request: Request, rate_limiter: Optional[RateLimiter] = Depends(get_rate_limiter)
+) -> None:
+    """Reject clients over their request budget, counted across all workers"""
+    if rate_limiter is None:
+        return
+    client = request.client.host if request.client else "unknown"
+    allowed, retry_after = rate_limiter.hit(client)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
 def extract_message_content(message: MessageSchema) -> tuple[str, List[str]]:
     """Extract text and image URLs from a message"""
     if isinstance(message.content, str):
@@ -41,84 +81,169 @@ def extract_message_content(message: MessageSchema) -> tuple[str, List[str]]:
     return text, images
 
 
-@router.post("/", response_model=ChatResponseSchema)
+def to_domain_message(message: MessageSchema, now: datetime) -> Message:
+    """Wrap a request message without copying its content parts.
+
+    The parsed TextContentSchema / ImageContentSchema objects are handed to the
+    provider as they are; it formats any part by its ``type``.
+    """
+    return Message(
+        role=message.role,
+        content=message.content,
+        model=message.model,
+        timestamp=message.timestamp or now,
+    )
+
+
+@router.post(
+    "/",
+    response_model=ChatResponseSchema,
+    dependencies=[Depends(enforce_rate_limit), Depends(enforce_request_limits)],
+)
 async def chat(
     request: ChatRequestSchema, chat_service: ChatService = Depends(get_chat_service)
 ) -> ChatResponseSchema:
-    # Convert request messages to domain models
-    messages = []
-    for msg in request.messages[:-1]:  # All messages except the last one
-        if isinstance(msg.content, str):
-            content = msg.content
-        else:
-            content = [
-                (
-                    TextContent(text=c.text)
-                    if c.type == "text"
-                    else ImageContent(image_url={"url": c.image_url.url})
-                )
-                for c in msg.content
-            ]
-        messages.append(
-            Message(
-                role=msg.role,
-                content=content,
-                model=msg.model,
-                timestamp=msg.timestamp or datetime.utcnow(),
-            )
-        )
+    # Convert request messages to domain models, sharing the parsed content
+    with start_span("chat.convert_messages", messages=len(request.messages)):
+        now = datetime.utcnow()
+        messages = [to_domain_message(msg, now) for msg in request.messages[:-1]]
 
     # Extract content from the last message
     text, images = extract_message_content(request.messages[-1])
 
-    response = await chat_service.process_message(
-        text=text, images=images, conversation_messages=messages
-    )
+    try:
+        response = await chat_service.process_message(
+            text=text, images=images, conversation_messages=messages
+        )
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
 
     return ChatResponseSchema(
         reply=response.content, model=response.model, timestamp=response.timestamp
     )
 
 
-@router.post("/stream")
+@router.post(
+    "/stream", dependencies=[Depends(enforce_rate_limit), Depends(enforce_request_limits)]
+)
 async def stream_chat(
-    request: ChatRequestSchema, chat_service: ChatService = Depends(get_chat_service)
+    request: ChatRequestSchema,
+    chat_service: ChatService = Depends(get_chat_service),
+    replay_buffer: Optional[StreamReplayBuffer] = Depends(get_replay_buffer),
 ):
     # Get the selected model from the last message
     selected_model = request.messages[-1].model
     logger.info(f"Selected model: {selected_model}")
 
     # Convert previous messages to domain models
-    messages = []
-    for msg in request.messages[:-1]:
-        if isinstance(msg.content, str):
-            content = msg.content
-        else:
-            content = [
-                (
-                    TextContent(text=c.text)
-                    if c.type == "text"
-                    else ImageContent(image_url={"url": c.image_url.url})
-                )
-                for c in msg.content
-            ]
-        messages.append(Message(role=msg.role, content=content))
+    with start_span("chat.convert_messages", messages=len(request.messages)):
+        now = datetime.utcnow()
+        messages = [to_domain_message(msg, now) for msg in request.messages[:-1]]
 
     # Extract content from the last message and create it with the selected model
     text, images = extract_message_content(request.messages[-1])
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+    }
+    stream_id = None
+    if replay_buffer is not None:
+        stream_id = replay_buffer.new_stream_id()
+        headers["X-Stream-Id"] = stream_id
 
-    async def generate():
+    async def events():
+        recorder = replay_buffer.recorder(stream_id)
         try:
-            async for chunk in chat_service.stream_response(
-                text=text,
-                images=images,
-                model=selected_model,
-                conversation_messages=messages
-            ):
-                yield f"data: {json.dumps({'content': chunk})}\n\n"
-        except Exception as e:
-            logger.error(f"Error in stream generation: {str(e)}")
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            async for event in generate():
+                await recorder.add(event)
+                yield event
+        finally:
+            recorder.close()
+
+    async def generate():
+        with start_span("chat.sse_stream") as span:
+            # Time spent between yielding an event and being resumed is the SSE write
+            write_ns = 0
+            try:
+                async for chunk in chat_service.stream_response(
+                    text=text,
+                    images=images,
+                    model=selected_model,
+                    conversation_messages=messages
+                ):
+                    started = time.perf_counter_ns()
+                    yield f"data: {json.dumps({'content': chunk})}\n\n"
+                    write_ns += time.perf_counter_ns() - started
+            except Exception as e:
+                logger.error(f"Error in stream generation: {str(e)}")
+                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            span.set_attribute("sse.write_ms", write_ns / 1e6)
+
+    return StreamingResponse(
+        events() if stream_id is not None else generate(),
+        media_type="text/event-stream",
+        headers=headers,
+    )
+
+
+@router.get("/stream/{stream_id}")
+async def resume_stream(
+    stream_id: str,
+    after: int = 0,
+    replay_buffer: Optional[StreamReplayBuffer] = Depends(get_replay_buffer),
+):
+    """Replay a stream's events after the first ``after``, following it until it ends"""
+    if replay_buffer is None or not replay_buffer.events(stream_id):
+        raise HTTPException(status_code=404, detail="Stream not found")
+    return StreamingResponse(
+        replay_buffer.follow(stream_id, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _compare_cancel_key(compare_id: str, model: str) -> str:
+    return f"compare:{compare_id}:cancel:{model}"
+
+
+@router.post(
+    "/compare", dependencies=[Depends(enforce_rate_limit), Depends(enforce_request_limits)]
+)
+async def compare_chat(
+    request: CompareRequestSchema,
+    chat_service: ChatService = Depends(get_chat_service),
+    shared_state: Optional[SharedStore] = Depends(get_shared_state),
+):
+    """Stream the last message to several models at once over one SSE connection.
+
+    Every event carries the model it belongs to. Each model ends with a
+    ``done`` event holding its own timings; one model can be stopped early
+    with ``DELETE /chat/compare/{compare_id}?model=...``.
+    """
+    models = list(dict.fromkeys(request.models))
+    with start_span("chat.convert_messages", messages=len(request.messages)):
+        now = datetime.utcnow()
+        messages = [to_domain_message(msg, now) for msg in request.messages[:-1]]
+    text, images = extract_message_content(request.messages[-1])
+    compare_id = uuid.uuid4().hex
+
+    is_cancelled = None
+    if shared_state is not None:
+        def is_cancelled(model: str) -> bool:
+            return shared_state.get(_compare_cancel_key(compare_id, model)) is not None
+
+    async def generate():
+        started = time.perf_counter()
+        async for event in chat_service.compare_stream(
+            models,
+            text=text,
+            images=images,
+            conversation_messages=messages,
+            is_cancelled=is_cancelled,
+        ):
+            yield f"data: {json.dumps(event)}\n\n"
+        yield f"data: {json.dumps({'done': True, 'duration_ms': round((time.perf_counter() - started) * 1000, 1)})}\n\n"
 
     return StreamingResponse(
         generate(),
@@ -127,5 +252,18 @@ async def stream_chat(
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no",
+            "X-Compare-Id": compare_id,
         },
     )
+
+
+@router.delete("/compare/{compare_id}", status_code=204)
+async def cancel_compare_model(
+    compare_id: str,
+    model: str,
+    shared_state: Optional[SharedStore] = Depends(get_shared_state),
+):
+    """Stop one model of a running comparison; the others keep streaming"""
+    if shared_state is None:
+        raise HTTPException(status_code=404, detail="Cancellation is not available")
+    shared_state.set(_compare_cancel_key(compare_id, model), b"1", ttl=600)
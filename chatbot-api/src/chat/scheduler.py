@@ -0,0 +1,281 @@
+"""Priority scheduling of upstream LLM calls.
+
+Interactive streams, background calls such as conversation titles and bulk
+jobs share the provider's capacity. ``UpstreamScheduler`` hands out a fixed
+number of upstream slots per process:
+
+- Priority classes are served in order, and some slots can be reserved for
+  interactive requests, so that a batch job filling every other slot does not
+  make a user's stream wait for one of its calls to finish.
+- Within a class, users are served by weighted fair queuing. A request's
+  virtual finish time is ``max(virtual clock, the user's last finish) +
+  cost / weight`` and the earliest finish goes first, so one user's burst
+  takes turns with everyone else's instead of running ahead of them.
+- Each class has a deadline: a request still queued when it passes is
+  dropped with ``DeadlineExceeded`` instead of being sent upstream after its
+  caller has likely given up.
+
+Slots are taken from threads (``reserve``) or from the event loop
+(``acquire``). Queue wait, drops, queue depth and slots in use are exported as
+Prometheus metrics labelled by priority.
+"""
+
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import AsyncIterator, Callable, Dict, List, Mapping, Optional
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from .models import ChatResponse, Message
+from .provider import DEFAULT_USER, AIProvider
+from ..observability.metrics import scheduler_metrics
+
+
+class Priority(IntEnum):
+    """Priority classes, most urgent first"""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+    BATCH = 2
+
+
+DEFAULT_DEADLINES = {
+    Priority.INTERACTIVE: 30.0,
+    Priority.BACKGROUND: 10.0,
+    Priority.BATCH: 600.0,
+}
+
+
+class DeadlineExceeded(Exception):
+    """A request waited longer than its class's deadline for upstream capacity"""
+
+    def __init__(self, priority: Priority, waited: float):
+        super().__init__(
+            f"Upstream capacity is busy: {priority.name.lower()} request dropped after {waited:.1f} s in the queue"
+        )
+        self.priority = priority
+        self.waited = waited
+
+
+class _Ticket:
+    __slots__ = ("priority", "user", "start", "finish", "sequence", "enqueued", "deadline", "granted", "withdrawn", "wake")
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.finish, self.sequence) < (other.finish, other.sequence)
+
+
+class _FairQueue:
+    """Weighted fair queue of one priority class"""
+
+    __slots__ = ("heap", "virtual_time", "last_finish", "queued")
+
+    def __init__(self):
+        self.heap: List[_Ticket] = []
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+        self.queued = 0
+
+    def push(self, ticket: _Ticket, cost: float, weight: float) -> None:
+        ticket.start = max(self.virtual_time, self.last_finish.get(ticket.user, 0.0))
+        ticket.finish = ticket.start + cost / weight
+        self.last_finish[ticket.user] = ticket.finish
+        heapq.heappush(self.heap, ticket)
+        self.queued += 1
+
+    def pop(self) -> Optional[_Ticket]:
+        """The live ticket with the earliest virtual finish, skipping withdrawn ones"""
+        while self.heap:
+            ticket = heapq.heappop(self.heap)
+            if not ticket.withdrawn:
+                self.virtual_time = ticket.start
+                return ticket
+        return None
+
+    def remove(self) -> None:
+        """Account for a ticket leaving the queue, forgetting history once it is empty"""
+        self.queued -= 1
+        if self.queued == 0:
+            self.heap.clear()
+            self.last_finish.clear()
+            self.virtual_time = 0.0
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _waker(loop: asyncio.AbstractEventLoop, future: asyncio.Future) -> Callable[[], None]:
+    """Resolve a future from whichever thread grants the slot"""
+
+    def wake() -> None:
+        try:
+            loop.call_soon_threadsafe(_resolve, future)
+        except RuntimeError:
+            pass  # The event loop is gone; nobody is waiting
+
+    return wake
+
+
+class UpstreamScheduler:
+    """Hands out upstream slots by priority class, fairly between users within a class"""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        reserved_interactive: int = 0,
+        deadlines: Optional[Mapping[Priority, float]] = None,
+        user_weights: Optional[Mapping[str, float]] = None,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if not 0 <= reserved_interactive < max_concurrency:
+            raise ValueError("reserved_interactive must be less than max_concurrency")
+        self.max_concurrency = max_concurrency
+        self.reserved_interactive = reserved_interactive
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+        self.user_weights = dict(user_weights or {})
+        self._lock = threading.Lock()
+        self._queues = {priority: _FairQueue() for priority in Priority}
+        self._in_use = {priority: 0 for priority in Priority}
+        self._sequence = itertools.count()
+        self._metrics = {priority: scheduler_metrics(priority.name.lower()) for priority in Priority}
+
+    def _can_start(self, priority: Priority) -> bool:
+        limit = self.max_concurrency
+        if priority is not Priority.INTERACTIVE:
+            limit -= self.reserved_interactive
+        return sum(self._in_use.values()) < limit
+
+    def _dispatch(self) -> None:
+        """Grant free slots to queued tickets, most urgent class first; called with the lock held"""
+        now = time.monotonic()
+        for priority in Priority:
+            queue = self._queues[priority]
+            while queue.queued and self._can_start(priority):
+                ticket = queue.pop()
+                queue.remove()
+                metrics = self._metrics[priority]
+                if now >= ticket.deadline:
+                    # Stale: its waiter gives up rather than going upstream late
+                    ticket.withdrawn = True
+                else:
+                    ticket.granted = True
+                    self._in_use[priority] += 1
+                    metrics.queue_wait.observe(now - ticket.enqueued)
+                    metrics.in_use.inc()
+                metrics.queued.set(queue.queued)
+                ticket.wake()
+            if queue.queued:
+                # No slot for this class, so none for the less urgent ones either
+                return
+
+    def _enqueue(self, priority: Priority, user: str, cost: float, wake: Callable[[], None]) -> _Ticket:
+        ticket = _Ticket()
+        ticket.priority = priority
+        ticket.user = user
+        ticket.sequence = next(self._sequence)
+        ticket.enqueued = time.monotonic()
+        ticket.deadline = ticket.enqueued + self.deadlines[priority]
+        ticket.granted = ticket.withdrawn = False
+        ticket.wake = wake
+        with self._lock:
+            queue = self._queues[priority]
+            queue.push(ticket, cost, self.user_weights.get(user, 1.0))
+            self._metrics[priority].queued.set(queue.queued)
+            self._dispatch()
+        return ticket
+
+    def _settle(self, ticket: _Ticket) -> bool:
+        """Whether a waiter that woke up or gave up holds a slot; withdraws it from the queue if not"""
+        with self._lock:
+            if ticket.granted:
+                return True
+            if not ticket.withdrawn:
+                ticket.withdrawn = True
+                queue = self._queues[ticket.priority]
+                queue.remove()
+                self._metrics[ticket.priority].queued.set(queue.queued)
+            return False
+
+    def _drop(self, ticket: _Ticket) -> DeadlineExceeded:
+        self._metrics[ticket.priority].dropped.inc()
+        return DeadlineExceeded(ticket.priority, time.monotonic() - ticket.enqueued)
+
+    def _release(self, ticket: _Ticket) -> None:
+        with self._lock:
+            self._in_use[ticket.priority] -= 1
+            self._metrics[ticket.priority].in_use.dec()
+            self._dispatch()
+
+    @contextmanager
+    def reserve(self, priority: Priority, user: str = DEFAULT_USER, cost: float = 1.0):
+        """Hold an upstream slot, blocking the calling thread until one is granted.
+
+        Never call this on the event loop: the slots it waits for are released there.
+        """
+        granted = threading.Event()
+        ticket = self._enqueue(priority, user, cost, granted.set)
+        granted.wait(max(0.0, ticket.deadline - time.monotonic()))
+        if not self._settle(ticket):
+            raise self._drop(ticket)
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    @asynccontextmanager
+    async def acquire(self, priority: Priority, user: str = DEFAULT_USER, cost: float = 1.0):
+        """Hold an upstream slot, waiting on the event loop until one is granted"""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        ticket = self._enqueue(priority, user, cost, _waker(loop, granted))
+        try:
+            await asyncio.wait_for(granted, max(0.0, ticket.deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # The caller went away while queued
+            if self._settle(ticket):
+                self._release(ticket)
+            raise
+        if not self._settle(ticket):
+            raise self._drop(ticket)
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def stats(self) -> dict:
+        """Slots in use and requests queued, per priority class"""
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_use": {priority.name.lower(): count for priority, count in self._in_use.items()},
+                "queued": {priority.name.lower(): queue.queued for priority, queue in self._queues.items()},
+            }
+
+
+@dataclass
+class ScheduledProvider:
+    """An AIProvider whose upstream calls wait for a slot from an UpstreamScheduler.
+
+    Streams hold their slot until they end or their consumer goes away.
+    """
+
+    provider: AIProvider
+    scheduler: UpstreamScheduler
+    priority: Priority = Priority.INTERACTIVE
+    user: str = DEFAULT_USER
+
+    def generate_response(self, messages: List[Message]) -> ChatResponse:
+        with self.scheduler.reserve(self.priority, self.user):
+            return self.provider.generate_response(messages)
+
+    async def generate_stream(self, messages: List[Message]) -> AsyncIterator[str]:
+        async with self.scheduler.acquire(self.priority, self.user):
+            async for chunk in self.provider.generate_stream(messages):
+                yield chunk
@@ -1,38 +1,70 @@
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional, Union, Dict
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field
+from typing import Annotated, List, Literal, Optional, Union, Dict
 from datetime import datetime
 
 
 class ImageUrlSchema(BaseModel):
     url: str
+    detail: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
 
 class ImageContentSchema(BaseModel):
-    type: str = "image_url"
+    type: Literal["image_url"] = "image_url"
     image_url: ImageUrlSchema
     model_config = ConfigDict(from_attributes=True)
 
 
 class TextContentSchema(BaseModel):
-    type: str = "text"
+    type: Literal["text"] = "text"
     text: str
     model_config = ConfigDict(from_attributes=True)
 
 
+# Parts are told apart by their ``type`` alone, so each part is validated
+# against exactly one schema instead of trying every member of the union
+ContentPartSchema = Annotated[
+    Union[TextContentSchema, ImageContentSchema], Field(discriminator="type")
+]
+
+# Older clients saved a lone part without the surrounding list. Tried last, so
+# the wrapping function never runs for strings and lists
+_SinglePartSchema = Annotated[ContentPartSchema, AfterValidator(lambda part: [part])]
+
+# Strings and lists are told apart on the first try, without a match-scoring pass
+MessageContentSchema = Annotated[
+    Union[str, List[ContentPartSchema], _SinglePartSchema], Field(union_mode="left_to_right")
+]
+
+
 class MessageSchema(BaseModel):
+    """A message as sent by the client; shared by the chat and conversation routes"""
+
     role: str
-    content: Union[str, List[Union[TextContentSchema, ImageContentSchema]]]
+    content: MessageContentSchema
     model: Optional[str] = None
     timestamp: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
 
+    def content_data(self) -> Union[str, List[dict]]:
+        """The content as plain JSON data, for storage"""
+        if isinstance(self.content, str):
+            return self.content
+        return [part.model_dump(exclude_none=True) for part in self.content]
+
 
 class ChatRequestSchema(BaseModel):
     messages: List[MessageSchema]
     model_config = ConfigDict(from_attributes=True)
 
 
+class CompareRequestSchema(BaseModel):
+    messages: List[MessageSchema]
+    # Models to send the last message to, side by side
+    models: List[str] = Field(min_length=1, max_length=4)
+    model_config = ConfigDict(from_attributes=True)
+
+
 class ChatResponseSchema(BaseModel):
     reply: str
     model: str
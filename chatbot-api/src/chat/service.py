@@ -1,7 +1,15 @@
 from dataclasses import dataclass
-from typing import List, AsyncIterator
+from typing import TYPE_CHECKING, Callable, Dict, List, AsyncIterator, Optional
+import asyncio
+import time
 from .models import Message, ChatResponse, TextContent, ImageContent
 from .provider import AIProvider
+from .prompt import order_messages
+from ..observability.tracing import start_span, traced
+
+if TYPE_CHECKING:
+    # numpy-backed; only imported when a retrieval index is configured
+    from ..retrieval.service import RetrievalService
 
 
 @dataclass
@@ -9,7 +17,37 @@ class ChatService:
     """Service for handling chat operations"""
 
     ai_provider: AIProvider
+    retrieval_service: Optional["RetrievalService"] = None
+
+    async def _context(self, text: str) -> Optional[Message]:
+        """Retrieved knowledge-base context for the current question, if any.
+
+        Embedding the question may call the embeddings API, so retrieval runs
+        off the event loop.
+        """
+        if self.retrieval_service is None:
+            return None
+        with start_span("RetrievalService.build_context_message"):
+            return await asyncio.to_thread(self.retrieval_service.build_context_message, text)
+
+    async def _add_context(self, messages: List[Message], text: str) -> List[Message]:
+        """Add retrieved knowledge-base context for the current question.
+
+        The context goes right before the question, after the history, so the
+        history stays a reusable prompt prefix for the upstream cache.
+        """
+        return order_messages(messages, await self._context(text))
+
+    @staticmethod
+    def _content(text: str, images: Optional[List[str]]):
+        if images:
+            return [
+                TextContent(text=text),
+                *[ImageContent(image_url={"url": img}) for img in images],
+            ]
+        return text
 
+    @traced("ChatService.process_message")
     async def process_message(
         self,
         text: str = "",
@@ -19,17 +57,12 @@ class ChatService:
         """Process a message with optional images and return response"""
         messages = conversation_messages or []
 
-        # Create message content
-        if images:
-            content = [
-                TextContent(text=text),
-                *[ImageContent(image_url={"url": img}) for img in images],
-            ]
-        else:
-            content = text
+        content = self._content(text, images)
 
         messages.append(Message(role="user", content=content))
-        return self.ai_provider.generate_response(messages)
+        messages = await self._add_context(messages, text)
+        # Off the event loop: the call blocks, and may first wait for an upstream slot
+        return await asyncio.to_thread(self.ai_provider.generate_response, messages)
 
     async def stream_response(
         self,
@@ -41,17 +74,86 @@ class ChatService:
         """Stream response for a message with optional images"""
         messages = conversation_messages or []
 
-        # Create message content
-        if images:
-            content = [
-                TextContent(text=text),
-                *[ImageContent(image_url={"url": img}) for img in images],
-            ]
-        else:
-            content = text
+        content = self._content(text, images)
+
+        with start_span("ChatService.stream_response", model=model or ""):
+            # Add the current message with the selected model
+            messages.append(Message(role="user", content=content, model=model))
+            messages = await self._add_context(messages, text)
+
+            async for chunk in self.ai_provider.generate_stream(messages):
+                yield chunk
+
+    async def compare_stream(
+        self,
+        models: List[str],
+        text: str = "",
+        images: List[str] = None,
+        conversation_messages: List[Message] = None,
+        is_cancelled: Optional[Callable[[str], bool]] = None,
+        poll_interval: float = 0.25,
+    ) -> AsyncIterator[dict]:
+        """Stream one prompt to several models at once, as tagged events.
+
+        Yields ``{"model", "content"}`` for every chunk, then one
+        ``{"model", "done": True, "ttft_ms", "duration_ms"}`` per model, with
+        ``"error"`` or ``"cancelled"`` when it did not finish normally. A
+        model failing or being cancelled through ``is_cancelled`` leaves the
+        others running, so the stream lasts as long as the slowest model.
+        """
+        history = conversation_messages or []
+        content = self._content(text, images)
+        context = await self._context(text)
+        events: asyncio.Queue = asyncio.Queue()
+        started = time.perf_counter()
+
+        async def run(model: str) -> None:
+            messages = order_messages([*history, Message(role="user", content=content, model=model)], context)
+            first_token = None
+
+            def finish(**result) -> None:
+                done = {"model": model, "done": True, **result}
+                if first_token is not None:
+                    done["ttft_ms"] = round((first_token - started) * 1000, 1)
+                done["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                # The queue is unbounded, so this never waits, even while being cancelled
+                events.put_nowait(done)
+
+            try:
+                async for chunk in self.ai_provider.generate_stream(messages):
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    await events.put({"model": model, "content": chunk})
+            except asyncio.CancelledError:
+                finish(cancelled=True)
+                raise
+            except Exception as e:
+                finish(error=str(e))
+                return
+            finish()
+
+        with start_span("ChatService.compare_stream", models=",".join(models)):
+            tasks: Dict[str, asyncio.Task] = {model: asyncio.create_task(run(model)) for model in models}
+
+            def cancelled_models() -> List[str]:
+                return [model for model, task in tasks.items() if not task.done() and is_cancelled(model)]
 
-        # Add the current message with the selected model
-        messages.append(Message(role="user", content=content, model=model))
+            async def watch_cancellations() -> None:
+                while True:
+                    await asyncio.sleep(poll_interval)
+                    # is_cancelled may read a shared store, so it runs off the event loop
+                    for model in await asyncio.to_thread(cancelled_models):
+                        tasks[model].cancel()
 
-        async for chunk in self.ai_provider.generate_stream(messages):
-            yield chunk
+            watcher = asyncio.create_task(watch_cancellations()) if is_cancelled else None
+            try:
+                remaining = len(tasks)
+                while remaining:
+                    event = await events.get()
+                    remaining -= event.get("done", False)
+                    yield event
+            finally:
+                if watcher is not None:
+                    watcher.cancel()
+                for task in tasks.values():
+                    task.cancel()
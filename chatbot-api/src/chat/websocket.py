@@ -0,0 +1,217 @@
+"""Multiplexed chat streaming over one WebSocket.
+
+``/ws/chat`` carries any number of concurrent generations over a single
+connection, each tagged with a client-chosen stream id. It is the same
+generation as ``POST /chat/stream``, which stays available.
+
+Client frames are JSON objects:
+
+* ``{"type": "start", "id": "s1", "messages": [...], "window": 32}`` starts a
+  generation. ``messages`` is validated like a ``/chat/stream`` body.
+  ``window`` is optional and enables flow control: the server then sends at
+  most that many chunks for the stream before waiting for credit.
+* ``{"type": "credit", "id": "s1", "n": 16}`` lets ``n`` more chunks through.
+* ``{"type": "cancel", "id": "s1"}`` stops a generation; the upstream
+  request is closed.
+
+Server frames are JSON arrays of one or more events, so that chunks of busy
+streams share a frame:
+
+* ``{"id": "s1", "content": "..."}`` for each chunk,
+* ``{"id": "s1", "error": "..."}`` when a stream fails or is rejected,
+* ``{"id": "s1", "done": true}``, with ``"cancelled": true`` if it was
+  cancelled, as the last event of every started stream.
+
+Events wait in a bounded queue per connection. When the client reads slower
+than the models write, the queue fills and every stream on the connection
+stops pulling from its upstream until the socket drains.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from .routes import (
+    extract_message_content,
+    get_chat_service,
+    get_rate_limiter,
+    to_domain_message,
+)
+from .schemas import ChatRequestSchema
+from .service import ChatService
+from ..limits import RequestLimits, check_messages, get_request_limits
+from ..observability.tracing import start_span
+from ..shared.rate_limit import RateLimiter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/ws", tags=["chat"])
+
+# Events buffered per connection before streams are paused
+QUEUE_SIZE = 256
+
+
+async def get_max_streams() -> int:
+    # Overridden in main.py with the configured limit
+    return 100
+
+
+@dataclass(slots=True)
+class _Stream:
+    task: Optional[asyncio.Task] = None
+    # Chunks the stream may still send; None when flow control is off
+    credit: Optional[int] = None
+    credit_granted: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class ChatMultiplexer:
+    """Runs the generations of one WebSocket connection"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        chat_service: ChatService,
+        limits: RequestLimits,
+        max_streams: int,
+        rate_limiter: Optional[RateLimiter] = None,
+        queue_size: int = QUEUE_SIZE,
+    ):
+        self.websocket = websocket
+        self.chat_service = chat_service
+        self.limits = limits
+        self.max_streams = max_streams
+        self.rate_limiter = rate_limiter
+        self.streams: Dict[str, _Stream] = {}
+        self.outbound: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closing = False
+
+    async def run(self) -> None:
+        writer = asyncio.create_task(self._write())
+        try:
+            while True:
+                try:
+                    frame = json.loads(await self.websocket.receive_text())
+                except WebSocketDisconnect:
+                    break
+                except ValueError:
+                    await self.outbound.put({"error": "Frames must be JSON objects"})
+                    continue
+                await self._dispatch(frame)
+        finally:
+            self.closing = True
+            tasks = [stream.task for stream in self.streams.values()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+
+    async def _dispatch(self, frame) -> None:
+        if not isinstance(frame, dict):
+            await self.outbound.put({"error": "Frames must be JSON objects"})
+            return
+        kind, stream_id = frame.get("type"), frame.get("id")
+        if not isinstance(stream_id, str):
+            await self.outbound.put({"error": "Every frame needs a string id"})
+        elif kind == "start":
+            await self._start(stream_id, frame)
+        elif kind == "cancel":
+            stream = self.streams.get(stream_id)
+            if stream is not None:
+                stream.task.cancel()
+        elif kind == "credit":
+            stream = self.streams.get(stream_id)
+            n = frame.get("n")
+            if stream is not None and stream.credit is not None and isinstance(n, int) and n > 0:
+                stream.credit += n
+                stream.credit_granted.set()
+        else:
+            await self.outbound.put({"id": stream_id, "error": f"Unknown frame type: {kind!r}"})
+
+    async def _start(self, stream_id: str, frame: dict) -> None:
+        error = None
+        if stream_id in self.streams:
+            error = "Stream id already in use"
+        elif self.max_streams and len(self.streams) >= self.max_streams:
+            error = f"Too many concurrent streams (limit {self.max_streams})"
+        else:
+            error = check_messages(frame.get("messages"), self.limits)
+        window = frame.get("window")
+        if error is None and window is not None and (not isinstance(window, int) or window < 1):
+            error = "window must be a positive integer"
+        if error is None and self.rate_limiter is not None:
+            client = self.websocket.client.host if self.websocket.client else "unknown"
+            allowed, retry_after = self.rate_limiter.hit(client)
+            if not allowed:
+                error = f"Too many requests, retry after {retry_after}s"
+        if error is None:
+            try:
+                request = ChatRequestSchema.model_validate({"messages": frame.get("messages")})
+            except ValidationError as e:
+                error = f"Invalid messages: {e.error_count()} validation errors"
+        if error is None and not request.messages:
+            error = "messages must not be empty"
+        if error is not None:
+            await self.outbound.put({"id": stream_id, "error": error})
+            return
+
+        stream = _Stream(credit=window)
+        self.streams[stream_id] = stream
+        stream.task = asyncio.create_task(self._generate(stream_id, stream, request))
+
+    async def _generate(self, stream_id: str, stream: _Stream, request: ChatRequestSchema) -> None:
+        now = datetime.utcnow()
+        messages = [to_domain_message(msg, now) for msg in request.messages[:-1]]
+        text, images = extract_message_content(request.messages[-1])
+        done = {"id": stream_id, "done": True}
+        try:
+            with start_span("chat.ws_stream", stream_id=stream_id):
+                async for chunk in self.chat_service.stream_response(
+                    text=text,
+                    images=images,
+                    model=request.messages[-1].model,
+                    conversation_messages=messages,
+                ):
+                    if stream.credit is not None:
+                        while stream.credit <= 0:
+                            stream.credit_granted.clear()
+                            await stream.credit_granted.wait()
+                        stream.credit -= 1
+                    await self.outbound.put({"id": stream_id, "content": chunk})
+        except asyncio.CancelledError:
+            done["cancelled"] = True
+        except Exception as e:
+            logger.error(f"Error in stream generation: {str(e)}")
+            await self.outbound.put({"id": stream_id, "error": str(e)})
+        finally:
+            del self.streams[stream_id]
+        if not self.closing:
+            await self.outbound.put(done)
+
+    async def _write(self) -> None:
+        while True:
+            events = [await self.outbound.get()]
+            # Everything already queued goes out in the same frame
+            while not self.outbound.empty():
+                events.append(self.outbound.get_nowait())
+            try:
+                await self.websocket.send_text(json.dumps(events))
+            except (WebSocketDisconnect, RuntimeError, OSError):
+                return  # The reader sees the disconnect and stops the streams
+
+
+@router.websocket("/chat")
+async def chat_websocket(
+    websocket: WebSocket,
+    chat_service: ChatService = Depends(get_chat_service),
+    limits: RequestLimits = Depends(get_request_limits),
+    rate_limiter: Optional[RateLimiter] = Depends(get_rate_limiter),
+    max_streams: int = Depends(get_max_streams),
+):
+    """Multiplexed streaming chat; see the module docstring for the protocol"""
+    await websocket.accept()
+    await ChatMultiplexer(websocket, chat_service, limits, max_streams, rate_limiter).run()
@@ -0,0 +1,246 @@
+"""Content-negotiated response compression.
+
+``CompressionMiddleware`` compresses responses with zstd, brotli or gzip,
+whichever the client accepts and is installed, preferring them in that order.
+Server-sent events, responses that are already encoded and media types that
+are already compressed pass through untouched. The compression level depends
+on the body size: small bodies are cheap to compress hard, while multi-MB
+conversations use a fast level to bound CPU time per request.
+"""
+
+from typing import List, Optional, Tuple
+import zlib
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# (largest body in the class, level per encoding); None covers everything larger
+SIZE_CLASS_LEVELS = (
+    (64 * 1024, {"zstd": 3, "br": 5, "gzip": 6}),
+    (1024 * 1024, {"zstd": 3, "br": 4, "gzip": 4}),
+    (None, {"zstd": 1, "br": 1, "gzip": 1}),
+)
+
+# Bodies at least this large are compressed in a worker thread, off the event loop
+THREADPOOL_MIN_BYTES = 256 * 1024
+
+# Media types whose payloads are already compressed or must not be buffered
+SKIPPED_CONTENT_TYPES = (
+    "text/event-stream",
+    "image/",
+    "video/",
+    "audio/",
+    "application/zip",
+    "application/gzip",
+    "application/zstd",
+    "application/x-brotli",
+    "font/woff",
+)
+
+
+def available_encodings() -> List[str]:
+    """Supported content codings, most preferred first"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, encodings: List[str]) -> Optional[str]:
+    """Pick the preferred encoding from an Accept-Encoding header, honouring q-values"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def level_for(encoding: str, size: Optional[int]) -> int:
+    """Compression level for a body of the given size; unknown sizes use the middle class"""
+    if size is None:
+        return SIZE_CLASS_LEVELS[1][1][encoding]
+    for limit, levels in SIZE_CLASS_LEVELS:
+        if limit is None or size <= limit:
+            return levels[encoding]
+
+
+class Compressor:
+    """Incremental compressor with one interface over zlib, zstandard and brotli"""
+
+    def __init__(self, encoding: str, level: int):
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=level)
+        else:
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+        self._brotli = encoding == "br"
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data) if self._brotli else self._obj.compress(data)
+
+    def finish(self) -> bytes:
+        return self._obj.finish() if self._brotli else self._obj.flush()
+
+
+class Decompressor:
+    """Incremental decompressor for request bodies sent with a Content-Encoding"""
+
+    def __init__(self, encoding: str):
+        if encoding == "zstd" and zstandard is not None:
+            self._obj = zstandard.ZstdDecompressor().decompressobj()
+        elif encoding == "br" and brotli is not None:
+            self._obj = brotli.Decompressor()
+        elif encoding == "gzip":
+            self._obj = zlib.decompressobj(31)
+        else:
+            raise ValueError(f"Unsupported content encoding: {encoding}")
+        self._brotli = encoding == "br"
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._obj.process(data) if self._brotli else self._obj.decompress(data)
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    compressor = Compressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing HTTP responses according to Accept-Encoding"""
+
+    def __init__(self, app, minimum_size: int = 1024, encodings: Optional[List[str]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = encodings or available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding, self.encodings) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.passthrough = False
+        self.compressor: Optional[Compressor] = None
+
+    @staticmethod
+    def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+        for key, value in headers:
+            if key.lower() == name:
+                return value
+        return None
+
+    def _headers(self, body_length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = [
+            (key, value)
+            for key, value in self.start["headers"]
+            if key.lower() not in (b"content-length", b"etag", b"vary")
+        ]
+        vary = self._header(self.start["headers"], b"vary")
+        headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+        etag = self._header(self.start["headers"], b"etag")
+        if etag is not None:
+            # The compressed bytes differ, so the representation's validator is weak
+            headers.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if body_length is not None:
+            headers.append((b"content-length", str(body_length).encode("latin-1")))
+        return headers
+
+    def _vary_only(self) -> dict:
+        if self.start["status"] == 304:
+            # Repeat the validator the compressed 200 response carried
+            headers = [(k, v) for k, v in self._headers(None) if k != b"content-encoding"]
+            return {**self.start, "headers": headers}
+        headers = [(k, v) for k, v in self.start["headers"] if k.lower() != b"vary"]
+        vary = self._header(self.start["headers"], b"vary")
+        headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+        return {**self.start, "headers": headers}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            headers = message.get("headers", [])
+            content_type = (self._header(headers, b"content-type") or b"").decode("latin-1").lower()
+            self.passthrough = (
+                self._header(headers, b"content-encoding") is not None
+                or content_type.startswith(SKIPPED_CONTENT_TYPES)
+            )
+            if self.passthrough:
+                await self._send(message)
+            else:
+                self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None and not more_body:
+            # Whole body in one message: compress only when it is worth it
+            if len(body) < self.minimum_size:
+                await self._send(self._vary_only())
+                await self._send(message)
+                return
+            level = level_for(self.encoding, len(body))
+            if len(body) >= THREADPOOL_MIN_BYTES:
+                compressed = await run_in_threadpool(compress, body, self.encoding, level)
+            else:
+                compressed = compress(body, self.encoding, level)
+            if len(compressed) >= len(body):
+                await self._send(self._vary_only())
+                await self._send(message)
+                return
+            await self._send({**self.start, "headers": self._headers(len(compressed))})
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        if self.compressor is None:
+            length = self._header(self.start["headers"], b"content-length")
+            self.compressor = Compressor(self.encoding, level_for(self.encoding, int(length) if length else None))
+            await self._send({**self.start, "headers": self._headers(None)})
+        data = self.compressor.compress(body)
+        if not more_body:
+            data += self.compressor.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
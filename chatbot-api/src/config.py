@@ -0,0 +1,177 @@
+from dataclasses import dataclass
+from typing import Mapping, Optional, Tuple
+import json
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Application settings, read from the environment once at startup"""
+
+    openai_api_key: str
+    openai_api_base: Optional[str] = None
+    groq_api_key: Optional[str] = None
+    groq_api_base: Optional[str] = None
+    github_api_key: Optional[str] = None
+    github_api_base: Optional[str] = None
+    rag_index_dir: Optional[str] = None
+    rag_embedder: str = "hashing"
+    rag_nprobe: int = 16
+    rag_top_k: int = 5
+    rag_max_context_tokens: int = 1500
+    conversation_cache_bytes: int = 64 * 1024 * 1024
+    shared_state_url: str = "memory://"
+    chat_rate_limit_per_minute: int = 0
+    stream_replay_ttl: float = 0.0
+    warm_up_clients: bool = True
+    archive_dir: Optional[str] = None
+    conversation_store_url: str = "sqlite:///conversations.db"
+    prompt_cache_hints: bool = True
+    max_request_bytes: int = 64 * 1024 * 1024
+    max_request_messages: int = 2000
+    max_content_parts: int = 16
+    max_image_bytes: int = 20 * 1024 * 1024
+    ws_max_streams: int = 100
+    backup_dir: Optional[str] = None
+    backup_interval_hours: float = 24.0
+    backup_keep: int = 7
+    backup_max_mb_per_second: float = 64.0
+    conversation_shards: int = 1
+    tenant_header: Optional[str] = None
+    upstream_max_concurrency: int = 0
+    upstream_reserved_interactive: int = 0
+    upstream_deadline_interactive: float = 30.0
+    upstream_deadline_background: float = 10.0
+    upstream_deadline_batch: float = 600.0
+    usage_db: Optional[str] = None
+    usage_flush_seconds: float = 5.0
+    usage_prices: Tuple[Tuple[str, Tuple[float, ...]], ...] = ()
+    local_model_path: Optional[str] = None
+    local_model_name: str = "local"
+    local_max_batch: int = 16
+    local_max_new_tokens: int = 512
+    local_temperature: float = 0.7
+
+
+def _number(env: Mapping[str, str], name: str, default, kind=int):
+    value = env.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        number = kind(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    if number < 0:
+        raise ValueError(f"{name} must not be negative, got {value!r}")
+    return number
+
+
+def _prices(env: Mapping[str, str]) -> Tuple[Tuple[str, Tuple[float, ...]], ...]:
+    """USAGE_PRICES: JSON mapping models to [input, output] or [input, output, cached] USD per million tokens"""
+    value = env.get("USAGE_PRICES")
+    if not value:
+        return ()
+    try:
+        prices = json.loads(value)
+    except ValueError:
+        raise ValueError("USAGE_PRICES must be a JSON object")
+    if not isinstance(prices, dict):
+        raise ValueError("USAGE_PRICES must be a JSON object")
+    for model, price in prices.items():
+        if (
+            not isinstance(price, list)
+            or len(price) not in (2, 3)
+            or not all(isinstance(p, (int, float)) and p >= 0 for p in price)
+        ):
+            raise ValueError(f"USAGE_PRICES for {model!r} must be [input, output] or [input, output, cached]")
+    return tuple((model, tuple(float(p) for p in price)) for model, price in prices.items())
+
+
+def load_settings(env: Mapping[str, str]) -> Settings:
+    """Build and validate settings, raising ValueError for anything missing or malformed"""
+    api_key = env.get("OPENAI_API_KEY") or ""
+    local_model_path = env.get("LOCAL_MODEL_PATH") or None
+    # A local model can serve every request on its own
+    if not api_key and not local_model_path:
+        raise ValueError(
+            "OPENAI_API_KEY environment variable is not set. Please check your .env file."
+        )
+    local_max_batch = _number(env, "LOCAL_MAX_BATCH", 16)
+    if local_max_batch < 1:
+        raise ValueError("LOCAL_MAX_BATCH must be at least 1")
+    rag_embedder = env.get("RAG_EMBEDDER") or "hashing"
+    # Names accepted by retrieval.ingest.create_embedder, which imports numpy
+    if rag_embedder not in ("hashing", "openai"):
+        raise ValueError(f"Unknown RAG_EMBEDDER: {rag_embedder}")
+    rag_nprobe = _number(env, "RAG_NPROBE", 16)
+    if rag_nprobe < 1:
+        raise ValueError("RAG_NPROBE must be at least 1")
+    shared_state_url = env.get("SHARED_STATE_URL") or "memory://"
+    if not shared_state_url.startswith(("memory://", "sqlite:///", "redis://", "rediss://")):
+        raise ValueError(f"Unsupported SHARED_STATE_URL: {shared_state_url}")
+    conversation_store_url = env.get("CONVERSATION_STORE_URL") or "sqlite:///conversations.db"
+    if not conversation_store_url.startswith(("sqlite:///", "log:///")):
+        raise ValueError(f"Unsupported CONVERSATION_STORE_URL: {conversation_store_url}")
+    if env.get("ARCHIVE_DIR") and not conversation_store_url.startswith("sqlite:///"):
+        raise ValueError("ARCHIVE_DIR requires a sqlite:/// CONVERSATION_STORE_URL")
+    if env.get("BACKUP_DIR") and not conversation_store_url.startswith("sqlite:///"):
+        raise ValueError("BACKUP_DIR requires a sqlite:/// CONVERSATION_STORE_URL")
+    if env.get("TENANT_HEADER") and not conversation_store_url.startswith("sqlite:///"):
+        raise ValueError("TENANT_HEADER requires a sqlite:/// CONVERSATION_STORE_URL")
+    conversation_shards = _number(env, "CONVERSATION_SHARDS", 1)
+    if conversation_shards < 1:
+        raise ValueError("CONVERSATION_SHARDS must be at least 1")
+    if conversation_shards > 1:
+        if not conversation_store_url.startswith("sqlite:///"):
+            raise ValueError("CONVERSATION_SHARDS requires a sqlite:/// CONVERSATION_STORE_URL")
+        for name in ("ARCHIVE_DIR", "BACKUP_DIR"):
+            if env.get(name):
+                raise ValueError(f"{name} is only supported with CONVERSATION_SHARDS=1")
+    upstream_max_concurrency = _number(env, "UPSTREAM_MAX_CONCURRENCY", 0)
+    upstream_reserved_interactive = _number(env, "UPSTREAM_RESERVED_INTERACTIVE", 0)
+    if upstream_max_concurrency and upstream_reserved_interactive >= upstream_max_concurrency:
+        raise ValueError("UPSTREAM_RESERVED_INTERACTIVE must be less than UPSTREAM_MAX_CONCURRENCY")
+    return Settings(
+        openai_api_key=api_key,
+        openai_api_base=env.get("OPENAI_API_BASE") or None,
+        groq_api_key=env.get("GROQ_API_KEY") or None,
+        groq_api_base=env.get("GROQ_API_BASE") or None,
+        github_api_key=env.get("GITHUB_API_KEY") or None,
+        github_api_base=env.get("GITHUB_API_BASE") or None,
+        rag_index_dir=env.get("RAG_INDEX_DIR") or None,
+        rag_embedder=rag_embedder,
+        rag_nprobe=rag_nprobe,
+        rag_top_k=_number(env, "RAG_TOP_K", 5),
+        rag_max_context_tokens=_number(env, "RAG_MAX_CONTEXT_TOKENS", 1500),
+        conversation_cache_bytes=_number(env, "CONVERSATION_CACHE_BYTES", 64 * 1024 * 1024),
+        shared_state_url=shared_state_url,
+        chat_rate_limit_per_minute=_number(env, "CHAT_RATE_LIMIT_PER_MINUTE", 0),
+        stream_replay_ttl=_number(env, "STREAM_REPLAY_TTL", 0.0, kind=float),
+        warm_up_clients=env.get("WARM_UP_CLIENTS", "true").lower() in ("1", "true", "yes"),
+        archive_dir=env.get("ARCHIVE_DIR") or None,
+        conversation_store_url=conversation_store_url,
+        prompt_cache_hints=env.get("PROMPT_CACHE_HINTS", "true").lower() in ("1", "true", "yes"),
+        max_request_bytes=_number(env, "MAX_REQUEST_BYTES", 64 * 1024 * 1024),
+        max_request_messages=_number(env, "MAX_REQUEST_MESSAGES", 2000),
+        max_content_parts=_number(env, "MAX_CONTENT_PARTS", 16),
+        max_image_bytes=_number(env, "MAX_IMAGE_BYTES", 20 * 1024 * 1024),
+        ws_max_streams=_number(env, "WS_MAX_STREAMS", 100),
+        backup_dir=env.get("BACKUP_DIR") or None,
+        backup_interval_hours=_number(env, "BACKUP_INTERVAL_HOURS", 24.0, kind=float),
+        backup_keep=_number(env, "BACKUP_KEEP", 7),
+        backup_max_mb_per_second=_number(env, "BACKUP_MAX_MB_PER_SECOND", 64.0, kind=float),
+        conversation_shards=conversation_shards,
+        tenant_header=env.get("TENANT_HEADER") or None,
+        upstream_max_concurrency=upstream_max_concurrency,
+        upstream_reserved_interactive=upstream_reserved_interactive,
+        upstream_deadline_interactive=_number(env, "UPSTREAM_DEADLINE_INTERACTIVE_SECONDS", 30.0, kind=float),
+        upstream_deadline_background=_number(env, "UPSTREAM_DEADLINE_BACKGROUND_SECONDS", 10.0, kind=float),
+        upstream_deadline_batch=_number(env, "UPSTREAM_DEADLINE_BATCH_SECONDS", 600.0, kind=float),
+        usage_db=env.get("USAGE_DB") or None,
+        usage_flush_seconds=_number(env, "USAGE_FLUSH_SECONDS", 5.0, kind=float),
+        usage_prices=_prices(env),
+        local_model_path=local_model_path,
+        local_model_name=env.get("LOCAL_MODEL_NAME") or "local",
+        local_max_batch=local_max_batch,
+        local_max_new_tokens=_number(env, "LOCAL_MAX_NEW_TOKENS", 512),
+        local_temperature=_number(env, "LOCAL_TEMPERATURE", 0.7, kind=float),
+    )
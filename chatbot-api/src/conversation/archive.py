@@ -0,0 +1,162 @@
+"""Cold storage for conversations that have not been touched for a while.
+
+Archived conversations are appended to segment files in an archive directory.
+Each record holds a small JSON header (id, name, last_updated, change_seq) and
+the messages blob exactly as the hot table stored it, so archiving never
+re-encodes messages. The offset index lives in the ``archived_conversations``
+table of the conversations database and is maintained by
+``SQLiteConversationRepository``, which reads through to the archive on a miss
+and moves a conversation back to the hot table when it is saved again.
+
+Segments are only written by the archiver, one process at a time; readers in
+any process only need the index row and the segment file it points at.
+
+Usage:
+    python -m src.conversation.archive --db conversations.db --archive-dir archive --days 90 [--compact] [--vacuum]
+"""
+
+from dataclasses import dataclass
+from typing import List, Tuple
+import argparse
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CVA1"
+# magic, header length, messages length, crc32 of header + messages
+RECORD_HEADER = struct.Struct("<4sIII")
+
+
+@dataclass(slots=True)
+class ArchivedRecord:
+    """A conversation as stored in a segment"""
+
+    conversation_id: str
+    conversation_name: str
+    last_updated: str
+    change_seq: int
+    messages: bytes
+
+
+class SegmentStore:
+    """Append-only segment files holding archived conversations"""
+
+    def __init__(self, archive_dir: str, segment_max_bytes: int = 64 * 1024 * 1024):
+        self.archive_dir = archive_dir
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(archive_dir, exist_ok=True)
+
+    def path(self, segment: int) -> str:
+        return os.path.join(self.archive_dir, f"{segment:08d}.seg")
+
+    def segments(self) -> List[int]:
+        return sorted(
+            int(name[:-4]) for name in os.listdir(self.archive_dir) if name.endswith(".seg")
+        )
+
+    def active_segment(self) -> int:
+        """The segment new records go to, starting a new one when the last is full"""
+        segments = self.segments()
+        if not segments:
+            return 1
+        last = segments[-1]
+        if os.path.getsize(self.path(last)) >= self.segment_max_bytes:
+            return last + 1
+        return last
+
+    @staticmethod
+    def encode(record: ArchivedRecord) -> bytes:
+        header = json.dumps(
+            {
+                "conversation_id": record.conversation_id,
+                "conversation_name": record.conversation_name,
+                "last_updated": record.last_updated,
+                "change_seq": record.change_seq,
+            },
+            separators=(",", ":"),
+        ).encode("utf-8")
+        crc = zlib.crc32(record.messages, zlib.crc32(header))
+        return RECORD_HEADER.pack(MAGIC, len(header), len(record.messages), crc) + header + record.messages
+
+    @staticmethod
+    def decode(data: bytes) -> ArchivedRecord:
+        magic, header_length, messages_length, crc = RECORD_HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not an archive record")
+        header = data[RECORD_HEADER.size:RECORD_HEADER.size + header_length]
+        messages = data[RECORD_HEADER.size + header_length:RECORD_HEADER.size + header_length + messages_length]
+        if len(messages) != messages_length or zlib.crc32(messages, zlib.crc32(header)) != crc:
+            raise ValueError("Archive record is truncated or corrupt")
+        return ArchivedRecord(messages=messages, **json.loads(header))
+
+    def append(self, records: List[ArchivedRecord]) -> List[Tuple[int, int, int]]:
+        """Append records durably; returns (segment, offset, length) for each"""
+        locations = []
+        segment = self.active_segment()
+        f = open(self.path(segment), "ab")
+        try:
+            for record in records:
+                if f.tell() >= self.segment_max_bytes:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+                    segment += 1
+                    f = open(self.path(segment), "ab")
+                data = self.encode(record)
+                locations.append((segment, f.tell(), len(data)))
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+        return locations
+
+    def read(self, segment: int, offset: int, length: int) -> ArchivedRecord:
+        with open(self.path(segment), "rb") as f:
+            f.seek(offset)
+            return self.decode(f.read(length))
+
+    def remove(self, segment: int) -> None:
+        os.remove(self.path(segment))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="conversations.db")
+    parser.add_argument("--archive-dir", default="archive")
+    parser.add_argument("--days", type=float, default=90, help="Archive conversations untouched for this long")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--compact", action="store_true", help="Rewrite segments that are mostly dead records")
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim freed pages afterwards")
+    args = parser.parse_args()
+
+    from datetime import datetime, timedelta, timezone
+    import sqlite3
+    from .repository import SQLiteConversationRepository
+
+    logging.basicConfig(level=logging.INFO)
+    repository = SQLiteConversationRepository(db_path=args.db, archive=SegmentStore(args.archive_dir))
+    file_size_before = os.path.getsize(args.db)
+    started = time.perf_counter()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.days)
+    archived = repository.archive_conversations(cutoff, batch_size=args.batch_size)
+    logger.info(f"Archived {archived} conversations last updated before {cutoff.isoformat()}")
+    if args.compact:
+        stats = repository.compact_archive()
+        logger.info(f"Compacted {stats['segments']} segments, moved {stats['records']} records")
+    if args.vacuum:
+        with sqlite3.connect(args.db) as conn:
+            conn.execute("VACUUM")
+    logger.info(
+        f"Database {file_size_before} -> {os.path.getsize(args.db)} bytes "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""Online backups of the conversation database, with retention and restore.
+
+``create_backup`` copies the live database with SQLite's online backup API a
+few pages per step, sleeping between steps to stay under a byte rate so the
+copy does not starve request I/O. The copying connection holds a read
+transaction for the whole backup: in WAL mode that pins one snapshot, so the
+copy is consistent and never restarts when the API commits, and writers carry
+on (checkpoints just cannot pass the snapshot until the copy ends). When an
+archive directory is given, its segments are copied alongside; segments are
+append-only and written before the index rows that point into them, so any
+segment present when the snapshot starts holds every record the snapshot
+references.
+
+Each backup is a directory named after its UTC start time, holding
+``conversations.db``, the archive segments and a ``manifest.json``. It is
+built under a ``.partial`` name and renamed when complete, so a crashed
+backup is never mistaken for a good one. ``BackupScheduler`` runs backups
+from the API process on an interval and keeps the newest few.
+
+Usage:
+    python -m src.conversation.backup create --db conversations.db --backup-dir backups [--archive-dir archive] [--keep 7]
+    python -m src.conversation.backup list --backup-dir backups
+    python -m src.conversation.backup restore --backup-dir backups [--name 20240501T120000Z] --db conversations.db [--archive-dir archive]
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DATABASE_NAME = "conversations.db"
+MANIFEST_NAME = "manifest.json"
+NAME_FORMAT = "%Y%m%dT%H%M%SZ"
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+@dataclass(slots=True)
+class BackupResult:
+    """A completed backup"""
+
+    name: str
+    path: str
+    bytes: int
+    pages: int
+    steps: int
+    segments: int
+    change_sequence: int
+    seconds: float
+
+
+class _Throttle:
+    """Sleeps as needed to keep the bytes copied so far under a rate"""
+
+    def __init__(self, max_bytes_per_second: int):
+        self.max_bytes_per_second = max_bytes_per_second
+        self.started = time.monotonic()
+        self.copied = 0
+
+    def __call__(self, copied: int) -> None:
+        self.copied += copied
+        if not self.max_bytes_per_second:
+            return
+        ahead = self.copied / self.max_bytes_per_second - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def _copy_file(source: str, destination: str, throttle: _Throttle) -> None:
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        while chunk := src.read(COPY_CHUNK_BYTES):
+            dst.write(chunk)
+            throttle(len(chunk))
+        dst.flush()
+        os.fsync(dst.fileno())
+
+
+def _link_segments(archive_dir: str, staging: str) -> None:
+    """Hard-link segments not linked yet; links keep compacted-away segments alive"""
+    os.makedirs(staging, exist_ok=True)
+    for name in os.listdir(archive_dir):
+        target = os.path.join(staging, name)
+        if name.endswith(".seg") and not os.path.exists(target):
+            try:
+                os.link(os.path.join(archive_dir, name), target)
+            except FileNotFoundError:
+                pass  # Removed by compaction in the meantime
+
+
+@contextmanager
+def backup_lock(backup_dir: str) -> Iterator[bool]:
+    """Hold the backup directory's lock, yielding False if another process holds it.
+
+    Without fcntl the lock is not taken; run a single backup process there.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    if fcntl is None:
+        yield True
+        return
+    with open(os.path.join(backup_dir, ".lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+
+
+def _fsync_directory(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def create_backup(
+    db_path: str,
+    backup_dir: str,
+    archive_dir: Optional[str] = None,
+    pages_per_step: int = 256,
+    max_bytes_per_second: int = 0,
+) -> BackupResult:
+    """Copy a live database (and archive) into a new timestamped backup directory"""
+    os.makedirs(backup_dir, exist_ok=True)
+    started = time.perf_counter()
+    name = datetime.now(timezone.utc).strftime(NAME_FORMAT)
+    path = os.path.join(backup_dir, name)
+    if os.path.exists(path):
+        raise FileExistsError(f"Backup {name} already exists")
+    partial = path + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    throttle = _Throttle(max_bytes_per_second)
+
+    staging = os.path.join(partial, "archive")
+    if archive_dir:
+        # Before the snapshot: a segment compacted away afterwards is still linked here
+        _link_segments(archive_dir, staging)
+
+    source = sqlite3.connect(db_path, isolation_level=None)
+    destination = sqlite3.connect(os.path.join(partial, DATABASE_NAME), isolation_level=None)
+    steps = 0
+    try:
+        # Reading inside a transaction pins the WAL snapshot the backup copies
+        source.execute("BEGIN")
+        row = source.execute("SELECT value FROM change_sequence WHERE id = 1").fetchone()
+        change_sequence = row[0] if row else 0
+        page_size = source.execute("PRAGMA page_size").fetchone()[0]
+
+        copied = 0
+
+        def progress(status, remaining, total):
+            nonlocal copied, steps
+            steps += 1
+            done = total - remaining
+            throttle((done - copied) * page_size)
+            copied = done
+
+        source.backup(destination, pages=pages_per_step, progress=progress)
+        source.execute("ROLLBACK")
+        # A self-contained file: no -wal or -shm to carry around with it
+        destination.execute("PRAGMA journal_mode=DELETE")
+        pages = destination.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        destination.close()
+        source.close()
+
+    segments = 0
+    if archive_dir:
+        # Segments created during the copy may hold records the snapshot points at
+        _link_segments(archive_dir, staging)
+        for file_name in sorted(os.listdir(staging)):
+            # Replace each link with a copy so later appends do not change the backup
+            linked = os.path.join(staging, file_name)
+            copy = linked + ".copy"
+            _copy_file(linked, copy, throttle)
+            os.replace(copy, linked)
+            segments += 1
+
+    size = os.path.getsize(os.path.join(partial, DATABASE_NAME))
+    seconds = time.perf_counter() - started
+    with open(os.path.join(partial, MANIFEST_NAME), "w") as f:
+        json.dump(
+            {
+                "created_at": name,
+                "source": os.path.abspath(db_path),
+                "bytes": size,
+                "pages": pages,
+                "segments": segments,
+                "change_sequence": change_sequence,
+                "seconds": round(seconds, 3),
+            },
+            f,
+        )
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(partial, path)
+    _fsync_directory(backup_dir)
+    logger.info(
+        f"Backed up {db_path} to {path}: {size / 1e6:.1f} MB, {segments} segments "
+        f"in {seconds:.1f}s ({steps} steps)"
+    )
+    return BackupResult(
+        name=name,
+        path=path,
+        bytes=size,
+        pages=pages,
+        steps=steps,
+        segments=segments,
+        change_sequence=change_sequence,
+        seconds=seconds,
+    )
+
+
+def list_backups(backup_dir: str) -> List[str]:
+    """Names of the complete backups, oldest first"""
+    if not os.path.isdir(backup_dir):
+        return []
+    return sorted(
+        name
+        for name in os.listdir(backup_dir)
+        if os.path.isfile(os.path.join(backup_dir, name, MANIFEST_NAME))
+    )
+
+
+def read_manifest(backup_dir: str, name: str) -> dict:
+    with open(os.path.join(backup_dir, name, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def prune_backups(backup_dir: str, keep: int) -> List[str]:
+    """Remove all but the newest ``keep`` backups, and any abandoned partial ones.
+
+    Call with ``backup_lock`` held, so that a backup in progress is not taken
+    for an abandoned one.
+    """
+    names = list_backups(backup_dir)
+    removed = names[:-keep] if keep else []
+    for name in removed:
+        shutil.rmtree(os.path.join(backup_dir, name))
+    for name in os.listdir(backup_dir):
+        if name.endswith(".partial"):
+            shutil.rmtree(os.path.join(backup_dir, name), ignore_errors=True)
+    return removed
+
+
+def restore_backup(backup_path: str, db_path: str, archive_dir: Optional[str] = None) -> None:
+    """Restore a backup over a database (and archive directory).
+
+    Meant to run while the API is stopped: running workers would keep serving
+    cached conversations from before the restore. The database is written
+    through the backup API so that its WAL is reset rather than left to be
+    replayed over the restored pages. The previous database is kept next to
+    it as ``<db>.before-restore``.
+    """
+    with open(os.path.join(backup_path, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    source_path = os.path.join(backup_path, DATABASE_NAME)
+    with sqlite3.connect(source_path) as source:
+        if source.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+            raise ValueError(f"Backup {backup_path} is corrupt")
+
+    if os.path.exists(db_path):
+        with sqlite3.connect(db_path) as current, sqlite3.connect(db_path + ".before-restore") as saved:
+            current.backup(saved)
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(db_path)
+    try:
+        source.backup(target)
+        target.execute("PRAGMA journal_mode=WAL")
+    finally:
+        target.close()
+        source.close()
+
+    staging = os.path.join(backup_path, "archive")
+    if archive_dir and os.path.isdir(staging):
+        if os.path.isdir(archive_dir):
+            previous = archive_dir.rstrip("/") + ".before-restore"
+            shutil.rmtree(previous, ignore_errors=True)
+            os.rename(archive_dir, previous)
+        shutil.copytree(staging, archive_dir)
+    logger.info(
+        f"Restored {db_path} from {backup_path} (change sequence {manifest['change_sequence']})"
+    )
+
+
+class BackupScheduler:
+    """Back up the database every ``interval`` seconds from the API process.
+
+    Every worker process runs a scheduler, so each one takes an exclusive lock
+    on the backup directory and starts a backup only when the newest one is
+    older than the interval; the copy itself runs in a thread.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        backup_dir: str,
+        interval: float,
+        keep: int,
+        archive_dir: Optional[str] = None,
+        pages_per_step: int = 256,
+        max_bytes_per_second: int = 0,
+    ):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.interval = interval
+        self.keep = keep
+        self.archive_dir = archive_dir
+        self.pages_per_step = pages_per_step
+        self.max_bytes_per_second = max_bytes_per_second
+        self._task: Optional[asyncio.Task] = None
+
+    def seconds_until_due(self) -> float:
+        names = list_backups(self.backup_dir)
+        if not names:
+            return 0.0
+        last = datetime.strptime(names[-1], NAME_FORMAT).replace(tzinfo=timezone.utc)
+        age = (datetime.now(timezone.utc) - last).total_seconds()
+        return max(0.0, self.interval - age)
+
+    def run_once(self) -> Optional[BackupResult]:
+        """Back up and prune if a backup is due and no other process is making one"""
+        with backup_lock(self.backup_dir) as acquired:
+            if not acquired or self.seconds_until_due() > 0:
+                return None
+            result = create_backup(
+                self.db_path,
+                self.backup_dir,
+                archive_dir=self.archive_dir,
+                pages_per_step=self.pages_per_step,
+                max_bytes_per_second=self.max_bytes_per_second,
+            )
+            prune_backups(self.backup_dir, self.keep)
+            return result
+
+    async def _run(self) -> None:
+        while True:
+            # A little past due, so that a backup made by another worker is seen
+            await asyncio.sleep(self.seconds_until_due() + 1)
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.warning(f"Scheduled backup failed: {str(e)}")
+                await asyncio.sleep(min(self.interval, 300))
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["create", "list", "restore"])
+    parser.add_argument("--db", default="conversations.db")
+    parser.add_argument("--backup-dir", default=os.getenv("BACKUP_DIR") or "backups")
+    parser.add_argument("--archive-dir", default=os.getenv("ARCHIVE_DIR") or None)
+    parser.add_argument("--keep", type=int, default=0, help="Backups to keep after creating one (0 keeps all)")
+    parser.add_argument("--pages-per-step", type=int, default=256)
+    parser.add_argument("--max-mb-per-second", type=float, default=0, help="Copy rate limit (0 for none)")
+    parser.add_argument("--name", help="Backup to restore (default: the newest)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "create":
+        with backup_lock(args.backup_dir) as acquired:
+            if not acquired:
+                parser.error(f"Another backup of {args.backup_dir} is running")
+            create_backup(
+                args.db,
+                args.backup_dir,
+                archive_dir=args.archive_dir,
+                pages_per_step=args.pages_per_step,
+                max_bytes_per_second=int(args.max_mb_per_second * 1024 * 1024),
+            )
+            if args.keep:
+                prune_backups(args.backup_dir, args.keep)
+    elif args.command == "list":
+        for name in list_backups(args.backup_dir):
+            manifest = read_manifest(args.backup_dir, name)
+            print(
+                f"{name}  {manifest['bytes'] / 1e6:10.1f} MB  {manifest['segments']:5d} segments  "
+                f"change sequence {manifest['change_sequence']}"
+            )
+    else:
+        names = list_backups(args.backup_dir)
+        name = args.name or (names[-1] if names else None)
+        if name not in names:
+            parser.error(f"No backup {name!r} in {args.backup_dir}")
+        restore_backup(os.path.join(args.backup_dir, name), args.db, archive_dir=args.archive_dir)
+
+
+if __name__ == "__main__":
+    main()
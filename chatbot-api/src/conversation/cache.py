@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+import copy
+import threading
+from .models import Conversation, ConversationChanges, ConversationSummary
+from .repository import ConversationRepository
+from ..shared.store import SharedStore
+
+# Approximate per-entry bookkeeping cost (key, tuple and OrderedDict node)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class _CacheState:
+    """Entries and counters shared by a cache and its tenant views"""
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, Tuple[Optional[bytes], bytes]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+class CachingConversationRepository:
+    """Read-through LRU cache in front of another ConversationRepository.
+
+    Caches the serialized conversation JSON served by ``get_conversation_json``,
+    bounded by total bytes rather than entry count. Saves go straight to the
+    underlying repository and invalidate the cached entry.
+
+    With several worker processes each keeps its own cache. Passing a shared
+    ``store`` keeps them consistent: saves bump a per-conversation version in
+    the store, and an entry is only served while its version is current.
+
+    ``for_tenant`` returns a view of one tenant's conversations that shares
+    the byte budget; entries and versions are keyed by tenant and id.
+    """
+
+    def __init__(
+        self,
+        repository: ConversationRepository,
+        max_bytes: int = 64 * 1024 * 1024,
+        store: Optional[SharedStore] = None,
+    ):
+        self.repository = repository
+        self.max_bytes = max_bytes
+        self.store = store
+        self._state = _CacheState()
+        self._lock = self._state.lock
+        # Prepended to conversation ids; empty for the default tenant
+        self._prefix = ""
+
+    def for_tenant(self, tenant_id: str) -> "CachingConversationRepository":
+        """The cached view of one tenant's conversations"""
+        view = copy.copy(self)
+        view.repository = self.repository.for_tenant(tenant_id)
+        view._prefix = f"{tenant_id}/" if tenant_id else ""
+        return view
+
+    def _entry_size(self, key: str, body: bytes) -> int:
+        return len(body) + len(key) + ENTRY_OVERHEAD_BYTES
+
+    def _version(self, key: str) -> Optional[bytes]:
+        if self.store is None:
+            return None
+        return self.store.get(f"conversation:{key}:version")
+
+    def _bump_version(self, key: str) -> None:
+        if self.store is not None:
+            self.store.incr(f"conversation:{key}:version")
+
+    def _store(self, key: str, version: Optional[bytes], body: bytes) -> None:
+        state = self._state
+        size = self._entry_size(key, body)
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        state.entries[key] = (version, body)
+        state.current_bytes += size
+        while state.current_bytes > self.max_bytes:
+            evicted_key, (_, evicted) = state.entries.popitem(last=False)
+            state.current_bytes -= self._entry_size(evicted_key, evicted)
+            state.evictions += 1
+
+    def _discard(self, key: str) -> None:
+        state = self._state
+        entry = state.entries.pop(key, None)
+        if entry is not None:
+            state.current_bytes -= self._entry_size(key, entry[1])
+
+    def get_conversations(self) -> List[ConversationSummary]:
+        return self.repository.get_conversations()
+
+    def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        return self.repository.get_conversation(conversation_id)
+
+    def get_conversation_json(self, conversation_id: str) -> Optional[bytes]:
+        key = self._prefix + conversation_id
+        version = self._version(key)
+        state = self._state
+        with self._lock:
+            entry = state.entries.get(key)
+            if entry is not None and entry[0] == version:
+                state.entries.move_to_end(key)
+                state.hits += 1
+                return entry[1]
+            state.misses += 1
+
+        body = self.repository.get_conversation_json(conversation_id)
+        if body is not None:
+            with self._lock:
+                self._store(key, version, body)
+        return body
+
+    def save_conversation(self, conversation: Conversation) -> None:
+        key = self._prefix + conversation.conversation_id
+        with self._lock:
+            self._discard(key)
+        self.repository.save_conversation(conversation)
+        self._bump_version(key)
+        # Drop anything a concurrent reader cached while the write was in flight
+        with self._lock:
+            self._discard(key)
+
+    def delete_conversation(self, conversation_id: str) -> bool:
+        key = self._prefix + conversation_id
+        deleted = self.repository.delete_conversation(conversation_id)
+        with self._lock:
+            self._discard(key)
+        if deleted:
+            self._bump_version(key)
+        return deleted
+
+    def get_changes(self, since: int, limit: int = 500) -> ConversationChanges:
+        return self.repository.get_changes(since, limit)
+
+    def export_json(self, batch_size: int = 500) -> Iterator[bytes]:
+        return self.repository.export_json(batch_size)
+
+    def import_conversations(
+        self,
+        conversations: Iterable[Any],
+        batch_size: int = 500,
+        on_batch: Optional[Callable[[List[str]], None]] = None,
+    ) -> int:
+        def invalidate(conversation_ids: List[str]) -> None:
+            keys = [self._prefix + conversation_id for conversation_id in conversation_ids]
+            with self._lock:
+                for key in keys:
+                    self._discard(key)
+            for key in keys:
+                self._bump_version(key)
+            if on_batch is not None:
+                on_batch(conversation_ids)
+
+        return self.repository.import_conversations(conversations, batch_size, invalidate)
+
+    def get_change_sequence(self) -> int:
+        return self.repository.get_change_sequence()
+
+    def stats(self) -> dict:
+        """Hit ratio and memory use of the cache"""
+        state = self._state
+        with self._lock:
+            lookups = state.hits + state.misses
+            return {
+                "hits": state.hits,
+                "misses": state.misses,
+                "hit_ratio": state.hits / lookups if lookups else 0.0,
+                "evictions": state.evictions,
+                "entries": len(state.entries),
+                "bytes": state.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,80 @@
+from typing import Optional
+import asyncio
+import logging
+from starlette.concurrency import run_in_threadpool
+from .repository import ConversationRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeed:
+    """Wake long-poll and SSE clients when the conversation change sequence advances.
+
+    One background task per process polls the repository's change sequence while
+    anyone is waiting, so the cost does not grow with the number of connected
+    clients. Saves and deletes in this process call ``notify`` to wake waiters
+    immediately; changes made by other workers are seen at the next poll.
+
+    The sequence counts changes to the whole database, every tenant's, while
+    change cursors are per tenant; waiters pass the last sequence they saw,
+    never a cursor.
+    """
+
+    def __init__(self, repository: ConversationRepository, poll_interval: float = 0.5):
+        self.repository = repository
+        self.poll_interval = poll_interval
+        self.sequence: Optional[int] = None
+        self._condition: Optional[asyncio.Condition] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._waiters = 0
+
+    def _ensure_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def _refresh(self) -> None:
+        sequence = await run_in_threadpool(self.repository.get_change_sequence)
+        condition = self._ensure_condition()
+        async with condition:
+            if sequence != self.sequence:
+                self.sequence = sequence
+                condition.notify_all()
+
+    async def _poll(self) -> None:
+        try:
+            while self._waiters:
+                await asyncio.sleep(self.poll_interval)
+                try:
+                    await self._refresh()
+                except Exception as e:
+                    logger.warning(f"Change feed poll failed: {str(e)}")
+        finally:
+            self._poller = None
+
+    async def notify(self) -> None:
+        """Re-read the sequence now, after a change made by this process"""
+        await self._refresh()
+
+    async def current(self) -> int:
+        """The latest sequence seen; read it before querying changes, then wait on it"""
+        if self.sequence is None:
+            await self._refresh()
+        return self.sequence
+
+    async def wait(self, since: int, timeout: float) -> int:
+        """Wait until the change sequence passes ``since`` or the timeout expires"""
+        if await self.current() > since:
+            return self.sequence
+        condition = self._ensure_condition()
+        self._waiters += 1
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll())
+        try:
+            async with condition:
+                await asyncio.wait_for(condition.wait_for(lambda: self.sequence > since), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters -= 1
+        return self.sequence
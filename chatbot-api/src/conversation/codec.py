@@ -0,0 +1,127 @@
+"""Storage codec for the ``messages`` column.
+
+Rows written by older versions hold the messages as JSON text, with structured
+content JSON-encoded a second time. New rows are BLOBs laid out as::
+
+    <format version: 1 byte><payload>
+
+where the payload is compact, single-encoded JSON, compressed according to the
+version byte. Both layouts are decoded transparently.
+"""
+
+from typing import Any, List, Union
+import json
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the json module is the fallback
+    orjson = None
+
+FORMAT_RAW = 0x00
+FORMAT_ZLIB = 0x01
+FORMAT_ZSTD = 0x02
+
+# Payloads smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 256
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON from bytes or text"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _single_encode(content: Any) -> Any:
+    """Undo the route-level JSON encoding of structured content in legacy rows"""
+    if isinstance(content, str) and content.startswith("["):
+        try:
+            parsed = loads(content)
+        except ValueError:
+            return content
+        if isinstance(parsed, list):
+            return parsed
+    return content
+
+
+class MessageCodec:
+    """Encode and decode the stored list of message dicts"""
+
+    def __init__(self, compression: str | None = None, level: int | None = None):
+        if compression is None:
+            compression = "zstd" if zstandard is not None else "zlib"
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+        if compression not in ("zstd", "zlib", "none"):
+            raise ValueError(f"Unknown compression: {compression}")
+        self.compression = compression
+        self.level = level
+        # Compressors must not be used by two threads at once, and views of a
+        # repository share their codec across the loop and the thread pool
+        self._local = threading.local()
+
+    def _zstd_compressor(self) -> "zstandard.ZstdCompressor":
+        compressor = getattr(self._local, "zstd", None)
+        if compressor is None:
+            compressor = self._local.zstd = zstandard.ZstdCompressor(level=self.level or 3)
+        return compressor
+
+    def encode(self, messages: List[dict]) -> bytes:
+        """Serialize messages into a versioned BLOB; content is stored as given"""
+        payload = dumps(messages)
+        if self.compression == "none" or len(payload) < MIN_COMPRESS_BYTES:
+            return bytes([FORMAT_RAW]) + payload
+        if self.compression == "zstd":
+            compressed = bytes([FORMAT_ZSTD]) + self._zstd_compressor().compress(payload)
+        else:
+            compressed = bytes([FORMAT_ZLIB]) + zlib.compress(payload, self.level or 6)
+        if len(compressed) >= len(payload) + 1:
+            return bytes([FORMAT_RAW]) + payload
+        return compressed
+
+    def decode(self, stored: Union[bytes, str]) -> List[dict]:
+        """Deserialize messages from either the BLOB or the legacy text layout"""
+        if isinstance(stored, str):
+            messages = loads(stored)
+            for message in messages:
+                message["content"] = _single_encode(message["content"])
+            return messages
+        return loads(self.decompress(stored))
+
+    def decode_json(self, stored: Union[bytes, str]) -> bytes:
+        """Return the messages as a JSON array without building Python objects"""
+        if isinstance(stored, str):
+            return dumps(self.decode(stored))
+        return self.decompress(stored)
+
+    @staticmethod
+    def decompress(stored: bytes) -> bytes:
+        """Return the uncompressed JSON payload of a BLOB"""
+        version, payload = stored[0], memoryview(stored)[1:]
+        if version == FORMAT_RAW:
+            return bytes(payload)
+        if version == FORMAT_ZLIB:
+            return zlib.decompress(payload)
+        if version == FORMAT_ZSTD:
+            if zstandard is None:
+                raise ValueError("Stored data is zstd-compressed but 'zstandard' is not installed")
+            return zstandard.ZstdDecompressor().decompress(payload)
+        raise ValueError(f"Unknown storage format version: {version}")
+
+    @staticmethod
+    def is_legacy(stored: Union[bytes, str]) -> bool:
+        return isinstance(stored, str)
@@ -0,0 +1,338 @@
+"""Log-structured conversation storage.
+
+Every save or delete appends one record to ``conversations.log`` and an
+in-memory index maps each conversation id to its latest record, so a read is a
+dict lookup plus one pread and a write is one append. Worker processes sharing
+the directory serialize appends with an flock on ``conversations.lock`` and
+pick up each other's records by scanning the log past the last offset they
+indexed. ``compact()`` rewrites the log with only the latest record per
+conversation and the tombstones delta sync needs.
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import json
+import os
+import struct
+import threading
+import zlib
+from .codec import MessageCodec
+from .models import Conversation, ConversationChanges, ConversationSummary
+from .repository import (
+    batched,
+    conversation_from_row,
+    conversation_json_from_row,
+    encode_messages,
+    ensure_utc,
+    row_from_export,
+    summary_from_row,
+)
+from ..observability.metrics import timed_operation, payload_size
+from ..observability.tracing import traced
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+READ_PAYLOAD_BYTES = payload_size("log", "read")
+WRITE_PAYLOAD_BYTES = payload_size("log", "write")
+
+MAGIC = b"CVL1"
+PUT, DELETE = 0, 1
+# magic, kind, header length, messages length, crc32 of header + messages
+RECORD_HEADER = struct.Struct("<4sBIII")
+
+
+@dataclass(slots=True)
+class _Entry:
+    conversation_name: str
+    last_updated: str
+    change_seq: int
+    offset: int
+    length: int
+
+
+def _record(kind: int, meta: dict, messages: bytes = b"") -> bytes:
+    header = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    crc = zlib.crc32(messages, zlib.crc32(header))
+    return RECORD_HEADER.pack(MAGIC, kind, len(header), len(messages), crc) + header + messages
+
+
+class LogConversationRepository:
+    """Append-only log implementation of ConversationRepository"""
+
+    def __init__(self, directory: str = "conversations", codec: MessageCodec | None = None, sync: bool = True):
+        self.directory = directory
+        self.codec = codec or MessageCodec()
+        self.sync = sync
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "conversations.log")
+        self._lock = threading.RLock()
+        self._lock_fd = os.open(os.path.join(directory, "conversations.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        self._fd = None
+        with self._lock:
+            self._open()
+            self._catch_up()
+
+    def _open(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._inode = os.fstat(self._fd).st_ino
+        self._entries: Dict[str, _Entry] = {}
+        self._tombstones: Dict[str, int] = {}
+        self._sequence = 0
+        self._position = 0
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the cross-process write lock"""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _catch_up(self) -> None:
+        """Index records appended since the last call; call with self._lock held"""
+        try:
+            if os.stat(self.path).st_ino != self._inode:
+                # Another process compacted the log
+                self._open()
+        except FileNotFoundError:
+            pass
+        if os.fstat(self._fd).st_size <= self._position:
+            return
+        with open(self._fd, "rb", closefd=False) as f:
+            f.seek(self._position)
+            while True:
+                head = f.read(RECORD_HEADER.size)
+                if len(head) < RECORD_HEADER.size:
+                    break
+                magic, kind, header_length, messages_length, crc = RECORD_HEADER.unpack(head)
+                if magic != MAGIC:
+                    raise ValueError(f"Corrupt record at offset {self._position} in {self.path}")
+                header = f.read(header_length)
+                offset = self._position + RECORD_HEADER.size + header_length
+                messages = f.read(messages_length)
+                if len(header) < header_length or len(messages) < messages_length:
+                    # A record still being written, or torn by a crash
+                    break
+                if zlib.crc32(messages, zlib.crc32(header)) != crc:
+                    raise ValueError(f"Corrupt record at offset {self._position} in {self.path}")
+                self._apply(kind, json.loads(header), offset, messages_length)
+                self._position = offset + messages_length
+
+    def _apply(self, kind: int, meta: dict, offset: int, length: int) -> None:
+        conversation_id = meta["conversation_id"]
+        self._sequence = max(self._sequence, meta["change_seq"])
+        if kind == PUT:
+            self._entries[conversation_id] = _Entry(
+                meta["conversation_name"], meta["last_updated"], meta["change_seq"], offset, length
+            )
+            self._tombstones.pop(conversation_id, None)
+        else:
+            self._entries.pop(conversation_id, None)
+            self._tombstones[conversation_id] = meta["change_seq"]
+
+    def _append(self, kind: int, meta: dict, messages: bytes = b"") -> bool:
+        with self._lock, self._exclusive():
+            self._catch_up()
+            if os.fstat(self._fd).st_size > self._position:
+                # We hold the write lock, so anything past the last record was torn by a crash
+                os.ftruncate(self._fd, self._position)
+            if kind == DELETE and meta["conversation_id"] not in self._entries:
+                return False
+            os.write(self._fd, _record(kind, {**meta, "change_seq": self._sequence + 1}, messages))
+            if self.sync:
+                os.fdatasync(self._fd)
+            self._catch_up()
+        return True
+
+    def _append_batch(self, records: List[tuple]) -> None:
+        """Append (meta, messages) PUT records with one write and one sync"""
+        with self._lock, self._exclusive():
+            self._catch_up()
+            if os.fstat(self._fd).st_size > self._position:
+                os.ftruncate(self._fd, self._position)
+            data = b"".join(
+                _record(PUT, {**meta, "change_seq": self._sequence + i}, messages)
+                for i, (meta, messages) in enumerate(records, 1)
+            )
+            os.write(self._fd, data)
+            if self.sync:
+                os.fdatasync(self._fd)
+            self._catch_up()
+
+    def _find(self, conversation_id: str) -> Optional[tuple]:
+        with self._lock:
+            self._catch_up()
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return None
+            messages = os.pread(self._fd, entry.length, entry.offset)
+        READ_PAYLOAD_BYTES.observe(len(messages))
+        return conversation_id, entry.conversation_name, messages, entry.last_updated
+
+    @traced("LogConversationRepository.get_conversations")
+    @timed_operation("log", "get_conversations")
+    def get_conversations(self) -> List[ConversationSummary]:
+        """Get all conversations summaries"""
+        with self._lock:
+            self._catch_up()
+            rows = [
+                (conversation_id, entry.conversation_name, entry.last_updated)
+                for conversation_id, entry in self._entries.items()
+            ]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return [summary_from_row(*row) for row in rows]
+
+    @traced("LogConversationRepository.get_conversation")
+    @timed_operation("log", "get_conversation")
+    def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """Get a specific conversation"""
+        row = self._find(conversation_id)
+        if not row:
+            return None
+        return conversation_from_row(self.codec, row)
+
+    @traced("LogConversationRepository.get_conversation_json")
+    @timed_operation("log", "get_conversation_json")
+    def get_conversation_json(self, conversation_id: str) -> Optional[bytes]:
+        """Get a conversation as a serialized API response, without decoding the messages"""
+        row = self._find(conversation_id)
+        if not row:
+            return None
+        return conversation_json_from_row(self.codec, row)
+
+    @traced("LogConversationRepository.save_conversation")
+    @timed_operation("log", "save_conversation")
+    def save_conversation(self, conversation: Conversation) -> None:
+        """Save or update a conversation"""
+        messages_blob = encode_messages(self.codec, conversation)
+        WRITE_PAYLOAD_BYTES.observe(len(messages_blob))
+        meta = {
+            "conversation_id": conversation.conversation_id,
+            "conversation_name": conversation.conversation_name,
+            "last_updated": ensure_utc(conversation.last_updated).isoformat(),
+        }
+        self._append(PUT, meta, messages_blob)
+
+    @traced("LogConversationRepository.delete_conversation")
+    @timed_operation("log", "delete_conversation")
+    def delete_conversation(self, conversation_id: str) -> bool:
+        """Delete a conversation, leaving a tombstone for delta sync"""
+        return self._append(DELETE, {"conversation_id": conversation_id})
+
+    @traced("LogConversationRepository.get_changes")
+    @timed_operation("log", "get_changes")
+    def get_changes(self, since: int, limit: int = 500) -> ConversationChanges:
+        """Conversations saved or deleted after the ``since`` cursor, oldest change first"""
+        with self._lock:
+            self._catch_up()
+            rows = [
+                (entry.change_seq, conversation_id, entry.conversation_name, entry.last_updated)
+                for conversation_id, entry in self._entries.items()
+                if entry.change_seq > since
+            ]
+            rows.extend(
+                (change_seq, conversation_id, None, None)
+                for conversation_id, change_seq in self._tombstones.items()
+                if change_seq > since
+            )
+        rows.sort()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        changes = ConversationChanges(cursor=rows[-1][0] if rows else since, has_more=has_more)
+        for _, conversation_id, name, last_updated in rows:
+            if last_updated is None:
+                changes.deleted.append(conversation_id)
+            else:
+                changes.changes.append(summary_from_row(conversation_id, name, last_updated))
+        return changes
+
+    def get_change_sequence(self) -> int:
+        """The latest change sequence number"""
+        with self._lock:
+            self._catch_up()
+            return self._sequence
+
+    def export_json(self, batch_size: int = 500) -> Iterator[bytes]:
+        """Every conversation serialized as by get_conversation_json, oldest change first.
+
+        Conversations deleted during the export are skipped; ones saved during
+        it are exported as they are when reached.
+        """
+        with self._lock:
+            self._catch_up()
+            ids = sorted(self._entries, key=lambda conversation_id: self._entries[conversation_id].change_seq)
+        for conversation_id in ids:
+            row = self._find(conversation_id)
+            if row is not None:
+                yield conversation_json_from_row(self.codec, row)
+
+    @traced("LogConversationRepository.import_conversations")
+    def import_conversations(
+        self,
+        conversations: Iterable[Any],
+        batch_size: int = 500,
+        on_batch: Optional[Callable[[List[str]], None]] = None,
+    ) -> int:
+        """Upsert exported conversations, one append and sync per batch; returns how many were imported"""
+        imported = 0
+        for batch in batched(conversations, batch_size):
+            records = []
+            for position, item in enumerate(batch, imported + 1):
+                try:
+                    conversation_id, name, messages, last_updated = row_from_export(self.codec, item)
+                except ValueError as e:
+                    raise ValueError(f"Conversation {position}: {e}")
+                WRITE_PAYLOAD_BYTES.observe(len(messages))
+                meta = {"conversation_id": conversation_id, "conversation_name": name, "last_updated": last_updated}
+                records.append((meta, messages))
+            self._append_batch(records)
+            imported += len(records)
+            if on_batch is not None:
+                on_batch([meta["conversation_id"] for meta, _ in records])
+        return imported
+
+    def compact(self) -> int:
+        """Rewrite the log without superseded records; returns the bytes reclaimed"""
+        with self._lock, self._exclusive():
+            self._catch_up()
+            size_before = os.fstat(self._fd).st_size
+            records = sorted(
+                [(entry.change_seq, conversation_id, entry) for conversation_id, entry in self._entries.items()]
+                + [(change_seq, conversation_id, None) for conversation_id, change_seq in self._tombstones.items()],
+                key=lambda record: record[0],
+            )
+            compacted_path = self.path + ".compact"
+            with open(compacted_path, "wb") as f:
+                for change_seq, conversation_id, entry in records:
+                    if entry is None:
+                        f.write(_record(DELETE, {"conversation_id": conversation_id, "change_seq": change_seq}))
+                        continue
+                    meta = {
+                        "conversation_id": conversation_id,
+                        "conversation_name": entry.conversation_name,
+                        "last_updated": entry.last_updated,
+                        "change_seq": change_seq,
+                    }
+                    f.write(_record(PUT, meta, os.pread(self._fd, entry.length, entry.offset)))
+                f.flush()
+                os.fsync(f.fileno())
+            # Readers holding the old file keep reading it until they notice the new inode
+            os.replace(compacted_path, self.path)
+            self._open()
+            self._catch_up()
+            return size_before - self._position
+
+    def close(self) -> None:
+        with self._lock:
+            os.close(self._fd)
+            os.close(self._lock_fd)
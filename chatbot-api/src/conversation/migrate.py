@@ -0,0 +1,72 @@
+"""Re-encode legacy JSON text rows into the compressed storage format.
+
+Usage:
+    python -m src.conversation.migrate --db conversations.db [--vacuum]
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from .codec import MessageCodec
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_messages(
+    db_path: str, codec: MessageCodec | None = None, batch_size: int = 500
+) -> dict:
+    """Convert every legacy row, committing in batches so writers are not blocked for long"""
+    codec = codec or MessageCodec()
+    migrated = bytes_before = bytes_after = 0
+    with sqlite3.connect(db_path) as conn:
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, messages FROM conversations "
+                "WHERE id > ? AND typeof(messages) = 'text' ORDER BY id LIMIT ?",
+                (last_id, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row_id, stored in rows:
+                blob = codec.encode(codec.decode(stored))
+                bytes_before += len(stored.encode("utf-8"))
+                bytes_after += len(blob)
+                updates.append((blob, row_id))
+            conn.executemany("UPDATE conversations SET messages = ? WHERE id = ?", updates)
+            conn.commit()
+            migrated += len(rows)
+            last_id = rows[-1][0]
+            logger.info(f"Migrated {migrated} rows")
+    return {"rows": migrated, "bytes_before": bytes_before, "bytes_after": bytes_after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="conversations.db")
+    parser.add_argument("--compression", choices=["zstd", "zlib", "none"], default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim freed pages afterwards")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    file_size_before = os.path.getsize(args.db)
+    started = time.perf_counter()
+    stats = migrate_messages(
+        args.db, MessageCodec(compression=args.compression), batch_size=args.batch_size
+    )
+    if args.vacuum:
+        with sqlite3.connect(args.db) as conn:
+            conn.execute("VACUUM")
+    print(
+        f"Migrated {stats['rows']} rows in {time.perf_counter() - started:.1f}s: "
+        f"messages {stats['bytes_before']} -> {stats['bytes_after']} bytes, "
+        f"file {file_size_before} -> {os.path.getsize(args.db)} bytes"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import List, Optional
 from ..chat.models import Message
 
 
-@dataclass
+@dataclass(slots=True)
 class Conversation:
     """Represents a conversation"""
 
@@ -14,10 +14,20 @@ class Conversation:
     last_updated: datetime = datetime.now(timezone.utc)
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationSummary:
     """Summary of a conversation for listing"""
 
     conversation_id: str
     conversation_name: str
     last_updated: datetime
+
+
+@dataclass(slots=True)
+class ConversationChanges:
+    """Conversations changed after a change-sequence cursor"""
+
+    cursor: int
+    changes: List[ConversationSummary] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    has_more: bool = False
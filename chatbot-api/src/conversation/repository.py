@@ -1,158 +1,737 @@
-from typing import List, Protocol, Optional
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, List, Protocol, Optional
+import copy
+import itertools
+import os
 import sqlite3
-import json
+import threading
 from datetime import datetime, timezone
-from .models import Conversation, ConversationSummary
+from .models import Conversation, ConversationChanges, ConversationSummary
+from .codec import MessageCodec, dumps
+from .archive import ArchivedRecord, SegmentStore
+from ..observability.metrics import timed_operation, payload_size
+from ..observability.tracing import traced
 from ..chat.models import Message
 
+READ_PAYLOAD_BYTES = payload_size("sqlite", "read")
+ARCHIVE_READ_PAYLOAD_BYTES = payload_size("archive", "read")
+WRITE_PAYLOAD_BYTES = payload_size("sqlite", "write")
+
+# Rows written without a tenant, including every row from before tenancy
+DEFAULT_TENANT = ""
+
 
 class ConversationRepository(Protocol):
     """Protocol for conversation storage"""
 
     def get_conversations(self) -> List[ConversationSummary]: ...
     def get_conversation(self, conversation_id: str) -> Optional[Conversation]: ...
+    def get_conversation_json(self, conversation_id: str) -> Optional[bytes]: ...
     def save_conversation(self, conversation: Conversation) -> None: ...
+    def delete_conversation(self, conversation_id: str) -> bool: ...
+    def get_changes(self, since: int, limit: int = 500) -> ConversationChanges: ...
+    def get_change_sequence(self) -> int: ...
+    def export_json(self, batch_size: int = 500) -> Iterator[bytes]: ...
+    def import_conversations(
+        self,
+        conversations: Iterable[Any],
+        batch_size: int = 500,
+        on_batch: Optional[Callable[[List[str]], None]] = None,
+    ) -> int: ...
+
+
+def ensure_utc(dt: datetime) -> datetime:
+    """Ensure datetime is UTC timezone-aware"""
+    if dt.tzinfo is timezone.utc:
+        return dt
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def encode_messages(codec: MessageCodec, conversation: Conversation) -> bytes:
+    """The stored messages blob for a conversation"""
+    return codec.encode(
+        [
+            {
+                "role": msg.role,
+                "content": msg.content,  # Structured content is stored single-encoded
+                "model": msg.model,
+                "timestamp": ensure_utc(msg.timestamp).isoformat(),
+            }
+            for msg in conversation.messages
+        ]
+    )
+
+
+def conversation_from_row(codec: MessageCodec, row: tuple) -> Conversation:
+    """Build a Conversation from (conversation_id, conversation_name, messages, last_updated)"""
+    messages = []
+    for msg in codec.decode(row[2]):
+        messages.append(
+            Message(
+                role=msg["role"],
+                content=msg["content"],
+                model=msg.get("model"),
+                timestamp=ensure_utc(datetime.fromisoformat(msg["timestamp"])),
+            )
+        )
+    return Conversation(
+        conversation_id=row[0],
+        conversation_name=row[1],
+        messages=messages,
+        last_updated=ensure_utc(datetime.fromisoformat(row[3])),
+    )
+
+
+def conversation_json_from_row(codec: MessageCodec, row: tuple) -> bytes:
+    """Serialize (conversation_id, conversation_name, messages, last_updated) as the API response"""
+    return b"".join(
+        (
+            b'{"conversation_id":',
+            dumps(row[0]),
+            b',"conversation_name":',
+            dumps(row[1]),
+            b',"messages":',
+            codec.decode_json(row[2]),
+            b',"last_updated":',
+            dumps(ensure_utc(datetime.fromisoformat(row[3])).isoformat()),
+            b"}",
+        )
+    )
+
+
+def row_from_export(codec: MessageCodec, item: Any) -> tuple:
+    """(conversation_id, conversation_name, messages, last_updated) from one exported conversation.
+
+    Raises ValueError for anything get_conversation could not read back.
+    """
+    if not isinstance(item, dict) or not isinstance(item.get("conversation_id"), str):
+        raise ValueError("expected an object with a string conversation_id")
+    messages = item.get("messages")
+    if not isinstance(messages, list):
+        raise ValueError("messages must be a list")
+    try:
+        last_updated = ensure_utc(datetime.fromisoformat(item["last_updated"])).isoformat()
+        stored = []
+        for message in messages:
+            if not isinstance(message.get("role"), str) or not isinstance(message.get("content"), (str, list, dict)):
+                raise ValueError("every message needs a role and content")
+            timestamp = message.get("timestamp")
+            stored.append(
+                {
+                    "role": message["role"],
+                    "content": message["content"],
+                    "model": message.get("model"),
+                    "timestamp": ensure_utc(datetime.fromisoformat(timestamp)).isoformat() if timestamp else last_updated,
+                }
+            )
+    except (AttributeError, KeyError, TypeError) as e:
+        raise ValueError(f"malformed conversation: {e!r}")
+    return item["conversation_id"], item.get("conversation_name") or "New Conversation", codec.encode(stored), last_updated
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def summary_from_row(conversation_id: str, conversation_name: str, last_updated: str) -> ConversationSummary:
+    return ConversationSummary(
+        conversation_id=conversation_id,
+        conversation_name=conversation_name,
+        last_updated=ensure_utc(datetime.fromisoformat(last_updated)),
+    )
+
+
+def create_repository(
+    url: str, archive: SegmentStore | None = None, shards: int = 1
+) -> ConversationRepository:
+    """Create a repository from a URL: sqlite:///conversations.db or log:///path/to/directory.
+
+    With ``shards`` above 1, sqlite storage is spread over that many database
+    files by tenant (see ``sharding``).
+    """
+    if url.startswith("sqlite:///"):
+        if shards > 1:
+            if archive is not None:
+                raise ValueError("The conversation archive is only supported with a single shard")
+            from .sharding import ShardedConversationRepository
+
+            return ShardedConversationRepository(db_path=url[len("sqlite:///"):], shards=shards)
+        return SQLiteConversationRepository(db_path=url[len("sqlite:///"):], archive=archive)
+    if archive is not None:
+        raise ValueError("The conversation archive is only supported with sqlite:/// storage")
+    if url.startswith("log:///"):
+        from .log_repository import LogConversationRepository
+
+        return LogConversationRepository(directory=url[len("log:///"):])
+    raise ValueError(f"Unsupported conversation store URL: {url}")
+
+
+class ConnectionPool:
+    """Idle SQLite connections to one database, reused by any thread.
+
+    Opening a connection costs about as much as a small query, so each
+    operation borrows one for a single transaction and returns it; at most
+    ``size`` idle connections are kept.
+    """
+
+    def __init__(self, db_path: str, size: int = 8):
+        self.db_path = db_path
+        self.size = size
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """A connection for one transaction, committed on success and rolled back on error"""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            with conn:
+                yield conn
+        finally:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
 
 
 class SQLiteConversationRepository:
-    """SQLite implementation of ConversationRepository"""
+    """SQLite implementation of ConversationRepository.
+
+    Rows carry a tenant id and every operation only sees ``tenant_id``'s
+    conversations; ``for_tenant`` returns a view of another tenant sharing the
+    connection pool. Archiving and compaction work across all tenants.
+    """
 
-    def __init__(self, db_path: str = "conversations.db"):
+    def __init__(
+        self,
+        db_path: str = "conversations.db",
+        codec: MessageCodec | None = None,
+        archive: SegmentStore | None = None,
+        tenant_id: str = DEFAULT_TENANT,
+        pool_size: int = 8,
+    ):
         self.db_path = db_path
+        self.codec = codec or MessageCodec()
+        self.archive = archive
+        self.tenant_id = tenant_id
+        self.pool = ConnectionPool(db_path, pool_size)
         self._init_db()
 
+    def for_tenant(self, tenant_id: str) -> "SQLiteConversationRepository":
+        """The same database, scoped to another tenant's conversations"""
+        view = copy.copy(self)
+        view.tenant_id = tenant_id
+        return view
+
     def _init_db(self):
         """Initialize the database schema"""
         with sqlite3.connect(self.db_path) as conn:
+            # WAL lets readers in other worker processes proceed during a write
+            conn.execute("PRAGMA journal_mode=WAL")
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS conversations (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     conversation_id TEXT NOT NULL,
                     conversation_name TEXT NOT NULL,
-                    messages TEXT NOT NULL,
-                    last_updated TEXT NOT NULL
+                    messages BLOB NOT NULL,
+                    last_updated TEXT NOT NULL,
+                    change_seq INTEGER NOT NULL DEFAULT 0
+                )
+            """
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(conversations)")]
+            if "change_seq" not in columns:
+                # Databases created before delta sync: number existing rows in insert order
+                conn.execute(
+                    "ALTER TABLE conversations ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0"
+                )
+                conn.execute("UPDATE conversations SET change_seq = id")
+            if "tenant_id" not in columns:
+                # Databases created before tenancy: every row belongs to the default tenant
+                conn.execute(
+                    "ALTER TABLE conversations ADD COLUMN tenant_id TEXT NOT NULL DEFAULT ''"
+                )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conversations_change_seq ON conversations (change_seq)"
+            )
+            # Point reads and upserts look conversations up by tenant and id, which is unique
+            conn.execute("DROP INDEX IF EXISTS idx_conversations_conversation_id")
+            conn.execute("DROP INDEX IF EXISTS idx_conversations_tenant_conversation_id")
+            unique = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_conversations_tenant_conversation_id'"
+            ).fetchone()
+            if unique is None:
+                # Concurrent first saves could insert a conversation twice; keep its latest row
+                conn.execute(
+                    """
+                    DELETE FROM conversations WHERE EXISTS (
+                        SELECT 1 FROM conversations AS newer
+                        WHERE newer.tenant_id = conversations.tenant_id
+                        AND newer.conversation_id = conversations.conversation_id
+                        AND (newer.change_seq, newer.id) > (conversations.change_seq, conversations.id)
+                    )
+                """
+                )
+                conn.execute(
+                    "CREATE UNIQUE INDEX uq_conversations_tenant_conversation_id "
+                    "ON conversations (tenant_id, conversation_id)"
+                )
+            # Tables keyed by conversation id alone are rebuilt with the tenant in the key
+            legacy_tables = []
+            for table in ("conversation_tombstones", "archived_conversations"):
+                table_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+                if table_columns and "tenant_id" not in table_columns:
+                    conn.execute(f"ALTER TABLE {table} RENAME TO legacy_{table}")
+                    legacy_tables.append((table, table_columns))
+            conn.execute("DROP INDEX IF EXISTS idx_archived_conversations_change_seq")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversation_tombstones (
+                    tenant_id TEXT NOT NULL DEFAULT '',
+                    conversation_id TEXT NOT NULL,
+                    change_seq INTEGER NOT NULL,
+                    PRIMARY KEY (tenant_id, conversation_id)
+                )
+            """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS archived_conversations (
+                    tenant_id TEXT NOT NULL DEFAULT '',
+                    conversation_id TEXT NOT NULL,
+                    conversation_name TEXT NOT NULL,
+                    last_updated TEXT NOT NULL,
+                    change_seq INTEGER NOT NULL,
+                    segment INTEGER NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    PRIMARY KEY (tenant_id, conversation_id)
+                ) WITHOUT ROWID
+            """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_archived_conversations_change_seq "
+                "ON archived_conversations (change_seq)"
+            )
+            for table, table_columns in legacy_tables:
+                names = ", ".join(table_columns)
+                conn.execute(f"INSERT INTO {table} ({names}) SELECT {names} FROM legacy_{table}")
+                conn.execute(f"DROP TABLE legacy_{table}")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS change_sequence (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    value INTEGER NOT NULL
                 )
             """
             )
+            conn.execute(
+                "INSERT OR IGNORE INTO change_sequence (id, value) "
+                "SELECT 1, COALESCE(MAX(change_seq), 0) FROM conversations"
+            )
             conn.commit()
 
-    def _ensure_utc(self, dt: datetime) -> datetime:
-        """Ensure datetime is UTC timezone-aware"""
-        if dt.tzinfo is None:
-            return dt.replace(tzinfo=timezone.utc)
-        return dt.astimezone(timezone.utc)
+    @staticmethod
+    def _next_change_seq(conn: sqlite3.Connection) -> int:
+        """Advance the change sequence; call inside the write transaction"""
+        return conn.execute(
+            "UPDATE change_sequence SET value = value + 1 WHERE id = 1 RETURNING value"
+        ).fetchone()[0]
 
+    @traced("SQLiteConversationRepository.get_conversations")
+    @timed_operation("sqlite", "get_conversations")
     def get_conversations(self) -> List[ConversationSummary]:
         """Get all conversations summaries"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.execute(
-                "SELECT conversation_id, conversation_name, last_updated FROM conversations ORDER BY last_updated DESC"
-            )
-            return [
-                ConversationSummary(
-                    conversation_id=row[0],
-                    conversation_name=row[1],
-                    last_updated=self._ensure_utc(datetime.fromisoformat(row[2])),
-                )
-                for row in cursor.fetchall()
-            ]
-
-    def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
-        """Get a specific conversation"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                "SELECT conversation_id, conversation_name, messages, last_updated FROM conversations WHERE conversation_id = ?",
-                (conversation_id,),
+                """
+                SELECT conversation_id, conversation_name, last_updated FROM conversations
+                WHERE tenant_id = ?
+                UNION ALL
+                SELECT conversation_id, conversation_name, last_updated FROM archived_conversations
+                WHERE tenant_id = ?
+                ORDER BY last_updated DESC
+                """,
+                (self.tenant_id, self.tenant_id),
             )
-            row = cursor.fetchone()
+            return [summary_from_row(*row) for row in cursor.fetchall()]
 
-            if not row:
+    def _read_archived(self, conversation_id: str) -> Optional[ArchivedRecord]:
+        """Read a conversation from the cold tier, if it was archived"""
+        if self.archive is None:
+            return None
+        for attempt in range(2):
+            with self.pool.connection() as conn:
+                location = conn.execute(
+                    "SELECT segment, offset, length FROM archived_conversations "
+                    "WHERE tenant_id = ? AND conversation_id = ?",
+                    (self.tenant_id, conversation_id),
+                ).fetchone()
+            if not location:
                 return None
+            try:
+                record = self.archive.read(*location)
+            except FileNotFoundError:
+                # Compaction moved the record and removed its segment; look it up again
+                if attempt:
+                    raise
+                continue
+            ARCHIVE_READ_PAYLOAD_BYTES.observe(len(record.messages))
+            return record
 
-            messages_data = json.loads(row[2])
-            messages = []
+    def _find(self, conversation_id: str) -> Optional[tuple]:
+        """(conversation_id, conversation_name, messages, last_updated) from either tier"""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT conversation_id, conversation_name, messages, last_updated FROM conversations "
+                "WHERE tenant_id = ? AND conversation_id = ?",
+                (self.tenant_id, conversation_id),
+            ).fetchone()
+        if row:
+            READ_PAYLOAD_BYTES.observe(len(row[2]))
+            return row
+        record = self._read_archived(conversation_id)
+        if record is None:
+            return None
+        return record.conversation_id, record.conversation_name, record.messages, record.last_updated
 
-            for msg in messages_data:
-                content = msg["content"]
-                # Try to parse content if it's a string that might be JSON
-                if isinstance(content, str):
-                    try:
-                        parsed_content = json.loads(content)
-                        if isinstance(parsed_content, list):
-                            content = parsed_content
-                    except json.JSONDecodeError:
-                        # Keep content as is if it's not valid JSON
-                        pass
-
-                messages.append(
-                    Message(
-                        role=msg["role"],
-                        content=content,
-                        model=msg.get("model"),
-                        timestamp=self._ensure_utc(
-                            datetime.fromisoformat(msg["timestamp"])
-                        ),
-                    )
-                )
+    @traced("SQLiteConversationRepository.get_conversation")
+    @timed_operation("sqlite", "get_conversation")
+    def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """Get a specific conversation"""
+        row = self._find(conversation_id)
+        if not row:
+            return None
+        return conversation_from_row(self.codec, row)
 
-            return Conversation(
-                conversation_id=row[0],
-                conversation_name=row[1],
-                messages=messages,
-                last_updated=self._ensure_utc(datetime.fromisoformat(row[3])),
-            )
+    @traced("SQLiteConversationRepository.get_conversation_json")
+    @timed_operation("sqlite", "get_conversation_json")
+    def get_conversation_json(self, conversation_id: str) -> Optional[bytes]:
+        """Get a conversation as a serialized API response, without decoding the messages"""
+        row = self._find(conversation_id)
+        if not row:
+            return None
+        return conversation_json_from_row(self.codec, row)
 
+    @traced("SQLiteConversationRepository.save_conversation")
+    @timed_operation("sqlite", "save_conversation")
     def save_conversation(self, conversation: Conversation) -> None:
         """Save or update a conversation"""
         # Ensure timestamps are UTC and prepare messages for storage
-        messages_json = json.dumps(
-            [
-                {
-                    "role": msg.role,
-                    "content": msg.content,  # Store content as-is, whether string or structured
-                    "model": msg.model,
-                    "timestamp": self._ensure_utc(msg.timestamp).isoformat(),
-                }
-                for msg in conversation.messages
-            ]
-        )
+        messages_blob = encode_messages(self.codec, conversation)
 
-        with sqlite3.connect(self.db_path) as conn:
-            # Check if the conversation already exists
-            cursor = conn.execute(
-                "SELECT id FROM conversations WHERE conversation_id = ?",
-                (conversation.conversation_id,)
+        WRITE_PAYLOAD_BYTES.observe(len(messages_blob))
+
+        with self.pool.connection() as conn:
+            # One statement, so concurrent first saves from several workers cannot both insert
+            change_seq = self._next_change_seq(conn)
+            conn.execute(
+                """
+                INSERT INTO conversations
+                (tenant_id, conversation_id, conversation_name, messages, last_updated, change_seq)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (tenant_id, conversation_id) DO UPDATE SET
+                    conversation_name = excluded.conversation_name,
+                    messages = excluded.messages,
+                    last_updated = excluded.last_updated,
+                    change_seq = excluded.change_seq
+                """,
+                (
+                    self.tenant_id,
+                    conversation.conversation_id,
+                    conversation.conversation_name,
+                    messages_blob,
+                    ensure_utc(conversation.last_updated).isoformat(),
+                    change_seq,
+                ),
+            )
+            conn.execute(
+                "DELETE FROM conversation_tombstones WHERE tenant_id = ? AND conversation_id = ?",
+                (self.tenant_id, conversation.conversation_id),
+            )
+            # Saving an archived conversation rehydrates it; its segment record becomes dead
+            conn.execute(
+                "DELETE FROM archived_conversations WHERE tenant_id = ? AND conversation_id = ?",
+                (self.tenant_id, conversation.conversation_id),
+            )
+            conn.commit()
+
+    @traced("SQLiteConversationRepository.delete_conversation")
+    @timed_operation("sqlite", "delete_conversation")
+    def delete_conversation(self, conversation_id: str) -> bool:
+        """Delete a conversation, leaving a tombstone for delta sync"""
+        with self.pool.connection() as conn:
+            deleted = conn.execute(
+                "DELETE FROM conversations WHERE tenant_id = ? AND conversation_id = ?",
+                (self.tenant_id, conversation_id),
+            ).rowcount
+            deleted += conn.execute(
+                "DELETE FROM archived_conversations WHERE tenant_id = ? AND conversation_id = ?",
+                (self.tenant_id, conversation_id),
+            ).rowcount
+            if not deleted:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO conversation_tombstones (tenant_id, conversation_id, change_seq) "
+                "VALUES (?, ?, ?)",
+                (self.tenant_id, conversation_id, self._next_change_seq(conn)),
             )
-            existing_conversation = cursor.fetchone()
+            conn.commit()
+        return True
 
-            if existing_conversation:
-                # Update existing conversation
-                conn.execute(
-                    """
-                    UPDATE conversations 
-                    SET conversation_name = ?, messages = ?, last_updated = ?
-                    WHERE conversation_id = ?
-                    """,
-                    (
-                        conversation.conversation_name,
-                        messages_json,
-                        self._ensure_utc(conversation.last_updated).isoformat(),
-                        conversation.conversation_id,
-                    ),
-                )
+    @traced("SQLiteConversationRepository.get_changes")
+    @timed_operation("sqlite", "get_changes")
+    def get_changes(self, since: int, limit: int = 500) -> ConversationChanges:
+        """Conversations saved or deleted after the ``since`` cursor, oldest change first"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT change_seq, conversation_id, conversation_name, last_updated FROM conversations
+                WHERE change_seq > ? AND tenant_id = ?
+                UNION ALL
+                SELECT change_seq, conversation_id, conversation_name, last_updated FROM archived_conversations
+                WHERE change_seq > ? AND tenant_id = ?
+                UNION ALL
+                SELECT change_seq, conversation_id, NULL, NULL FROM conversation_tombstones
+                WHERE change_seq > ? AND tenant_id = ?
+                ORDER BY 1
+                LIMIT ?
+                """,
+                (since, self.tenant_id, since, self.tenant_id, since, self.tenant_id, limit + 1),
+            ).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        changes = ConversationChanges(cursor=rows[-1][0] if rows else since, has_more=has_more)
+        for _, conversation_id, name, last_updated in rows:
+            if last_updated is None:
+                changes.deleted.append(conversation_id)
             else:
-                # Insert new conversation
-                conn.execute(
+                changes.changes.append(summary_from_row(conversation_id, name, last_updated))
+        return changes
+
+    def get_change_sequence(self) -> int:
+        """The latest change sequence number, shared by every tenant in the database"""
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT value FROM change_sequence WHERE id = 1").fetchone()[0]
+
+    def export_json(self, batch_size: int = 500) -> Iterator[bytes]:
+        """Every conversation serialized as by get_conversation_json, hot tier first.
+
+        Rows stream from a cursor inside one read transaction: the export is a
+        consistent snapshot, holds at most ``batch_size`` rows in memory and,
+        under WAL, does not block writers. The generator may be resumed from
+        different threads, as a streaming response does.
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            conn.execute("BEGIN")
+            cursor = conn.execute(
+                "SELECT conversation_id, conversation_name, messages, last_updated FROM conversations "
+                "WHERE tenant_id = ? ORDER BY id",
+                (self.tenant_id,),
+            )
+            while rows := cursor.fetchmany(batch_size):
+                for row in rows:
+                    yield conversation_json_from_row(self.codec, row)
+            if self.archive is None:
+                return
+            cursor = conn.execute(
+                "SELECT conversation_id, segment, offset, length FROM archived_conversations "
+                "WHERE tenant_id = ? ORDER BY segment, offset",
+                (self.tenant_id,),
+            )
+            while rows := cursor.fetchmany(batch_size):
+                for conversation_id, segment, offset, length in rows:
+                    try:
+                        record = self.archive.read(segment, offset, length)
+                    except FileNotFoundError:
+                        # Compacted since the snapshot; find its new location
+                        record = self._read_archived(conversation_id)
+                        if record is None:
+                            continue
+                    yield conversation_json_from_row(
+                        self.codec,
+                        (record.conversation_id, record.conversation_name, record.messages, record.last_updated),
+                    )
+        finally:
+            conn.close()
+
+    @traced("SQLiteConversationRepository.import_conversations")
+    def import_conversations(
+        self,
+        conversations: Iterable[Any],
+        batch_size: int = 500,
+        on_batch: Optional[Callable[[List[str]], None]] = None,
+    ) -> int:
+        """Upsert exported conversations, one transaction per batch; returns how many were imported.
+
+        ``conversations`` are decoded export lines. An invalid one raises
+        ValueError naming its position; batches before it stay committed.
+        ``on_batch`` is called with the ids of every committed batch.
+        """
+        imported = 0
+        for batch in batched(conversations, batch_size):
+            rows = []
+            for position, item in enumerate(batch, imported + 1):
+                try:
+                    rows.append(row_from_export(self.codec, item))
+                except ValueError as e:
+                    raise ValueError(f"Conversation {position}: {e}")
+            with self.pool.connection() as conn:
+                last_seq = conn.execute(
+                    "UPDATE change_sequence SET value = value + ? WHERE id = 1 RETURNING value", (len(rows),)
+                ).fetchone()[0]
+                for change_seq, (conversation_id, name, messages, last_updated) in enumerate(
+                    rows, last_seq - len(rows) + 1
+                ):
+                    WRITE_PAYLOAD_BYTES.observe(len(messages))
+                    updated = conn.execute(
+                        """
+                        UPDATE conversations
+                        SET conversation_name = ?, messages = ?, last_updated = ?, change_seq = ?
+                        WHERE tenant_id = ? AND conversation_id = ?
+                        """,
+                        (name, messages, last_updated, change_seq, self.tenant_id, conversation_id),
+                    ).rowcount
+                    if updated:
+                        continue
+                    conn.execute(
+                        """
+                        INSERT INTO conversations
+                        (tenant_id, conversation_id, conversation_name, messages, last_updated, change_seq)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        (self.tenant_id, conversation_id, name, messages, last_updated, change_seq),
+                    )
+                    conn.execute(
+                        "DELETE FROM conversation_tombstones WHERE tenant_id = ? AND conversation_id = ?",
+                        (self.tenant_id, conversation_id),
+                    )
+                    conn.execute(
+                        "DELETE FROM archived_conversations WHERE tenant_id = ? AND conversation_id = ?",
+                        (self.tenant_id, conversation_id),
+                    )
+                conn.commit()
+            imported += len(rows)
+            if on_batch is not None:
+                on_batch([row[0] for row in rows])
+        return imported
+
+    def archive_conversations(self, cutoff: datetime, batch_size: int = 200) -> int:
+        """Move conversations last updated before ``cutoff`` to the cold tier.
+
+        Archiving keeps each conversation's change_seq, so it is invisible to
+        delta sync. A conversation saved while its batch was being written
+        stays in the hot table and its copy in the segment is left dead.
+        """
+        if self.archive is None:
+            raise RuntimeError("No archive configured")
+        cutoff_iso = ensure_utc(cutoff).isoformat()
+        archived, last_id = 0, 0
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(
                     """
-                    INSERT INTO conversations (conversation_id, conversation_name, messages, last_updated)
-                    VALUES (?, ?, ?, ?)
+                    SELECT id, conversation_id, conversation_name, messages, last_updated, change_seq, tenant_id
+                    FROM conversations WHERE id > ? AND last_updated < ? ORDER BY id LIMIT ?
                     """,
-                    (
-                        conversation.conversation_id,
-                        conversation.conversation_name,
-                        messages_json,
-                        self._ensure_utc(conversation.last_updated).isoformat(),
-                    ),
+                    (last_id, cutoff_iso, batch_size),
+                ).fetchall()
+            if not rows:
+                return archived
+            last_id = rows[-1][0]
+            records = [
+                ArchivedRecord(
+                    conversation_id=row[1],
+                    conversation_name=row[2],
+                    last_updated=row[4],
+                    change_seq=row[5],
+                    messages=row[3],
                 )
-            conn.commit()
+                for row in rows
+            ]
+            # Records are durable before the index points at them
+            locations = self.archive.append(records)
+            with self.pool.connection() as conn:
+                for row, record, (segment, offset, length) in zip(rows, records, locations):
+                    moved = conn.execute(
+                        "DELETE FROM conversations WHERE id = ? AND change_seq = ?",
+                        (row[0], record.change_seq),
+                    ).rowcount
+                    if not moved:
+                        continue
+                    conn.execute(
+                        """
+                        INSERT OR REPLACE INTO archived_conversations
+                        (tenant_id, conversation_id, conversation_name, last_updated, change_seq, segment, offset, length)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            row[6],
+                            record.conversation_id,
+                            record.conversation_name,
+                            record.last_updated,
+                            record.change_seq,
+                            segment,
+                            offset,
+                            length,
+                        ),
+                    )
+                    archived += 1
+                conn.commit()
+
+    def compact_archive(self, min_live_ratio: float = 0.5) -> dict:
+        """Rewrite sealed segments whose live records are under ``min_live_ratio`` of the file"""
+        if self.archive is None:
+            raise RuntimeError("No archive configured")
+        active = self.archive.active_segment()
+        with self.pool.connection() as conn:
+            live_bytes = dict(
+                conn.execute("SELECT segment, SUM(length) FROM archived_conversations GROUP BY segment")
+            )
+        stats = {"segments": 0, "records": 0}
+        for segment in self.archive.segments():
+            if segment >= active:
+                continue
+            size = os.path.getsize(self.archive.path(segment))
+            if size and live_bytes.get(segment, 0) / size >= min_live_ratio:
+                continue
+            with self.pool.connection() as conn:
+                rows = conn.execute(
+                    "SELECT tenant_id, conversation_id, offset, length FROM archived_conversations WHERE segment = ?",
+                    (segment,),
+                ).fetchall()
+            records = [self.archive.read(segment, offset, length) for _, _, offset, length in rows]
+            locations = self.archive.append(records) if records else []
+            with self.pool.connection() as conn:
+                for (tenant_id, conversation_id, offset, _), location in zip(rows, locations):
+                    # Skip conversations rehydrated or deleted since they were read
+                    conn.execute(
+                        """
+                        UPDATE archived_conversations SET segment = ?, offset = ?, length = ?
+                        WHERE tenant_id = ? AND conversation_id = ? AND segment = ? AND offset = ?
+                        """,
+                        (*location, tenant_id, conversation_id, segment, offset),
+                    )
+                conn.commit()
+            self.archive.remove(segment)
+            stats["segments"] += 1
+            stats["records"] += len(records)
+        return stats
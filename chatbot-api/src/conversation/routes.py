@@ -1,25 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from typing import List, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Iterator, List, Any, Optional
+from email.utils import format_datetime, parsedate_to_datetime
+import asyncio
+import hashlib
+import re
+import time
 from datetime import datetime, timezone
 from pydantic import BaseModel, ConfigDict, Field
 from .service import ConversationService
+from .changes import ChangeFeed
+from .transfer import decode_lines, ndjson_chunks, split_lines
 from .models import Conversation, ConversationSummary
 from ..chat.models import Message
+from ..chat.scheduler import DeadlineExceeded
+from ..chat.schemas import MessageSchema
+from ..compression import Decompressor
+from ..limits import enforce_request_limits
 import logging
-import json
 
 logger = logging.getLogger(__name__)
 
 
-# Pydantic models for API
-class MessageSchema(BaseModel):
-    role: str
-    content: str | dict | list[dict]  # Allow structured content
-    model: str | None = None
-    timestamp: datetime | None = None
-    model_config = ConfigDict(from_attributes=True)
-
-
+# Pydantic models for API; messages use the chat request schema
 class ConversationSummarySchema(BaseModel):
     conversation_id: str
     conversation_name: str
@@ -35,6 +39,20 @@ class ConversationSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ConversationChangesSchema(BaseModel):
+    changes: List[ConversationSummarySchema]
+    deleted: List[str]
+    cursor: int
+    has_more: bool
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ImportResultSchema(BaseModel):
+    imported: int
+    duration_ms: float
+    conversations_per_second: float
+
+
 class GenerateNameRequest(BaseModel):
     message: str
 
@@ -52,6 +70,61 @@ async def get_conversation_service() -> ConversationService:
     raise NotImplementedError("Conversation service not configured")
 
 
+async def get_tenant_id() -> Optional[str]:
+    # Overridden in main.py; None when the deployment is not multi-tenant
+    return None
+
+
+async def get_change_feed() -> Optional[ChangeFeed]:
+    # Overridden in main.py; without a feed, change requests never wait
+    return None
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(etag: str, if_none_match: str | None) -> bool:
+    """Check an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+# The serialized conversation ends with its last_updated field
+_LAST_UPDATED = re.compile(rb'"last_updated":"([^"]+)"\}\s*$')
+
+
+def last_modified(body: bytes) -> Optional[datetime]:
+    """Read last_updated from the tail of a serialized conversation"""
+    match = _LAST_UPDATED.search(body, max(0, len(body) - 128))
+    if match is None:
+        return None
+    try:
+        updated = datetime.fromisoformat(match.group(1).decode())
+    except ValueError:
+        return None
+    if updated.tzinfo is None:
+        updated = updated.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    return updated.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def not_modified_since(updated: Optional[datetime], if_modified_since: str | None) -> bool:
+    """Check an If-Modified-Since header against the last modification time"""
+    if updated is None or not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return updated <= since
+
+
 @router.get("/conversations", response_model=List[ConversationSummarySchema])
 async def list_conversations(
     service: ConversationService = Depends(get_conversation_service),
@@ -61,24 +134,119 @@ async def list_conversations(
     return service.get_conversations()
 
 
+@router.get("/conversations/changes", response_model=ConversationChangesSchema)
+async def get_conversation_changes(
+    since: int = Query(0, ge=0, description="Cursor from the previous response; 0 for a full sync"),
+    limit: int = Query(500, ge=1, le=5000),
+    wait: float = Query(0, ge=0, le=60, description="Seconds to wait for a change (long polling)"),
+    service: ConversationService = Depends(get_conversation_service),
+    feed: Optional[ChangeFeed] = Depends(get_change_feed),
+) -> ConversationChangesSchema:
+    """Conversations created, renamed, updated or deleted since a cursor"""
+    seen = await feed.current() if wait and feed is not None else None
+    changes = service.get_changes(since, limit)
+    if seen is not None:
+        # The feed's sequence also moves for other tenants' changes; wait on it, not on the cursor
+        deadline = time.monotonic() + wait
+        while not changes.changes and not changes.deleted:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sequence = await feed.wait(seen, timeout=remaining)
+            if sequence <= seen:
+                break
+            seen = sequence
+            changes = service.get_changes(since, limit)
+    return ConversationChangesSchema.model_validate(changes)
+
+
+@router.get("/conversations/changes/stream")
+async def stream_conversation_changes(
+    since: int = Query(0, ge=0),
+    service: ConversationService = Depends(get_conversation_service),
+    feed: Optional[ChangeFeed] = Depends(get_change_feed),
+):
+    """Server-sent events carrying each batch of changes as it happens"""
+    if feed is None:
+        raise HTTPException(status_code=503, detail="Change feed not configured")
+
+    async def events():
+        cursor = since
+        # The feed's sequence also moves for other tenants' changes; wait on it, not on the cursor
+        seen = await feed.current()
+        while True:
+            changes = service.get_changes(cursor, 500)
+            if changes.changes or changes.deleted:
+                cursor = changes.cursor
+                body = ConversationChangesSchema.model_validate(changes).model_dump_json()
+                yield f"id: {cursor}\ndata: {body}\n\n"
+                if changes.has_more:
+                    continue
+            sequence = await feed.wait(seen, timeout=15)
+            if sequence <= seen:
+                # Keep idle connections open through proxies
+                yield ": keep-alive\n\n"
+            seen = sequence
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/conversations/export")
+async def export_conversations(
+    service: ConversationService = Depends(get_conversation_service),
+):
+    """Every conversation as NDJSON, streamed from a database cursor.
+
+    Compressed with zstd or gzip when the client sends Accept-Encoding.
+    """
+    return StreamingResponse(
+        ndjson_chunks(service.export_json()),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="conversations.ndjson"'},
+    )
+
+
 @router.get("/conversations/{conversation_id}", response_model=ConversationSchema)
 async def get_conversation(
     conversation_id: str,
+    request: Request,
     service: ConversationService = Depends(get_conversation_service),
 ) -> ConversationSchema:
     """Get a specific conversation"""
     logger.info(f"Fetching conversation: {conversation_id}")
-    conversation = service.get_conversation(conversation_id)
-    if not conversation:
+    # The stored payload already matches ConversationSchema, so skip re-validation
+    body = service.get_conversation_json(conversation_id)
+    if body is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return conversation
+    etag = make_etag(body)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    updated = last_modified(body)
+    if updated is not None:
+        headers["Last-Modified"] = format_datetime(updated, usegmt=True)
+    # If-Modified-Since only applies when the client sent no If-None-Match
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(etag, if_none_match) or (
+        if_none_match is None
+        and not_modified_since(updated, request.headers.get("if-modified-since"))
+    ):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
-@router.post("/conversations", response_model=ConversationSchema)
+@router.post(
+    "/conversations",
+    response_model=ConversationSchema,
+    dependencies=[Depends(enforce_request_limits)],
+)
 async def save_conversation(
     request: Request,
     conversation: ConversationSchema,
     service: ConversationService = Depends(get_conversation_service),
+    feed: Optional[ChangeFeed] = Depends(get_change_feed),
 ) -> ConversationSchema:
     """Save a conversation"""
     try:
@@ -90,11 +258,7 @@ async def save_conversation(
             messages=[
                 Message(
                     role=msg.role,
-                    content=(
-                        msg.content
-                        if isinstance(msg.content, str)
-                        else json.dumps(msg.content)
-                    ),
+                    content=msg.content_data(),
                     model=msg.model,
                     timestamp=msg.timestamp or current_time,
                 )
@@ -104,6 +268,8 @@ async def save_conversation(
         )
 
         service.save_conversation(domain_conversation)
+        if feed is not None:
+            await feed.notify()
 
         # Return updated conversation with current timestamp
         conversation.last_updated = current_time
@@ -113,6 +279,74 @@ async def save_conversation(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _body_chunks(request: Request, loop: asyncio.AbstractEventLoop) -> Iterator[bytes]:
+    """The request body, read from a worker thread, decompressed per its Content-Encoding"""
+    encoding = request.headers.get("content-encoding", "identity").lower()
+    decompressor = Decompressor(encoding) if encoding != "identity" else None
+    stream = request.stream()
+
+    async def next_chunk() -> Optional[bytes]:
+        return await anext(stream, None)
+
+    while (chunk := asyncio.run_coroutine_threadsafe(next_chunk(), loop).result()) is not None:
+        if decompressor is None:
+            yield chunk
+            continue
+        try:
+            yield decompressor.decompress(chunk)
+        except Exception:
+            raise ValueError(f"Body is not valid {encoding} data")
+
+
+@router.post("/conversations/import", response_model=ImportResultSchema)
+async def import_conversations(
+    request: Request,
+    batch_size: int = Query(500, ge=1, le=10000, description="Conversations per transaction"),
+    service: ConversationService = Depends(get_conversation_service),
+    feed: Optional[ChangeFeed] = Depends(get_change_feed),
+) -> ImportResultSchema:
+    """Create or replace conversations from an NDJSON export, streamed in batches.
+
+    The body may be sent with Content-Encoding zstd or gzip. On an invalid
+    line the batches before it stay imported.
+    """
+    encoding = request.headers.get("content-encoding", "identity").lower()
+    if encoding != "identity":
+        try:
+            Decompressor(encoding)
+        except ValueError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+    started = time.perf_counter()
+    lines = decode_lines(split_lines(_body_chunks(request, asyncio.get_running_loop())))
+    try:
+        imported = await run_in_threadpool(service.import_conversations, lines, batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if feed is not None:
+            await feed.notify()
+    duration = time.perf_counter() - started
+    return ImportResultSchema(
+        imported=imported,
+        duration_ms=round(duration * 1000, 1),
+        conversations_per_second=round(imported / duration, 1) if duration else 0.0,
+    )
+
+
+@router.delete("/conversations/{conversation_id}", status_code=204)
+async def delete_conversation(
+    conversation_id: str,
+    service: ConversationService = Depends(get_conversation_service),
+    feed: Optional[ChangeFeed] = Depends(get_change_feed),
+) -> Response:
+    """Delete a conversation"""
+    if not service.delete_conversation(conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if feed is not None:
+        await feed.notify()
+    return Response(status_code=204)
+
+
 @router.post("/generate_name", response_model=GenerateNameResponse)
 async def generate_name(
     request: GenerateNameRequest,
@@ -120,5 +354,9 @@ async def generate_name(
 ) -> GenerateNameResponse:
     """Generate a name for a conversation"""
     logger.info("Generating conversation name")
-    name = service.generate_name(request.message)
+    try:
+        # The title call blocks, behind interactive calls when upstream capacity is scheduled
+        name = await run_in_threadpool(service.generate_name, request.message)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     return GenerateNameResponse(name=name)
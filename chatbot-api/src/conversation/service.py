@@ -1,10 +1,11 @@
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Any, Iterable, Iterator, List, Optional
 from datetime import datetime, timezone
-from .models import Conversation, ConversationSummary
+from .models import Conversation, ConversationChanges, ConversationSummary
 from .repository import ConversationRepository
 from ..chat.provider import AIProvider
 from ..chat.models import Message
+from ..observability.tracing import traced
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,21 +13,39 @@ logger = logging.getLogger(__name__)
 
 @dataclass
 class ConversationService:
-    """Service for managing conversations"""
+    """Service for managing conversations.
+
+    With a ``tenant_id`` every operation sees only that tenant's conversations;
+    the repository must then provide ``for_tenant``.
+    """
 
     repository: ConversationRepository
     ai_provider: AIProvider
+    tenant_id: Optional[str] = None
+
+    def __post_init__(self):
+        if self.tenant_id is not None:
+            self.repository = self.repository.for_tenant(self.tenant_id)
 
+    @traced("ConversationService.get_conversations")
     def get_conversations(self) -> List[ConversationSummary]:
         """Get all conversations"""
         logger.info("Fetching all conversations")
         return self.repository.get_conversations()
 
+    @traced("ConversationService.get_conversation")
     def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
         """Get a specific conversation"""
         logger.info(f"Fetching conversation: {conversation_id}")
         return self.repository.get_conversation(conversation_id)
 
+    @traced("ConversationService.get_conversation_json")
+    def get_conversation_json(self, conversation_id: str) -> Optional[bytes]:
+        """Get a specific conversation, already serialized for the API"""
+        logger.info(f"Fetching conversation JSON: {conversation_id}")
+        return self.repository.get_conversation_json(conversation_id)
+
+    @traced("ConversationService.save_conversation")
     def save_conversation(self, conversation: Conversation) -> None:
         """Save a conversation"""
         logger.info(f"Saving conversation: {conversation.conversation_id}")
@@ -37,6 +56,28 @@ class ConversationService:
             )
         self.repository.save_conversation(conversation)
 
+    @traced("ConversationService.delete_conversation")
+    def delete_conversation(self, conversation_id: str) -> bool:
+        """Delete a conversation"""
+        logger.info(f"Deleting conversation: {conversation_id}")
+        return self.repository.delete_conversation(conversation_id)
+
+    @traced("ConversationService.get_changes")
+    def get_changes(self, since: int, limit: int = 500) -> ConversationChanges:
+        """Get conversations saved or deleted after a change cursor"""
+        return self.repository.get_changes(since, limit)
+
+    def export_json(self) -> Iterator[bytes]:
+        """Every conversation, serialized for the API, in constant memory"""
+        logger.info("Exporting conversations")
+        return self.repository.export_json()
+
+    @traced("ConversationService.import_conversations")
+    def import_conversations(self, conversations: Iterable[Any], batch_size: int = 500) -> int:
+        """Create or replace conversations from decoded export lines"""
+        return self.repository.import_conversations(conversations, batch_size)
+
+    @traced("ConversationService.generate_name")
     def generate_name(self, message: str) -> str:
         """Generate a name for a conversation"""
         logger.info("Generating conversation name")
@@ -0,0 +1,333 @@
+"""Conversations spread over several SQLite databases by tenant.
+
+A SQLite database admits one writer at a time, so with a single file every
+save in the deployment queues on the same lock. ``ShardedConversationRepository``
+routes each tenant to one of N database files with a consistent hash ring:
+tenants on different shards write in parallel, and going from N to N + 1
+shards reassigns only about 1/(N + 1) of the tenants. Shard 0 is the
+configured database itself (``conversations.db``; the others are
+``conversations-1.db`` and so on), so a single-file deployment is the one-shard
+case. Each shard has its own connection pool.
+
+After changing the shard count, restart the API so that new writes go to
+each tenant's new shard, then move existing conversations with ``rebalance``.
+Until its rows are moved, a reassigned tenant does not see its older
+conversations.
+
+Usage:
+    python -m src.conversation.sharding status --db conversations.db --shards 4
+    python -m src.conversation.sharding rebalance --db conversations.db --shards 4 [--dry-run]
+"""
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import argparse
+import bisect
+import hashlib
+import logging
+import os
+import re
+import time
+from .codec import MessageCodec
+from .models import Conversation, ConversationChanges, ConversationSummary
+from .repository import DEFAULT_TENANT, SQLiteConversationRepository
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(key: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of tenant ids onto shard numbers"""
+
+    def __init__(self, shards: int, replicas: int = 128):
+        if shards < 1:
+            raise ValueError("At least one shard is required")
+        points = sorted(
+            (_hash(f"shard-{shard}-{replica}"), shard)
+            for shard in range(shards)
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard(self, key: str) -> int:
+        index = bisect.bisect(self._points, _hash(key))
+        return self._shards[index % len(self._shards)]
+
+
+def shard_path(db_path: str, shard: int) -> str:
+    if shard == 0:
+        return db_path
+    root, ext = os.path.splitext(db_path)
+    return f"{root}-{shard}{ext}"
+
+
+def existing_shards(db_path: str) -> List[int]:
+    """Shard numbers with a database file next to ``db_path``, whatever the configured count"""
+    root, ext = os.path.splitext(db_path)
+    pattern = re.compile(re.escape(os.path.basename(root)) + r"-(\d+)" + re.escape(ext) + "$")
+    directory = os.path.dirname(db_path) or "."
+    shards = [0] if os.path.exists(db_path) else []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            shards.append(int(match.group(1)))
+    return sorted(shards)
+
+
+class ShardedConversationRepository:
+    """ConversationRepository over N SQLite files, one per tenant by consistent hashing.
+
+    ``for_tenant`` returns the tenant's view of its shard. The repository
+    methods themselves act for the default tenant, so a sharded store can be
+    used wherever a single one is.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "conversations.db",
+        shards: int = 2,
+        codec: MessageCodec | None = None,
+        pool_size: int = 8,
+    ):
+        self.db_path = db_path
+        self.ring = HashRing(shards)
+        codec = codec or MessageCodec()
+        self.shards = [
+            SQLiteConversationRepository(db_path=shard_path(db_path, shard), codec=codec, pool_size=pool_size)
+            for shard in range(shards)
+        ]
+
+    def shard_index(self, tenant_id: str) -> int:
+        return self.ring.shard(tenant_id)
+
+    def for_tenant(self, tenant_id: str) -> SQLiteConversationRepository:
+        return self.shards[self.shard_index(tenant_id)].for_tenant(tenant_id)
+
+    def _default(self) -> SQLiteConversationRepository:
+        return self.for_tenant(DEFAULT_TENANT)
+
+    def get_conversations(self) -> List[ConversationSummary]:
+        return self._default().get_conversations()
+
+    def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        return self._default().get_conversation(conversation_id)
+
+    def get_conversation_json(self, conversation_id: str) -> Optional[bytes]:
+        return self._default().get_conversation_json(conversation_id)
+
+    def save_conversation(self, conversation: Conversation) -> None:
+        self._default().save_conversation(conversation)
+
+    def delete_conversation(self, conversation_id: str) -> bool:
+        return self._default().delete_conversation(conversation_id)
+
+    def get_changes(self, since: int, limit: int = 500) -> ConversationChanges:
+        return self._default().get_changes(since, limit)
+
+    def get_change_sequence(self) -> int:
+        return self._default().get_change_sequence()
+
+    def export_json(self, batch_size: int = 500) -> Iterator[bytes]:
+        return self._default().export_json(batch_size)
+
+    def import_conversations(
+        self,
+        conversations: Iterable[Any],
+        batch_size: int = 500,
+        on_batch: Optional[Callable[[List[str]], None]] = None,
+    ) -> int:
+        return self._default().import_conversations(conversations, batch_size, on_batch)
+
+
+def tenants(repository: SQLiteConversationRepository) -> Dict[str, int]:
+    """Conversations stored per tenant in one database"""
+    with repository.pool.connection() as conn:
+        return dict(
+            conn.execute(
+                """
+                SELECT tenant_id, COUNT(*) FROM (
+                    SELECT tenant_id FROM conversations
+                    UNION ALL SELECT tenant_id FROM archived_conversations
+                ) GROUP BY tenant_id
+                """
+            )
+        )
+
+
+def move_tenant(
+    source: SQLiteConversationRepository,
+    target: SQLiteConversationRepository,
+    tenant_id: str,
+    batch_size: int = 500,
+) -> int:
+    """Move a tenant's conversations and tombstones to another database; returns conversations moved.
+
+    Each batch is inserted into the target, then deleted from the source, so an
+    interrupted move can simply be run again. Conversations the tenant has
+    already saved or deleted on the target since the API switched shards are
+    newer than the source's copy and are kept. The target's change sequence is
+    first raised to the source's, so that delta sync cursors the tenant's
+    clients hold stay behind every change they have yet to see.
+    """
+    with source.pool.connection() as conn:
+        if conn.execute(
+            "SELECT 1 FROM archived_conversations WHERE tenant_id = ? LIMIT 1", (tenant_id,)
+        ).fetchone():
+            raise ValueError(f"Tenant {tenant_id!r} has archived conversations, which cannot be moved")
+    with target.pool.connection() as conn:
+        conn.execute(
+            "UPDATE change_sequence SET value = MAX(value, ?) WHERE id = 1", (source.get_change_sequence(),)
+        )
+
+    moved = 0
+    while True:
+        with source.pool.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, conversation_id, conversation_name, messages, last_updated FROM conversations
+                WHERE tenant_id = ? ORDER BY id LIMIT ?
+                """,
+                (tenant_id, batch_size),
+            ).fetchall()
+        if not rows:
+            break
+        with target.pool.connection() as conn:
+            newer = _present(conn, tenant_id, [row[1] for row in rows])
+            missing = [row for row in rows if row[1] not in newer]
+            if missing:
+                last_seq = conn.execute(
+                    "UPDATE change_sequence SET value = value + ? WHERE id = 1 RETURNING value", (len(missing),)
+                ).fetchone()[0]
+                conn.executemany(
+                    """
+                    INSERT INTO conversations
+                    (tenant_id, conversation_id, conversation_name, messages, last_updated, change_seq)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (tenant_id, conversation_id) DO NOTHING
+                    """,
+                    [
+                        (tenant_id, conversation_id, name, messages, last_updated, change_seq)
+                        for change_seq, (_, conversation_id, name, messages, last_updated) in enumerate(
+                            missing, last_seq - len(missing) + 1
+                        )
+                    ],
+                )
+        with source.pool.connection() as conn:
+            conn.executemany("DELETE FROM conversations WHERE id = ?", [(row[0],) for row in rows])
+        moved += len(missing)
+
+    with source.pool.connection() as conn:
+        deleted = [
+            row[0]
+            for row in conn.execute(
+                "SELECT conversation_id FROM conversation_tombstones WHERE tenant_id = ?", (tenant_id,)
+            )
+        ]
+    for batch_start in range(0, len(deleted), batch_size):
+        batch = deleted[batch_start:batch_start + batch_size]
+        with target.pool.connection() as conn:
+            present = _present(conn, tenant_id, batch)
+            for conversation_id in batch:
+                if conversation_id in present:
+                    continue
+                conn.execute(
+                    "INSERT INTO conversation_tombstones (tenant_id, conversation_id, change_seq) VALUES (?, ?, ?)",
+                    (tenant_id, conversation_id, target._next_change_seq(conn)),
+                )
+        with source.pool.connection() as conn:
+            conn.executemany(
+                "DELETE FROM conversation_tombstones WHERE tenant_id = ? AND conversation_id = ?",
+                [(tenant_id, conversation_id) for conversation_id in batch],
+            )
+    return moved
+
+
+def _present(conn, tenant_id: str, conversation_ids: List[str]) -> set:
+    """Which of the ids the tenant has a conversation or tombstone for"""
+    marks = ", ".join("?" * len(conversation_ids))
+    return {
+        row[0]
+        for row in conn.execute(
+            f"""
+            SELECT conversation_id FROM conversations WHERE tenant_id = ? AND conversation_id IN ({marks})
+            UNION SELECT conversation_id FROM conversation_tombstones WHERE tenant_id = ? AND conversation_id IN ({marks})
+            """,
+            (tenant_id, *conversation_ids, tenant_id, *conversation_ids),
+        )
+    }
+
+
+def rebalance(
+    db_path: str,
+    shards: int,
+    batch_size: int = 500,
+    dry_run: bool = False,
+    codec: MessageCodec | None = None,
+) -> List[dict]:
+    """Move every tenant stored on a shard other than its own under ``shards`` shards.
+
+    Shard files beyond the new count, left over from a larger one, are drained
+    too. Returns one entry per tenant moved (or to move, with ``dry_run``).
+    """
+    ring = HashRing(shards)
+    codec = codec or MessageCodec()
+    repositories: Dict[int, SQLiteConversationRepository] = {}
+
+    def repository(shard: int) -> SQLiteConversationRepository:
+        if shard not in repositories:
+            repositories[shard] = SQLiteConversationRepository(db_path=shard_path(db_path, shard), codec=codec)
+        return repositories[shard]
+
+    moves = []
+    for shard in sorted(set(existing_shards(db_path)) | set(range(shards))):
+        for tenant_id, conversations in sorted(tenants(repository(shard)).items()):
+            owner = ring.shard(tenant_id)
+            if owner == shard:
+                continue
+            move = {"tenant_id": tenant_id, "from": shard, "to": owner, "conversations": conversations}
+            if not dry_run:
+                started = time.perf_counter()
+                move["conversations"] = move_tenant(repository(shard), repository(owner), tenant_id, batch_size)
+                logger.info(
+                    f"Moved tenant {tenant_id!r} from shard {shard} to {owner}: "
+                    f"{move['conversations']} conversations in {time.perf_counter() - started:.1f}s"
+                )
+            moves.append(move)
+    return moves
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["status", "rebalance"])
+    parser.add_argument("--db", default="conversations.db", help="Shard 0; the other shards sit next to it")
+    parser.add_argument(
+        "--shards", type=int, default=int(os.getenv("CONVERSATION_SHARDS") or 1), help="Shard count to balance for"
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="List the moves without making them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "status":
+        ring = HashRing(args.shards)
+        for shard in sorted(set(existing_shards(args.db)) | set(range(args.shards))):
+            path = shard_path(args.db, shard)
+            counts = tenants(SQLiteConversationRepository(db_path=path))
+            misplaced = sum(1 for tenant_id in counts if ring.shard(tenant_id) != shard)
+            print(
+                f"shard {shard:3d} {path}: {os.path.getsize(path) / 1e6:9.1f} MB, {len(counts)} tenants, "
+                f"{sum(counts.values())} conversations, {misplaced} tenants to move"
+            )
+        return
+    moves = rebalance(args.db, args.shards, batch_size=args.batch_size, dry_run=args.dry_run)
+    for move in moves:
+        print(f"{move['tenant_id']!r}: shard {move['from']} -> {move['to']} ({move['conversations']} conversations)")
+    print(f"{'Would move' if args.dry_run else 'Moved'} {len(moves)} tenants")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Bulk export and import of conversations as NDJSON.
+
+Each line of a dump is one conversation exactly as ``GET
+/api/conversations/{id}`` returns it, so a dump can be produced by the API
+(``GET /api/conversations/export``) or this CLI and restored by either.
+Dumps ending in ``.gz`` or ``.zst`` are compressed.
+
+Usage:
+    python -m src.conversation.transfer export --output conversations.ndjson.zst
+    python -m src.conversation.transfer import --input conversations.ndjson.zst [--batch-size 1000]
+"""
+
+from typing import Any, BinaryIO, Iterable, Iterator
+import argparse
+import gzip
+import logging
+import os
+import time
+from .codec import loads
+from .repository import create_repository
+from .archive import SegmentStore
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Lines are grouped into chunks of about this size for writing
+CHUNK_BYTES = 64 * 1024
+
+
+def ndjson_chunks(bodies: Iterable[bytes], chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """Join serialized conversations into newline-terminated chunks"""
+    chunk, size = [], 0
+    for body in bodies:
+        chunk.append(body)
+        chunk.append(b"\n")
+        size += len(body) + 1
+        if size >= chunk_bytes:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield b"".join(chunk)
+
+
+def split_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Lines of a byte stream that arrives in arbitrary chunks"""
+    pending = b""
+    for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def decode_lines(lines: Iterable[bytes]) -> Iterator[Any]:
+    """Decode NDJSON lines, skipping blank ones; raises ValueError naming a bad line"""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield loads(line)
+        except ValueError:
+            raise ValueError(f"Line {number}: invalid JSON")
+
+
+def open_dump(path: str, mode: str) -> BinaryIO:
+    """Open a dump file for "rb" or "wb", compressed according to its extension"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, compresslevel=6)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ValueError("zstd dumps require the 'zstandard' package")
+        if mode == "rb":
+            return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"), closefd=True)
+    return open(path, mode)
+
+
+def _read_chunks(f: BinaryIO) -> Iterator[bytes]:
+    while chunk := f.read(CHUNK_BYTES):
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument(
+        "--store",
+        default=os.getenv("CONVERSATION_STORE_URL") or "sqlite:///conversations.db",
+        help="Conversation store URL (default: CONVERSATION_STORE_URL)",
+    )
+    parser.add_argument("--archive-dir", default=os.getenv("ARCHIVE_DIR") or None)
+    parser.add_argument("--output", help="Dump to write (export)")
+    parser.add_argument("--input", help="Dump to read (import)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Conversations per transaction (import)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    repository = create_repository(
+        args.store, archive=SegmentStore(args.archive_dir) if args.archive_dir else None
+    )
+    started = time.perf_counter()
+    if args.command == "export":
+        if not args.output:
+            parser.error("export needs --output")
+        conversations = 0
+
+        def counted(bodies):
+            nonlocal conversations
+            for body in bodies:
+                conversations += 1
+                yield body
+
+        with open_dump(args.output, "wb") as f:
+            for chunk in ndjson_chunks(counted(repository.export_json())):
+                f.write(chunk)
+        size = os.path.getsize(args.output)
+    else:
+        if not args.input:
+            parser.error("import needs --input")
+        progress = {"conversations": 0}
+
+        def report(conversation_ids):
+            progress["conversations"] += len(conversation_ids)
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"Imported {progress['conversations']} conversations "
+                f"({progress['conversations'] / elapsed:.0f}/s)"
+            )
+
+        with open_dump(args.input, "rb") as f:
+            conversations = repository.import_conversations(
+                decode_lines(split_lines(_read_chunks(f))), args.batch_size, report
+            )
+        size = os.path.getsize(args.input)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{args.command}: {conversations} conversations, {size / 1e6:.1f} MB dump, "
+        f"{elapsed:.1f} s ({conversations / elapsed if elapsed else 0:.0f} conversations/s, "
+        f"{size / 1e6 / elapsed if elapsed else 0:.1f} MB/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Continuous batching of local generations.
+
+One thread runs the model. Every iteration it
+
+1. admits waiting requests while fewer than ``max_batch`` sequences run,
+2. gives each running sequence the token it sampled last, and prompt chunks
+   of newly admitted ones, up to ``token_budget`` tokens in all,
+3. runs them through one forward pass, samples the next token of every
+   sequence whose input is used up, and hands it to the request's callback.
+
+Sequences join and leave between iterations, so new requests start without
+waiting for long generations to finish, every running generation shares each
+pass over the weights, and throughput rises with the number of concurrent
+requests instead of them running one after another. Chunking prompts keeps a
+long prompt from stalling the streams already running.
+"""
+
+from collections import deque
+from typing import Callable, Deque, List, Optional
+import logging
+import threading
+import numpy as np
+from .model import BOS, EOS, LocalModel
+
+logger = logging.getLogger(__name__)
+
+# Called with each sampled token, then once with None when the generation ends
+# (with the error that ended it, if any); always on the engine thread
+Emit = Callable[[Optional[int], Optional[BaseException]], None]
+
+
+class Generation:
+    """One request's progress through the engine"""
+
+    __slots__ = (
+        "prompt", "max_new_tokens", "temperature", "rng", "emit",
+        "cache", "consumed", "generated", "next_token", "cancelled",
+    )
+
+    def __init__(self, prompt: List[int], max_new_tokens: int, temperature: float, seed: Optional[int], emit: Emit):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.rng = np.random.default_rng(seed)
+        self.emit = emit
+        self.cache = None
+        self.consumed = 0
+        self.generated = 0
+        self.next_token = None
+        self.cancelled = False
+
+
+class BatchingEngine:
+    """Runs a LocalModel over all concurrent generations at once, on a thread of its own"""
+
+    def __init__(self, model: LocalModel, max_batch: int = 16, token_budget: int = 256, max_new_tokens: int = 512):
+        if token_budget <= max_batch:
+            raise ValueError("token_budget must be larger than max_batch, to leave room for prompts")
+        self.model = model
+        self.max_batch = max_batch
+        self.token_budget = token_budget
+        self.max_new_tokens = min(max_new_tokens, model.config.max_seq // 2)
+        self.steps = 0
+        self.tokens = 0
+        self._waiting: Deque[Generation] = deque()
+        self._running: List[Generation] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def submit(
+        self,
+        prompt: List[int],
+        emit: Emit,
+        max_new_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        seed: Optional[int] = None,
+    ) -> Generation:
+        """Queue a generation; ``emit`` receives its tokens as they are sampled.
+
+        Prompts too long for the model keep their most recent tokens.
+        """
+        max_new = min(max_new_tokens or self.max_new_tokens, self.max_new_tokens)
+        prompt = [BOS, *prompt[-(self.model.config.max_seq - max_new - 1):]]
+        generation = Generation(prompt, max_new, temperature, seed, emit)
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("The local inference engine is stopped")
+            self._waiting.append(generation)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="local-inference", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return generation
+
+    def cancel(self, generation: Generation) -> None:
+        """Stop a generation at the next iteration; its callback gets no more tokens"""
+        generation.cancelled = True
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped and not self._waiting and not self._running:
+                    self._condition.wait()
+                if self._stopped:
+                    pending = [*self._waiting, *self._running]
+                    self._waiting.clear()
+                    self._running.clear()
+                    break
+                while self._waiting and len(self._running) < self.max_batch:
+                    self._running.append(self._waiting.popleft())
+            try:
+                self._step()
+            except Exception as e:
+                logger.error(f"Local inference failed: {str(e)}")
+                for generation in self._running:
+                    generation.emit(None, e)
+                self._running.clear()
+        for generation in pending:
+            generation.emit(None, RuntimeError("The local inference engine stopped"))
+
+    def _step(self) -> None:
+        self._running = [generation for generation in self._running if not generation.cancelled]
+        batch: List[Generation] = []
+        chunks: List[List[int]] = []
+        budget = self.token_budget
+        # Running streams first, one token each, then prompt chunks with what is left
+        for generation in self._running:
+            if generation.next_token is not None:
+                batch.append(generation)
+                chunks.append([generation.next_token])
+                budget -= 1
+        for generation in self._running:
+            if generation.next_token is None and budget > 0:
+                if generation.cache is None:
+                    generation.cache = self.model.new_cache(len(generation.prompt) + generation.max_new_tokens)
+                chunk = generation.prompt[generation.consumed:generation.consumed + budget]
+                generation.consumed += len(chunk)
+                budget -= len(chunk)
+                batch.append(generation)
+                chunks.append(chunk)
+        if not batch:
+            return
+        logits = self.model.forward([generation.cache for generation in batch], chunks)
+        self.steps += 1
+        self.tokens += sum(len(chunk) for chunk in chunks)
+        finished = []
+        for generation, row in zip(batch, logits):
+            if generation.consumed < len(generation.prompt):
+                continue  # More of the prompt to go
+            token = self._sample(generation, row)
+            generation.generated += 1
+            if token == EOS:
+                finished.append(generation)
+                continue
+            generation.emit(token, None)
+            generation.next_token = token
+            if generation.generated >= generation.max_new_tokens or generation.cache.length >= generation.cache.capacity:
+                finished.append(generation)
+        for generation in finished:
+            self._running.remove(generation)
+            generation.cache = None
+            generation.emit(None, None)
+
+    @staticmethod
+    def _sample(generation: Generation, logits: np.ndarray) -> int:
+        if generation.temperature <= 0:
+            return int(np.argmax(logits))
+        scaled = (logits - logits.max()) / generation.temperature
+        probabilities = np.exp(scaled)
+        probabilities /= probabilities.sum()
+        return int(generation.rng.choice(len(probabilities), p=probabilities))
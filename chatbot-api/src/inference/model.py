@@ -0,0 +1,238 @@
+"""A small decoder-only transformer with int8 weights, run on the CPU with numpy.
+
+The architecture is Llama-like: RMSNorm, rotary position embeddings, multi-head
+causal attention and a SwiGLU feed-forward block, with the output head tied to
+the token embedding. Weight matrices are stored as int8 with one float32 scale
+per output channel and multiplied as they are, so every forward pass reads
+each weight once whatever the number of tokens it processes; batching many
+sequences into one pass is what makes it efficient.
+
+``forward`` takes a ragged batch: any number of sequences, each with its own
+KV cache and any number of new tokens (a prompt chunk or one decode token).
+The matrix products run over all new tokens at once; only attention runs per
+sequence.
+
+Tokens are bytes of UTF-8 text plus BOS and EOS, so any model trained with a
+byte-level vocabulary can be loaded. Models are ``.npz`` files holding a
+``config`` JSON string and the quantized weights; ``init`` writes a randomly
+initialized one, which produces noise but exercises the whole serving path for
+development and load tests.
+
+Usage:
+    python -m src.inference.model init --out local-model.npz --dim 512 --layers 8
+"""
+
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Sequence, Tuple
+import argparse
+import json
+import numpy as np
+
+BOS = 256
+EOS = 257
+VOCAB_SIZE = 258
+
+
+@dataclass(frozen=True, slots=True)
+class ModelConfig:
+    dim: int = 256
+    layers: int = 4
+    heads: int = 4
+    hidden: int = 704
+    max_seq: int = 1024
+    vocab: int = VOCAB_SIZE
+    rope_theta: float = 10000.0
+    norm_eps: float = 1e-5
+
+    @property
+    def head_dim(self) -> int:
+        return self.dim // self.heads
+
+
+def encode(text: str) -> List[int]:
+    return list(text.encode("utf-8"))
+
+
+def quantize(weight: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric int8 quantization with one scale per output column"""
+    scale = np.abs(weight).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    return np.round(weight / scale).astype(np.int8), scale.astype(np.float32)
+
+
+class QuantizedLinear:
+    __slots__ = ("weight", "scale")
+
+    def __init__(self, weight: np.ndarray, scale: np.ndarray):
+        self.weight = weight
+        self.scale = scale
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        return (x @ self.weight) * self.scale
+
+
+class KVCache:
+    """Keys and values of one sequence's tokens so far, for every layer"""
+
+    __slots__ = ("keys", "values", "length")
+
+    def __init__(self, config: ModelConfig, capacity: int):
+        shape = (config.layers, capacity, config.heads, config.head_dim)
+        self.keys = np.empty(shape, dtype=np.float32)
+        self.values = np.empty(shape, dtype=np.float32)
+        self.length = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.keys.shape[1]
+
+
+def _rms_norm(x: np.ndarray, weight: np.ndarray, eps: float) -> np.ndarray:
+    return x / np.sqrt(np.mean(x * x, axis=-1, keepdims=True) + eps) * weight
+
+
+class LocalModel:
+    def __init__(self, config: ModelConfig, tensors: Dict[str, np.ndarray]):
+        self.config = config
+        self.embedding = tensors["embedding.weight"]
+        self.embedding_scale = tensors["embedding.scale"]
+        self.norm = tensors["norm"]
+        self.layers = []
+        for i in range(config.layers):
+            prefix = f"layers.{i}."
+            self.layers.append(
+                {
+                    name: QuantizedLinear(tensors[prefix + name + ".weight"], tensors[prefix + name + ".scale"])
+                    for name in ("wq", "wk", "wv", "wo", "w1", "w2", "w3")
+                }
+                | {"attention_norm": tensors[prefix + "attention_norm"], "ffn_norm": tensors[prefix + "ffn_norm"]}
+            )
+        frequencies = 1.0 / config.rope_theta ** (np.arange(0, config.head_dim, 2) / config.head_dim)
+        angles = np.outer(np.arange(config.max_seq), frequencies)
+        self.cos = np.cos(angles).astype(np.float32)
+        self.sin = np.sin(angles).astype(np.float32)
+
+    @classmethod
+    def random(cls, config: ModelConfig, seed: int = 0) -> "LocalModel":
+        rng = np.random.default_rng(seed)
+        tensors = {}
+
+        def linear(name, rows, columns):
+            tensors[name + ".weight"], tensors[name + ".scale"] = quantize(
+                rng.normal(0, rows ** -0.5, (rows, columns)).astype(np.float32)
+            )
+
+        # Embedding rows are tokens, so its scales are per token
+        weight, scale = quantize(rng.normal(0, 1, (config.dim, config.vocab)).astype(np.float32))
+        tensors["embedding.weight"], tensors["embedding.scale"] = np.ascontiguousarray(weight.T), scale
+        tensors["norm"] = np.ones(config.dim, dtype=np.float32)
+        for i in range(config.layers):
+            prefix = f"layers.{i}."
+            for name in ("wq", "wk", "wv", "wo"):
+                linear(prefix + name, config.dim, config.dim)
+            linear(prefix + "w1", config.dim, config.hidden)
+            linear(prefix + "w3", config.dim, config.hidden)
+            linear(prefix + "w2", config.hidden, config.dim)
+            tensors[prefix + "attention_norm"] = np.ones(config.dim, dtype=np.float32)
+            tensors[prefix + "ffn_norm"] = np.ones(config.dim, dtype=np.float32)
+        return cls(config, tensors)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalModel":
+        with np.load(path) as data:
+            tensors = {name: data[name] for name in data.files}
+        config = ModelConfig(**json.loads(str(tensors.pop("config"))))
+        return cls(config, tensors)
+
+    def save(self, path: str) -> None:
+        tensors = {
+            "config": np.array(json.dumps(asdict(self.config))),
+            "embedding.weight": self.embedding,
+            "embedding.scale": self.embedding_scale,
+            "norm": self.norm,
+        }
+        for i, layer in enumerate(self.layers):
+            for name, value in layer.items():
+                if isinstance(value, QuantizedLinear):
+                    tensors[f"layers.{i}.{name}.weight"] = value.weight
+                    tensors[f"layers.{i}.{name}.scale"] = value.scale
+                else:
+                    tensors[f"layers.{i}.{name}"] = value
+        np.savez(path, **tensors)
+
+    def new_cache(self, capacity: int) -> KVCache:
+        return KVCache(self.config, min(capacity, self.config.max_seq))
+
+    def _rope(self, x: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Rotate (tokens, heads, head_dim) queries or keys by their positions"""
+        cos = self.cos[positions][:, None, :]
+        sin = self.sin[positions][:, None, :]
+        even, odd = x[..., 0::2], x[..., 1::2]
+        rotated = np.empty_like(x)
+        rotated[..., 0::2] = even * cos - odd * sin
+        rotated[..., 1::2] = even * sin + odd * cos
+        return rotated
+
+    def forward(self, caches: Sequence[KVCache], chunks: Sequence[Sequence[int]]) -> np.ndarray:
+        """Append each chunk of tokens to its sequence; returns logits after each chunk's last token.
+
+        Every chunk must fit in its cache.
+        """
+        config = self.config
+        lengths = [len(chunk) for chunk in chunks]
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        tokens = np.fromiter((token for chunk in chunks for token in chunk), dtype=np.int64, count=int(offsets[-1]))
+        positions = np.concatenate([np.arange(cache.length, cache.length + n) for cache, n in zip(caches, lengths)])
+        x = self.embedding[tokens] * self.embedding_scale[tokens, None]
+        count = len(tokens)
+        scale = config.head_dim ** -0.5
+        for index, layer in enumerate(self.layers):
+            h = _rms_norm(x, layer["attention_norm"], config.norm_eps)
+            q = self._rope(layer["wq"](h).reshape(count, config.heads, config.head_dim), positions)
+            k = self._rope(layer["wk"](h).reshape(count, config.heads, config.head_dim), positions)
+            v = layer["wv"](h).reshape(count, config.heads, config.head_dim)
+            attended = np.empty_like(q)
+            for cache, start, end in zip(caches, offsets[:-1], offsets[1:]):
+                past = cache.length
+                total = past + end - start
+                cache.keys[index, past:total] = k[start:end]
+                cache.values[index, past:total] = v[start:end]
+                keys = cache.keys[index, :total]
+                scores = np.einsum("chd,lhd->hcl", q[start:end], keys) * scale
+                if end - start > 1:
+                    # Token j of the chunk sees the past and chunk tokens up to itself
+                    mask = np.arange(total)[None, :] > (past + np.arange(end - start))[:, None]
+                    scores[:, mask] = -np.inf
+                scores = np.exp(scores - scores.max(axis=-1, keepdims=True))
+                scores /= scores.sum(axis=-1, keepdims=True)
+                attended[start:end] = np.einsum("hcl,lhd->chd", scores, cache.values[index, :total])
+            x = x + layer["wo"](attended.reshape(count, config.dim))
+            h = _rms_norm(x, layer["ffn_norm"], config.norm_eps)
+            gate = layer["w1"](h)
+            x = x + layer["w2"](gate / (1.0 + np.exp(-gate)) * layer["w3"](h))
+        for cache, n in zip(caches, lengths):
+            cache.length += n
+        last = _rms_norm(x[offsets[1:] - 1], self.norm, config.norm_eps)
+        return (last @ self.embedding.T) * self.embedding_scale
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["init"])
+    parser.add_argument("--out", default="local-model.npz")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--heads", type=int, default=4)
+    parser.add_argument("--hidden", type=int, help="Feed-forward width (default: about 2.7 x dim)")
+    parser.add_argument("--max-seq", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    hidden = args.hidden or (args.dim * 8 // 3 + 63) // 64 * 64
+    config = ModelConfig(dim=args.dim, layers=args.layers, heads=args.heads, hidden=hidden, max_seq=args.max_seq)
+    LocalModel.random(config, seed=args.seed).save(args.out)
+    print(f"Wrote a random {config} to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
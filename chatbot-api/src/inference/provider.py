@@ -0,0 +1,162 @@
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
+from datetime import datetime
+import asyncio
+import codecs
+import logging
+import threading
+import time
+from .engine import BatchingEngine
+from .model import encode
+from ..chat.models import ChatResponse, Message
+from ..chat.prompt import canonical_message
+from ..chat.provider import DEFAULT_USER, AIProvider, UserProvider
+from ..observability.metrics import allow_model_label, llm_metrics
+from ..observability.tracing import start_span, SPAN_KIND_CLIENT
+
+if TYPE_CHECKING:
+    from ..usage.accounting import UsageRecorder
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def render_prompt(messages: List[Message]) -> str:
+    """Chat template of the local model: role tags around each turn, images as placeholders"""
+    lines = []
+    for message in messages:
+        formatted = canonical_message(message)
+        content = formatted["content"]
+        if not isinstance(content, str):
+            content = "\n".join(part["text"] if part["type"] == "text" else "[image]" for part in content)
+        lines.append(f"<|{formatted['role']}|>\n{content}\n")
+    lines.append("<|assistant|>\n")
+    return "".join(lines)
+
+
+class LocalProvider:
+    """AIProvider that runs a local model on the CPU through a BatchingEngine.
+
+    Requests for ``model_name`` run locally and other models go to
+    ``fallback``; without a fallback, every request runs locally, as in an
+    air-gapped deployment. Concurrent requests share the engine's forward
+    passes, so they do not queue behind one another.
+    """
+
+    def __init__(
+        self,
+        engine: BatchingEngine,
+        model_name: str = "local",
+        fallback: Optional[AIProvider] = None,
+        usage: Optional["UsageRecorder"] = None,
+        temperature: float = 0.7,
+    ):
+        self.engine = engine
+        self.model_name = model_name
+        self.fallback = fallback
+        self.usage = usage
+        self.temperature = temperature
+        allow_model_label(model_name)
+
+    def for_user(self, user: str) -> UserProvider:
+        """This provider, accounting usage to ``user``"""
+        return UserProvider(self, user)
+
+    def _runs_locally(self, messages: List[Message]) -> bool:
+        return self.fallback is None or not messages or messages[-1].model in (None, self.model_name)
+
+    def _account(self, user: str, prompt_tokens: int, completion_tokens: int) -> None:
+        if self.usage is not None:
+            self.usage.record(user, self.model_name, prompt_tokens, completion_tokens)
+
+    def generate_response(self, messages: List[Message], user: str = DEFAULT_USER) -> ChatResponse:
+        """Generate a response for messages"""
+        if not self._runs_locally(messages):
+            return self.fallback.generate_response(messages, user=user)
+        metrics = llm_metrics(self.model_name, "local")
+        with start_span("LocalProvider.generate_response", kind=SPAN_KIND_CLIENT, model=self.model_name):
+            prompt = encode(render_prompt(messages))
+            tokens: List[int] = []
+            done = threading.Event()
+            failure: List[BaseException] = []
+
+            def emit(token, error):
+                if token is not None:
+                    tokens.append(token)
+                    return
+                if error is not None:
+                    failure.append(error)
+                done.set()
+
+            started = time.perf_counter()
+            self.engine.submit(prompt, emit, temperature=self.temperature)
+            done.wait()
+            if failure:
+                metrics.errors.inc()
+                raise failure[0]
+            metrics.complete_duration.observe(time.perf_counter() - started)
+            metrics.tokens_in.inc(len(prompt))
+            metrics.tokens_out.inc(len(tokens))
+            self._account(user, len(prompt), len(tokens))
+        return ChatResponse(
+            content=bytes(tokens).decode("utf-8", errors="replace"),
+            model=self.model_name,
+            timestamp=datetime.utcnow(),
+        )
+
+    async def generate_stream(self, messages: List[Message], user: str = DEFAULT_USER) -> AsyncIterator[str]:
+        """Stream response for messages, a piece of text per sampled token"""
+        if not self._runs_locally(messages):
+            async for chunk in self.fallback.generate_stream(messages, user=user):
+                yield chunk
+            return
+        metrics = llm_metrics(self.model_name, "local")
+        with start_span("LocalProvider.generate_stream", kind=SPAN_KIND_CLIENT, model=self.model_name) as span:
+            loop = asyncio.get_running_loop()
+            queue: asyncio.Queue = asyncio.Queue()
+
+            def emit(token, error):
+                item = token if token is not None else (error or _DONE)
+                try:
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+                except RuntimeError:
+                    pass  # The event loop is gone; nobody is listening
+
+            prompt = encode(render_prompt(messages))
+            # Tokens are bytes; a character may span several of them
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            started = time.perf_counter()
+            first_token = None
+            tokens = 0
+            metrics.in_flight.inc()
+            generation = self.engine.submit(prompt, emit, temperature=self.temperature)
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    tokens += 1
+                    text = decoder.decode(bytes((item,)))
+                    if not text:
+                        continue
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                        metrics.ttft.observe(first_token - started)
+                    yield text
+                tail = decoder.decode(b"", final=True)
+                if tail:
+                    yield tail
+            except Exception as e:
+                metrics.errors.inc()
+                logger.error(f"Error in local stream: {str(e)}")
+                raise
+            finally:
+                # Frees the sequence's batch slot when the consumer goes away early
+                self.engine.cancel(generation)
+                metrics.in_flight.dec()
+                metrics.tokens_in.inc(len(prompt))
+                metrics.observe_stream(started, first_token, time.perf_counter(), tokens)
+                span.set_attribute("tokens", tokens)
+                self._account(user, len(prompt), tokens)
@@ -0,0 +1,148 @@
+"""Request size limits, enforced before a body is validated.
+
+Validating a chat or conversation body builds a model object for every message
+and content part, so an oversized request costs event loop time before any
+handler runs. ``BodySizeLimitMiddleware`` refuses bodies over a byte limit
+before they are read in full, and ``enforce_request_limits`` counts messages,
+content parts and inline image bytes on the decoded JSON before the schemas
+see it. Every limit can be disabled by setting it to 0.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+from fastapi import Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass(frozen=True)
+class RequestLimits:
+    max_request_bytes: int = 64 * 1024 * 1024
+    max_messages: int = 2000
+    max_content_parts: int = 16
+    # OpenAI rejects images over 20 MB
+    max_image_bytes: int = 20 * 1024 * 1024
+
+
+async def get_request_limits() -> RequestLimits:
+    # Overridden in main.py with the configured limits
+    return RequestLimits()
+
+
+def image_bytes(url: str) -> int:
+    """Decoded size of an inline data: URL; remote URLs count as 0"""
+    if not url.startswith("data:"):
+        return 0
+    comma = url.find(",")
+    if comma == -1:
+        return 0
+    payload = len(url) - comma - 1
+    if url[:comma].endswith(";base64"):
+        return payload * 3 // 4
+    return payload
+
+
+def check_messages(messages: Any, limits: RequestLimits) -> Optional[str]:
+    """Why a decoded list of messages exceeds the limits, or None if it does not"""
+    if not isinstance(messages, list):
+        return None
+    if limits.max_messages and len(messages) > limits.max_messages:
+        return f"Too many messages: {len(messages)} (limit {limits.max_messages})"
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, dict):
+            content = [content]
+        if not isinstance(content, list):
+            continue
+        if limits.max_content_parts and len(content) > limits.max_content_parts:
+            return f"Too many content parts: {len(content)} (limit {limits.max_content_parts})"
+        if not limits.max_image_bytes:
+            continue
+        for part in content:
+            image = part.get("image_url") if isinstance(part, dict) else None
+            url = image.get("url") if isinstance(image, dict) else None
+            if isinstance(url, str) and image_bytes(url) > limits.max_image_bytes:
+                return f"Image too large: {image_bytes(url)} bytes (limit {limits.max_image_bytes})"
+    return None
+
+
+async def enforce_request_limits(
+    request: Request, limits: RequestLimits = Depends(get_request_limits)
+) -> None:
+    """Reject oversized message lists with 413 before the body is validated"""
+    try:
+        # FastAPI has already decoded the body; this returns the cached value
+        payload = await request.json()
+    except ValueError:
+        return  # Left for body validation to report
+    if isinstance(payload, dict):
+        reason = check_messages(payload.get("messages"), limits)
+        if reason is not None:
+            raise HTTPException(status_code=413, detail=reason)
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class BodySizeLimitMiddleware:
+    """ASGI middleware answering 413 to request bodies over a byte limit.
+
+    ``max_bytes`` is an int or a callable returning one, so that the limit can
+    come from settings that are only loaded on first use. Routes that stream
+    their body instead of parsing it whole can be listed in ``exempt_paths``.
+    """
+
+    def __init__(self, app, max_bytes, exempt_paths: Tuple[str, ...] = ()):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.max_bytes() if callable(self.max_bytes) else self.max_bytes
+        if scope["type"] != "http" or not max_bytes or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+        for key, value in scope["headers"]:
+            if key == b"content-length":
+                if value.isdigit() and int(value) > max_bytes:
+                    await self._reject(scope, receive, send, max_bytes)
+                    return
+                break
+
+        # Bodies without a Content-Length are counted as they arrive
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                return  # The app's error response is replaced with a 413
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            pass
+        if exceeded and not started:
+            await self._reject(scope, receive, send, max_bytes)
+
+    @staticmethod
+    async def _reject(scope, receive, send, max_bytes: int):
+        response = JSONResponse(
+            {"detail": f"Request body too large (limit {max_bytes} bytes)"},
+            status_code=413,
+            headers={"Connection": "close"},
+        )
+        await response(scope, receive, send)
@@ -1,23 +1,127 @@
+import asyncio
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.requests import HTTPConnection
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from src.chat.routes import router as chat_router, get_chat_service
+from prometheus_client import (
+    REGISTRY,
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+from src.chat.routes import (
+    router as chat_router,
+    get_chat_service,
+    get_rate_limiter,
+    get_replay_buffer,
+    get_shared_state,
+)
+from src.chat.websocket import router as chat_websocket_router, get_max_streams
 from src.chat.service import ChatService
-from src.chat.provider import OpenAIProvider
+from src.chat.provider import AIProvider, OpenAIProvider
+from src.chat.scheduler import Priority, ScheduledProvider, UpstreamScheduler
 from src.conversation.routes import (
     router as conversation_router,
+    get_change_feed,
     get_conversation_service,
+    get_tenant_id,
 )
+from src.conversation.changes import ChangeFeed
 from src.conversation.service import ConversationService
-from src.conversation.repository import SQLiteConversationRepository
+from src.conversation.repository import DEFAULT_TENANT, create_repository
+from src.conversation.sharding import ShardedConversationRepository
+from src.conversation.archive import SegmentStore
+from src.conversation.backup import BackupScheduler
+from src.conversation.cache import CachingConversationRepository
+from src.observability.metrics import CacheStatsCollector
+from src.usage.accounting import ModelPrice, UsageRecorder, UsageStore
+from src.usage.routes import router as usage_router, get_usage_store
+from src.observability.tracing import (
+    TracingMiddleware,
+    configure_tracing,
+    create_tracer_from_env,
+)
+from src.observability.profiling import (
+    CProfileMiddleware,
+    EventLoopMonitor,
+    ProfilingState,
+)
+from src.observability.routes import (
+    router as profiling_router,
+    get_profiling_state,
+)
+from src.shared.rate_limit import RateLimiter
+from src.shared.replay import StreamReplayBuffer
+from src.shared.store import SharedStore, create_store
+from src.config import Settings, load_settings
+from src.compression import CompressionMiddleware
+from src.limits import BodySizeLimitMiddleware, RequestLimits, get_request_limits
+
+if TYPE_CHECKING:
+    from src.inference.engine import BatchingEngine
+    from src.retrieval.service import RetrievalService
 
 # Load environment variables
 load_dotenv()
 
+# Tracing is off unless TRACE_SAMPLE_RATE is set
+configure_tracing(create_tracer_from_env(os.environ))
+
+# Profiling endpoints are only mounted when PROFILING_ENABLED is set
+profiling_state = (
+    ProfilingState(
+        output_dir=os.getenv("PROFILE_DIR", "profiles"),
+        route_pattern=os.getenv("PROFILE_ROUTES") or None,
+    )
+    if os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+    else None
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail at startup, not on the first request, when the configuration is invalid
+    settings = get_settings()
+    if settings.warm_up_clients and settings.openai_api_key:
+        # Import openai and build the default client off the event loop while
+        # the server starts accepting requests
+        asyncio.get_running_loop().run_in_executor(None, lambda: get_openai_provider().client)
+    if settings.local_model_path:
+        # Likewise load the local model
+        asyncio.get_running_loop().run_in_executor(None, get_local_engine)
+    if profiling_state is not None:
+        profiling_state.loop_monitor = EventLoopMonitor(
+            threshold=float(os.getenv("EVENT_LOOP_LAG_THRESHOLD_MS", "100")) / 1000
+        )
+        profiling_state.loop_monitor.start()
+    backups = get_backup_scheduler()
+    if backups is not None:
+        backups.start()
+    usage = get_usage_recorder()
+    if usage is not None:
+        usage.start()
+    yield
+    if settings.local_model_path:
+        await asyncio.to_thread(get_local_engine().stop)
+    if usage is not None:
+        await usage.stop()
+    if backups is not None:
+        await backups.stop()
+    if profiling_state is not None:
+        await profiling_state.loop_monitor.stop()
+
+
 # Create FastAPI app
 app = FastAPI(
-    title="Chat API", version="1.0.0", description="Chat API with OpenAI integration"
+    title="Chat API",
+    version="1.0.0",
+    description="Chat API with OpenAI integration",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -28,48 +132,322 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+app.add_middleware(TracingMiddleware)
+# Settings are loaded on the first request, after the environment is in place
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=lambda: get_settings().max_request_bytes,
+    # Imports stream their body in batches and may be far larger than a chat request
+    exempt_paths=("/api/conversations/import",),
+)
+if profiling_state is not None:
+    app.add_middleware(CProfileMiddleware, state=profiling_state)
 
 # Include routers
 app.include_router(chat_router)
+app.include_router(chat_websocket_router)
 app.include_router(conversation_router)
+app.include_router(usage_router)
+if profiling_state is not None:
+    app.include_router(profiling_router)
+    app.dependency_overrides[get_profiling_state] = lambda: profiling_state
 
 
 # Setup dependencies
-def get_chat_service_override() -> ChatService:
-    api_key = os.getenv("OPENAI_API_KEY")
-    api_base = os.getenv("OPENAI_API_BASE")
-    groq_api_key = os.getenv("GROQ_API_KEY")
-    groq_api_base = os.getenv("GROQ_API_BASE")
-    github_api_key = os.getenv("GITHUB_API_KEY")
-    github_api_base = os.getenv("GITHUB_API_BASE")
-    if not api_key:
-        raise ValueError(
-            "OPENAI_API_KEY environment variable is not set. Please check your .env file."
-        )
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Read and validate the configuration once per process"""
+    return load_settings(os.environ)
+
+
+@lru_cache(maxsize=1)
+def get_usage_store_override() -> Optional[UsageStore]:
+    usage_db = get_settings().usage_db
+    if not usage_db:
+        return None
+    return UsageStore(usage_db)
+
+
+@lru_cache(maxsize=1)
+def get_usage_recorder() -> Optional[UsageRecorder]:
+    """Token accounting for this process, flushed to USAGE_DB in batches"""
+    store = get_usage_store_override()
+    if store is None:
+        return None
+    settings = get_settings()
+    return UsageRecorder(
+        store,
+        flush_interval=settings.usage_flush_seconds,
+        prices={model: ModelPrice(*price) for model, price in settings.usage_prices},
+    )
+
+
+@lru_cache(maxsize=1)
+def get_openai_provider() -> OpenAIProvider:
+    """One provider per process; its backend clients are created on first use"""
+    settings = get_settings()
+    return OpenAIProvider(
+        api_key=settings.openai_api_key,
+        api_base=settings.openai_api_base,
+        groq_api_key=settings.groq_api_key,
+        groq_api_base=settings.groq_api_base,
+        github_api_key=settings.github_api_key,
+        github_api_base=settings.github_api_base,
+        prompt_cache_hints=settings.prompt_cache_hints,
+        usage=get_usage_recorder(),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_local_engine() -> "BatchingEngine":
+    """Load the local model once per process"""
+    # Deferred: the local model runs on numpy
+    from src.inference.engine import BatchingEngine
+    from src.inference.model import LocalModel
+
+    settings = get_settings()
+    return BatchingEngine(
+        LocalModel.load(settings.local_model_path),
+        max_batch=settings.local_max_batch,
+        token_budget=max(256, settings.local_max_batch * 2),
+        max_new_tokens=settings.local_max_new_tokens,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_ai_provider():
+    """The local model when LOCAL_MODEL_PATH is set, in front of the upstream models if any"""
+    settings = get_settings()
+    if not settings.local_model_path:
+        return get_openai_provider()
+    from src.inference.provider import LocalProvider
+
+    return LocalProvider(
+        get_local_engine(),
+        model_name=settings.local_model_name,
+        fallback=get_openai_provider() if settings.openai_api_key else None,
+        usage=get_usage_recorder(),
+        temperature=settings.local_temperature,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_retrieval_service() -> Optional["RetrievalService"]:
+    """Load the retrieval index once per process, if one is configured"""
+    settings = get_settings()
+    if not settings.rag_index_dir:
+        return None
+    # Deferred: the retrieval stack pulls in numpy
+    from src.retrieval.index import open_index
+    from src.retrieval.ingest import create_embedder
+    from src.retrieval.service import RetrievalService
+
+    index = open_index(settings.rag_index_dir, nprobe=settings.rag_nprobe)
+    if index is None:
+        return None
+    return RetrievalService(
+        embedder=create_embedder(settings.rag_embedder),
+        index=index,
+        top_k=settings.rag_top_k,
+        max_context_tokens=settings.rag_max_context_tokens,
+    )
+
 
-    ai_provider = OpenAIProvider(api_key=api_key, api_base=api_base, groq_api_key=groq_api_key, groq_api_base=groq_api_base, github_api_key=github_api_key, github_api_base=github_api_base)
-    return ChatService(ai_provider=ai_provider)
+@lru_cache(maxsize=1)
+def get_upstream_scheduler() -> Optional[UpstreamScheduler]:
+    """Upstream slots shared by this process's requests, if UPSTREAM_MAX_CONCURRENCY is set"""
+    settings = get_settings()
+    if settings.upstream_max_concurrency <= 0:
+        return None
+    return UpstreamScheduler(
+        max_concurrency=settings.upstream_max_concurrency,
+        reserved_interactive=settings.upstream_reserved_interactive,
+        deadlines={
+            Priority.INTERACTIVE: settings.upstream_deadline_interactive,
+            Priority.BACKGROUND: settings.upstream_deadline_background,
+            Priority.BATCH: settings.upstream_deadline_batch,
+        },
+    )
 
 
-def get_conversation_service_override() -> ConversationService:
-    api_key = os.getenv("OPENAI_API_KEY")
-    api_base = os.getenv("OPENAI_API_BASE")
+def get_upstream_user(connection: HTTPConnection) -> str:
+    """Who a request's upstream calls are scheduled and accounted for: its tenant, or else its client address"""
+    header = get_settings().tenant_header
+    user = connection.headers.get(header) if header else None
+    return user or (connection.client.host if connection.client else "unknown")
 
-    if not api_key:
-        raise ValueError(
-            "OPENAI_API_KEY environment variable is not set. Please check your .env file."
+
+def scheduled_provider(priority: Priority, user: str) -> AIProvider:
+    provider = get_ai_provider().for_user(user)
+    scheduler = get_upstream_scheduler()
+    if scheduler is None:
+        return provider
+    return ScheduledProvider(provider, scheduler, priority=priority, user=user)
+
+
+def get_chat_service_override(user: str = Depends(get_upstream_user)) -> ChatService:
+    return ChatService(
+        ai_provider=scheduled_provider(Priority.INTERACTIVE, user),
+        retrieval_service=get_retrieval_service(),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_shared_store() -> SharedStore:
+    """State shared between worker processes; in-process unless SHARED_STATE_URL is set"""
+    return create_store(get_settings().shared_state_url)
+
+
+@lru_cache(maxsize=1)
+def get_rate_limiter_override() -> Optional[RateLimiter]:
+    limit = get_settings().chat_rate_limit_per_minute
+    if limit <= 0:
+        return None
+    return RateLimiter(store=get_shared_store(), limit=limit, window=60)
+
+
+@lru_cache(maxsize=1)
+def get_replay_buffer_override() -> Optional[StreamReplayBuffer]:
+    ttl = get_settings().stream_replay_ttl
+    if ttl <= 0:
+        return None
+    return StreamReplayBuffer(store=get_shared_store(), ttl=ttl)
+
+
+@lru_cache(maxsize=1)
+def get_conversation_store():
+    """Create the storage backend once per process; sharded when CONVERSATION_SHARDS > 1"""
+    settings = get_settings()
+    return create_repository(
+        settings.conversation_store_url,
+        archive=SegmentStore(settings.archive_dir) if settings.archive_dir else None,
+        shards=settings.conversation_shards,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_conversation_repository():
+    """The conversation store behind this process's cache"""
+    settings = get_settings()
+    repository = get_conversation_store()
+    cache_bytes = settings.conversation_cache_bytes
+    if cache_bytes > 0:
+        return CachingConversationRepository(
+            repository, max_bytes=cache_bytes, store=get_shared_store()
         )
+    return repository
+
+
+@lru_cache(maxsize=1)
+def get_backup_scheduler() -> Optional[BackupScheduler]:
+    settings = get_settings()
+    if not settings.backup_dir:
+        return None
+    return BackupScheduler(
+        db_path=settings.conversation_store_url[len("sqlite:///"):],
+        backup_dir=settings.backup_dir,
+        interval=settings.backup_interval_hours * 3600,
+        keep=settings.backup_keep,
+        archive_dir=settings.archive_dir,
+        max_bytes_per_second=int(settings.backup_max_mb_per_second * 1024 * 1024),
+    )
+
+
+def get_tenant_id_override(request: Request) -> Optional[str]:
+    """The tenant named in TENANT_HEADER, which an authenticating proxy in front of the API sets"""
+    header = get_settings().tenant_header
+    if header is None:
+        return None
+    tenant_id = request.headers.get(header)
+    if not tenant_id:
+        raise HTTPException(status_code=401, detail=f"Missing {header} header")
+    if len(tenant_id) > 256:
+        raise HTTPException(status_code=400, detail=f"{header} is too long")
+    return tenant_id
+
+
+def get_conversation_service_override(
+    tenant_id: Optional[str] = Depends(get_tenant_id),
+    user: str = Depends(get_upstream_user),
+) -> ConversationService:
+    # Title generation yields upstream capacity to interactive chats
+    return ConversationService(
+        repository=get_conversation_repository(),
+        ai_provider=scheduled_provider(Priority.BACKGROUND, user),
+        tenant_id=tenant_id,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_request_limits_override() -> RequestLimits:
+    settings = get_settings()
+    return RequestLimits(
+        max_request_bytes=settings.max_request_bytes,
+        max_messages=settings.max_request_messages,
+        max_content_parts=settings.max_content_parts,
+        max_image_bytes=settings.max_image_bytes,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_shard_change_feed(shard: int) -> ChangeFeed:
+    """One change feed per shard per process, shared by all long-poll and SSE clients"""
+    store = get_conversation_store()
+    if isinstance(store, ShardedConversationRepository):
+        store = store.shards[shard]
+    return ChangeFeed(store)
+
+
+def get_change_feed_override(tenant_id: Optional[str] = Depends(get_tenant_id)) -> ChangeFeed:
+    # Change sequences are per database, so tenants wait on their own shard's
+    store = get_conversation_store()
+    if isinstance(store, ShardedConversationRepository):
+        return get_shard_change_feed(store.shard_index(tenant_id or DEFAULT_TENANT))
+    return get_shard_change_feed(0)
+
+
+def get_conversation_cache_stats() -> dict:
+    repository = get_conversation_repository()
+    if isinstance(repository, CachingConversationRepository):
+        return repository.stats()
+    return {}
+
+
+@app.get("/api/cache/stats", tags=["conversations"])
+async def conversation_cache_stats() -> dict:
+    """Hit ratio and memory use of the conversation cache"""
+    return get_conversation_cache_stats()
+
+
+# The collector's describe() keeps registration from building the repository at import
+REGISTRY.register(CacheStatsCollector(get_conversation_cache_stats))
+
 
-    ai_provider = OpenAIProvider(api_key=api_key, api_base=api_base)
-    repository = SQLiteConversationRepository()
-    return ConversationService(repository=repository, ai_provider=ai_provider)
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Prometheus metrics, aggregated over all workers in multi-worker mode"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
 
 
 # Override the dependencies
 app.dependency_overrides[get_chat_service] = get_chat_service_override
 app.dependency_overrides[get_conversation_service] = get_conversation_service_override
+app.dependency_overrides[get_rate_limiter] = get_rate_limiter_override
+app.dependency_overrides[get_change_feed] = get_change_feed_override
+app.dependency_overrides[get_tenant_id] = get_tenant_id_override
+app.dependency_overrides[get_replay_buffer] = get_replay_buffer_override
+app.dependency_overrides[get_shared_state] = get_shared_store
+app.dependency_overrides[get_usage_store] = get_usage_store_override
+app.dependency_overrides[get_request_limits] = get_request_limits_override
+app.dependency_overrides[get_max_streams] = lambda: get_settings().ws_max_streams
 
 if __name__ == "__main__":
     import uvicorn
 
+    # Development server; use ``python -m src.serve`` to run several workers
     uvicorn.run("src.main:app", host="0.0.0.0", port=5001, reload=True)
@@ -0,0 +1,53 @@
+"""Minimal OTLP/HTTP trace collector for local development.
+
+Accepts OTLP/JSON batches on ``POST /v1/traces`` and appends them to a JSONL
+file, so TRACE_OTLP_ENDPOINT can point at it instead of a real collector.
+
+Usage:
+    python -m src.observability.collector --port 4318 --output traces.jsonl
+"""
+
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(output: str):
+    class CollectorHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/v1/traces":
+                self.send_error(404)
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                payload = json.loads(body)
+            except json.JSONDecodeError:
+                self.send_error(400, "Invalid JSON")
+                return
+            with open(output, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload) + "\n")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    return CollectorHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default="traces.jsonl")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.output))
+    print(f"Collecting traces on http://{args.host}:{args.port}/v1/traces -> {args.output}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
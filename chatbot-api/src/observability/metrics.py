@@ -0,0 +1,244 @@
+"""Prometheus metrics for the LLM providers, their scheduler and the conversation repository.
+
+Label sets are bound once per (model, backend) or per repository operation and
+reused, so the hot path only updates pre-resolved metric children.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+from typing import Callable
+import time
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 8, 13, 20, 30, 60)
+INTER_TOKEN_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.2, 0.5)
+TOKEN_RATE_BUCKETS = (1, 5, 10, 20, 35, 50, 75, 100, 150, 250, 500)
+REPOSITORY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+QUEUE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from request to the first streamed token",
+    ["model", "backend"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "Total duration of an upstream LLM call",
+    ["model", "backend", "mode"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_INTER_TOKEN_LATENCY = Histogram(
+    "llm_inter_token_latency_seconds",
+    "Mean gap between streamed tokens, observed once per stream",
+    ["model", "backend"],
+    buckets=INTER_TOKEN_BUCKETS,
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_tokens_per_second",
+    "Output token rate after the first token, observed once per stream",
+    ["model", "backend"],
+    buckets=TOKEN_RATE_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens",
+    "Tokens sent to and received from the model",
+    ["model", "backend", "direction"],
+)
+LLM_ERRORS = Counter(
+    "llm_errors",
+    "Failed upstream LLM calls",
+    ["model", "backend"],
+)
+LLM_STREAMS_IN_FLIGHT = Gauge(
+    "llm_streams_in_flight",
+    "Streams currently being generated",
+    ["model", "backend"],
+)
+LLM_QUEUE_WAIT = Histogram(
+    "llm_scheduler_queue_wait_seconds",
+    "Time upstream calls waited for a slot",
+    ["priority"],
+    buckets=QUEUE_WAIT_BUCKETS,
+)
+LLM_QUEUE_DROPPED = Counter(
+    "llm_scheduler_dropped",
+    "Upstream calls dropped after waiting past their deadline",
+    ["priority"],
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "llm_scheduler_queued",
+    "Upstream calls waiting for a slot",
+    ["priority"],
+)
+LLM_SLOTS_IN_USE = Gauge(
+    "llm_scheduler_slots_in_use",
+    "Upstream slots held",
+    ["priority"],
+)
+REPOSITORY_OPERATION_DURATION = Histogram(
+    "repository_operation_duration_seconds",
+    "Duration of conversation repository operations",
+    ["backend", "operation"],
+    buckets=REPOSITORY_BUCKETS,
+)
+REPOSITORY_PAYLOAD_BYTES = Histogram(
+    "repository_payload_bytes",
+    "Size of stored conversation payloads read or written",
+    ["backend", "operation"],
+    buckets=PAYLOAD_BUCKETS,
+)
+
+
+@dataclass(slots=True)
+class LLMMetrics:
+    """Metric children bound to one (model, backend) pair"""
+
+    ttft: Histogram
+    stream_duration: Histogram
+    complete_duration: Histogram
+    inter_token: Histogram
+    tokens_per_second: Histogram
+    tokens_in: Counter
+    tokens_out: Counter
+    tokens_cached: Counter
+    errors: Counter
+    in_flight: Gauge
+
+    def observe_stream(self, started: float, first_token: float | None, ended: float, tokens: int) -> None:
+        """Record a finished stream; called once per stream, not per chunk"""
+        self.stream_duration.observe(ended - started)
+        if first_token is None:
+            return
+        self.tokens_out.inc(tokens)
+        generation = ended - first_token
+        if tokens > 1 and generation > 0:
+            self.inter_token.observe(generation / (tokens - 1))
+            self.tokens_per_second.observe((tokens - 1) / generation)
+
+
+# Models are chosen by clients; others share one label so label sets stay bounded
+KNOWN_MODELS = frozenset(
+    {
+        "claude-3-5-sonnet",
+        "DeepSeek-R1-mga",
+        "deepseek-r1-distill-llama-70b",
+        "Deepseek-r1",
+        "o3-mini",
+        "o1-preview",
+        "gemini-2.0-flash-001",
+        "gemini-1.5-pro-002",
+        "gpt-4o",
+        "gpt-4o-mini",
+    }
+)
+OTHER_MODEL = "other"
+_model_labels = set(KNOWN_MODELS)
+
+
+def allow_model_label(model: str) -> None:
+    """Give a configured model its own label instead of ``other``"""
+    _model_labels.add(model)
+
+
+def llm_metrics(model: str | None, backend: str) -> LLMMetrics:
+    """Bind the LLM metric label set for a model and backend"""
+    return _llm_metrics(model if model in _model_labels else OTHER_MODEL, backend)
+
+
+@lru_cache(maxsize=256)
+def _llm_metrics(model: str, backend: str) -> LLMMetrics:
+    return LLMMetrics(
+        ttft=LLM_TIME_TO_FIRST_TOKEN.labels(model, backend),
+        stream_duration=LLM_REQUEST_DURATION.labels(model, backend, "stream"),
+        complete_duration=LLM_REQUEST_DURATION.labels(model, backend, "complete"),
+        inter_token=LLM_INTER_TOKEN_LATENCY.labels(model, backend),
+        tokens_per_second=LLM_TOKENS_PER_SECOND.labels(model, backend),
+        tokens_in=LLM_TOKENS.labels(model, backend, "in"),
+        tokens_out=LLM_TOKENS.labels(model, backend, "out"),
+        tokens_cached=LLM_TOKENS.labels(model, backend, "cached"),
+        errors=LLM_ERRORS.labels(model, backend),
+        in_flight=LLM_STREAMS_IN_FLIGHT.labels(model, backend),
+    )
+
+
+@dataclass(slots=True)
+class SchedulerMetrics:
+    """Metric children bound to one scheduler priority class"""
+
+    queue_wait: Histogram
+    dropped: Counter
+    queued: Gauge
+    in_use: Gauge
+
+
+@lru_cache(maxsize=8)
+def scheduler_metrics(priority: str) -> SchedulerMetrics:
+    """Bind the upstream scheduler metric label set for a priority class"""
+    return SchedulerMetrics(
+        queue_wait=LLM_QUEUE_WAIT.labels(priority),
+        dropped=LLM_QUEUE_DROPPED.labels(priority),
+        queued=LLM_QUEUE_DEPTH.labels(priority),
+        in_use=LLM_SLOTS_IN_USE.labels(priority),
+    )
+
+
+def timed_operation(backend: str, operation: str) -> Callable:
+    """Decorate a repository method to record its duration"""
+    duration = REPOSITORY_OPERATION_DURATION.labels(backend, operation)
+
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                duration.observe(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+@lru_cache(maxsize=64)
+def payload_size(backend: str, operation: str) -> Histogram:
+    """Bind the payload size histogram for a repository operation"""
+    return REPOSITORY_PAYLOAD_BYTES.labels(backend, operation)
+
+
+class CacheStatsCollector:
+    """Export CachingConversationRepository.stats() at scrape time"""
+
+    COUNTERS = ("hits", "misses", "evictions")
+    GAUGES = (
+        ("hit_ratio", "Conversation cache hit ratio"),
+        ("entries", "Conversations held in the cache"),
+        ("bytes", "Bytes held in the conversation cache"),
+        ("max_bytes", "Conversation cache capacity in bytes"),
+    )
+
+    def __init__(self, get_stats: Callable[[], dict]):
+        self.get_stats = get_stats
+
+    def describe(self):
+        # Without describe(), registering calls collect(), which builds the repository
+        for name in self.COUNTERS:
+            yield CounterMetricFamily(f"conversation_cache_{name}", f"Conversation cache {name}")
+        for name, help_text in self.GAUGES:
+            yield GaugeMetricFamily(f"conversation_cache_{name}", help_text)
+
+    def collect(self):
+        stats = self.get_stats()
+        if not stats:
+            return
+        for name in self.COUNTERS:
+            counter = CounterMetricFamily(
+                f"conversation_cache_{name}", f"Conversation cache {name}"
+            )
+            counter.add_metric([], stats[name])
+            yield counter
+        for name, help_text in self.GAUGES:
+            yield GaugeMetricFamily(f"conversation_cache_{name}", help_text, value=stats[name])
@@ -0,0 +1,210 @@
+"""On-demand profiling for a running server.
+
+- ``StackSampler`` samples every thread's stack and writes folded stacks
+  (``frame;frame;frame count``), the input format of flamegraph.pl, speedscope
+  and inferno.
+- ``CProfileMiddleware`` records a cProfile dump per request for selected routes.
+- ``take_tracemalloc_snapshot`` dumps allocation snapshots.
+- ``EventLoopMonitor`` measures event-loop lag and logs the stack of whatever
+  blocked the loop for longer than a threshold.
+"""
+
+from collections import Counter
+from typing import Dict, List, Optional
+import asyncio
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import traceback
+from prometheus_client import Histogram
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between when the loop monitor should wake up and when it does",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+def _timestamp() -> str:
+    return time.strftime("%Y%m%d-%H%M%S")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Statistical profiler sampling all threads at a fixed interval"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._running = threading.Lock()
+
+    def sample(self, seconds: float, interval: Optional[float] = None) -> Counter:
+        """Sample for a number of seconds and return folded stack counts"""
+        interval = interval or self.interval
+        if not self._running.acquire(blocking=False):
+            raise RuntimeError("A sampling profile is already running")
+        try:
+            own_thread = threading.get_ident()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks: Counter = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame))
+                        frame = frame.f_back
+                    labels.append(names.get(thread_id, str(thread_id)))
+                    stacks[";".join(reversed(labels))] += 1
+                time.sleep(interval)
+            return stacks
+        finally:
+            self._running.release()
+
+    @staticmethod
+    def folded(stacks: Counter) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class ProfilingState:
+    """Process-wide profiling settings, changeable at runtime via the admin API"""
+
+    def __init__(self, output_dir: str, route_pattern: Optional[str] = None):
+        self.output_dir = output_dir
+        self.sampler = StackSampler()
+        self.loop_monitor: Optional["EventLoopMonitor"] = None
+        self.set_route_pattern(route_pattern)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def set_route_pattern(self, pattern: Optional[str]) -> None:
+        self.route_pattern = re.compile(pattern) if pattern else None
+
+
+class CProfileMiddleware:
+    """ASGI middleware dumping a cProfile file per request on matching paths.
+
+    cProfile is process-wide, so only one request is profiled at a time and
+    work done by concurrent requests in the same interval is included.
+    """
+
+    def __init__(self, app, state: ProfilingState):
+        self.app = app
+        self.state = state
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        pattern = self.state.route_pattern
+        if (
+            scope["type"] != "http"
+            or pattern is None
+            or not pattern.search(scope["path"])
+            or not self._busy.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                profiler.disable()
+            route = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+            path = os.path.join(
+                self.state.output_dir,
+                f"{scope['method']}_{route}_{_timestamp()}_{time.perf_counter_ns()}.prof",
+            )
+            profiler.dump_stats(path)
+        finally:
+            self._busy.release()
+
+
+def take_tracemalloc_snapshot(output_dir: str, limit: int = 25) -> Dict[str, object]:
+    """Dump a tracemalloc snapshot and summarize the top allocation sites"""
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running")
+    snapshot = tracemalloc.take_snapshot()
+    path = os.path.join(output_dir, f"tracemalloc_{_timestamp()}_{time.perf_counter_ns()}.snapshot")
+    snapshot.dump(path)
+    current, peak = tracemalloc.get_traced_memory()
+    top = snapshot.statistics("lineno")[:limit]
+    return {
+        "path": path,
+        "current_bytes": current,
+        "peak_bytes": peak,
+        "top": [{"location": str(stat.traceback), "size": stat.size, "count": stat.count} for stat in top],
+    }
+
+
+class EventLoopMonitor:
+    """Detect callbacks that block the event loop.
+
+    A coroutine records a heartbeat every ``interval``; the lateness of each
+    wake-up is the loop lag. A watchdog thread checks the heartbeat and, when it
+    is older than ``threshold``, logs the loop thread's current stack, which is
+    the code that is blocking it.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocked_stacks: List[str] = []
+        self._heartbeat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            EVENT_LOOP_LAG.observe(lag)
+            if lag > self.threshold:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+            self._heartbeat = now
+
+    def _watch(self) -> None:
+        reported = None
+        while not self._stop.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat <= self.threshold + self.interval or reported == heartbeat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            reported = heartbeat
+            stack = "".join(traceback.format_stack(frame))
+            self.blocked_stacks = (self.blocked_stacks + [stack])[-20:]
+            logger.warning(f"Event loop blocked for more than {self.threshold * 1000:.0f} ms in:\n{stack}")
@@ -0,0 +1,113 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse
+from typing import List, Optional
+import hmac
+import os
+import time
+import tracemalloc
+from .profiling import ProfilingState, StackSampler, take_tracemalloc_snapshot
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/profile", tags=["profiling"])
+
+
+async def get_profiling_state() -> ProfilingState:
+    # This will be overridden in main.py
+    raise NotImplementedError("Profiling not configured")
+
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    # Fails closed: without PROFILING_TOKEN the routes are mounted but refuse everyone
+    expected = os.getenv("PROFILING_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="PROFILING_TOKEN is not configured")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.post("/sample", response_class=PlainTextResponse, dependencies=[Depends(require_admin_token)])
+async def sample_profile(
+    seconds: float = Query(10.0, gt=0, le=300),
+    interval: float = Query(0.005, gt=0, le=1),
+    state: ProfilingState = Depends(get_profiling_state),
+) -> PlainTextResponse:
+    """Sample all threads for N seconds and return folded stacks for a flamegraph"""
+    logger.info(f"Sampling profile for {seconds}s")
+    try:
+        stacks = await run_in_threadpool(state.sampler.sample, seconds, interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    folded = StackSampler.folded(stacks)
+    path = os.path.join(state.output_dir, f"sample_{time.strftime('%Y%m%d-%H%M%S')}.folded")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(folded)
+    return PlainTextResponse(folded, headers={"X-Profile-Path": path})
+
+
+@router.put("/cprofile", dependencies=[Depends(require_admin_token)])
+async def enable_route_profiling(
+    pattern: str = Query(..., description="Regular expression matched against request paths"),
+    state: ProfilingState = Depends(get_profiling_state),
+) -> dict:
+    """Dump a cProfile file for every request whose path matches"""
+    state.set_route_pattern(pattern)
+    return {"pattern": pattern}
+
+
+@router.delete("/cprofile", dependencies=[Depends(require_admin_token)])
+async def disable_route_profiling(state: ProfilingState = Depends(get_profiling_state)) -> dict:
+    state.set_route_pattern(None)
+    return {"pattern": None}
+
+
+@router.post("/tracemalloc/start", dependencies=[Depends(require_admin_token)])
+async def start_tracemalloc(frames: int = Query(10, ge=1, le=100)) -> dict:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return {"tracing": True}
+
+
+@router.post("/tracemalloc/snapshot", dependencies=[Depends(require_admin_token)])
+async def tracemalloc_snapshot(
+    limit: int = Query(25, ge=1, le=500),
+    state: ProfilingState = Depends(get_profiling_state),
+) -> dict:
+    try:
+        return await run_in_threadpool(take_tracemalloc_snapshot, state.output_dir, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/tracemalloc/stop", dependencies=[Depends(require_admin_token)])
+async def stop_tracemalloc() -> dict:
+    tracemalloc.stop()
+    return {"tracing": False}
+
+
+@router.get("/event-loop", dependencies=[Depends(require_admin_token)])
+async def event_loop_report(state: ProfilingState = Depends(get_profiling_state)) -> dict:
+    """Recent stacks that blocked the event loop"""
+    monitor = state.loop_monitor
+    if monitor is None:
+        return {"enabled": False, "blocked_stacks": []}
+    return {
+        "enabled": True,
+        "threshold_ms": monitor.threshold * 1000,
+        "blocked_stacks": monitor.blocked_stacks,
+    }
+
+
+@router.get("/files", dependencies=[Depends(require_admin_token)])
+async def list_profiles(state: ProfilingState = Depends(get_profiling_state)) -> List[str]:
+    return sorted(os.listdir(state.output_dir))
+
+
+@router.get("/files/{name}", dependencies=[Depends(require_admin_token)])
+async def download_profile(name: str, state: ProfilingState = Depends(get_profiling_state)):
+    path = os.path.join(state.output_dir, os.path.basename(name))
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path)
@@ -0,0 +1,414 @@
+"""Lightweight tracing with OpenTelemetry-compatible output.
+
+Spans are propagated through ``contextvars`` and sampled at the root, so an
+unsampled request costs one context lookup per instrumented call. Finished
+spans are handed to a background thread that writes them as OTLP/JSON, either
+to a local JSONL file or to an OTLP/HTTP collector.
+"""
+
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+import inspect
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = (
+        "tracer", "name", "trace_id", "span_id", "parent_id", "kind",
+        "attributes", "events", "start_ns", "end_ns", "error", "_token", "_parent",
+    )
+
+    def __init__(self, tracer, name, trace_id, parent_id, kind, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.events: List[tuple] = []
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self._token = None
+        self._parent = None
+
+    @property
+    def sampled(self) -> bool:
+        return True
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append((name, time.time_ns(), attributes))
+
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context header value for downstream calls"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def __enter__(self):
+        self._parent = _current_span.get()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited from another context, e.g. an async generator finished by a different task
+            _current_span.set(self._parent)
+        self.tracer.exporter.export(self)
+        return False
+
+
+class NoopSpan:
+    """Stand-in for spans that are not recorded"""
+
+    __slots__ = ()
+    sampled = False
+    traceparent = None
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class UnsampledSpan(NoopSpan):
+    """Root of an unsampled trace; turns every span beneath it into a no-op"""
+
+    __slots__ = ("_token",)
+
+    def __enter__(self):
+        self._token = _current_span.set(NOOP_SPAN)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            _current_span.set(None)
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+def span_to_otlp(span: Span) -> dict:
+    """Encode a span in the OTLP/JSON shape"""
+    data = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_attribute(k, v) for k, v in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    if span.events:
+        data["events"] = [
+            {
+                "name": name,
+                "timeUnixNano": str(ts),
+                "attributes": [_attribute(k, v) for k, v in attrs.items()],
+            }
+            for name, ts, attrs in span.events
+        ]
+    return data
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class SpanExporter(ABC):
+    """Batch finished spans and write them from a background thread.
+
+    At most ``max_queue`` spans wait to be written; while the destination is
+    slow or down, further spans are dropped and counted in ``dropped``.
+    """
+
+    def __init__(
+        self,
+        service_name: str = "chatbot-api",
+        batch_size: int = 256,
+        interval: float = 1.0,
+        max_queue: int = 4096,
+    ):
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            if not self.dropped:
+                logger.warning("Span export queue is full; dropping spans")
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self.flush(block=True)
+
+    def flush(self, block: bool = False) -> None:
+        """Write out the queued spans"""
+        batch = []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            try:
+                timeout = max(0.0, deadline - time.monotonic()) if block else None
+                batch.append(self._queue.get(block=block, timeout=timeout))
+            except queue.Empty:
+                break
+        if batch:
+            try:
+                self.write(self._payload(batch))
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.warning(f"Dropping {len(batch)} spans: {str(e)}")
+
+    def _payload(self, spans: List[Span]) -> dict:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_attribute("service.name", self.service_name)]},
+                    "scopeSpans": [
+                        {"scope": {"name": "chatbot-api"}, "spans": [span_to_otlp(s) for s in spans]}
+                    ],
+                }
+            ]
+        }
+
+    @abstractmethod
+    def write(self, payload: dict) -> None:
+        """Write one OTLP/JSON batch"""
+
+
+class FileSpanExporter(SpanExporter):
+    """Append OTLP/JSON batches to a JSONL file"""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def write(self, payload: dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload) + "\n")
+
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """POST OTLP/JSON batches to a collector's /v1/traces endpoint"""
+
+    def __init__(self, endpoint: str, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint.rstrip("/") + "/v1/traces"
+
+    def write(self, payload: dict) -> None:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=5):
+            pass
+
+
+class Tracer:
+    """Create spans, sampling whole traces at the root.
+
+    A request with a ``traceparent`` continues that trace. Its sampled flag is
+    only followed when ``trust_remote_sampling`` is set, e.g. behind a gateway
+    that sets it; otherwise any client could have every request traced, and
+    sampled remote traces are kept at ``sample_rate`` like local ones.
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[SpanExporter] = None,
+        sample_rate: float = 0.0,
+        trust_remote_sampling: bool = False,
+    ):
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+        self.trust_remote_sampling = trust_remote_sampling
+
+    def start_span(
+        self,
+        name: str,
+        kind: int = SPAN_KIND_INTERNAL,
+        traceparent: Optional[str] = None,
+        **attributes,
+    ):
+        parent = _current_span.get()
+        if parent is NOOP_SPAN or self.exporter is None:
+            return NOOP_SPAN
+        if parent is not None:
+            return Span(self, name, parent.trace_id, parent.span_id, kind, attributes)
+
+        remote = parse_traceparent(traceparent) if traceparent else None
+        if remote is not None:
+            trace_id, parent_id, sampled = remote
+            if not sampled or (not self.trust_remote_sampling and random.random() >= self.sample_rate):
+                return UnsampledSpan()
+            return Span(self, name, trace_id, parent_id, kind, attributes)
+        if random.random() >= self.sample_rate:
+            return UnsampledSpan()
+        return Span(self, name, f"{random.getrandbits(128):032x}", None, kind, attributes)
+
+
+def parse_traceparent(header: str) -> Optional[tuple]:
+    """Parse a W3C traceparent header into (trace_id, parent_id, sampled)"""
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+_tracer = Tracer()
+
+
+def configure_tracing(tracer: Tracer) -> None:
+    """Install the process-wide tracer"""
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def start_span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+    """Start a span under the current one using the process-wide tracer"""
+    return _tracer.start_span(name, kind=kind, **attributes)
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def traced(name: str) -> Callable:
+    """Decorate a function or coroutine function to run inside a span"""
+
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _tracer.start_span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _tracer.start_span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        span = _tracer.start_span(
+            f"{scope['method']} {scope['path']}",
+            kind=SPAN_KIND_SERVER,
+            traceparent=traceparent,
+        )
+        with span:
+            if not span.sampled:
+                await self.app(scope, receive, send)
+                return
+            span.set_attribute("http.method", scope["method"])
+            span.set_attribute("http.target", scope["path"])
+
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+
+def create_tracer_from_env(env: Dict[str, str]) -> Tracer:
+    """Build a tracer from TRACE_* settings"""
+    sample_rate = float(env.get("TRACE_SAMPLE_RATE", "0") or 0)
+    if sample_rate <= 0:
+        return Tracer()
+    endpoint = env.get("TRACE_OTLP_ENDPOINT")
+    if endpoint:
+        exporter = OTLPHttpSpanExporter(endpoint)
+    else:
+        exporter = FileSpanExporter(env.get("TRACE_FILE", "traces.jsonl"))
+    trust_remote_sampling = env.get("TRACE_TRUST_PARENT", "").lower() in ("1", "true", "yes")
+    return Tracer(exporter=exporter, sample_rate=sample_rate, trust_remote_sampling=trust_remote_sampling)
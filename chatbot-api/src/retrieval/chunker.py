@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+from typing import Iterator, TextIO
+from .models import Chunk
+
+
+@dataclass
+class TextChunker:
+    """Split text into overlapping chunks without reading it all into memory"""
+
+    chunk_size: int = 1000
+    overlap: int = 200
+    read_size: int = 64 * 1024
+
+    def __post_init__(self):
+        if self.chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if not 0 <= self.overlap < self.chunk_size:
+            raise ValueError("overlap must be between 0 and chunk_size")
+
+    def _cut(self, buffer: str, start: int) -> int:
+        """Find where to end the next chunk, preferring a whitespace boundary"""
+        end = start + self.chunk_size
+        lowest = start + self.overlap + 1
+        boundary = max(buffer.rfind(" ", lowest, end), buffer.rfind("\n", lowest, end))
+        return boundary if boundary > 0 else end
+
+    def _overlap_start(self, buffer: str, end: int) -> int:
+        """Start the next chunk about ``overlap`` before ``end``, at the start of a word"""
+        start = end - self.overlap
+        if start == end or buffer[start - 1].isspace():
+            return start
+        boundaries = [i for i in (buffer.find(" ", start, end), buffer.find("\n", start, end)) if i >= 0]
+        return min(boundaries) + 1 if boundaries else start
+
+    def chunk_stream(self, stream: TextIO, source: str) -> Iterator[Chunk]:
+        """Yield chunks from a text stream, holding at most one block in memory"""
+        buffer = ""
+        position = 0
+        while True:
+            block = stream.read(self.read_size)
+            buffer += block
+            start = 0
+            while len(buffer) - start > self.chunk_size or (not block and start < len(buffer)):
+                if len(buffer) - start <= self.chunk_size:
+                    end = len(buffer)
+                else:
+                    end = self._cut(buffer, start)
+                text = buffer[start:end].strip()
+                if text:
+                    yield Chunk(text=text, source=source, position=position)
+                    position += 1
+                if end >= len(buffer):
+                    start = end
+                    break
+                start = self._overlap_start(buffer, end)
+            buffer = buffer[start:]
+            if not block:
+                return
+
+    def chunk_file(self, path: str) -> Iterator[Chunk]:
+        """Yield chunks from a file on disk"""
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            yield from self.chunk_stream(f, source=path)
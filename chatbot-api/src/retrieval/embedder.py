@@ -0,0 +1,59 @@
+from typing import Protocol, List
+import re
+import zlib
+import numpy as np
+
+
+class Embedder(Protocol):
+    """Protocol for text embedders"""
+
+    dimension: int
+
+    def embed(self, texts: List[str]) -> np.ndarray: ...
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so that a dot product is a cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """Local embedder using signed feature hashing of word unigrams and bigrams.
+
+    Needs no network access, so it is used for offline deployments and tests.
+    """
+
+    _token_pattern = re.compile(r"\w+")
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+
+    def _features(self, text: str) -> List[str]:
+        tokens = self._token_pattern.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, h % self.dimension] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize(vectors)
+
+
+class OpenAIEmbedder:
+    """Embedder backed by an OpenAI-compatible embeddings endpoint"""
+
+    def __init__(self, client, model: str = "text-embedding-3-small", dimension: int = 1536):
+        self.client = client
+        self.model = model
+        self.dimension = dimension
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = self.client.embeddings.create(
+            model=self.model, input=texts, dimensions=self.dimension
+        )
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        return _normalize(vectors)
@@ -0,0 +1,209 @@
+"""On-disk vector index.
+
+Layout of an index directory:
+
+- ``vectors.npy``: float32 matrix of L2-normalized embeddings, grouped by list
+- ``centroids.npy``: one centroid per inverted list (a single list for small indexes)
+- ``list_offsets.npy``: start row of each list in ``vectors.npy``, plus the end row
+- ``row_ids.npy``: chunk id stored at each row of ``vectors.npy``
+- ``chunks.jsonl`` / ``chunk_offsets.npy``: chunk text and metadata, addressed by byte offset
+- ``meta.json``: dimension, count and list count
+
+Everything except the centroids is memory-mapped read-only, so worker processes
+loading the same directory share one copy through the OS page cache.
+"""
+
+from typing import List, Optional, Tuple
+import json
+import mmap
+import os
+import numpy as np
+from .models import Chunk, RetrievedChunk
+
+# Indexes smaller than this are scanned exhaustively
+MIN_ROWS_FOR_LISTS = 20_000
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+BLOCK_ROWS = 16_384
+
+
+def _kmeans(sample: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over normalized vectors"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class VectorIndexWriter:
+    """Build a vector index incrementally, holding only one batch in memory"""
+
+    def __init__(self, index_dir: str, dimension: int):
+        self.index_dir = index_dir
+        self.dimension = dimension
+        self.count = 0
+        os.makedirs(index_dir, exist_ok=True)
+        self._staging_path = os.path.join(index_dir, "vectors.staging")
+        self._vectors = open(self._staging_path, "wb")
+        self._chunks = open(os.path.join(index_dir, "chunks.jsonl.tmp"), "wb")
+        self._chunk_offsets: List[int] = []
+
+    def add(self, chunks: List[Chunk], vectors: np.ndarray) -> None:
+        """Append a batch of chunks and their embeddings"""
+        if vectors.shape != (len(chunks), self.dimension):
+            raise ValueError(
+                f"Expected vectors of shape ({len(chunks)}, {self.dimension}), got {vectors.shape}"
+            )
+        self._vectors.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        for chunk in chunks:
+            self._chunk_offsets.append(self._chunks.tell())
+            record = {"text": chunk.text, "source": chunk.source, "position": chunk.position}
+            self._chunks.write(json.dumps(record).encode("utf-8") + b"\n")
+        self.count += len(chunks)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def close(self) -> None:
+        """Cluster the staged vectors into inverted lists and publish the index"""
+        self._vectors.close()
+        self._chunks.close()
+        count, dim = self.count, self.dimension
+        staged = (
+            np.memmap(self._staging_path, dtype=np.float32, mode="r", shape=(count, dim))
+            if count
+            else np.zeros((0, dim), dtype=np.float32)
+        )
+
+        nlist = int(np.sqrt(count)) if count >= MIN_ROWS_FOR_LISTS else 1
+        if nlist > 1:
+            rng = np.random.default_rng(0)
+            sample_size = min(count, nlist * KMEANS_SAMPLE_PER_LIST)
+            sample_rows = np.sort(rng.choice(count, sample_size, replace=False))
+            centroids = _kmeans(np.asarray(staged[sample_rows]), nlist)
+            assign = np.empty(count, dtype=np.int32)
+            for start in range(0, count, BLOCK_ROWS):
+                block = np.asarray(staged[start : start + BLOCK_ROWS])
+                assign[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+            row_ids = np.argsort(assign, kind="stable").astype(np.int64)
+            sizes = np.bincount(assign, minlength=nlist)
+        else:
+            centroids = np.zeros((1, dim), dtype=np.float32)
+            row_ids = np.arange(count, dtype=np.int64)
+            sizes = np.array([count])
+        list_offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+
+        vectors_tmp = self._path("vectors.npy.tmp")
+        out = np.lib.format.open_memmap(vectors_tmp, mode="w+", dtype=np.float32, shape=(count, dim))
+        for start in range(0, count, BLOCK_ROWS):
+            rows = row_ids[start : start + BLOCK_ROWS]
+            # Read the staging file in ascending order, then scatter into place
+            order = np.argsort(rows)
+            block = np.empty((len(rows), dim), dtype=np.float32)
+            block[order] = staged[rows[order]]
+            out[start : start + len(rows)] = block
+        out.flush()
+        del out, staged
+
+        # Replace files atomically so processes holding the old mappings keep working
+        for name, array in (
+            ("centroids.npy", centroids),
+            ("list_offsets.npy", list_offsets),
+            ("row_ids.npy", row_ids),
+            ("chunk_offsets.npy", np.array(self._chunk_offsets, dtype=np.int64)),
+        ):
+            with open(self._path(name + ".tmp"), "wb") as f:
+                np.save(f, array)
+            os.replace(self._path(name + ".tmp"), self._path(name))
+        os.replace(vectors_tmp, self._path("vectors.npy"))
+        os.replace(self._path("chunks.jsonl.tmp"), self._path("chunks.jsonl"))
+        with open(self._path("meta.json"), "w") as f:
+            json.dump({"dimension": dim, "count": count, "nlist": len(centroids)}, f)
+        os.remove(self._staging_path)
+
+
+class VectorIndex:
+    """Read-only, memory-mapped vector index"""
+
+    def __init__(self, index_dir: str, nprobe: int = 16):
+        if nprobe < 1:
+            raise ValueError("nprobe must be at least 1")
+        self.index_dir = index_dir
+        self.nprobe = nprobe
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.dimension = meta["dimension"]
+        self.count = meta["count"]
+        self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+        self.centroids = np.load(os.path.join(index_dir, "centroids.npy"))
+        self.list_offsets = np.load(os.path.join(index_dir, "list_offsets.npy"))
+        self.row_ids = np.load(os.path.join(index_dir, "row_ids.npy"), mmap_mode="r")
+        self.chunk_offsets = np.load(os.path.join(index_dir, "chunk_offsets.npy"), mmap_mode="r")
+        self._chunks_file = open(os.path.join(index_dir, "chunks.jsonl"), "rb")
+        self._chunks = (
+            mmap.mmap(self._chunks_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.count
+            else b""
+        )
+
+    def _chunk(self, chunk_id: int) -> dict:
+        start = int(self.chunk_offsets[chunk_id])
+        end = self._chunks.find(b"\n", start)
+        return json.loads(self._chunks[start:end])
+
+    def _candidate_rows(self, query: np.ndarray) -> List[Tuple[int, int]]:
+        """Row ranges of the inverted lists closest to the query"""
+        nlist = len(self.centroids)
+        if nlist == 1:
+            return [(0, self.count)]
+        nprobe = min(self.nprobe, nlist)
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return [(int(self.list_offsets[i]), int(self.list_offsets[i + 1])) for i in np.sort(probe)]
+
+    def search(self, query: np.ndarray, k: int = 5) -> List[RetrievedChunk]:
+        """Return the k chunks most similar to a normalized query vector"""
+        if self.count == 0 or k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        ranges = self._candidate_rows(query)
+        scores = np.concatenate([self.vectors[start:end] @ query for start, end in ranges])
+        rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for i in top:
+            record = self._chunk(int(self.row_ids[rows[i]]))
+            results.append(
+                RetrievedChunk(
+                    text=record["text"],
+                    source=record["source"],
+                    position=record["position"],
+                    score=float(scores[i]),
+                )
+            )
+        return results
+
+    def close(self) -> None:
+        if isinstance(self._chunks, mmap.mmap):
+            self._chunks.close()
+        self._chunks_file.close()
+
+
+def open_index(index_dir: str, nprobe: int = 16) -> Optional[VectorIndex]:
+    """Load an index if the directory contains one"""
+    if not os.path.exists(os.path.join(index_dir, "meta.json")):
+        return None
+    return VectorIndex(index_dir, nprobe=nprobe)
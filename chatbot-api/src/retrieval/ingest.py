@@ -0,0 +1,59 @@
+"""Build a retrieval index from local documents.
+
+Usage:
+    python -m src.retrieval.ingest --index-dir rag_index docs/*.md
+"""
+
+import argparse
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from .chunker import TextChunker
+from .embedder import HashingEmbedder, OpenAIEmbedder
+from .service import RetrievalService
+
+
+def create_embedder(name: str):
+    """Create the embedder configured by RAG_EMBEDDER"""
+    if name == "openai":
+        from openai import OpenAI
+
+        client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_API_BASE")
+        )
+        return OpenAIEmbedder(
+            client,
+            model=os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-3-small"),
+            dimension=int(os.getenv("RAG_EMBEDDING_DIMENSION", "1536")),
+        )
+    if name == "hashing":
+        return HashingEmbedder(dimension=int(os.getenv("RAG_EMBEDDING_DIMENSION", "256")))
+    raise ValueError(f"Unknown embedder: {name}")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="Text files to ingest")
+    parser.add_argument("--index-dir", default=os.getenv("RAG_INDEX_DIR", "rag_index"))
+    parser.add_argument("--embedder", default=os.getenv("RAG_EMBEDDER", "hashing"))
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    service = RetrievalService(embedder=create_embedder(args.embedder))
+    started = time.perf_counter()
+    count = service.ingest(
+        args.paths,
+        args.index_dir,
+        chunker=TextChunker(chunk_size=args.chunk_size, overlap=args.overlap),
+        batch_size=args.batch_size,
+    )
+    print(f"Indexed {count} chunks in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class Chunk:
+    """A slice of a source document"""
+
+    text: str
+    source: str
+    position: int
+
+
+@dataclass
+class RetrievedChunk:
+    """A chunk returned by a similarity search"""
+
+    text: str
+    source: str
+    position: int
+    score: float
@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+import logging
+from .chunker import TextChunker
+from .embedder import Embedder
+from .index import VectorIndex, VectorIndexWriter
+from .models import RetrievedChunk
+from ..chat.models import Message
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_PREAMBLE = (
+    "Use the following excerpts from the knowledge base when they are relevant "
+    "to the user's question. Cite the source when you use one.\n\n"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class RetrievalService:
+    """Service for ingesting documents and retrieving relevant context"""
+
+    embedder: Embedder
+    index: Optional[VectorIndex] = None
+    top_k: int = 5
+    max_context_tokens: int = 1500
+    min_score: float = 0.0
+
+    def ingest(
+        self,
+        paths: Iterable[str],
+        index_dir: str,
+        chunker: Optional[TextChunker] = None,
+        batch_size: int = 64,
+    ) -> int:
+        """Chunk, embed and index files, streaming each one batch by batch"""
+        chunker = chunker or TextChunker()
+        writer = VectorIndexWriter(index_dir, dimension=self.embedder.dimension)
+        batch = []
+        for path in paths:
+            logger.info(f"Ingesting {path}")
+            for chunk in chunker.chunk_file(path):
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    writer.add(batch, self.embedder.embed([c.text for c in batch]))
+                    batch = []
+        if batch:
+            writer.add(batch, self.embedder.embed([c.text for c in batch]))
+        writer.close()
+        logger.info(f"Indexed {writer.count} chunks into {index_dir}")
+        return writer.count
+
+    def retrieve(self, query: str) -> List[RetrievedChunk]:
+        """Return the most relevant chunks that fit in the token budget"""
+        if self.index is None or not query.strip():
+            return []
+        query_vector = self.embedder.embed([query])[0]
+        selected = []
+        budget = self.max_context_tokens
+        for chunk in self.index.search(query_vector, k=self.top_k):
+            if chunk.score < self.min_score:
+                break
+            cost = estimate_tokens(chunk.text)
+            if cost > budget:
+                continue
+            selected.append(chunk)
+            budget -= cost
+        return selected
+
+    def build_context_message(self, query: str) -> Optional[Message]:
+        """Build a system message carrying the retrieved context, if any"""
+        chunks = self.retrieve(query)
+        if not chunks:
+            return None
+        excerpts = "\n\n".join(
+            f"[{i}] {chunk.source}\n{chunk.text}" for i, chunk in enumerate(chunks, 1)
+        )
+        return Message(role="system", content=CONTEXT_PREAMBLE + excerpts)
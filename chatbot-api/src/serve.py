@@ -0,0 +1,70 @@
+"""Production entry point running the API in several worker processes.
+
+Workers share no memory, so with more than one worker this switches the shared
+state (rate limits, stream replay, cache versions) to a SQLite file unless
+SHARED_STATE_URL already points at one or at Redis, and aggregates Prometheus
+metrics across workers through PROMETHEUS_MULTIPROC_DIR.
+
+Usage:
+    python -m src.serve --workers 4 --port 5001
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+
+def default_workers() -> int:
+    """One worker per available core, unless WEB_CONCURRENCY says otherwise"""
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def configure_shared_state(workers: int, env=os.environ) -> None:
+    """Point every worker at the same shared state before they start"""
+    if workers <= 1:
+        return
+    if env.get("SHARED_STATE_URL", "memory://").startswith("memory://"):
+        env["SHARED_STATE_URL"] = "sqlite:///shared_state.db"
+        logger.warning("SHARED_STATE_URL is in-process; using sqlite:///shared_state.db for all workers")
+    if not env.get("PROMETHEUS_MULTIPROC_DIR"):
+        env["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+
+def main():
+    # Before anything reads the environment: workers default from WEB_CONCURRENCY,
+    # and an in-process SHARED_STATE_URL is replaced, so .env must be loaded first
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+    configure_shared_state(args.workers)
+
+    import uvicorn
+
+    logger.info(f"Starting {args.workers} workers on {args.host}:{args.port}")
+    uvicorn.run(
+        "src.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
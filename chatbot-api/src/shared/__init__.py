@@ -0,0 +1 @@
+"""Source package initialization"""
@@ -0,0 +1,21 @@
+from dataclasses import dataclass
+from typing import Tuple
+import time
+from .store import SharedStore
+
+
+@dataclass
+class RateLimiter:
+    """Fixed-window request limiter whose counters live in a shared store"""
+
+    store: SharedStore
+    limit: int
+    window: float = 60.0
+
+    def hit(self, key: str) -> Tuple[bool, int]:
+        """Count a request; return whether it is allowed and seconds until the window resets"""
+        now = time.time()
+        window_start = int(now // self.window)
+        count = self.store.incr(f"ratelimit:{key}:{window_start}", ttl=self.window * 2)
+        retry_after = int((window_start + 1) * self.window - now) + 1
+        return count <= self.limit, retry_after
@@ -0,0 +1,89 @@
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List
+import asyncio
+import uuid
+from .store import SharedStore
+
+END_OF_STREAM = b""
+
+
+@dataclass
+class StreamReplayBuffer:
+    """Record streamed events so a client can resume a stream from any worker.
+
+    Events are appended to a list in the shared store under the stream id; an
+    empty event marks the end of the stream.
+    """
+
+    store: SharedStore
+    ttl: float = 300.0
+    poll_interval: float = 0.05
+
+    @staticmethod
+    def new_stream_id() -> str:
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def _key(stream_id: str) -> str:
+        return f"stream:{stream_id}"
+
+    def append(self, stream_id: str, event: str) -> int:
+        return self.store.append(self._key(stream_id), event.encode("utf-8"), ttl=self.ttl)
+
+    def extend(self, stream_id: str, events: List[str], finished: bool = False) -> int:
+        values = [event.encode("utf-8") for event in events]
+        if finished:
+            values.append(END_OF_STREAM)
+        return self.store.extend(self._key(stream_id), values, ttl=self.ttl)
+
+    def finish(self, stream_id: str) -> None:
+        self.store.append(self._key(stream_id), END_OF_STREAM, ttl=self.ttl)
+
+    def recorder(self, stream_id: str) -> "StreamRecorder":
+        return StreamRecorder(self, stream_id)
+
+    def events(self, stream_id: str, after: int = 0) -> List[bytes]:
+        return self.store.range(self._key(stream_id), after)
+
+    async def follow(self, stream_id: str, after: int = 0, timeout: float = 120.0) -> AsyncIterator[str]:
+        """Yield the events after ``after``, then new ones until the stream ends"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            for event in self.events(stream_id, after):
+                if event == END_OF_STREAM:
+                    return
+                after += 1
+                yield event.decode("utf-8")
+            await asyncio.sleep(self.poll_interval)
+
+
+@dataclass
+class StreamRecorder:
+    """Record one stream's events in batches, written off the event loop.
+
+    Events are written at most every ``poll_interval`` of the buffer, the
+    same delay a follower already has, instead of one store write per token.
+    """
+
+    buffer: StreamReplayBuffer
+    stream_id: str
+    pending: List[str] = field(default_factory=list)
+    flushed_at: float = 0.0
+
+    async def add(self, event: str) -> None:
+        self.pending.append(event)
+        loop = asyncio.get_running_loop()
+        if loop.time() - self.flushed_at >= self.buffer.poll_interval:
+            events, self.pending = self.pending, []
+            await asyncio.to_thread(self.buffer.extend, self.stream_id, events)
+            self.flushed_at = loop.time()
+
+    def close(self) -> None:
+        """Write what is left and the end marker.
+
+        Synchronous, since it runs while the stream is being cancelled, when
+        awaiting would be cancelled too; it is a single write per stream.
+        """
+        events, self.pending = self.pending, []
+        self.buffer.extend(self.stream_id, events, finished=True)
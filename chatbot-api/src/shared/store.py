@@ -0,0 +1,265 @@
+"""Key-value backends for state shared between worker processes.
+
+``MemoryStore`` keeps everything in the current process and is the default for a
+single worker and for tests. ``SQLiteStore`` shares state between workers on one
+host through a WAL-mode database file. ``RedisStore`` shares it across hosts.
+"""
+
+from typing import Dict, List, Optional, Protocol, Tuple
+import sqlite3
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class SharedStore(Protocol):
+    """Protocol for shared state backends"""
+
+    def get(self, key: str) -> Optional[bytes]: ...
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None: ...
+    def delete(self, key: str) -> None: ...
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int: ...
+    def append(self, key: str, value: bytes, ttl: Optional[float] = None) -> int: ...
+    def extend(self, key: str, values: List[bytes], ttl: Optional[float] = None) -> int: ...
+    def range(self, key: str, start: int = 0) -> List[bytes]: ...
+
+
+class MemoryStore:
+    """In-process stand-in for a shared store"""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[object, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        item = self._values.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> Optional[float]:
+        return time.monotonic() + ttl if ttl else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._live(key)
+        return str(value).encode() if isinstance(value, int) else value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._values[key] = (value, self._expiry(ttl))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            value = self._live(key)
+            if value is None:
+                self._values[key] = (amount, self._expiry(ttl))
+                return amount
+            value = int(value) + amount
+            self._values[key] = (value, self._values[key][1])
+            return value
+
+    def append(self, key: str, value: bytes, ttl: Optional[float] = None) -> int:
+        return self.extend(key, [value], ttl)
+
+    def extend(self, key: str, values: List[bytes], ttl: Optional[float] = None) -> int:
+        with self._lock:
+            items = self._live(key)
+            if items is None:
+                items = []
+                self._values[key] = (items, self._expiry(ttl))
+            items.extend(values)
+            return len(items)
+
+    def range(self, key: str, start: int = 0) -> List[bytes]:
+        with self._lock:
+            items = self._live(key)
+            return list(items[start:]) if items else []
+
+
+class SQLiteStore:
+    """Shared store backed by a SQLite file, for workers on the same host.
+
+    Expired rows are skipped on read and replaced on write, but keys that are
+    never written again (rate limit windows, finished streams) would stay, so
+    writes also delete every expired row at most once per ``sweep_interval``.
+    """
+
+    def __init__(self, db_path: str = "shared_state.db", sweep_interval: float = 60.0):
+        self.db_path = db_path
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS lists (key TEXT, seq INTEGER, value BLOB, expires REAL, "
+                "PRIMARY KEY (key, seq))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> Optional[float]:
+        # Wall clock, since expiry times are compared across processes
+        return time.time() + ttl if ttl else None
+
+    def sweep(self) -> int:
+        """Delete every expired value and list item; returns the number of rows deleted"""
+        now = time.time()
+        self._next_sweep = now + self.sweep_interval
+        conn = self._connect()
+        deleted = conn.execute("DELETE FROM kv WHERE expires <= ?", (now,)).rowcount
+        return deleted + conn.execute("DELETE FROM lists WHERE expires <= ?", (now,)).rowcount
+
+    def _maybe_sweep(self) -> None:
+        if time.time() >= self._next_sweep:
+            self.sweep()
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        return str(row[0]).encode() if isinstance(row[0], int) else row[0]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._maybe_sweep()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+            (key, value, self._expiry(ttl)),
+        )
+
+    def delete(self, key: str) -> None:
+        conn = self._connect()
+        conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+        conn.execute("DELETE FROM lists WHERE key = ?", (key,))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        self._maybe_sweep()
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires <= ?", (key, now))
+            (value,) = conn.execute(
+                "INSERT INTO kv (key, value, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value "
+                "RETURNING value",
+                (key, amount, self._expiry(ttl)),
+            ).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return int(value)
+
+    def append(self, key: str, value: bytes, ttl: Optional[float] = None) -> int:
+        return self.extend(key, [value], ttl)
+
+    def extend(self, key: str, values: List[bytes], ttl: Optional[float] = None) -> int:
+        self._maybe_sweep()
+        conn = self._connect()
+        expires = self._expiry(ttl)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM lists WHERE key = ? AND expires <= ?", (key, time.time()))
+            (length,) = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM lists WHERE key = ?", (key,)).fetchone()
+            conn.executemany(
+                "INSERT INTO lists (key, seq, value, expires) VALUES (?, ?, ?, ?)",
+                [(key, length + i, value, expires) for i, value in enumerate(values, 1)],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return length + len(values)
+
+    def range(self, key: str, start: int = 0) -> List[bytes]:
+        rows = self._connect().execute(
+            "SELECT value FROM lists WHERE key = ? AND seq > ? AND (expires IS NULL OR expires > ?) "
+            "ORDER BY seq",
+            (key, start, time.time()),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+
+class RedisStore:
+    """Shared store backed by Redis, for workers on several hosts"""
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisStore":
+        if redis is None:
+            raise ImportError("redis is not installed. Install it with: pip install redis")
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        if not ttl:
+            return self.client.incrby(key, amount)
+        # Create the key with its expiry first, in one transaction: a process dying
+        # between INCR and PEXPIRE would leave a counter that never expires
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(key, 0, nx=True, px=int(ttl * 1000))
+        pipe.incrby(key, amount)
+        return pipe.execute()[-1]
+
+    def append(self, key: str, value: bytes, ttl: Optional[float] = None) -> int:
+        return self.extend(key, [value], ttl)
+
+    def extend(self, key: str, values: List[bytes], ttl: Optional[float] = None) -> int:
+        if not values:
+            return self.client.llen(key)
+        length = self.client.rpush(key, *values)
+        if ttl and length == len(values):
+            self.client.pexpire(key, int(ttl * 1000))
+        return length
+
+    def range(self, key: str, start: int = 0) -> List[bytes]:
+        return self.client.lrange(key, start, -1)
+
+
+def create_store(url: str) -> SharedStore:
+    """Create a store from a URL: memory://, sqlite:///path/to/file.db or redis://host:port/db"""
+    if url.startswith("memory://"):
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisStore.from_url(url)
+    raise ValueError(f"Unsupported shared state URL: {url}")
@@ -0,0 +1,285 @@
+"""Per-user, per-model token and cost accounting.
+
+The provider calls ``UsageRecorder.record`` once per upstream call, with the
+token counts the upstream reported or, when it reported none, local
+estimates. Recording appends a tuple to a deque, which is atomic in CPython,
+so the request path takes no lock and does no I/O. Every few seconds a
+background task drains the deque, sums it into per-minute buckets and upserts
+them into a SQLite usage table in one transaction: writes grow with users x
+models x minutes, not with requests. Cost is priced when a batch is summed,
+from per-model prices per million tokens.
+
+Rows written by several worker processes to the same file add up.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, List, Mapping, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
+from ..conversation.repository import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 60
+# A rough cost of one image in the prompt, for local estimates
+IMAGE_TOKENS = 765
+
+
+@dataclass(frozen=True, slots=True)
+class ModelPrice:
+    """USD per million tokens; cached prompt tokens cost ``input`` unless ``cached`` is set"""
+
+    input: float
+    output: float
+    cached: Optional[float] = None
+
+    def cost(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> float:
+        cached_price = self.input if self.cached is None else self.cached
+        return (
+            (prompt_tokens - cached_tokens) * self.input
+            + cached_tokens * cached_price
+            + completion_tokens * self.output
+        ) / 1_000_000
+
+
+DEFAULT_PRICES = {
+    "gpt-4o": ModelPrice(2.50, 10.00, 1.25),
+    "gpt-4o-mini": ModelPrice(0.15, 0.60, 0.075),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def estimate_prompt_tokens(formatted_messages: Iterable[dict]) -> int:
+    """Estimate the prompt tokens of messages formatted for the OpenAI API"""
+    tokens = 0
+    for message in formatted_messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += estimate_tokens(content)
+            continue
+        for part in content or ():
+            if part.get("type") == "text":
+                tokens += estimate_tokens(part.get("text") or "")
+            else:
+                tokens += IMAGE_TOKENS
+    return tokens
+
+
+@dataclass(slots=True)
+class UsageTotals:
+    """Usage summed over one (minute, user, model) bucket"""
+
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    estimated_requests: int = 0
+    cost_usd: float = 0.0
+
+    def merge(self, other: "UsageTotals") -> None:
+        self.requests += other.requests
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+        self.estimated_requests += other.estimated_requests
+        self.cost_usd += other.cost_usd
+
+
+UsageKey = Tuple[int, str, str]
+
+
+class UsageStore:
+    """Usage buckets in a SQLite table, summed again over any time window"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, size=2)
+        self._init_db()
+
+    def _init_db(self) -> None:
+        with self.pool.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS usage (
+                    bucket INTEGER NOT NULL,
+                    user_id TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    requests INTEGER NOT NULL,
+                    prompt_tokens INTEGER NOT NULL,
+                    completion_tokens INTEGER NOT NULL,
+                    cached_tokens INTEGER NOT NULL,
+                    estimated_requests INTEGER NOT NULL,
+                    cost_usd REAL NOT NULL,
+                    PRIMARY KEY (bucket, user_id, model)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_user_bucket ON usage (user_id, bucket)")
+
+    def add(self, totals: Mapping[UsageKey, UsageTotals]) -> None:
+        """Add to the stored buckets in one transaction"""
+        with self.pool.connection() as conn:
+            conn.executemany(
+                """
+                INSERT INTO usage (bucket, user_id, model, requests, prompt_tokens, completion_tokens,
+                                   cached_tokens, estimated_requests, cost_usd)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (bucket, user_id, model) DO UPDATE SET
+                    requests = requests + excluded.requests,
+                    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                    completion_tokens = completion_tokens + excluded.completion_tokens,
+                    cached_tokens = cached_tokens + excluded.cached_tokens,
+                    estimated_requests = estimated_requests + excluded.estimated_requests,
+                    cost_usd = cost_usd + excluded.cost_usd
+                """,
+                [
+                    (bucket, user, model, t.requests, t.prompt_tokens, t.completion_tokens,
+                     t.cached_tokens, t.estimated_requests, t.cost_usd)
+                    for (bucket, user, model), t in totals.items()
+                ],
+            )
+
+    def query(
+        self,
+        start: float,
+        end: float,
+        interval: Optional[int] = 3600,
+        group_by: Iterable[str] = ("user", "model"),
+        user: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> List[dict]:
+        """Usage between two Unix times, per ``interval`` seconds (or for the whole window if None).
+
+        Rows are grouped by any of ``"user"`` and ``"model"``. Usage is kept
+        per minute, so the window counts the minutes starting from ``start``
+        rounded down to a minute, up to ``end``.
+        """
+        group_by = list(group_by)
+        columns = {"user": "user_id", "model": "model"}
+        if not set(group_by) <= set(columns):
+            raise ValueError(f"Cannot group usage by {group_by}")
+        keys = [f"{columns[name]} AS {name}" for name in group_by]
+        groups = [columns[name] for name in group_by]
+        params: List[Any] = []
+        if interval is not None:
+            keys.insert(0, "(bucket / ?) * ? AS start")
+            groups.insert(0, "start")
+            params += [interval, interval]
+        where = ["bucket >= ?", "bucket < ?"]
+        params += [int(start) // BUCKET_SECONDS * BUCKET_SECONDS, end]
+        if user is not None:
+            where.append("user_id = ?")
+            params.append(user)
+        if model is not None:
+            where.append("model = ?")
+            params.append(model)
+        sums = [
+            f"SUM({name}) AS {name}"
+            for name in ("requests", "prompt_tokens", "completion_tokens", "cached_tokens", "estimated_requests", "cost_usd")
+        ]
+        sql = f"SELECT {', '.join(keys + sums)} FROM usage WHERE {' AND '.join(where)}"
+        if groups:
+            sql += f" GROUP BY {', '.join(groups)} ORDER BY {', '.join(groups)}"
+        with self.pool.connection() as conn:
+            cursor = conn.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor if row[names.index("requests")] is not None]
+
+
+class UsageRecorder:
+    """Collects usage in memory and flushes it to a UsageStore in batches"""
+
+    def __init__(
+        self,
+        store: UsageStore,
+        flush_interval: float = 5.0,
+        prices: Optional[Mapping[str, ModelPrice]] = None,
+    ):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.prices = {**DEFAULT_PRICES, **(prices or {})}
+        self._pending: Deque[tuple] = deque()
+        self._unflushed: Dict[UsageKey, UsageTotals] = {}
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(
+        self,
+        user: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        estimated: bool = False,
+    ) -> None:
+        """Count one upstream call; safe from any thread and never blocks"""
+        self._pending.append((time.time(), user, model, prompt_tokens, completion_tokens, cached_tokens, estimated))
+
+    def _drain(self) -> Dict[UsageKey, UsageTotals]:
+        totals, self._unflushed = self._unflushed, {}
+        pending = self._pending
+        while True:
+            try:
+                at, user, model, prompt, completion, cached, estimated = pending.popleft()
+            except IndexError:
+                return totals
+            key = (int(at) // BUCKET_SECONDS * BUCKET_SECONDS, user, model)
+            bucket = totals.get(key)
+            if bucket is None:
+                bucket = totals[key] = UsageTotals()
+            bucket.requests += 1
+            bucket.prompt_tokens += prompt
+            bucket.completion_tokens += completion
+            bucket.cached_tokens += cached
+            bucket.estimated_requests += estimated
+            price = self.prices.get(model)
+            if price is not None:
+                bucket.cost_usd += price.cost(prompt, completion, cached)
+
+    def flush(self) -> int:
+        """Write everything recorded so far; returns the number of buckets written.
+
+        Buckets that fail to be written are kept and retried by the next flush.
+        """
+        with self._flush_lock:
+            totals = self._drain()
+            if not totals:
+                return 0
+            try:
+                self.store.add(totals)
+            except Exception:
+                for key, bucket in self._drain().items():
+                    totals.setdefault(key, UsageTotals()).merge(bucket)
+                self._unflushed = totals
+                raise
+            return len(totals)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.warning(f"Usage flush failed: {str(e)}")
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop flushing periodically, then write what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
@@ -0,0 +1,105 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta, timezone
+from pydantic import BaseModel
+from .accounting import UsageStore
+from ..conversation.routes import get_tenant_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/usage", tags=["usage"])
+
+INTERVALS = {"minute": 60, "hour": 3600, "day": 86400}
+
+
+class UsageRowSchema(BaseModel):
+    start: Optional[datetime] = None
+    user: Optional[str] = None
+    model: Optional[str] = None
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    estimated_requests: int
+    cost_usd: float
+
+
+class UsageResponse(BaseModel):
+    start: datetime
+    end: datetime
+    rows: List[UsageRowSchema]
+
+
+async def get_usage_store() -> Optional[UsageStore]:
+    # Overridden in main.py when USAGE_DB is set
+    return None
+
+
+def _window(start: Optional[datetime], end: Optional[datetime]) -> tuple[datetime, datetime]:
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+
+async def _query(
+    store: Optional[UsageStore],
+    tenant_id: Optional[str],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    **options,
+) -> UsageResponse:
+    if store is None:
+        raise HTTPException(status_code=503, detail="Usage accounting not configured")
+    if tenant_id is not None:
+        # A tenant only sees its own usage
+        if options["user"] not in (None, tenant_id):
+            raise HTTPException(status_code=403, detail="Usage of another tenant")
+        options["user"] = tenant_id
+    start, end = _window(start, end)
+    rows = await run_in_threadpool(store.query, start.timestamp(), end.timestamp(), **options)
+    for row in rows:
+        if "start" in row:
+            row["start"] = datetime.fromtimestamp(row["start"], timezone.utc)
+    return UsageResponse(start=start, end=end, rows=rows)
+
+
+@router.get("", response_model=UsageResponse)
+async def usage_over_time(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval: Literal["minute", "hour", "day"] = "hour",
+    user: Optional[str] = None,
+    model: Optional[str] = None,
+    group_by: List[Literal["user", "model"]] = Query(["user", "model"]),
+    store: Optional[UsageStore] = Depends(get_usage_store),
+    tenant_id: Optional[str] = Depends(get_tenant_id),
+) -> UsageResponse:
+    """Token usage and cost per interval over a window (the last day by default).
+
+    Usage reaches the store in batches, so the latest few seconds may be missing.
+    """
+    return await _query(
+        store, tenant_id, start, end, interval=INTERVALS[interval], group_by=group_by, user=user, model=model
+    )
+
+
+@router.get("/summary", response_model=UsageResponse)
+async def usage_summary(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user: Optional[str] = None,
+    model: Optional[str] = None,
+    group_by: List[Literal["user", "model"]] = Query(["user", "model"]),
+    store: Optional[UsageStore] = Depends(get_usage_store),
+    tenant_id: Optional[str] = Depends(get_tenant_id),
+) -> UsageResponse:
+    """Token usage and cost totals over a window (the last day by default)"""
+    return await _query(store, tenant_id, start, end, interval=None, group_by=group_by, user=user, model=model)
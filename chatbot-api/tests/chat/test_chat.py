@@ -99,3 +99,60 @@ async def test_stream_response_with_image(chat_service):
         chunks.append(chunk)
 
     assert chunks == ["Mock ", "streaming ", "response"]
+
+
+def test_models_have_no_instance_dict():
+    message = Message(role="".join(["us", "er"]), content="Hello", model="gpt-4")
+
+    assert not hasattr(message, "__dict__")
+    assert message.role is "user"  # noqa: F632 - roles are interned
+
+
+def test_format_message_accepts_domain_schema_and_dict_parts():
+    from src.chat.provider import OpenAIProvider
+    from src.chat.schemas import TextContentSchema, ImageContentSchema
+
+    provider = OpenAIProvider(api_key="test-api-key")
+    url = "data:image/jpeg;base64,/9j/4AAQSkZJRg=="
+    expected = [
+        {"type": "text", "text": "Hi"},
+        {"type": "image_url", "image_url": {"url": url}},
+    ]
+
+    for parts in (
+        [TextContent(text="Hi"), ImageContent(image_url={"url": url})],
+        [TextContentSchema(text="Hi"), ImageContentSchema(image_url={"url": url})],
+        expected,
+    ):
+        formatted = provider._format_message(Message(role="user", content=parts))
+        assert formatted == {"role": "user", "content": expected}
+
+
+@pytest.mark.asyncio
+async def test_compare_stream_cancels_one_model():
+    import asyncio
+
+    tasks = {}
+
+    class SlowProvider(MockAIProvider):
+        async def generate_stream(self, messages):
+            tasks[messages[-1].model] = asyncio.current_task()
+            for i in range(50):
+                await asyncio.sleep(0.01)
+                yield f"{messages[-1].model}-{i}"
+
+    service = ChatService(ai_provider=SlowProvider())
+    events = [
+        event
+        async for event in service.compare_stream(
+            ["keep", "stop"], text="Hi", is_cancelled=lambda model: model == "stop", poll_interval=0.05
+        )
+    ]
+
+    done = {event["model"]: event for event in events if event.get("done")}
+    assert done["stop"]["cancelled"] is True
+    assert "cancelled" not in done["keep"]
+    assert sum(1 for event in events if event.get("model") == "keep" and "content" in event) == 50
+    assert sum(1 for event in events if event.get("model") == "stop" and "content" in event) < 50
+    # The cancellation propagates instead of ending the task normally
+    assert tasks["stop"].cancelled() and not tasks["keep"].cancelled()
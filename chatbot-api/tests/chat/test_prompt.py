@@ -0,0 +1,80 @@
+import json
+from src.chat.models import ImageContent, Message, TextContent
+from src.chat.prompt import cache_key, canonical_message, order_messages
+from src.chat.schemas import ImageContentSchema, TextContentSchema
+
+URL = "data:image/png;base64,iVBORw0KGgo="
+
+
+def _bytes(message: Message) -> bytes:
+    return json.dumps(canonical_message(message), separators=(",", ":")).encode()
+
+
+def test_equivalent_parts_render_identically():
+    variants = [
+        # The current turn, as built by ChatService
+        [TextContent(text="Look"), ImageContent(image_url={"url": URL})],
+        # The same turn echoed back in the history by the client
+        [TextContentSchema(text="Look"), ImageContentSchema(image_url={"url": URL})],
+        [{"text": "Look", "type": "text"}, {"image_url": {"url": f" {URL}\n"}, "type": "image_url"}],
+    ]
+    rendered = {_bytes(Message(role="user", content=parts)) for parts in variants}
+    assert len(rendered) == 1
+
+
+def test_interleaved_parts_keep_their_order():
+    parts = [TextContent(text="Before"), ImageContent(image_url={"url": URL}), TextContent(text="After")]
+
+    content = canonical_message(Message(role="user", content=parts))["content"]
+
+    assert [part.get("text") for part in content] == ["Before", None, "After"]
+
+
+def test_single_text_part_collapses_to_string():
+    assert canonical_message(Message(role="user", content=[TextContentSchema(text="Hi")])) == {
+        "role": "user",
+        "content": "Hi",
+    }
+
+
+def test_unknown_parts_have_sorted_keys():
+    part = {"type": "input_audio", "input_audio": {"format": "wav", "data": "AAA"}}
+    content = canonical_message(Message(role="user", content=[part]))["content"]
+    assert list(content[0]) == ["input_audio", "type"]
+    assert list(content[0]["input_audio"]) == ["data", "format"]
+
+
+def test_preamble_is_pinned_and_context_precedes_the_question():
+    system = Message(role="system", content="Be brief")
+    history = [Message(role="user", content="Q1"), Message(role="assistant", content="A1"), system]
+    question = Message(role="user", content="Q2")
+    context = Message(role="system", content="Retrieved")
+
+    ordered = order_messages([*history, question], context)
+
+    assert [m.content for m in ordered] == ["Be brief", "Q1", "A1", "Retrieved", "Q2"]
+    assert order_messages([question]) == [question]
+
+
+def test_prefix_is_stable_across_turns():
+    turns = [("Q1", "A1"), ("Q2", "A2"), ("Q3", None)]
+    prompts = []
+    history = []
+    for question, answer in turns:
+        ordered = order_messages(
+            [*history, Message(role="user", content=question)],
+            Message(role="system", content=f"Context for {question}"),
+        )
+        prompts.append([canonical_message(m) for m in ordered])
+        history += [Message(role="user", content=question), Message(role="assistant", content=answer or "")]
+
+    # Turn 3 repeats turn 2's history verbatim; only the last exchange follows
+    assert prompts[2][:2] == prompts[1][:2]
+    assert len({cache_key(prompt) for prompt in prompts}) == 1
+
+
+def test_cache_key_is_scoped():
+    opening = [canonical_message(Message(role="user", content="hi"))]
+
+    assert cache_key(opening, "alice") == cache_key(opening, "alice")
+    assert cache_key(opening, "alice") != cache_key(opening, "bob")
@@ -0,0 +1,127 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from openai import OpenAI, InternalServerError
+from src.chat.models import Message
+from src.chat.provider import OpenAIProvider
+from src.observability.metrics import allow_model_label
+from benchmarks.fake_llm import FakeLLMConfig, create_app
+
+
+def fake_provider(**config) -> OpenAIProvider:
+    http_client = TestClient(create_app(FakeLLMConfig(ttft=0, tokens_per_second=10_000, **config)))
+    provider = OpenAIProvider(api_key="test")
+    provider.client = OpenAI(api_key="test", base_url="http://testserver/v1", http_client=http_client, max_retries=0)
+    return provider
+
+
+def question(text: str = "Hello") -> list:
+    return [Message(role="user", content=text, model="gpt-4o")]
+
+
+def test_generate_response_against_fake_llm():
+    provider = fake_provider(completion_tokens=8, token_size=4)
+
+    first = provider.generate_response(question())
+    second = provider.generate_response(question())
+
+    assert len(first.content) == 32
+    assert first.content == second.content
+    assert provider.generate_response(question("Other")).content != first.content
+
+
+@pytest.mark.asyncio
+async def test_generate_stream_against_fake_llm():
+    provider = fake_provider(completion_tokens=5)
+
+    tokens = [token async for token in provider.generate_stream(question())]
+
+    assert len(tokens) == 5
+    assert "".join(tokens) == provider.generate_response(question()).content
+
+
+def test_fake_llm_injects_errors():
+    provider = fake_provider(error_rate=1.0)
+
+    with pytest.raises(InternalServerError):
+        provider.generate_response(question())
+
+
+def test_clients_are_created_on_first_use():
+    provider = OpenAIProvider(api_key="test", groq_api_key="groq-key")
+
+    assert "client" not in vars(provider)
+    client, backend = provider._client_for("deepseek-r1-distill-llama-70b")
+
+    assert backend == "groq"
+    assert client.api_key == "groq-key"
+    assert provider._client_for("deepseek-r1-distill-llama-70b")[0] is client
+    assert "client" not in vars(provider) and "github_client" not in vars(provider)
+
+
+def cached_tokens(model: str) -> float:
+    from prometheus_client import REGISTRY
+
+    labels = {"model": model, "backend": "openai", "direction": "cached"}
+    return REGISTRY.get_sample_value("llm_tokens_total", labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_history_is_served_from_the_upstream_prefix_cache():
+    allow_model_label("cache-model")
+    provider = fake_provider(completion_tokens=3, prefix_cache_tokens=100_000)
+    history = [
+        Message(role="user", content="Long question " * 50, model="cache-model"),
+        Message(role="assistant", content="Long answer " * 50),
+    ]
+
+    [token async for token in provider.generate_stream(history[:1])]
+    assert cached_tokens("cache-model") == 0
+    [token async for token in provider.generate_stream([*history, Message(role="user", content="More", model="cache-model")])]
+    assert cached_tokens("cache-model") > 100
+
+
+@pytest.mark.asyncio
+async def test_streams_do_not_block_the_event_loop():
+    import asyncio
+    import time
+
+    provider = fake_provider(completion_tokens=2)
+    provider.client = OpenAI(
+        api_key="test",
+        base_url="http://testserver/v1",
+        http_client=TestClient(create_app(FakeLLMConfig(ttft=0.2, tokens_per_second=10_000, completion_tokens=2))),
+        max_retries=0,
+    )
+
+    async def consume(text):
+        return [token async for token in provider.generate_stream(question(text))]
+
+    started = time.perf_counter()
+    results = await asyncio.gather(consume("one"), consume("two"), consume("three"))
+    assert all(len(tokens) == 2 for tokens in results)
+    assert time.perf_counter() - started < 0.5
+
+
+@pytest.mark.asyncio
+async def test_usage_is_accounted_to_the_user(tmp_path):
+    from src.usage.accounting import UsageRecorder, UsageStore
+
+    store = UsageStore(str(tmp_path / "usage.db"))
+    provider = fake_provider(completion_tokens=6)
+    provider.usage = UsageRecorder(store)
+    alice = provider.for_user("alice")
+
+    alice.generate_response(question())
+    [token async for token in alice.generate_stream(question())]
+    stream = provider.for_user("bob").generate_stream(question())
+    await stream.__anext__()
+    # Closed before the final chunk that carries usage, so estimated locally
+    await stream.aclose()
+    provider.usage.flush()
+
+    rows = {row["user"]: row for row in store.query(0, time.time() + 60, interval=None, group_by=["user"])}
+    assert rows["alice"]["requests"] == 2
+    assert rows["alice"]["completion_tokens"] == 12 and rows["alice"]["estimated_requests"] == 0
+    assert rows["alice"]["prompt_tokens"] > 0 and rows["alice"]["cost_usd"] > 0
+    assert rows["bob"]["completion_tokens"] == 1 and rows["bob"]["estimated_requests"] == 1
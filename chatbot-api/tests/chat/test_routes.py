@@ -1,9 +1,14 @@
+import asyncio
+import time
 import pytest
 from fastapi.testclient import TestClient
 from datetime import datetime, timezone
-from src.chat.routes import router, get_chat_service
+from src.chat.routes import router, get_chat_service, get_rate_limiter, get_replay_buffer, get_shared_state
 from src.chat.service import ChatService
 from tests.chat.test_chat import MockAIProvider
+from src.shared.rate_limit import RateLimiter
+from src.shared.replay import StreamReplayBuffer
+from src.shared.store import MemoryStore
 import json
 
 # Create test client
@@ -152,3 +157,127 @@ def test_stream_image_endpoint():
                 chunks.append(json.loads(data)["content"])
 
         assert chunks == ["Mock ", "streaming ", "response"]
+
+
+def test_rate_limit_returns_429():
+    limiter = RateLimiter(store=MemoryStore(), limit=1)
+    limited = FastAPI()
+    limited.include_router(router)
+    limited.dependency_overrides[get_chat_service] = get_test_chat_service
+    limited.dependency_overrides[get_rate_limiter] = lambda: limiter
+    limited_client = TestClient(limited)
+    body = {"messages": [{"role": "user", "content": "Hello", "model": "gpt-4"}]}
+
+    assert limited_client.post("/chat/", json=body).status_code == 200
+    response = limited_client.post("/chat/", json=body)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_stream_can_be_replayed():
+    buffer = StreamReplayBuffer(store=MemoryStore())
+    replaying = FastAPI()
+    replaying.include_router(router)
+    replaying.dependency_overrides[get_chat_service] = get_test_chat_service
+    replaying.dependency_overrides[get_replay_buffer] = lambda: buffer
+    replaying_client = TestClient(replaying)
+
+    response = replaying_client.post(
+        "/chat/stream", json={"messages": [{"role": "user", "content": "Hello", "model": "gpt-4"}]}
+    )
+    stream_id = response.headers["X-Stream-Id"]
+    replay = replaying_client.get(f"/chat/stream/{stream_id}", params={"after": 1})
+
+    assert replay.status_code == 200
+    assert replay.text == "".join(response.text.split("\n\n", 1)[1:])
+    assert replaying_client.get("/chat/stream/unknown").status_code == 404
+
+
+class DelayedProvider:
+    """Streams three chunks per model, at a per-model pace"""
+
+    delays = {"fast": 0.02, "slow": 0.1}
+
+    def generate_response(self, messages):
+        raise NotImplementedError
+
+    async def generate_stream(self, messages):
+        model = messages[-1].model
+        if model == "broken":
+            raise RuntimeError("upstream down")
+        for i in range(3):
+            await asyncio.sleep(self.delays[model])
+            yield f"{model}{i} "
+
+
+def _compare_events(text):
+    return [json.loads(line[len("data: "):]) for line in text.split("\n\n") if line.startswith("data: ")]
+
+
+def test_compare_streams_models_concurrently():
+    store = MemoryStore()
+    comparing = FastAPI()
+    comparing.include_router(router)
+    comparing.dependency_overrides[get_chat_service] = lambda: ChatService(ai_provider=DelayedProvider())
+    comparing.dependency_overrides[get_shared_state] = lambda: store
+    comparing_client = TestClient(comparing)
+
+    started = time.perf_counter()
+    response = comparing_client.post(
+        "/chat/compare",
+        json={"messages": [{"role": "user", "content": "Hi"}], "models": ["slow", "fast", "broken", "fast"]},
+    )
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    assert response.headers["x-compare-id"]
+    events = _compare_events(response.text)
+    for model in ("fast", "slow"):
+        assert [e["content"] for e in events if e.get("model") == model and "content" in e] == [
+            f"{model}0 ", f"{model}1 ", f"{model}2 "
+        ]
+    done = {e["model"]: e for e in events if e.get("done") and "model" in e}
+    assert set(done) == {"fast", "slow", "broken"}
+    assert done["broken"]["error"] == "upstream down"
+    assert done["fast"]["duration_ms"] < done["slow"]["duration_ms"]
+    assert events[-1]["done"] is True and "model" not in events[-1]
+    # Wall time is the slowest model's, not the sum
+    assert elapsed < 0.3 + 0.06 + 0.25
+
+    assert comparing_client.delete(
+        f"/chat/compare/{response.headers['x-compare-id']}", params={"model": "slow"}
+    ).status_code == 204
+    assert store.get(f"compare:{response.headers['x-compare-id']}:cancel:slow") == b"1"
+
+
+def test_compare_validates_models():
+    response = client.post(
+        "/chat/compare", json={"messages": [{"role": "user", "content": "Hi"}], "models": []}
+    )
+    assert response.status_code == 422
+    assert client.delete("/chat/compare/abc", params={"model": "m"}).status_code == 404
+
+
+def test_content_parts_are_discriminated_by_type():
+    response = client.post(
+        "/chat",
+        json={"messages": [{"role": "user", "content": [{"type": "audio", "text": "Hi"}]}]},
+    )
+    assert response.status_code == 422
+    # Only the schema named by ``type`` is tried, so the error points at it alone
+    errors = response.json()["detail"]
+    assert any("union_tag_invalid" == error["type"] for error in errors)
+
+
+def test_request_limits():
+    from src.limits import RequestLimits, get_request_limits
+
+    app.dependency_overrides[get_request_limits] = lambda: RequestLimits(max_messages=2)
+    try:
+        messages = [{"role": "user", "content": "Hi"}] * 3
+        assert client.post("/chat", json={"messages": messages}).status_code == 413
+        assert client.post("/chat/stream", json={"messages": messages}).status_code == 413
+        assert client.post("/chat", json={"messages": messages[:2]}).status_code == 200
+    finally:
+        del app.dependency_overrides[get_request_limits]
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from prometheus_client import REGISTRY
+from src.chat.models import ChatResponse, Message
+from src.chat.scheduler import DeadlineExceeded, Priority, ScheduledProvider, UpstreamScheduler
+
+
+async def _run_in_grant_order(scheduler, requests):
+    """Queue requests behind a held slot, release it and return the order they are granted in"""
+    order = []
+
+    async def call(priority, user, label):
+        async with scheduler.acquire(priority, user):
+            order.append(label)
+            await asyncio.sleep(0)
+
+    blocker = asyncio.Event()
+
+    async def hold():
+        async with scheduler.acquire(Priority.INTERACTIVE, "holder"):
+            await blocker.wait()
+
+    holding = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    tasks = []
+    for priority, user, label in requests:
+        tasks.append(asyncio.create_task(call(priority, user, label)))
+        await asyncio.sleep(0)
+    blocker.set()
+    await asyncio.gather(holding, *tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_classes_are_served_in_priority_order():
+    order = await _run_in_grant_order(
+        UpstreamScheduler(max_concurrency=1),
+        [
+            (Priority.BATCH, "u", "batch"),
+            (Priority.BACKGROUND, "u", "title"),
+            (Priority.INTERACTIVE, "u", "chat"),
+        ],
+    )
+
+    assert order == ["chat", "title", "batch"]
+
+
+@pytest.mark.asyncio
+async def test_users_take_turns_by_weight():
+    requests = [(Priority.BATCH, "alice", f"alice-{i}") for i in range(4)]
+    requests += [(Priority.BATCH, "bob", f"bob-{i}") for i in range(2)]
+
+    order = await _run_in_grant_order(UpstreamScheduler(max_concurrency=1), requests)
+    # Bob's requests, queued after all of Alice's, are not stuck behind them
+    assert order == ["alice-0", "bob-0", "alice-1", "bob-1", "alice-2", "alice-3"]
+
+    weighted = UpstreamScheduler(max_concurrency=1, user_weights={"alice": 2})
+    order = await _run_in_grant_order(weighted, requests)
+    assert order == ["alice-0", "alice-1", "bob-0", "alice-2", "alice-3", "bob-1"]
+
+
+@pytest.mark.asyncio
+async def test_reserved_slots_are_kept_for_interactive_requests():
+    scheduler = UpstreamScheduler(max_concurrency=2, reserved_interactive=1)
+
+    async with scheduler.acquire(Priority.BATCH, "job"):
+        waiting = asyncio.create_task(scheduler.acquire(Priority.BATCH, "job").__aenter__())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        async with scheduler.acquire(Priority.INTERACTIVE, "user"):
+            assert scheduler.stats()["in_use"] == {"interactive": 1, "background": 0, "batch": 1}
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+    assert scheduler.stats()["queued"]["batch"] == 0
+
+
+def _dropped(priority):
+    return REGISTRY.get_sample_value("llm_scheduler_dropped_total", {"priority": priority}) or 0
+
+
+@pytest.mark.asyncio
+async def test_requests_past_their_deadline_are_dropped():
+    scheduler = UpstreamScheduler(max_concurrency=1, deadlines={Priority.BACKGROUND: 0.05})
+    dropped = _dropped("background")
+
+    async with scheduler.acquire(Priority.INTERACTIVE):
+        with pytest.raises(DeadlineExceeded, match="background request dropped"):
+            async with scheduler.acquire(Priority.BACKGROUND):
+                pass
+        # Blocking callers, e.g. title generation in the thread pool, too
+        with pytest.raises(DeadlineExceeded):
+            await asyncio.to_thread(lambda: scheduler.reserve(Priority.BACKGROUND).__enter__())
+
+    assert _dropped("background") == dropped + 2
+    assert scheduler.stats()["queued"] == {"interactive": 0, "background": 0, "batch": 0}
+    assert scheduler.stats()["in_use"]["interactive"] == 0
+
+
+class _StubProvider:
+    def generate_response(self, messages):
+        return ChatResponse(content="Title", model="gpt-4o-mini", timestamp=datetime.now(timezone.utc))
+
+    async def generate_stream(self, messages):
+        for chunk in ("a", "b", "c"):
+            yield chunk
+
+
+@pytest.mark.asyncio
+async def test_streams_hold_their_slot_until_closed():
+    scheduler = UpstreamScheduler(max_concurrency=1)
+    provider = _StubProvider()
+    chat = ScheduledProvider(provider, scheduler, priority=Priority.INTERACTIVE, user="alice")
+    titles = ScheduledProvider(provider, scheduler, priority=Priority.BACKGROUND, user="alice")
+    messages = [Message(role="user", content="Hello")]
+
+    stream = chat.generate_stream(messages)
+    assert await stream.__anext__() == "a"
+    title = asyncio.create_task(asyncio.to_thread(titles.generate_response, messages))
+    await asyncio.sleep(0.05)
+    assert not title.done()
+
+    # The consumer going away early gives the slot back
+    await stream.aclose()
+    assert (await title).content == "Title"
+    assert scheduler.stats()["in_use"] == {"interactive": 0, "background": 0, "batch": 0}
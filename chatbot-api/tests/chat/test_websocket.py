@@ -0,0 +1,148 @@
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.chat.routes import get_chat_service
+from src.chat.service import ChatService
+from src.chat.websocket import router, get_max_streams
+from src.limits import RequestLimits, get_request_limits
+
+
+class CountingProvider:
+    """Streams ``<model>0 ``, ``<model>1 ``... for as many chunks as the model name says"""
+
+    def __init__(self):
+        self.closed = []
+
+    def generate_response(self, messages):
+        raise NotImplementedError
+
+    async def generate_stream(self, messages):
+        model = messages[-1].model
+        if model == "broken":
+            raise RuntimeError("upstream down")
+        try:
+            for i in range(int(model.split("-")[1])):
+                await asyncio.sleep(0.005)
+                yield f"{model}:{i} "
+        finally:
+            self.closed.append(model)
+
+
+def make_client(provider, max_streams=100, limits=RequestLimits()):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_chat_service] = lambda: ChatService(ai_provider=provider)
+    app.dependency_overrides[get_max_streams] = lambda: max_streams
+    app.dependency_overrides[get_request_limits] = lambda: limits
+    return TestClient(app)
+
+
+def start(stream_id, model, **extra):
+    return {"type": "start", "id": stream_id, "messages": [{"role": "user", "content": "Hi", "model": model}], **extra}
+
+
+def receive_until_done(websocket, ids, events=None):
+    events, remaining = list(events or []), set(ids)
+    while remaining:
+        for event in websocket.receive_json():
+            events.append(event)
+            if event.get("done"):
+                remaining.discard(event["id"])
+    return events
+
+
+def next_error(websocket, stream_id=None):
+    """The next error for a stream, skipping the chunks of others"""
+    while True:
+        for event in websocket.receive_json():
+            if "error" in event and event.get("id") == stream_id:
+                return event["error"]
+
+
+def chunks(events, stream_id):
+    return [event["content"] for event in events if event.get("id") == stream_id and "content" in event]
+
+
+def test_multiplexes_concurrent_streams():
+    provider = CountingProvider()
+    with make_client(provider).websocket_connect("/ws/chat") as websocket:
+        websocket.send_json(start("a", "m-5"))
+        websocket.send_json(start("b", "m-3"))
+        websocket.send_json(start("c", "broken"))
+        events = receive_until_done(websocket, ["a", "b", "c"])
+
+    assert chunks(events, "a") == [f"m-5:{i} " for i in range(5)]
+    assert chunks(events, "b") == [f"m-3:{i} " for i in range(3)]
+    assert {"id": "c", "error": "upstream down"} in events
+    # Every stream ends with exactly one done event, after its chunks
+    for stream_id in "abc":
+        own = [event for event in events if event.get("id") == stream_id]
+        assert own[-1] == {"id": stream_id, "done": True}
+        assert sum(1 for event in own if event.get("done")) == 1
+
+
+def test_cancel_closes_the_upstream_stream():
+    provider = CountingProvider()
+    with make_client(provider).websocket_connect("/ws/chat") as websocket:
+        websocket.send_json(start("long", "m-1000"))
+        websocket.send_json(start("short", "m-2"))
+        first = websocket.receive_json()
+        assert first[0]["id"] in ("long", "short")
+        websocket.send_json({"type": "cancel", "id": "long"})
+        events = receive_until_done(websocket, ["long", "short"], first)
+
+    assert {"id": "long", "done": True, "cancelled": True} in events
+    assert len(chunks(events, "long")) < 1000
+    assert "m-1000" in provider.closed
+    assert chunks(events, "short") == ["m-2:0 ", "m-2:1 "]
+
+
+def test_flow_control_window():
+    provider = CountingProvider()
+    with make_client(provider).websocket_connect("/ws/chat") as websocket:
+        websocket.send_json(start("s", "m-6", window=2))
+        received = []
+        while len(received) < 2:
+            received += chunks(websocket.receive_json(), "s")
+        # Without credit the stream is paused after the window
+        websocket.send_json(start("probe", "m-1"))
+        events = receive_until_done(websocket, ["probe"])
+        assert chunks(events, "s") == []
+
+        websocket.send_json({"type": "credit", "id": "s", "n": 10})
+        events = receive_until_done(websocket, ["s"])
+
+    assert received + chunks(events, "s") == [f"m-6:{i} " for i in range(6)]
+
+
+def test_rejected_starts():
+    provider = CountingProvider()
+    client = make_client(provider, max_streams=1, limits=RequestLimits(max_messages=1))
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.send_json(start("a", "m-1000"))
+        websocket.send_json(start("a", "m-1"))
+        assert next_error(websocket, "a") == "Stream id already in use"
+        websocket.send_json(start("b", "m-1"))
+        assert next_error(websocket, "b") == "Too many concurrent streams (limit 1)"
+        websocket.send_json({"type": "cancel", "id": "a"})
+        receive_until_done(websocket, ["a"])
+
+        too_long = start("c", "m-1")
+        too_long["messages"] *= 2
+        websocket.send_json(too_long)
+        assert next_error(websocket, "c") == "Too many messages: 2 (limit 1)"
+        websocket.send_json({"type": "start", "id": "d", "messages": [{"role": "user", "content": [{"type": "audio"}]}]})
+        assert next_error(websocket, "d").startswith("Invalid messages")
+        websocket.send_json({"type": "pause", "id": "d"})
+        assert next_error(websocket, "d") == "Unknown frame type: 'pause'"
+        websocket.send_text("not json")
+        assert next_error(websocket) == "Frames must be JSON objects"
+
+
+def test_disconnect_cancels_running_streams():
+    provider = CountingProvider()
+    with make_client(provider).websocket_connect("/ws/chat") as websocket:
+        websocket.send_json(start("a", "m-1000"))
+        websocket.receive_json()
+
+    assert "m-1000" in provider.closed
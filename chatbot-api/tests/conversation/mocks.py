@@ -1,5 +1,7 @@
 from datetime import datetime, timezone
 from src.chat.models import Message
+from src.conversation.models import ConversationChanges, ConversationSummary
+from src.conversation.routes import ConversationSchema
 
 
 class MockRepository:
@@ -10,6 +12,8 @@ class MockRepository:
             cls._instance = super().__new__(cls)
             cls._instance.conversations = {}
             cls._instance.conversation_summaries = []
+            cls._instance.change_seqs = {}
+            cls._instance.sequence = 0
         return cls._instance
 
     def get_conversations(self):
@@ -18,6 +22,12 @@ class MockRepository:
     def get_conversation(self, conversation_id: str):
         return self.conversations.get(conversation_id)
 
+    def get_conversation_json(self, conversation_id: str):
+        conversation = self.conversations.get(conversation_id)
+        if conversation is None:
+            return None
+        return ConversationSchema.model_validate(conversation).model_dump_json().encode()
+
     def save_conversation(self, conversation):
         self.conversations[conversation.conversation_id] = conversation
         # Update summary
@@ -32,6 +42,40 @@ class MockRepository:
             if s["conversation_id"] != conversation.conversation_id
         ]
         self.conversation_summaries.append(summary)
+        self.sequence += 1
+        self.change_seqs[conversation.conversation_id] = self.sequence
+
+    def delete_conversation(self, conversation_id: str):
+        if self.conversations.pop(conversation_id, None) is None:
+            return False
+        self.conversation_summaries = [
+            s for s in self.conversation_summaries if s["conversation_id"] != conversation_id
+        ]
+        self.sequence += 1
+        self.change_seqs[conversation_id] = self.sequence
+        return True
+
+    def get_changes(self, since: int, limit: int = 500):
+        changed = sorted((seq, cid) for cid, seq in self.change_seqs.items() if seq > since)
+        changes = ConversationChanges(
+            cursor=changed[:limit][-1][0] if changed else since, has_more=len(changed) > limit
+        )
+        for _, conversation_id in changed[:limit]:
+            conversation = self.conversations.get(conversation_id)
+            if conversation is None:
+                changes.deleted.append(conversation_id)
+            else:
+                changes.changes.append(
+                    ConversationSummary(
+                        conversation_id=conversation_id,
+                        conversation_name=conversation.conversation_name,
+                        last_updated=conversation.last_updated,
+                    )
+                )
+        return changes
+
+    def get_change_sequence(self):
+        return self.sequence
 
 
 class MockAIProvider:
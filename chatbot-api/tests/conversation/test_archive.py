@@ -0,0 +1,142 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+import pytest
+from src.chat.models import Message
+from src.conversation.archive import ArchivedRecord, SegmentStore
+from src.conversation.models import Conversation
+from src.conversation.repository import SQLiteConversationRepository
+
+NOW = datetime.now(timezone.utc)
+
+
+def _conversation(conversation_id, age_days, text="Hello"):
+    last_updated = NOW - timedelta(days=age_days)
+    return Conversation(
+        conversation_id=conversation_id,
+        conversation_name=f"Chat {conversation_id}",
+        messages=[
+            Message(role="user", content=text, timestamp=last_updated),
+            Message(role="assistant", content=[{"type": "text", "text": "Hi"}], model="gpt-4o", timestamp=last_updated),
+        ],
+        last_updated=last_updated,
+    )
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return SegmentStore(str(tmp_path / "archive"), segment_max_bytes=4096)
+
+
+@pytest.fixture
+def repository(tmp_path, archive):
+    repository = SQLiteConversationRepository(db_path=str(tmp_path / "test.db"), archive=archive)
+    for i in range(20):
+        repository.save_conversation(_conversation(f"old-{i}", age_days=100 + i, text="x" * 300))
+    repository.save_conversation(_conversation("recent", age_days=1))
+    return repository
+
+
+def _hot_ids(repository):
+    with sqlite3.connect(repository.db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT conversation_id FROM conversations")}
+
+
+def test_segment_record_round_trip(archive):
+    record = ArchivedRecord("c1", "Chat", NOW.isoformat(), 7, b"\x00messages")
+    [(segment, offset, length)] = archive.append([record])
+    assert archive.read(segment, offset, length) == record
+
+
+def test_segment_detects_corruption(archive):
+    [(segment, offset, length)] = archive.append([ArchivedRecord("c1", "Chat", NOW.isoformat(), 1, b"abc" * 10)])
+    with open(archive.path(segment), "r+b") as f:
+        f.seek(offset + length - 1)
+        f.write(b"?")
+    with pytest.raises(ValueError):
+        archive.read(segment, offset, length)
+
+
+def test_segments_roll_over_at_max_size(archive):
+    records = [ArchivedRecord(f"c{i}", "Chat", NOW.isoformat(), i, os.urandom(1000)) for i in range(10)]
+    locations = archive.append(records)
+    assert len({segment for segment, _, _ in locations}) > 1
+    assert [archive.read(*location) for location in locations] == records
+
+
+def test_archive_moves_old_conversations_and_reads_through(repository):
+    before = {i: repository.get_conversation_json(f"old-{i}") for i in range(20)}
+    summaries_before = repository.get_conversations()
+
+    assert repository.archive_conversations(NOW - timedelta(days=90), batch_size=7) == 20
+
+    assert _hot_ids(repository) == {"recent"}
+    for i in range(20):
+        assert repository.get_conversation_json(f"old-{i}") == before[i]
+    conversation = repository.get_conversation("old-3")
+    assert conversation.messages[1].content == [{"type": "text", "text": "Hi"}]
+    assert repository.get_conversations() == summaries_before
+    assert repository.get_conversation("missing") is None
+
+
+def test_archiving_is_invisible_to_delta_sync(repository):
+    cursor = repository.get_change_sequence()
+    repository.archive_conversations(NOW - timedelta(days=90))
+    changes = repository.get_changes(cursor)
+    assert changes.changes == [] and changes.deleted == []
+    assert len(repository.get_changes(0).changes) == 21
+
+
+def test_save_rehydrates_archived_conversation(repository):
+    repository.archive_conversations(NOW - timedelta(days=90))
+    cursor = repository.get_change_sequence()
+
+    updated = repository.get_conversation("old-5")
+    updated.messages.append(Message(role="user", content="Back again", timestamp=NOW))
+    updated.last_updated = NOW
+    repository.save_conversation(updated)
+
+    assert "old-5" in _hot_ids(repository)
+    assert repository.get_conversation("old-5").messages[-1].content == "Back again"
+    assert [summary.conversation_id for summary in repository.get_conversations()].count("old-5") == 1
+    assert [summary.conversation_id for summary in repository.get_changes(cursor).changes] == ["old-5"]
+
+
+def test_delete_archived_conversation(repository):
+    repository.archive_conversations(NOW - timedelta(days=90))
+    assert repository.delete_conversation("old-2") is True
+    assert repository.get_conversation("old-2") is None
+    assert repository.delete_conversation("old-2") is False
+    assert repository.get_changes(repository.get_change_sequence() - 1).deleted == ["old-2"]
+
+
+def test_compaction_drops_dead_segments_and_keeps_live_records(repository, archive):
+    repository.archive_conversations(NOW - timedelta(days=90))
+    expected = {i: repository.get_conversation_json(f"old-{i}") for i in range(20)}
+    for i in range(15):
+        repository.delete_conversation(f"old-{i}")
+    segments_before = archive.segments()
+    size_before = sum(os.path.getsize(archive.path(segment)) for segment in segments_before)
+
+    stats = repository.compact_archive(min_live_ratio=0.5)
+
+    assert stats["segments"] > 0
+    assert sum(os.path.getsize(archive.path(segment)) for segment in archive.segments()) < size_before
+    for i in range(15, 20):
+        assert repository.get_conversation_json(f"old-{i}") == expected[i]
+
+
+def test_archive_requires_configured_store(tmp_path):
+    repository = SQLiteConversationRepository(db_path=str(tmp_path / "test.db"))
+    with pytest.raises(RuntimeError):
+        repository.archive_conversations(NOW)
+
+
+def test_export_includes_archived_conversations(repository):
+    repository.archive_conversations(NOW - timedelta(days=90))
+    expected = {conversation_id: repository.get_conversation_json(conversation_id)
+                for conversation_id in [f"old-{i}" for i in range(20)] + ["recent"]}
+
+    exported = list(repository.export_json(batch_size=3))
+
+    assert sorted(exported) == sorted(expected.values())
@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from src.chat.models import Message
+from src.conversation import backup as backup_module
+from src.conversation.archive import SegmentStore
+from src.conversation.backup import (
+    BackupScheduler,
+    backup_lock,
+    create_backup,
+    list_backups,
+    prune_backups,
+    restore_backup,
+)
+from src.conversation.models import Conversation
+from src.conversation.repository import SQLiteConversationRepository
+
+NOW = datetime.now(timezone.utc)
+
+
+def _conversation(conversation_id, age_days=0, text="Hello"):
+    last_updated = NOW - timedelta(days=age_days)
+    return Conversation(
+        conversation_id=conversation_id,
+        conversation_name=f"Chat {conversation_id}",
+        messages=[Message(role="user", content=text, timestamp=last_updated)],
+        last_updated=last_updated,
+    )
+
+
+def _ids(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT conversation_id FROM conversations")}
+
+
+def test_backup_is_a_consistent_snapshot_while_writes_continue(tmp_path):
+    repository = SQLiteConversationRepository(db_path=str(tmp_path / "live.db"))
+    for i in range(200):
+        repository.save_conversation(_conversation(f"c{i}", text=os.urandom(2000).hex()))
+    stop = threading.Event()
+    written = []
+
+    def write():
+        while not stop.is_set():
+            conversation_id = f"w{len(written)}"
+            repository.save_conversation(_conversation(conversation_id))
+            written.append(conversation_id)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        # One page per step so that the copy spans many commits
+        result = create_backup(repository.db_path, str(tmp_path / "backups"), pages_per_step=1)
+    finally:
+        stop.set()
+        writer.join()
+
+    assert result.steps > 50
+    assert written, "the writer was blocked for the whole backup"
+    backup_db = os.path.join(result.path, "conversations.db")
+    assert not os.path.exists(backup_db + "-wal")
+    with sqlite3.connect(backup_db) as conn:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        # Exactly the conversations committed before the snapshot
+        assert conn.execute("SELECT MAX(change_seq) FROM conversations").fetchone()[0] == result.change_sequence
+    assert {f"c{i}" for i in range(200)} <= _ids(backup_db)
+    assert len(_ids(backup_db)) < 200 + len(written)
+    assert list_backups(str(tmp_path / "backups")) == [result.name]
+
+
+def test_throttle_limits_copy_rate(tmp_path):
+    repository = SQLiteConversationRepository(db_path=str(tmp_path / "live.db"))
+    for i in range(50):
+        repository.save_conversation(_conversation(f"c{i}", text=os.urandom(4000).hex()))
+    with sqlite3.connect(repository.db_path) as conn:
+        size = conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+    started = time.perf_counter()
+    create_backup(repository.db_path, str(tmp_path / "backups"), pages_per_step=16, max_bytes_per_second=size * 4)
+    assert time.perf_counter() - started >= 0.2
+
+
+def test_restore_with_archive(tmp_path):
+    archive = SegmentStore(str(tmp_path / "archive"), segment_max_bytes=4096)
+    repository = SQLiteConversationRepository(db_path=str(tmp_path / "live.db"), archive=archive)
+    for i in range(10):
+        repository.save_conversation(_conversation(f"old-{i}", age_days=100, text=os.urandom(500).hex()))
+    repository.save_conversation(_conversation("recent"))
+    repository.archive_conversations(NOW - timedelta(days=90))
+    expected = {i: repository.get_conversation_json(f"old-{i}") for i in range(10)}
+    result = create_backup(repository.db_path, str(tmp_path / "backups"), archive_dir=archive.archive_dir)
+    assert result.segments == len(archive.segments()) > 1
+
+    # Changes after the backup: deletions, compaction and a new conversation
+    for i in range(8):
+        repository.delete_conversation(f"old-{i}")
+    repository.compact_archive()
+    repository.save_conversation(_conversation("after-backup"))
+
+    restore_backup(result.path, repository.db_path, archive_dir=archive.archive_dir)
+
+    restored = SQLiteConversationRepository(db_path=repository.db_path, archive=SegmentStore(archive.archive_dir))
+    for i in range(10):
+        assert restored.get_conversation_json(f"old-{i}") == expected[i]
+    assert restored.get_conversation("after-backup") is None
+    assert restored.get_change_sequence() == result.change_sequence
+    with sqlite3.connect(repository.db_path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # The database that was replaced is kept
+    assert "after-backup" in _ids(repository.db_path + ".before-restore")
+
+
+def _fake_backup(backup_dir, name):
+    os.makedirs(os.path.join(backup_dir, name))
+    with open(os.path.join(backup_dir, name, "manifest.json"), "w") as f:
+        json.dump({"created_at": name}, f)
+
+
+def test_prune_keeps_newest_and_removes_partials(tmp_path):
+    backup_dir = str(tmp_path / "backups")
+    names = [f"2024050{day}T000000Z" for day in range(1, 6)]
+    for name in names:
+        _fake_backup(backup_dir, name)
+    os.makedirs(os.path.join(backup_dir, "20240506T000000Z.partial"))
+
+    assert list_backups(backup_dir) == names
+    assert prune_backups(backup_dir, keep=2) == names[:3]
+    assert sorted(os.listdir(backup_dir)) == names[3:]
+
+
+def test_scheduler_backs_up_when_due_and_not_locked(tmp_path):
+    repository = SQLiteConversationRepository(db_path=str(tmp_path / "live.db"))
+    repository.save_conversation(_conversation("c1"))
+    backup_dir = str(tmp_path / "backups")
+    scheduler = BackupScheduler(repository.db_path, backup_dir, interval=3600, keep=2)
+
+    with backup_lock(backup_dir) as acquired:
+        assert acquired
+        # Another process is backing up
+        assert scheduler.run_once() is None
+
+    result = scheduler.run_once()
+    assert result is not None and "c1" in _ids(os.path.join(result.path, "conversations.db"))
+    assert 3590 < scheduler.seconds_until_due() <= 3600
+    # Not due again yet, e.g. for a second worker process
+    assert scheduler.run_once() is None
+
+
+def test_failed_backup_leaves_no_complete_backup(tmp_path, monkeypatch):
+    archive = SegmentStore(str(tmp_path / "archive"))
+    repository = SQLiteConversationRepository(db_path=str(tmp_path / "live.db"), archive=archive)
+    repository.save_conversation(_conversation("old", age_days=100))
+    repository.archive_conversations(NOW - timedelta(days=90))
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(backup_module, "_copy_file", fail)
+    with pytest.raises(OSError):
+        create_backup(repository.db_path, str(tmp_path / "backups"), archive_dir=archive.archive_dir)
+    assert list_backups(str(tmp_path / "backups")) == []
+
+
+def test_backup_lock_without_fcntl(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup_module, "fcntl", None)
+
+    with backup_module.backup_lock(str(tmp_path / "backups")) as acquired:
+        assert acquired
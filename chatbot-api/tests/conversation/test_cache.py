@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+import pytest
+from src.conversation.cache import CachingConversationRepository, ENTRY_OVERHEAD_BYTES
+from src.conversation.models import Conversation
+from src.conversation.repository import SQLiteConversationRepository
+from src.shared.store import SQLiteStore
+from src.chat.models import Message
+
+
+def _conversation(conversation_id, text="Hello"):
+    return Conversation(
+        conversation_id=conversation_id,
+        conversation_name="Test Conversation",
+        messages=[
+            Message(role="user", content=text, model="gpt-4", timestamp=datetime.now(timezone.utc))
+        ],
+        last_updated=datetime.now(timezone.utc),
+    )
+
+
+@pytest.fixture
+def backing(tmp_path):
+    return SQLiteConversationRepository(db_path=str(tmp_path / "test.db"))
+
+
+def test_read_through_and_hit_ratio(backing):
+    cache = CachingConversationRepository(backing)
+    backing.save_conversation(_conversation("a"))
+
+    first = cache.get_conversation_json("a")
+    second = cache.get_conversation_json("a")
+
+    assert first == second == backing.get_conversation_json("a")
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["entries"] == 1
+    assert stats["bytes"] > len(first)
+
+
+def test_missing_conversation_is_not_cached(backing):
+    cache = CachingConversationRepository(backing)
+
+    assert cache.get_conversation_json("missing") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_save_invalidates_entry(backing):
+    cache = CachingConversationRepository(backing)
+    cache.save_conversation(_conversation("a", "Hello"))
+    cache.get_conversation_json("a")
+
+    cache.save_conversation(_conversation("a", "Updated"))
+
+    assert b"Updated" in cache.get_conversation_json("a")
+    assert cache.stats()["misses"] == 2
+
+
+def test_evicts_least_recently_used_by_bytes(backing):
+    for conversation_id in ("a", "b", "c"):
+        backing.save_conversation(_conversation(conversation_id, "x" * 100))
+    entry_size = len(backing.get_conversation_json("a")) + 1 + ENTRY_OVERHEAD_BYTES
+    cache = CachingConversationRepository(backing, max_bytes=entry_size * 2)
+
+    cache.get_conversation_json("a")
+    cache.get_conversation_json("b")
+    cache.get_conversation_json("a")  # "b" is now least recently used
+    cache.get_conversation_json("c")
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+    cache.get_conversation_json("a")
+    assert cache.stats()["hits"] == 2
+
+
+def test_shared_store_keeps_worker_caches_consistent(backing, tmp_path):
+    store = SQLiteStore(str(tmp_path / "shared.db"))
+    worker_a = CachingConversationRepository(backing, store=store)
+    worker_b = CachingConversationRepository(backing, store=SQLiteStore(str(tmp_path / "shared.db")))
+    backing.save_conversation(_conversation("a", "before"))
+    worker_b.get_conversation_json("a")
+
+    worker_a.save_conversation(_conversation("a", "after"))
+
+    assert b"after" in worker_b.get_conversation_json("a")
+    assert worker_b.stats()["hits"] == 0
+    worker_b.get_conversation_json("a")
+    assert worker_b.stats()["hits"] == 1
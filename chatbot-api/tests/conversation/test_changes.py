@@ -0,0 +1,154 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+import httpx
+import pytest
+from fastapi import FastAPI
+from src.conversation.changes import ChangeFeed
+from src.conversation.models import Conversation
+from src.conversation.repository import SQLiteConversationRepository
+from src.conversation.routes import (
+    router,
+    get_change_feed,
+    get_conversation_service,
+    stream_conversation_changes,
+)
+from src.conversation.service import ConversationService
+
+
+def _conversation(conversation_id):
+    return Conversation(
+        conversation_id=conversation_id,
+        conversation_name="Chat",
+        messages=[],
+        last_updated=datetime.now(timezone.utc),
+    )
+
+
+@pytest.fixture
+def repository(tmp_path):
+    return SQLiteConversationRepository(db_path=str(tmp_path / "test.db"))
+
+
+@pytest.fixture
+def feed(repository):
+    return ChangeFeed(repository, poll_interval=0.02)
+
+
+@pytest.fixture
+def client(repository, feed):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_conversation_service] = lambda: ConversationService(
+        repository=repository, ai_provider=None
+    )
+    app.dependency_overrides[get_change_feed] = lambda: feed
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_feed_sees_changes_from_other_workers(repository, feed):
+    waiter = asyncio.create_task(feed.wait(0, timeout=5))
+    await asyncio.sleep(0.05)
+
+    # Written without notify, as another worker process would
+    repository.save_conversation(_conversation("a"))
+
+    assert await asyncio.wait_for(waiter, 1) == 1
+
+
+@pytest.mark.asyncio
+async def test_feed_wait_times_out(feed):
+    started = time.monotonic()
+
+    assert await feed.wait(0, timeout=0.1) == 0
+    assert time.monotonic() - started >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_changes_endpoint_and_delete(client):
+    async with client:
+        await client.post("/api/conversations", json={"conversation_id": "a", "messages": []})
+        await client.post("/api/conversations", json={"conversation_id": "b", "messages": []})
+        full = (await client.get("/api/conversations/changes")).json()
+
+        assert (await client.delete("/api/conversations/b")).status_code == 204
+        assert (await client.delete("/api/conversations/b")).status_code == 404
+        delta = (await client.get("/api/conversations/changes", params={"since": full["cursor"]})).json()
+
+    assert [c["conversation_id"] for c in full["changes"]] == ["a", "b"]
+    assert delta == {"changes": [], "deleted": ["b"], "cursor": full["cursor"] + 1, "has_more": False}
+
+
+@pytest.mark.asyncio
+async def test_long_poll_returns_when_a_change_arrives(client):
+    async with client:
+        poll = asyncio.create_task(client.get("/api/conversations/changes", params={"wait": 10}))
+        await asyncio.sleep(0.05)
+        assert not poll.done()
+
+        await client.post("/api/conversations", json={"conversation_id": "a", "messages": []})
+        response = await asyncio.wait_for(poll, 1)
+
+    assert [c["conversation_id"] for c in response.json()["changes"]] == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_stream_pushes_changes(repository, feed):
+    service = ConversationService(repository=repository, ai_provider=None)
+    response = await stream_conversation_changes(since=0, service=service, feed=feed)
+    events = response.body_iterator
+
+    repository.save_conversation(_conversation("a"))
+    first = await asyncio.wait_for(events.__anext__(), 1)
+    next_event = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0.05)
+    repository.save_conversation(_conversation("b"))
+    second = await asyncio.wait_for(next_event, 1)
+    await events.aclose()
+
+    assert first.startswith("id: 1\ndata: ") and '"conversation_id":"a"' in first
+    assert second.startswith("id: 2\n") and '"conversation_id":"b"' in second
+
+
+@pytest.mark.asyncio
+async def test_other_tenants_changes_do_not_end_a_long_poll(repository, feed):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_conversation_service] = lambda: ConversationService(
+        repository=repository.for_tenant("alice"), ai_provider=None
+    )
+    app.dependency_overrides[get_change_feed] = lambda: feed
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    async with client:
+        poll = asyncio.create_task(client.get("/api/conversations/changes", params={"wait": 10}))
+        await asyncio.sleep(0.05)
+        repository.for_tenant("bob").save_conversation(_conversation("bobs"))
+        await asyncio.sleep(0.1)
+        assert not poll.done()
+
+        repository.for_tenant("alice").save_conversation(_conversation("alices"))
+        response = await asyncio.wait_for(poll, 1)
+
+    assert [c["conversation_id"] for c in response.json()["changes"]] == ["alices"]
+
+
+@pytest.mark.asyncio
+async def test_stream_waits_through_other_tenants_changes(repository, feed):
+    alice = repository.for_tenant("alice")
+    service = ConversationService(repository=alice, ai_provider=None)
+    response = await stream_conversation_changes(since=0, service=service, feed=feed)
+    events = response.body_iterator
+
+    next_event = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0.05)
+    repository.for_tenant("bob").save_conversation(_conversation("bobs"))
+    await asyncio.sleep(0.1)
+    assert not next_event.done()
+
+    alice.save_conversation(_conversation("alices"))
+    event = await asyncio.wait_for(next_event, 1)
+    await events.aclose()
+
+    assert '"conversation_id":"alices"' in event
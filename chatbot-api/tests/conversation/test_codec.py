@@ -0,0 +1,88 @@
+import json
+import pytest
+from src.conversation.codec import (
+    MessageCodec,
+    FORMAT_RAW,
+    FORMAT_ZLIB,
+)
+
+
+def _messages(text="Hello", count=1):
+    return [
+        {"role": "user", "content": text, "model": "gpt-4", "timestamp": "2024-01-01T00:00:00+00:00"}
+        for _ in range(count)
+    ]
+
+
+def test_round_trip_compressed():
+    codec = MessageCodec(compression="zlib")
+    messages = _messages("A fairly repetitive message. " * 50, count=10)
+
+    blob = codec.encode([dict(m) for m in messages])
+
+    assert blob[0] == FORMAT_ZLIB
+    assert len(blob) < len(json.dumps(messages))
+    assert codec.decode(blob) == messages
+
+
+def test_small_payload_is_stored_raw():
+    codec = MessageCodec(compression="zlib")
+
+    blob = codec.encode(_messages())
+
+    assert blob[0] == FORMAT_RAW
+    assert codec.decode(blob) == _messages()
+
+
+def test_structured_content_is_single_encoded():
+    codec = MessageCodec(compression="none")
+    content = [{"type": "text", "text": "Hi"}]
+
+    blob = codec.encode([{"role": "user", "content": content, "model": None, "timestamp": "t"}])
+
+    assert b'\\"type\\"' not in blob
+    assert codec.decode(blob)[0]["content"] == content
+
+
+def test_text_that_looks_like_json_stays_text():
+    codec = MessageCodec(compression="none")
+    messages = [{"role": "user", "content": "[1, 2]", "model": None, "timestamp": "t"}]
+
+    blob = codec.encode(messages)
+
+    assert codec.decode(blob)[0]["content"] == "[1, 2]"
+    assert messages[0]["content"] == "[1, 2]"
+
+
+def test_zstd_compressor_per_thread():
+    from concurrent.futures import ThreadPoolExecutor
+
+    pytest.importorskip("zstandard")
+    codec = MessageCodec(compression="zstd")
+    messages = _messages("A fairly repetitive message. " * 50, count=10)
+
+    with ThreadPoolExecutor(4) as pool:
+        blobs = list(pool.map(lambda _: codec.encode(messages), range(32)))
+
+    assert all(codec.decode(blob) == messages for blob in blobs)
+
+
+def test_decode_legacy_text():
+    codec = MessageCodec()
+    content = [{"type": "text", "text": "Hi"}]
+    legacy = json.dumps(
+        [
+            {"role": "user", "content": json.dumps(content), "model": None, "timestamp": "t"},
+            {"role": "assistant", "content": "not [json", "model": None, "timestamp": "t"},
+        ]
+    )
+
+    decoded = codec.decode(legacy)
+
+    assert decoded[0]["content"] == content
+    assert decoded[1]["content"] == "not [json"
+
+
+def test_unknown_format_version():
+    with pytest.raises(ValueError):
+        MessageCodec().decode(b"\x7f{}")
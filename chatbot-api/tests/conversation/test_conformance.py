@@ -0,0 +1,203 @@
+"""Behaviour every ConversationRepository implementation must share.
+
+Add a backend to BACKENDS to run the whole suite against it, and to
+``benchmarks/bench_repositories.py`` to measure it.
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+from src.chat.models import Message
+from src.conversation.cache import CachingConversationRepository
+from src.conversation.models import Conversation
+from src.conversation.repository import create_repository
+from src.conversation.routes import ConversationSchema
+
+BACKENDS = {
+    "sqlite": lambda path: create_repository(f"sqlite:///{path}/conversations.db"),
+    "log": lambda path: create_repository(f"log:///{path}/conversations"),
+    "sqlite+cache": lambda path: CachingConversationRepository(
+        create_repository(f"sqlite:///{path}/conversations.db")
+    ),
+    "sqlite+shards": lambda path: create_repository(f"sqlite:///{path}/conversations.db", shards=3),
+}
+
+NOW = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _conversation(conversation_id, minutes=0, name="Chat", text="Hello"):
+    timestamp = NOW + timedelta(minutes=minutes)
+    return Conversation(
+        conversation_id=conversation_id,
+        conversation_name=name,
+        messages=[
+            Message(role="user", content=text, timestamp=timestamp),
+            Message(
+                role="assistant",
+                content=[{"type": "text", "text": "Hi"}, {"type": "image_url", "image_url": {"url": "data:,"}}],
+                model="gpt-4o",
+                timestamp=timestamp,
+            ),
+        ],
+        last_updated=timestamp,
+    )
+
+
+@pytest.fixture(params=list(BACKENDS))
+def open_repository(request, tmp_path):
+    return lambda: BACKENDS[request.param](tmp_path)
+
+
+@pytest.fixture
+def repository(open_repository):
+    return open_repository()
+
+
+def test_save_and_get_round_trip(repository):
+    conversation = _conversation("c1")
+    repository.save_conversation(conversation)
+    loaded = repository.get_conversation("c1")
+    assert loaded.conversation_name == "Chat"
+    assert loaded.last_updated == NOW
+    assert [(m.role, m.content, m.model, m.timestamp) for m in loaded.messages] == [
+        (m.role, m.content, m.model, m.timestamp) for m in conversation.messages
+    ]
+
+
+def test_json_matches_schema_serialization(repository):
+    conversation = _conversation("c1")
+    repository.save_conversation(conversation)
+    served = ConversationSchema.model_validate_json(repository.get_conversation_json("c1"))
+    assert served == ConversationSchema.model_validate(conversation)
+
+
+def test_missing_conversation(repository):
+    assert repository.get_conversation("missing") is None
+    assert repository.get_conversation_json("missing") is None
+    assert repository.delete_conversation("missing") is False
+
+
+def test_update_replaces_conversation(repository):
+    repository.save_conversation(_conversation("c1"))
+    repository.get_conversation_json("c1")
+    repository.save_conversation(_conversation("c1", minutes=5, name="Renamed", text="Updated"))
+    assert repository.get_conversation("c1").messages[0].content == "Updated"
+    assert json.loads(repository.get_conversation_json("c1"))["conversation_name"] == "Renamed"
+    assert len(repository.get_conversations()) == 1
+
+
+def test_list_is_newest_first(repository):
+    for i, minutes in enumerate([5, 1, 9, 3]):
+        repository.save_conversation(_conversation(f"c{i}", minutes=minutes))
+    assert [s.conversation_id for s in repository.get_conversations()] == ["c2", "c0", "c3", "c1"]
+    assert repository.get_conversations()[0].last_updated == NOW + timedelta(minutes=9)
+
+
+def test_delete_leaves_tombstone(repository):
+    repository.save_conversation(_conversation("c1"))
+    cursor = repository.get_change_sequence()
+    assert repository.delete_conversation("c1") is True
+    assert repository.get_conversation("c1") is None
+    assert repository.get_conversation_json("c1") is None
+    changes = repository.get_changes(cursor)
+    assert changes.deleted == ["c1"] and changes.changes == []
+    assert changes.cursor == repository.get_change_sequence() > cursor
+
+
+def test_resave_after_delete(repository):
+    repository.save_conversation(_conversation("c1"))
+    repository.delete_conversation("c1")
+    repository.save_conversation(_conversation("c1", text="Back"))
+    assert repository.get_conversation("c1").messages[0].content == "Back"
+    changes = repository.get_changes(0)
+    assert [s.conversation_id for s in changes.changes] == ["c1"] and changes.deleted == []
+
+
+def test_changes_are_ordered_and_paginated(repository):
+    for i in range(5):
+        repository.save_conversation(_conversation(f"c{i}"))
+    repository.save_conversation(_conversation("c1", minutes=1))
+
+    first = repository.get_changes(0, limit=3)
+    assert [s.conversation_id for s in first.changes] == ["c0", "c2", "c3"]
+    assert first.has_more
+    rest = repository.get_changes(first.cursor, limit=3)
+    assert [s.conversation_id for s in rest.changes] == ["c4", "c1"]
+    assert not rest.has_more
+    assert repository.get_changes(rest.cursor).changes == []
+
+
+def test_change_sequence_is_monotonic(repository):
+    sequences = [repository.get_change_sequence()]
+    for i in range(3):
+        repository.save_conversation(_conversation(f"c{i}"))
+        sequences.append(repository.get_change_sequence())
+    repository.delete_conversation("c0")
+    sequences.append(repository.get_change_sequence())
+    assert sequences == sorted(set(sequences))
+
+
+def test_data_survives_reopen(open_repository):
+    repository = open_repository()
+    repository.save_conversation(_conversation("c1"))
+    repository.save_conversation(_conversation("c2"))
+    repository.delete_conversation("c2")
+    sequence = repository.get_change_sequence()
+
+    reopened = open_repository()
+    assert reopened.get_conversation_json("c1") == repository.get_conversation_json("c1")
+    assert reopened.get_conversation("c2") is None
+    assert reopened.get_change_sequence() == sequence
+
+
+def test_instances_see_each_others_writes(open_repository):
+    # Worker processes each open their own instance over the same storage
+    first, second = open_repository(), open_repository()
+    first.save_conversation(_conversation("c1"))
+    assert second.get_conversation("c1").conversation_name == "Chat"
+    second.save_conversation(_conversation("c2"))
+    assert {s.conversation_id for s in first.get_conversations()} == {"c1", "c2"}
+    assert first.get_change_sequence() == second.get_change_sequence()
+
+
+def test_export_then_import_restores_conversations(repository):
+    for i in range(5):
+        repository.save_conversation(_conversation(f"c{i}", minutes=i, text=f"Hello {i}"))
+    exported = [json.loads(body) for body in repository.export_json(batch_size=2)]
+    assert sorted(item["conversation_id"] for item in exported) == [f"c{i}" for i in range(5)]
+    before = {f"c{i}": repository.get_conversation_json(f"c{i}") for i in range(5)}
+
+    repository.delete_conversation("c0")
+    repository.save_conversation(_conversation("c1", minutes=1, text="Edited"))
+    cursor = repository.get_change_sequence()
+    batches = []
+    assert repository.import_conversations(exported, batch_size=2, on_batch=batches.append) == 5
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    for conversation_id, body in before.items():
+        assert ConversationSchema.model_validate_json(
+            repository.get_conversation_json(conversation_id)
+        ) == ConversationSchema.model_validate_json(body)
+    assert len(repository.get_conversations()) == 5
+    # Imported conversations reach delta sync clients
+    changes = repository.get_changes(cursor)
+    assert sorted(summary.conversation_id for summary in changes.changes) == [f"c{i}" for i in range(5)]
+    assert changes.deleted == []
+
+
+def test_import_stops_at_an_invalid_conversation(repository):
+    items = [json.loads(line) for line in _exported(["a", "b", "c"])]
+    items[2] = {"conversation_id": "c", "messages": "not a list", "last_updated": NOW.isoformat()}
+
+    with pytest.raises(ValueError, match="Conversation 3"):
+        repository.import_conversations(items, batch_size=2)
+    # The batch before the invalid conversation stays imported
+    assert repository.get_conversation("a") is not None
+    assert repository.get_conversation("c") is None
+
+
+def _exported(conversation_ids):
+    return [
+        json.dumps(ConversationSchema.model_validate(_conversation(conversation_id)).model_dump(mode="json"))
+        for conversation_id in conversation_ids
+    ]
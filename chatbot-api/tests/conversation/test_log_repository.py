@@ -0,0 +1,70 @@
+import os
+from datetime import datetime, timezone
+import pytest
+from src.conversation.log_repository import LogConversationRepository
+from src.conversation.models import Conversation
+from src.chat.models import Message
+
+
+def _conversation(conversation_id, text="Hello"):
+    now = datetime.now(timezone.utc)
+    return Conversation(
+        conversation_id=conversation_id,
+        conversation_name="Chat",
+        messages=[Message(role="user", content=text, timestamp=now)],
+        last_updated=now,
+    )
+
+
+@pytest.fixture
+def repository(tmp_path):
+    return LogConversationRepository(directory=str(tmp_path / "log"), sync=False)
+
+
+def test_compaction_drops_superseded_records(repository):
+    for i in range(10):
+        repository.save_conversation(_conversation("c1", text=f"version {i}" * 50))
+    repository.save_conversation(_conversation("c2"))
+    repository.delete_conversation("c2")
+    size = os.path.getsize(repository.path)
+    sequence = repository.get_change_sequence()
+
+    reclaimed = repository.compact()
+
+    assert reclaimed > 0 and os.path.getsize(repository.path) == size - reclaimed
+    assert repository.get_conversation("c1").messages[0].content == "version 9" * 50
+    assert repository.get_changes(0).deleted == ["c2"]
+    assert repository.get_change_sequence() == sequence
+
+
+def test_other_instances_follow_compaction(repository):
+    other = LogConversationRepository(directory=repository.directory, sync=False)
+    for i in range(3):
+        repository.save_conversation(_conversation("c1", text=f"version {i}"))
+    assert other.get_conversation("c1").messages[0].content == "version 2"
+    repository.compact()
+    assert other.get_conversation("c1").messages[0].content == "version 2"
+    other.save_conversation(_conversation("c2"))
+    assert repository.get_conversation("c2") is not None
+
+
+def test_torn_tail_is_ignored_and_truncated(repository):
+    repository.save_conversation(_conversation("c1"))
+    size = os.path.getsize(repository.path)
+    with open(repository.path, "ab") as f:
+        f.write(b"CVL1\x00partial")
+
+    reopened = LogConversationRepository(directory=repository.directory, sync=False)
+    assert reopened.get_conversation("c1") is not None
+    reopened.save_conversation(_conversation("c2"))
+    assert LogConversationRepository(directory=repository.directory).get_conversation("c2") is not None
+    assert os.path.getsize(repository.path) > size
+
+
+def test_corrupt_record_is_rejected(repository):
+    repository.save_conversation(_conversation("c1"))
+    with open(repository.path, "r+b") as f:
+        f.seek(-2, os.SEEK_END)
+        f.write(b"??")
+    with pytest.raises(ValueError):
+        LogConversationRepository(directory=repository.directory)
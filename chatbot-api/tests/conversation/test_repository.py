@@ -162,4 +162,214 @@ def test_save_conversation_with_structured_content(repository):
     assert isinstance(saved_conv.messages[0].content, list)
     assert len(saved_conv.messages[0].content) == 2
     assert saved_conv.messages[0].content[0]["type"] == "text"
-    assert saved_conv.messages[0].content[1]["type"] == "image_url" 
\ No newline at end of file
+    assert saved_conv.messages[0].content[1]["type"] == "image_url" 
+
+def test_read_and_migrate_legacy_rows(repository, test_db_path):
+    """Test that rows in the legacy JSON text format are readable and migratable"""
+    import json
+    import sqlite3
+    from src.conversation.migrate import migrate_messages
+
+    legacy_messages = json.dumps(
+        [
+            {
+                "role": "user",
+                "content": json.dumps([{"type": "text", "text": "Legacy"}]),
+                "model": "gpt-4",
+                "timestamp": "2024-01-01T00:00:00+00:00",
+            }
+        ]
+    )
+    with sqlite3.connect(test_db_path) as conn:
+        conn.execute(
+            "INSERT INTO conversations (conversation_id, conversation_name, messages, last_updated) VALUES (?, ?, ?, ?)",
+            ("legacy-id", "Legacy", legacy_messages, "2024-01-01T00:00:00+00:00"),
+        )
+
+    before = repository.get_conversation("legacy-id")
+    stats = migrate_messages(test_db_path)
+    after = repository.get_conversation("legacy-id")
+
+    assert stats["rows"] == 1
+    assert before.messages[0].content == [{"type": "text", "text": "Legacy"}]
+    assert after.messages == before.messages
+    with sqlite3.connect(test_db_path) as conn:
+        kind = conn.execute("SELECT typeof(messages) FROM conversations").fetchone()[0]
+    assert kind == "blob"
+    assert migrate_messages(test_db_path)["rows"] == 0
+
+
+def test_get_conversation_json_matches_schema(repository):
+    """Test that the raw JSON fast path matches the validated conversation"""
+    import json
+    from src.conversation.routes import ConversationSchema
+
+    conv = Conversation(
+        conversation_id="test-id",
+        conversation_name="Test Conversation",
+        messages=[
+            Message(
+                role="user",
+                content=[{"type": "text", "text": "Hello"}],
+                model="gpt-4",
+                timestamp=datetime.now(timezone.utc)
+            ),
+            Message(
+                role="assistant",
+                content="Hi there",
+                timestamp=datetime.now(timezone.utc)
+            ),
+        ],
+        last_updated=datetime.now(timezone.utc)
+    )
+    repository.save_conversation(conv)
+
+    body = repository.get_conversation_json("test-id")
+    expected = ConversationSchema.model_validate(repository.get_conversation("test-id"))
+
+    assert ConversationSchema.model_validate(json.loads(body)) == expected
+    assert repository.get_conversation_json("nonexistent-id") is None
+
+
+def _empty_conversation(conversation_id, name="Chat"):
+    return Conversation(
+        conversation_id=conversation_id,
+        conversation_name=name,
+        messages=[],
+        last_updated=datetime.now(timezone.utc),
+    )
+
+
+def test_changes_since_cursor(repository):
+    """Test that saves and deletes advance the change cursor"""
+    repository.save_conversation(_empty_conversation("a"))
+    repository.save_conversation(_empty_conversation("b"))
+    full = repository.get_changes(0)
+    assert [c.conversation_id for c in full.changes] == ["a", "b"]
+    assert full.cursor == repository.get_change_sequence() == 2
+
+    repository.save_conversation(_empty_conversation("a", "Renamed"))
+    assert repository.delete_conversation("b")
+    assert not repository.delete_conversation("b")
+
+    delta = repository.get_changes(full.cursor)
+    assert [(c.conversation_id, c.conversation_name) for c in delta.changes] == [("a", "Renamed")]
+    assert delta.deleted == ["b"]
+    assert repository.get_changes(delta.cursor).changes == []
+
+    # Re-creating a deleted conversation replaces its tombstone
+    repository.save_conversation(_empty_conversation("b"))
+    recreated = repository.get_changes(delta.cursor)
+    assert [c.conversation_id for c in recreated.changes] == ["b"]
+    assert repository.get_changes(0).deleted == []
+
+
+def test_changes_are_paged(repository):
+    """Test that a limit returns the oldest changes first and flags the rest"""
+    for i in range(5):
+        repository.save_conversation(_empty_conversation(f"c{i}"))
+
+    page = repository.get_changes(0, limit=3)
+    rest = repository.get_changes(page.cursor, limit=3)
+
+    assert [c.conversation_id for c in page.changes] == ["c0", "c1", "c2"]
+    assert page.has_more
+    assert [c.conversation_id for c in rest.changes] == ["c3", "c4"]
+    assert not rest.has_more
+
+
+def test_existing_database_gets_change_sequence(test_db_path):
+    """Test that rows from before delta sync are numbered when the column is added"""
+    import sqlite3
+
+    with sqlite3.connect(test_db_path) as conn:
+        conn.execute(
+            "CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT NOT NULL, "
+            "conversation_name TEXT NOT NULL, messages BLOB NOT NULL, last_updated TEXT NOT NULL)"
+        )
+        for conversation_id in ("old-1", "old-2"):
+            conn.execute(
+                "INSERT INTO conversations (conversation_id, conversation_name, messages, last_updated) "
+                "VALUES (?, 'Old', '[]', '2024-01-01T00:00:00+00:00')",
+                (conversation_id,),
+            )
+
+    repository = SQLiteConversationRepository(db_path=test_db_path)
+    repository.save_conversation(_empty_conversation("new"))
+
+    assert [c.conversation_id for c in repository.get_changes(0).changes] == ["old-1", "old-2", "new"]
+    assert repository.get_change_sequence() == 3
+
+
+def test_tenants_are_isolated(repository):
+    """Test that each tenant view only sees its own conversations, even with the same ids"""
+    alice = repository.for_tenant("alice")
+    bob = repository.for_tenant("bob")
+    alice.save_conversation(_empty_conversation("shared-id"))
+    bob.save_conversation(_empty_conversation("shared-id"))
+    bob.save_conversation(_empty_conversation("bob-only"))
+
+    assert [c.conversation_id for c in alice.get_conversations()] == ["shared-id"]
+    assert repository.get_conversations() == []
+    assert alice.get_conversation("bob-only") is None
+
+    assert bob.delete_conversation("shared-id")
+    assert alice.get_conversation("shared-id") is not None
+    assert alice.get_changes(0).deleted == []
+    assert bob.get_changes(0).deleted == ["shared-id"]
+
+
+def test_existing_database_gets_tenant_keys(test_db_path):
+    """Test that tables from before tenancy are keyed by tenant, keeping their rows in the default tenant"""
+    import sqlite3
+
+    repository = SQLiteConversationRepository(db_path=test_db_path)
+    repository.save_conversation(_empty_conversation("kept"))
+    repository.save_conversation(_empty_conversation("deleted"))
+    repository.delete_conversation("deleted")
+    with sqlite3.connect(test_db_path) as conn:
+        # Recreate the pre-tenancy layout
+        conn.execute("DROP INDEX uq_conversations_tenant_conversation_id")
+        conn.execute("ALTER TABLE conversations DROP COLUMN tenant_id")
+        conn.execute("DROP TABLE conversation_tombstones")
+        conn.execute("CREATE TABLE conversation_tombstones (conversation_id TEXT PRIMARY KEY, change_seq INTEGER NOT NULL)")
+        conn.execute("INSERT INTO conversation_tombstones VALUES ('deleted', 2)")
+
+    repository = SQLiteConversationRepository(db_path=test_db_path)
+
+    assert [c.conversation_id for c in repository.get_conversations()] == ["kept"]
+    assert repository.get_changes(0).deleted == ["deleted"]
+    repository.for_tenant("other").delete_conversation("deleted")
+    repository.for_tenant("other").save_conversation(_empty_conversation("deleted"))
+    assert repository.get_changes(0).deleted == ["deleted"]
+
+
+def test_concurrent_first_saves_keep_one_row(test_db_path):
+    """Test that workers saving the same new conversation at once leave a single row"""
+    import sqlite3
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = [SQLiteConversationRepository(db_path=test_db_path) for _ in range(4)]
+    with ThreadPoolExecutor(len(workers)) as pool:
+        list(pool.map(lambda worker: worker.save_conversation(_empty_conversation("raced")), workers))
+
+    with sqlite3.connect(test_db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0] == 1
+
+
+def test_existing_duplicates_are_removed(test_db_path):
+    """Test that duplicate rows from before the unique index keep only the latest save"""
+    import sqlite3
+
+    repository = SQLiteConversationRepository(db_path=test_db_path)
+    repository.save_conversation(_empty_conversation("dup"))
+    with sqlite3.connect(test_db_path) as conn:
+        conn.execute("DROP INDEX uq_conversations_tenant_conversation_id")
+        conn.execute(
+            "INSERT INTO conversations (tenant_id, conversation_id, conversation_name, messages, last_updated, change_seq) "
+            "SELECT tenant_id, conversation_id, 'Latest', messages, last_updated, change_seq + 1 FROM conversations"
+        )
+
+    repository = SQLiteConversationRepository(db_path=test_db_path)
+
+    assert [c.conversation_name for c in repository.get_conversations()] == ["Latest"]
@@ -132,6 +132,15 @@ def test_save_conversation():
 
     response = client.post("/api/conversations", json=conversation_data)
     assert response.status_code == 200
+    # A lone part is stored the way the chat routes send it, as a list
+    assert mock_repository.get_conversation("test-id-2").messages[0].content == [
+        {"type": "text", "text": "Hello with structure"}
+    ]
+
+    # Parts must be of a known type
+    conversation_data["messages"][0]["content"] = [{"type": "video", "url": "x"}]
+    response = client.post("/api/conversations", json=conversation_data)
+    assert response.status_code == 422
 
 
 def test_generate_name():
@@ -143,3 +152,64 @@ def test_generate_name():
     data = response.json()
     assert "name" in data
     assert data["name"] == "Mock Conversation Title"
+
+
+def test_get_conversation_not_modified():
+    # Clear repository
+    mock_repository.conversations.clear()
+    mock_repository.conversation_summaries.clear()
+
+    conversation_data = {
+        "conversation_id": "test-id",
+        "conversation_name": "Test Conversation",
+        "messages": [{"role": "user", "content": "Hello"}],
+    }
+    client.post("/api/conversations", json=conversation_data)
+
+    response = client.get("/api/conversations/test-id")
+    etag = response.headers["etag"]
+
+    # Unchanged conversation returns 304 without a body
+    response = client.get("/api/conversations/test-id", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # After an update the old ETag no longer matches
+    conversation_data["messages"].append({"role": "assistant", "content": "Hi"})
+    client.post("/api/conversations", json=conversation_data)
+    response = client.get("/api/conversations/test-id", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_get_conversation_last_modified():
+    mock_repository.conversations.clear()
+    mock_repository.conversation_summaries.clear()
+
+    client.post(
+        "/api/conversations",
+        json={
+            "conversation_id": "test-id",
+            "conversation_name": "Test Conversation",
+            "messages": [{"role": "user", "content": "Hello"}],
+        },
+    )
+
+    response = client.get("/api/conversations/test-id")
+    last_modified = response.headers["last-modified"]
+    assert last_modified.endswith(" GMT")
+
+    response = client.get("/api/conversations/test-id", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    response = client.get(
+        "/api/conversations/test-id", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}
+    )
+    assert response.status_code == 200
+
+    # If-None-Match takes precedence over If-Modified-Since
+    response = client.get(
+        "/api/conversations/test-id",
+        headers={"If-Modified-Since": last_modified, "If-None-Match": '"other"'},
+    )
+    assert response.status_code == 200
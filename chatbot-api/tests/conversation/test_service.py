@@ -127,3 +127,17 @@ def test_generate_name_error():
     # Assert that generate_name raises the exception
     with pytest.raises(Exception):
         service.generate_name("Hello")
+
+
+def test_generate_name_is_traced(conversation_service):
+    from src.observability import tracing
+    from tests.observability.test_tracing import MemoryExporter
+
+    exporter = MemoryExporter()
+    tracing.configure_tracing(tracing.Tracer(exporter=exporter, sample_rate=1.0))
+    try:
+        conversation_service.generate_name("Hello")
+    finally:
+        tracing.configure_tracing(tracing.Tracer())
+
+    assert [span.name for span in exporter.spans] == ["ConversationService.generate_name"]
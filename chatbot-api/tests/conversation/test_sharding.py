@@ -0,0 +1,144 @@
+import os
+from datetime import datetime, timezone
+import pytest
+from src.chat.models import Message
+from src.conversation.cache import CachingConversationRepository
+from src.conversation.models import Conversation
+from src.conversation.repository import SQLiteConversationRepository
+from src.conversation.service import ConversationService
+from src.conversation.sharding import (
+    HashRing,
+    ShardedConversationRepository,
+    existing_shards,
+    move_tenant,
+    rebalance,
+    shard_path,
+)
+
+TENANTS = [f"tenant-{i}" for i in range(2000)]
+
+
+def _conversation(conversation_id, name="Chat"):
+    now = datetime.now(timezone.utc)
+    return Conversation(
+        conversation_id=conversation_id,
+        conversation_name=name,
+        messages=[Message(role="user", content="Hello", timestamp=now)],
+        last_updated=now,
+    )
+
+
+def test_ring_spreads_tenants_and_moves_few_when_growing():
+    four, five = HashRing(4), HashRing(5)
+    counts = [0] * 4
+    for tenant_id in TENANTS:
+        counts[four.shard(tenant_id)] += 1
+    assert min(counts) > len(TENANTS) / 4 * 0.7
+
+    moved = [tenant_id for tenant_id in TENANTS if four.shard(tenant_id) != five.shard(tenant_id)]
+    # Only tenants taken over by the new shard move
+    assert {five.shard(tenant_id) for tenant_id in moved} == {4}
+    assert len(moved) < len(TENANTS) / 5 * 1.3
+
+
+def test_shard_files(tmp_path):
+    db_path = str(tmp_path / "conversations.db")
+    repository = ShardedConversationRepository(db_path=db_path, shards=3)
+
+    assert [shard.db_path for shard in repository.shards] == [
+        db_path, str(tmp_path / "conversations-1.db"), str(tmp_path / "conversations-2.db")
+    ]
+    assert existing_shards(db_path) == [0, 1, 2]
+
+
+def test_tenants_write_to_their_own_shard(tmp_path):
+    repository = ShardedConversationRepository(db_path=str(tmp_path / "conversations.db"), shards=3)
+    for tenant_id in TENANTS[:30]:
+        ConversationService(repository=repository, ai_provider=None, tenant_id=tenant_id).save_conversation(
+            _conversation("c1", name=tenant_id)
+        )
+
+    for tenant_id in TENANTS[:30]:
+        own = repository.shards[repository.shard_index(tenant_id)]
+        assert own.for_tenant(tenant_id).get_conversation("c1").conversation_name == tenant_id
+        for other in repository.shards:
+            if other is not own:
+                assert other.for_tenant(tenant_id).get_conversations() == []
+
+
+def test_cache_views_are_per_tenant(tmp_path):
+    cache = CachingConversationRepository(ShardedConversationRepository(db_path=str(tmp_path / "c.db"), shards=2))
+    alice, bob = cache.for_tenant("alice"), cache.for_tenant("bob")
+    alice.save_conversation(_conversation("c1", name="Alice's"))
+    bob.save_conversation(_conversation("c1", name="Bob's"))
+
+    assert b"Alice's" in alice.get_conversation_json("c1")
+    assert b"Bob's" in bob.get_conversation_json("c1")
+    assert b"Alice's" in alice.get_conversation_json("c1")
+    assert cache.get_conversation_json("c1") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 3, 2)
+
+
+def test_rebalance_moves_tenants_to_their_new_shard(tmp_path):
+    db_path = str(tmp_path / "conversations.db")
+    single = SQLiteConversationRepository(db_path=db_path)
+    for tenant_id in TENANTS[:20]:
+        view = single.for_tenant(tenant_id)
+        for i in range(3):
+            view.save_conversation(_conversation(f"c{i}", name=tenant_id))
+        view.delete_conversation("c2")
+    cursors = {tenant_id: single.for_tenant(tenant_id).get_changes(0).cursor for tenant_id in TENANTS[:20]}
+
+    assert rebalance(db_path, 3, dry_run=True)
+    moves = rebalance(db_path, 3, batch_size=2)
+    assert {move["tenant_id"] for move in moves} == {
+        tenant_id for tenant_id in TENANTS[:20] if HashRing(3).shard(tenant_id) != 0
+    }
+    assert all(move["conversations"] == 2 for move in moves)
+    assert rebalance(db_path, 3) == []
+
+    sharded = ShardedConversationRepository(db_path=db_path, shards=3)
+    for tenant_id in TENANTS[:20]:
+        view = sharded.for_tenant(tenant_id)
+        assert sorted(c.conversation_id for c in view.get_conversations()) == ["c0", "c1"]
+        assert view.get_changes(0).deleted == ["c2"]
+        # A client's cursor from the old shard still sees changes made on the new one;
+        # moved conversations are sent again
+        view.save_conversation(_conversation("c3"))
+        changed = [c.conversation_id for c in view.get_changes(cursors[tenant_id]).changes]
+        assert changed[-1] == "c3" and set(changed) <= {"c0", "c1", "c3"}
+
+    # Shrinking drains the shards beyond the new count
+    rebalance(db_path, 1)
+    for tenant_id in TENANTS[:20]:
+        assert len(single.for_tenant(tenant_id).get_conversations()) == 3
+    for shard in (1, 2):
+        assert SQLiteConversationRepository(db_path=shard_path(db_path, shard)).get_changes(0).changes == []
+
+
+def test_move_keeps_newer_writes_on_the_target(tmp_path):
+    source = SQLiteConversationRepository(db_path=str(tmp_path / "a.db")).for_tenant("t")
+    target = SQLiteConversationRepository(db_path=str(tmp_path / "b.db")).for_tenant("t")
+    for conversation_id in ("updated", "deleted", "untouched"):
+        source.save_conversation(_conversation(conversation_id, name="old"))
+    # Written through the new shard before the move
+    target.save_conversation(_conversation("updated", name="new"))
+    target.save_conversation(_conversation("deleted"))
+    target.delete_conversation("deleted")
+
+    assert move_tenant(source, target, "t") == 1
+
+    assert target.get_conversation("updated").conversation_name == "new"
+    assert target.get_conversation("deleted") is None
+    assert target.get_conversation("untouched").conversation_name == "old"
+    assert source.get_conversations() == []
+
+
+def test_sharded_store_rejects_archive(tmp_path):
+    from src.conversation.archive import SegmentStore
+    from src.conversation.repository import create_repository
+
+    with pytest.raises(ValueError, match="single shard"):
+        create_repository(f"sqlite:///{tmp_path}/c.db", archive=SegmentStore(str(tmp_path / "archive")), shards=2)
+    assert not os.path.exists(tmp_path / "c.db")
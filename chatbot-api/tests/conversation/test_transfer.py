@@ -0,0 +1,109 @@
+import gzip
+import json
+from datetime import datetime, timezone
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.chat.models import Message
+from src.conversation.models import Conversation
+from src.conversation.repository import SQLiteConversationRepository
+from src.conversation.routes import router, get_conversation_service
+from src.conversation.service import ConversationService
+from src.conversation.transfer import decode_lines, ndjson_chunks, open_dump, split_lines
+from tests.conversation.mocks import mock_ai_provider
+
+NOW = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _conversation(conversation_id):
+    return Conversation(
+        conversation_id=conversation_id,
+        conversation_name=f"Chat {conversation_id}",
+        messages=[Message(role="user", content=f"Hello from {conversation_id}", timestamp=NOW)],
+        last_updated=NOW,
+    )
+
+
+def test_ndjson_chunks_and_split_lines_round_trip():
+    bodies = [f'{{"n":{i}}}'.encode() for i in range(100)]
+    chunks = list(ndjson_chunks(bodies, chunk_bytes=64))
+    assert len(chunks) > 1
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    # Re-split at arbitrary boundaries, as a network body arrives
+    data = b"".join(chunks)
+    pieces = [data[i:i + 7] for i in range(0, len(data), 7)]
+    assert [line for line in split_lines(pieces) if line] == bodies
+
+
+def test_decode_lines_names_the_bad_line():
+    with pytest.raises(ValueError, match="Line 3"):
+        list(decode_lines([b'{"a":1}', b"", b"{not json"]))
+    assert list(decode_lines([b'{"a":1}', b"  ", b"[2]"])) == [{"a": 1}, [2]]
+
+
+@pytest.mark.parametrize("name", ["dump.ndjson", "dump.ndjson.gz", "dump.ndjson.zst"])
+def test_open_dump_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    with open_dump(path, "wb") as f:
+        f.write(b'{"a":1}\n' * 1000)
+    with open_dump(path, "rb") as f:
+        assert f.read() == b'{"a":1}\n' * 1000
+
+
+@pytest.fixture
+def client(tmp_path):
+    repository = SQLiteConversationRepository(db_path=str(tmp_path / "test.db"))
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_conversation_service] = lambda: ConversationService(
+        repository=repository, ai_provider=mock_ai_provider
+    )
+    client = TestClient(app)
+    client.repository = repository
+    return client
+
+
+def test_export_streams_ndjson(client):
+    for i in range(3):
+        client.repository.save_conversation(_conversation(f"c{i}"))
+
+    response = client.get("/api/conversations/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.content.splitlines()
+    assert [json.loads(line)["conversation_id"] for line in lines] == ["c0", "c1", "c2"]
+    assert lines[0] == client.repository.get_conversation_json("c0")
+
+
+def test_import_accepts_compressed_bodies(client):
+    dump = b"".join(
+        json.dumps({"conversation_id": f"c{i}", "conversation_name": "Chat", "last_updated": NOW.isoformat(),
+                    "messages": [{"role": "user", "content": "Hi", "timestamp": NOW.isoformat()}]}).encode() + b"\n"
+        for i in range(10)
+    )
+
+    response = client.post(
+        "/api/conversations/import?batch_size=3",
+        content=gzip.compress(dump),
+        headers={"content-type": "application/x-ndjson", "content-encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["imported"] == 10
+    assert len(client.repository.get_conversations()) == 10
+    assert client.get("/api/conversations/c9").json()["messages"][0]["content"] == "Hi"
+
+
+def test_import_rejects_bad_input(client):
+    response = client.post("/api/conversations/import", content=b'{"conversation_id": "a"}\n{oops\n')
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Line 2: invalid JSON"
+
+    response = client.post(
+        "/api/conversations/import", content=b"not gzip", headers={"content-encoding": "gzip"}
+    )
+    assert response.status_code == 400
+
+    response = client.post("/api/conversations/import", content=b"", headers={"content-encoding": "lzma"})
+    assert response.status_code == 415
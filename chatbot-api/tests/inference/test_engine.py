@@ -0,0 +1,102 @@
+import threading
+import numpy as np
+import pytest
+from src.inference.engine import BatchingEngine
+from src.inference.model import EOS, LocalModel, ModelConfig, encode
+
+CONFIG = ModelConfig(dim=32, layers=2, heads=2, hidden=64, max_seq=128)
+
+
+@pytest.fixture(scope="module")
+def model():
+    return LocalModel.random(CONFIG, seed=3)
+
+
+def test_ragged_batches_and_chunked_prompts_match_single_passes(model):
+    first, second = encode("Hello there, how are you?"), encode("Other")
+
+    alone = [model.forward([model.new_cache(64)], [tokens])[0] for tokens in (first, second)]
+    together = model.forward([model.new_cache(64), model.new_cache(64)], [first, second])
+    cache = model.new_cache(64)
+    model.forward([cache], [first[:10]])
+    chunked = model.forward([cache], [first[10:]])[0]
+
+    np.testing.assert_allclose(together[0], alone[0], rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(together[1], alone[1], rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(chunked, alone[0], rtol=1e-4, atol=1e-4)
+    assert cache.length == len(first)
+
+
+def test_save_and_load(model, tmp_path):
+    model.save(str(tmp_path / "model.npz"))
+    loaded = LocalModel.load(str(tmp_path / "model.npz"))
+
+    assert loaded.config == CONFIG
+    tokens = encode("Hi")
+    np.testing.assert_array_equal(
+        loaded.forward([loaded.new_cache(8)], [tokens]), model.forward([model.new_cache(8)], [tokens])
+    )
+
+
+def _generate(engine, prompts, **options):
+    """Submit prompts at once and wait for all of them; returns each one's tokens"""
+    outputs = [[] for _ in prompts]
+    done = threading.Semaphore(0)
+
+    def emitter(i):
+        def emit(token, error):
+            assert error is None
+            if token is None:
+                done.release()
+            else:
+                outputs[i].append(token)
+
+        return emit
+
+    for i, prompt in enumerate(prompts):
+        engine.submit(encode(prompt), emitter(i), temperature=0, **options)
+    for _ in prompts:
+        assert done.acquire(timeout=10)
+    return outputs
+
+
+def test_concurrent_generations_share_forward_passes(model):
+    prompts = [f"Prompt number {i}" for i in range(6)]
+    alone = [_generate(BatchingEngine(model, max_batch=1, token_budget=64, max_new_tokens=12), [p])[0] for p in prompts]
+
+    engine = BatchingEngine(model, max_batch=4, token_budget=64, max_new_tokens=12)
+    together = _generate(engine, prompts)
+    engine.stop()
+
+    # Greedy decoding gives each sequence the same tokens in a batch as alone
+    assert together == alone
+    assert all(0 < len(tokens) <= 12 and EOS not in tokens for tokens in together)
+    generated = sum(len(tokens) for tokens in together)
+    assert engine.steps < generated
+
+
+def test_long_prompts_are_prefilled_in_chunks(model):
+    engine = BatchingEngine(model, max_batch=2, token_budget=8, max_new_tokens=4)
+    [tokens] = _generate(engine, ["x" * 40])
+
+    assert engine.steps >= 40 // 8 + len(tokens) - 1
+    # Too long for the model: the most recent tokens are kept
+    [tokens] = _generate(engine, ["y" * 500])
+    assert tokens
+
+
+def test_cancelled_generations_leave_the_batch(model):
+    engine = BatchingEngine(model, max_batch=1, token_budget=16, max_new_tokens=60)
+    first_token = threading.Event()
+
+    def emit(token, error):
+        first_token.set()
+
+    generation = engine.submit(encode("cancel me"), emit, temperature=0)
+    assert first_token.wait(10)
+    engine.cancel(generation)
+    # The only batch slot is free again
+    assert _generate(engine, ["next"])[0]
+    engine.stop()
+    with pytest.raises(RuntimeError):
+        engine.submit(encode("late"), emit)
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+import pytest
+from src.chat.models import ChatResponse, ImageContent, Message, TextContent
+from src.inference.engine import BatchingEngine
+from src.inference.model import LocalModel, ModelConfig
+from src.inference.provider import LocalProvider, render_prompt
+from src.usage.accounting import UsageRecorder, UsageStore
+
+
+@pytest.fixture(scope="module")
+def engine():
+    model = LocalModel.random(ModelConfig(dim=32, layers=2, heads=2, hidden=64, max_seq=256), seed=5)
+    engine = BatchingEngine(model, max_batch=8, token_budget=64, max_new_tokens=24)
+    yield engine
+    engine.stop()
+
+
+class RemoteProvider:
+    def generate_response(self, messages, user=""):
+        return ChatResponse(content=f"remote for {user}", model="gpt-4o", timestamp=datetime.now(timezone.utc))
+
+    async def generate_stream(self, messages, user=""):
+        yield "remote"
+
+
+def question(text="Hello", model="local"):
+    return [Message(role="user", content=text, model=model)]
+
+
+def test_prompt_template():
+    messages = [
+        Message(role="system", content="Be brief"),
+        Message(role="user", content=[TextContent(text="What is this?"), ImageContent(image_url={"url": "http://x"})]),
+    ]
+    assert render_prompt(messages) == "<|system|>\nBe brief\n<|user|>\nWhat is this?\n[image]\n<|assistant|>\n"
+
+
+@pytest.mark.asyncio
+async def test_streams_concurrently_through_the_engine(engine):
+    provider = LocalProvider(engine, temperature=0)
+    expected = provider.generate_response(question())
+
+    async def stream(text):
+        return "".join([chunk async for chunk in provider.generate_stream(question(text))])
+
+    steps = engine.steps
+    results = await asyncio.gather(*(stream("Hello") for _ in range(8)))
+    assert results == [expected.content] * 8
+    # Eight streams of up to 24 tokens in about as many passes as one
+    assert engine.steps - steps < 24 * 2
+
+
+@pytest.mark.asyncio
+async def test_closing_a_stream_frees_its_slot(engine):
+    provider = LocalProvider(engine, temperature=0)
+    stream = provider.generate_stream(question())
+    await stream.__anext__()
+    await stream.aclose()
+
+    for _ in range(100):
+        if not engine._running:
+            break
+        await asyncio.sleep(0.01)
+    assert not engine._running
+
+
+@pytest.mark.asyncio
+async def test_other_models_go_to_the_fallback(engine, tmp_path):
+    store = UsageStore(str(tmp_path / "usage.db"))
+    provider = LocalProvider(engine, fallback=RemoteProvider(), usage=UsageRecorder(store))
+    alice = provider.for_user("alice")
+
+    assert alice.generate_response(question(model="gpt-4o")).content == "remote for alice"
+    assert [chunk async for chunk in alice.generate_stream(question(model="gpt-4o"))] == ["remote"]
+    assert alice.generate_response(question()).model == "local"
+    "".join([chunk async for chunk in alice.generate_stream(question())])
+    # Without a fallback, every model runs locally
+    assert LocalProvider(engine).generate_response(question(model="gpt-4o")).model == "local"
+
+    provider.usage.flush()
+    [row] = store.query(0, time.time() + 60, interval=None)
+    assert (row["user"], row["model"], row["requests"], row["estimated_requests"]) == ("alice", "local", 2, 0)
+    assert row["cost_usd"] == 0 and row["completion_tokens"] > 0
@@ -0,0 +1,144 @@
+from types import SimpleNamespace
+import pytest
+from prometheus_client import REGISTRY, CollectorRegistry
+from src.chat.models import Message
+from src.chat.provider import OpenAIProvider
+from src.observability.metrics import OTHER_MODEL, CacheStatsCollector, allow_model_label, llm_metrics
+
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], usage=None)
+
+
+def _usage(prompt_tokens, completion_tokens, cached_tokens=0):
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+    )
+
+
+class FakeCompletions:
+    def __init__(self, chunks=None, error=None):
+        self.chunks = chunks or []
+        self.error = error
+
+    def create(self, model, messages, stream=False, **options):
+        if self.error:
+            raise self.error
+        if stream:
+            return iter(self.chunks)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Hi"))],
+            usage=_usage(7, 3, cached_tokens=4),
+        )
+
+
+def _provider(completions):
+    provider = OpenAIProvider(api_key="test-api-key")
+    provider.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return provider
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_stream_records_ttft_tokens_and_in_flight():
+    labels = {"model": "metrics-stream-model", "backend": "openai"}
+    allow_model_label(labels["model"])
+    provider = _provider(FakeCompletions([_chunk("a"), _chunk(None), _chunk("b"), _chunk("c")]))
+    messages = [Message(role="user", content="Hello", model=labels["model"])]
+
+    chunks = []
+    async for chunk in provider.generate_stream(messages):
+        assert _sample("llm_streams_in_flight", **labels) == 1
+        chunks.append(chunk)
+
+    assert chunks == ["a", "b", "c"]
+    assert _sample("llm_streams_in_flight", **labels) == 0
+    assert _sample("llm_time_to_first_token_seconds_count", **labels) == 1
+    assert _sample("llm_tokens_total", direction="out", **labels) == 3
+    assert _sample("llm_inter_token_latency_seconds_count", **labels) == 1
+    assert _sample("llm_request_duration_seconds_count", mode="stream", **labels) == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_error_is_counted():
+    labels = {"model": "metrics-error-model", "backend": "openai"}
+    allow_model_label(labels["model"])
+    provider = _provider(FakeCompletions(error=RuntimeError("upstream down")))
+
+    with pytest.raises(RuntimeError):
+        async for _ in provider.generate_stream([Message(role="user", content="Hi", model=labels["model"])]):
+            pass
+
+    assert _sample("llm_errors_total", **labels) == 1
+    assert _sample("llm_streams_in_flight", **labels) == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_setup_error_leaves_no_stream_in_flight(monkeypatch):
+    labels = {"model": "metrics-setup-error-model", "backend": "openai"}
+    allow_model_label(labels["model"])
+    provider = _provider(FakeCompletions())
+    monkeypatch.setattr(provider, "_request_options", lambda *args: 1 / 0)
+
+    with pytest.raises(ZeroDivisionError):
+        async for _ in provider.generate_stream([Message(role="user", content="Hi", model=labels["model"])]):
+            pass
+
+    assert _sample("llm_streams_in_flight", **labels) == 0
+
+
+def test_response_records_usage():
+    labels = {"model": "metrics-complete-model", "backend": "openai"}
+    allow_model_label(labels["model"])
+    provider = _provider(FakeCompletions())
+
+    provider.generate_response([Message(role="user", content="Hi", model=labels["model"])])
+
+    assert _sample("llm_tokens_total", direction="in", **labels) == 7
+    assert _sample("llm_tokens_total", direction="out", **labels) == 3
+    assert _sample("llm_tokens_total", direction="cached", **labels) == 4
+    assert _sample("llm_request_duration_seconds_count", mode="complete", **labels) == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_records_usage_chunk():
+    labels = {"model": "metrics-usage-model", "backend": "openai"}
+    allow_model_label(labels["model"])
+    usage_chunk = SimpleNamespace(choices=[], usage=_usage(120, 2, cached_tokens=96))
+    provider = _provider(FakeCompletions([_chunk("a"), _chunk("b"), usage_chunk]))
+
+    tokens = [t async for t in provider.generate_stream([Message(role="user", content="Hi", model=labels["model"])])]
+
+    assert tokens == ["a", "b"]
+    assert _sample("llm_tokens_total", direction="in", **labels) == 120
+    assert _sample("llm_tokens_total", direction="cached", **labels) == 96
+
+
+def test_label_sets_are_bound_once():
+    assert llm_metrics("m", "openai") is llm_metrics("m", "openai")
+
+
+def test_unknown_models_share_a_label():
+    assert llm_metrics("client-chosen-1", "openai") is llm_metrics("client-chosen-2", "openai")
+    assert llm_metrics(None, "openai") is llm_metrics(OTHER_MODEL, "openai")
+    allow_model_label("configured-model")
+    assert llm_metrics("configured-model", "openai") is not llm_metrics(OTHER_MODEL, "openai")
+
+
+def test_cache_stats_collector():
+    stats = {"hits": 3, "misses": 1, "evictions": 0, "hit_ratio": 0.75, "entries": 2, "bytes": 10, "max_bytes": 100}
+    families = {family.name: family for family in CacheStatsCollector(lambda: stats).collect()}
+
+    assert families["conversation_cache_hit_ratio"].samples[0].value == 0.75
+    assert families["conversation_cache_hits"].samples[0].value == 3
+    assert list(CacheStatsCollector(dict).collect()) == []
+
+
+def test_cache_stats_collector_registers_without_collecting():
+    registry = CollectorRegistry()
+    registry.register(CacheStatsCollector(lambda: pytest.fail("collected at registration")))
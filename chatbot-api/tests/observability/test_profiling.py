@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.observability.profiling import (
+    CProfileMiddleware,
+    EventLoopMonitor,
+    ProfilingState,
+    StackSampler,
+)
+from src.observability.routes import router, get_profiling_state
+
+
+@pytest.fixture
+def state(tmp_path):
+    return ProfilingState(output_dir=str(tmp_path))
+
+
+@pytest.fixture
+def client(state, monkeypatch):
+    monkeypatch.setenv("PROFILING_TOKEN", "secret")
+    app = FastAPI()
+    app.include_router(router)
+
+    @app.get("/work")
+    async def work():
+        return {"total": sum(range(10_000))}
+
+    app.add_middleware(CProfileMiddleware, state=state)
+    app.dependency_overrides[get_profiling_state] = lambda: state
+    return TestClient(app, headers={"X-Admin-Token": "secret"})
+
+
+def busy_worker(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_produces_folded_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_worker, args=(stop,), name="busy")
+    worker.start()
+    try:
+        stacks = StackSampler().sample(0.1, interval=0.001)
+    finally:
+        stop.set()
+        worker.join()
+
+    folded = StackSampler.folded(stacks)
+    busy = [line for line in folded.splitlines() if line.startswith("busy;")]
+    assert busy and all("busy_worker (test_profiling.py" in line for line in busy)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in busy)
+
+
+def test_cprofile_dumps_matching_routes(client, state, tmp_path):
+    client.get("/work")
+    assert list(tmp_path.glob("*.prof")) == []
+
+    assert client.put("/admin/profile/cprofile", params={"pattern": "^/work$"}).status_code == 200
+    client.get("/work")
+    client.get("/admin/profile/files")
+
+    assert [p.name.split("_")[:2] for p in tmp_path.glob("*.prof")] == [["GET", "work"]]
+
+
+def test_sample_endpoint_saves_file(client, tmp_path):
+    response = client.post("/admin/profile/sample", params={"seconds": 0.05, "interval": 0.01})
+
+    assert response.status_code == 200
+    assert (tmp_path / response.headers["X-Profile-Path"].split("/")[-1]).read_text() == response.text
+
+
+def test_tracemalloc_snapshot(client):
+    assert client.post("/admin/profile/tracemalloc/snapshot").status_code == 409
+    client.post("/admin/profile/tracemalloc/start")
+    try:
+        response = client.post("/admin/profile/tracemalloc/snapshot", params={"limit": 3})
+    finally:
+        client.post("/admin/profile/tracemalloc/stop")
+
+    assert response.status_code == 200
+    assert len(response.json()["top"]) <= 3
+    assert client.get("/admin/profile/files").json() == [response.json()["path"].split("/")[-1]]
+
+
+def test_admin_token_required(client, monkeypatch):
+    assert client.get("/admin/profile/files").status_code == 200
+    assert client.get("/admin/profile/files", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    monkeypatch.delenv("PROFILING_TOKEN")
+    assert client.get("/admin/profile/files").status_code == 403
+    assert client.put("/admin/profile/cprofile", params={"pattern": ".*"}).status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_event_loop_monitor_reports_blocking_call():
+    monitor = EventLoopMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+    await asyncio.sleep(0.02)
+
+    time.sleep(0.2)  # a synchronous call on the loop thread
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+
+    assert monitor.blocked_stacks
+    assert "test_event_loop_monitor_reports_blocking_call" in monitor.blocked_stacks[0]
@@ -0,0 +1,141 @@
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.chat.routes import router, get_chat_service
+from src.chat.service import ChatService
+from src.observability import tracing
+from src.observability.tracing import (
+    FileSpanExporter,
+    SpanExporter,
+    Tracer,
+    TracingMiddleware,
+    parse_traceparent,
+    span_to_otlp,
+)
+from tests.chat.test_chat import MockAIProvider
+
+
+class MemoryExporter(SpanExporter):
+    def __init__(self):
+        super().__init__()
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def write(self, payload):
+        pass
+
+
+@pytest.fixture
+def exporter():
+    exporter = MemoryExporter()
+    tracing.configure_tracing(Tracer(exporter=exporter, sample_rate=1.0))
+    yield exporter
+    tracing.configure_tracing(Tracer())
+
+
+def test_nested_spans_share_trace(exporter):
+    with tracing.start_span("parent") as parent:
+        with tracing.start_span("child", items=3) as child:
+            assert tracing.current_span() is child
+
+    assert [s.name for s in exporter.spans] == ["child", "parent"]
+    assert child.trace_id == parent.trace_id
+    assert child.parent_id == parent.span_id
+    assert tracing.current_span() is tracing.NOOP_SPAN
+
+
+def test_unsampled_trace_records_nothing():
+    exporter = MemoryExporter()
+    tracing.configure_tracing(Tracer(exporter=exporter, sample_rate=0.0))
+    try:
+        with tracing.start_span("root"):
+            with tracing.start_span("child") as child:
+                assert not child.sampled
+    finally:
+        tracing.configure_tracing(Tracer())
+
+    assert exporter.spans == []
+
+
+def test_continues_remote_trace(exporter):
+    header = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+    with tracing.get_tracer().start_span("server", traceparent=header) as span:
+        pass
+
+    assert span.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert span.parent_id == "b7ad6b7169203331"
+    assert parse_traceparent("garbage") is None
+
+
+def test_remote_sampled_flag_needs_trust():
+    header = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    exporter = MemoryExporter()
+
+    assert not Tracer(exporter=exporter, sample_rate=0.0).start_span("server", traceparent=header).sampled
+    assert Tracer(exporter=exporter, trust_remote_sampling=True).start_span("server", traceparent=header).sampled
+
+
+class BlockedExporter(SpanExporter):
+    def _start(self):
+        pass  # No writer thread, as if the destination hung
+
+    def write(self, payload):
+        pass
+
+
+def test_export_queue_is_bounded():
+    exporter = BlockedExporter(max_queue=2)
+    tracer = Tracer(exporter=exporter, sample_rate=1.0)
+
+    for _ in range(5):
+        with tracer.start_span("op"):
+            pass
+
+    assert exporter._queue.qsize() == 2
+    assert exporter.dropped == 3
+
+
+def test_errors_are_recorded(exporter):
+    with pytest.raises(ValueError):
+        with tracing.start_span("failing"):
+            raise ValueError("boom")
+
+    assert span_to_otlp(exporter.spans[0])["status"] == {"code": 2, "message": "ValueError: boom"}
+
+
+def test_file_exporter_writes_otlp_json(tmp_path, exporter):
+    with tracing.start_span("op", count=2):
+        pass
+    path = tmp_path / "traces.jsonl"
+
+    file_exporter = FileSpanExporter(str(path))
+    file_exporter.write(file_exporter._payload(exporter.spans))
+
+    payload = json.loads(path.read_text())
+    span = payload["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert span["name"] == "op"
+    assert span["attributes"] == [{"key": "count", "value": {"intValue": "2"}}]
+
+
+def test_stream_request_spans(exporter):
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(TracingMiddleware)
+    app.dependency_overrides[get_chat_service] = lambda: ChatService(ai_provider=MockAIProvider())
+
+    response = TestClient(app).post(
+        "/chat/stream", json={"messages": [{"role": "user", "content": "Hello", "model": "gpt-4"}]}
+    )
+
+    assert response.status_code == 200
+    spans = {s.name: s for s in exporter.spans}
+    server = spans["POST /chat/stream"]
+    assert server.attributes["http.status_code"] == 200
+    for name in ("chat.convert_messages", "chat.sse_stream", "ChatService.stream_response"):
+        assert spans[name].trace_id == server.trace_id
+    assert spans["ChatService.stream_response"].parent_id == spans["chat.sse_stream"].span_id
+    assert "sse.write_ms" in spans["chat.sse_stream"].attributes
@@ -0,0 +1,53 @@
+import io
+import pytest
+from src.retrieval.chunker import TextChunker
+
+
+def test_chunks_respect_size_and_overlap():
+    text = " ".join(f"word{i}" for i in range(2000))
+    chunker = TextChunker(chunk_size=200, overlap=50, read_size=128)
+
+    chunks = list(chunker.chunk_stream(io.StringIO(text), source="doc.txt"))
+
+    assert len(chunks) > 1
+    assert all(len(c.text) <= 200 for c in chunks)
+    assert [c.position for c in chunks] == list(range(len(chunks)))
+    # Consecutive chunks share some text
+    assert chunks[0].text.split()[-1] in chunks[1].text
+    # Nothing is lost at the end of the stream
+    assert chunks[-1].text.endswith("word1999")
+
+
+def test_overlap_starts_at_a_word():
+    text = " ".join(f"word{i}" for i in range(2000))
+    chunker = TextChunker(chunk_size=200, overlap=50, read_size=128)
+
+    chunks = list(chunker.chunk_stream(io.StringIO(text), source="doc.txt"))
+
+    assert all(c.text.startswith("word") for c in chunks)
+    assert all(c.text.split()[0] in text.split() for c in chunks)
+
+
+def test_short_text_is_a_single_chunk():
+    chunker = TextChunker(chunk_size=100, overlap=10)
+
+    chunks = list(chunker.chunk_stream(io.StringIO("Hello world"), source="a"))
+
+    assert len(chunks) == 1
+    assert chunks[0].text == "Hello world"
+    assert chunks[0].source == "a"
+
+
+def test_chunk_file(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("alpha beta gamma " * 100)
+
+    chunks = list(TextChunker(chunk_size=120, overlap=20).chunk_file(str(path)))
+
+    assert chunks
+    assert all(c.source == str(path) for c in chunks)
+
+
+def test_invalid_overlap():
+    with pytest.raises(ValueError):
+        TextChunker(chunk_size=100, overlap=100)
@@ -0,0 +1,61 @@
+import numpy as np
+from src.retrieval import index as index_module
+from src.retrieval.index import VectorIndexWriter, VectorIndex, open_index
+from src.retrieval.models import Chunk
+
+
+def _random_vectors(count, dim, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _build(index_dir, vectors, batch_size=100):
+    writer = VectorIndexWriter(str(index_dir), dimension=vectors.shape[1])
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start : start + batch_size]
+        chunks = [
+            Chunk(text=f"chunk {start + i}", source="doc.txt", position=start + i)
+            for i in range(len(batch))
+        ]
+        writer.add(chunks, batch)
+    writer.close()
+    return VectorIndex(str(index_dir))
+
+
+def test_exact_search_on_small_index(tmp_path):
+    vectors = _random_vectors(500, 32)
+    index = _build(tmp_path / "idx", vectors)
+
+    results = index.search(vectors[123], k=3)
+
+    assert len(results) == 3
+    assert results[0].text == "chunk 123"
+    assert results[0].score > 0.99
+    assert results[0].score >= results[1].score >= results[2].score
+    index.close()
+
+
+def test_inverted_lists_find_stored_vectors(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_module, "MIN_ROWS_FOR_LISTS", 1000)
+    vectors = _random_vectors(3000, 16, seed=1)
+    index = _build(tmp_path / "idx", vectors, batch_size=256)
+
+    assert len(index.centroids) > 1
+    for row in (0, 1500, 2999):
+        results = index.search(vectors[row], k=1)
+        assert results[0].text == f"chunk {row}"
+    index.close()
+
+
+def test_empty_index(tmp_path):
+    writer = VectorIndexWriter(str(tmp_path / "idx"), dimension=8)
+    writer.close()
+
+    index = open_index(str(tmp_path / "idx"))
+
+    assert index is not None
+    assert index.search(np.ones(8, dtype=np.float32), k=5) == []
+
+
+def test_open_missing_index(tmp_path):
+    assert open_index(str(tmp_path / "missing")) is None
@@ -0,0 +1,84 @@
+import pytest
+from src.retrieval.embedder import HashingEmbedder
+from src.retrieval.index import VectorIndex
+from src.retrieval.service import RetrievalService
+from src.chat.service import ChatService
+from tests.chat.test_chat import MockAIProvider
+
+
+@pytest.fixture
+def retrieval_service(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "python.txt").write_text(
+        "Python is a programming language. It uses indentation for blocks."
+    )
+    (docs / "cooking.txt").write_text(
+        "To bake bread you need flour, water, yeast and salt."
+    )
+    service = RetrievalService(embedder=HashingEmbedder(dimension=128))
+    index_dir = str(tmp_path / "index")
+    count = service.ingest([str(p) for p in sorted(docs.iterdir())], index_dir)
+    assert count == 2
+    service.index = VectorIndex(index_dir)
+    return service
+
+
+def test_retrieve_ranks_relevant_chunk_first(retrieval_service):
+    chunks = retrieval_service.retrieve("how do I bake bread with yeast")
+
+    assert chunks[0].source.endswith("cooking.txt")
+
+
+def test_retrieve_respects_token_budget(retrieval_service):
+    retrieval_service.max_context_tokens = 5
+
+    assert retrieval_service.retrieve("bake bread") == []
+
+
+def test_build_context_message(retrieval_service):
+    message = retrieval_service.build_context_message("python indentation")
+
+    assert message.role == "system"
+    assert "indentation" in message.content
+
+
+class RecordingProvider(MockAIProvider):
+    def __init__(self):
+        self.messages = None
+
+    async def generate_stream(self, messages):
+        self.messages = messages
+        yield "ok"
+
+
+@pytest.mark.asyncio
+async def test_stream_response_injects_context(retrieval_service):
+    provider = RecordingProvider()
+    chat_service = ChatService(ai_provider=provider, retrieval_service=retrieval_service)
+
+    chunks = [c async for c in chat_service.stream_response(text="bake bread", model="gpt-4")]
+
+    assert chunks == ["ok"]
+    assert provider.messages[0].role == "system"
+    assert "flour" in provider.messages[0].content
+    assert provider.messages[-1].content == "bake bread"
+
+
+@pytest.mark.asyncio
+async def test_retrieval_runs_off_the_event_loop(retrieval_service):
+    import threading
+
+    threads = []
+    build = retrieval_service.build_context_message
+
+    def recording_build(text):
+        threads.append(threading.current_thread())
+        return build(text)
+
+    retrieval_service.build_context_message = recording_build
+    chat_service = ChatService(ai_provider=RecordingProvider(), retrieval_service=retrieval_service)
+
+    [c async for c in chat_service.stream_response(text="bake bread", model="gpt-4")]
+
+    assert threads and threads[0] is not threading.current_thread()
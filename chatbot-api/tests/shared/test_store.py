@@ -0,0 +1,141 @@
+import time
+import pytest
+from src.shared.rate_limit import RateLimiter
+from src.shared.replay import StreamReplayBuffer
+from src.shared.store import MemoryStore, RedisStore, SQLiteStore, create_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore()
+    return SQLiteStore(str(tmp_path / "shared.db"))
+
+
+def test_get_set_delete(store):
+    assert store.get("missing") is None
+    store.set("key", b"value")
+    assert store.get("key") == b"value"
+    store.delete("key")
+    assert store.get("key") is None
+
+
+def test_incr(store):
+    assert store.incr("counter") == 1
+    assert store.incr("counter", 5) == 6
+    assert store.get("counter") == b"6"
+
+
+def test_ttl_expires_values(store):
+    store.set("short", b"value", ttl=0.05)
+    store.incr("counter", ttl=0.05)
+    time.sleep(0.1)
+
+    assert store.get("short") is None
+    assert store.incr("counter") == 1
+
+
+def test_append_and_range(store):
+    assert store.append("events", b"a") == 1
+    assert store.append("events", b"b") == 2
+
+    assert store.range("events") == [b"a", b"b"]
+    assert store.range("events", 1) == [b"b"]
+    assert store.range("other") == []
+
+
+def test_extend(store):
+    assert store.extend("events", [b"a", b"b"]) == 2
+    assert store.extend("events", [b"c"]) == 3
+
+    assert store.range("events", 1) == [b"b", b"c"]
+
+
+def test_sqlite_store_sweeps_expired_keys(tmp_path):
+    store = SQLiteStore(str(tmp_path / "shared.db"), sweep_interval=0.05)
+    store.incr("ratelimit:client:0", ttl=0.01)
+    store.append("stream:done", b"event", ttl=0.01)
+    store.set("kept", b"value")
+    time.sleep(0.06)
+
+    store.incr("ratelimit:client:1", ttl=60)
+
+    conn = store._connect()
+    assert [row[0] for row in conn.execute("SELECT key FROM kv ORDER BY key")] == ["kept", "ratelimit:client:1"]
+    assert conn.execute("SELECT COUNT(*) FROM lists").fetchone()[0] == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_recorder_batches_events(store):
+    buffer = StreamReplayBuffer(store=store, poll_interval=60)
+    recorder = buffer.recorder("s")
+
+    for event in ("a", "b", "c"):
+        await recorder.add(event)
+    assert buffer.events("s") == [b"a"]
+
+    recorder.close()
+    assert buffer.events("s") == [b"a", b"b", b"c", b""]
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.db")
+    first, second = SQLiteStore(path), SQLiteStore(path)
+
+    first.incr("counter")
+    second.incr("counter")
+
+    assert first.get("counter") == b"2"
+
+
+def test_create_store_from_url(tmp_path):
+    assert isinstance(create_store("memory://"), MemoryStore)
+    assert isinstance(create_store(f"sqlite:///{tmp_path}/shared.db"), SQLiteStore)
+    with pytest.raises(ValueError):
+        create_store("ftp://nowhere")
+
+
+def test_rate_limiter(store):
+    limiter = RateLimiter(store=store, limit=2, window=60)
+
+    assert limiter.hit("client")[0]
+    assert limiter.hit("client")[0]
+    allowed, retry_after = limiter.hit("client")
+
+    assert not allowed
+    assert 0 < retry_after <= 61
+    assert limiter.hit("other")[0]
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def set(self, key, value, nx=False, px=None):
+        self.commands.append(("set", key, value, nx, px))
+
+    def incrby(self, key, amount):
+        self.commands.append(("incrby", key, amount))
+
+    def execute(self):
+        self.client.transactions.append(self.commands)
+        return [True, 1]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.transactions = []
+
+    def pipeline(self, transaction=True):
+        assert transaction
+        return FakePipeline(self)
+
+
+def test_redis_incr_sets_expiry_with_the_counter():
+    client = FakeRedis()
+
+    assert RedisStore(client).incr("ratelimit:client:0", ttl=60) == 1
+    assert client.transactions == [
+        [("set", "ratelimit:client:0", 0, True, 60000), ("incrby", "ratelimit:client:0", 1)]
+    ]
@@ -0,0 +1,113 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+from src.compression import (
+    CompressionMiddleware,
+    available_encodings,
+    choose_encoding,
+    level_for,
+    zstandard,
+)
+
+BODY = b'{"text": "' + b"compressible " * 1000 + b'"}'
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/json")
+    async def json_body():
+        return Response(BODY, media_type="application/json", headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/sse")
+    async def sse():
+        return StreamingResponse(iter([b"data: x\n\n"] * 200), media_type="text/event-stream")
+
+    @app.get("/image")
+    async def image():
+        return Response(b"\xff\xd8" * 5000, media_type="image/jpeg")
+
+    @app.get("/chunked")
+    async def chunked():
+        return StreamingResponse(iter([BODY[:5000], BODY[5000:]]), media_type="application/json")
+
+    @app.get("/not-modified")
+    async def not_modified():
+        return Response(status_code=304, headers={"ETag": '"abc"'})
+
+    app.add_middleware(CompressionMiddleware, encodings=["gzip"])
+    return TestClient(app)
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br, zstd", ["zstd", "br", "gzip"]) == "zstd"
+    assert choose_encoding("zstd;q=0.5, gzip", ["zstd", "gzip"]) == "gzip"
+    assert choose_encoding("identity", ["gzip"]) is None
+    assert choose_encoding("*", ["gzip"]) == "gzip"
+    assert choose_encoding("gzip;q=0", ["gzip"]) is None
+
+
+def test_level_depends_on_size():
+    assert level_for("gzip", 10_000) > level_for("gzip", 500_000) > level_for("gzip", 5_000_000)
+
+
+def test_compresses_json_with_weak_etag(client):
+    response = client.get("/json", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.content == BODY
+
+
+def test_streamed_body_is_compressed(client):
+    response = client.get("/chunked", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize("path", ["/small", "/sse", "/image"])
+def test_skipped_responses(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+
+
+def test_no_accept_encoding(client):
+    response = client.get("/json", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+
+
+def test_not_modified_repeats_weak_etag(client):
+    response = client.get("/not-modified", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == 'W/"abc"'
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.skipif(zstandard is None, reason="zstandard not installed")
+def test_zstd_round_trip():
+    app = FastAPI()
+
+    @app.get("/json")
+    async def json_body():
+        return Response(BODY, media_type="application/json")
+
+    app.add_middleware(CompressionMiddleware)
+    assert available_encodings()[0] == "zstd"
+
+    response = TestClient(app).get("/json", headers={"Accept-Encoding": "gzip, zstd"})
+
+    assert response.headers["content-encoding"] == "zstd"
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(response.content) == BODY
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+import pytest
+from src.config import load_settings
+
+
+def test_defaults():
+    settings = load_settings({"OPENAI_API_KEY": "key"})
+
+    assert settings.openai_api_key == "key"
+    assert settings.groq_api_key is None
+    assert settings.rag_index_dir is None
+    assert settings.conversation_cache_bytes == 64 * 1024 * 1024
+    assert settings.shared_state_url == "memory://"
+
+
+def test_reads_values():
+    settings = load_settings(
+        {
+            "OPENAI_API_KEY": "key",
+            "RAG_TOP_K": "3",
+            "STREAM_REPLAY_TTL": "1.5",
+            "WARM_UP_CLIENTS": "no",
+            "MAX_CONTENT_PARTS": "0",
+            "BACKUP_DIR": "backups",
+            "BACKUP_INTERVAL_HOURS": "0.5",
+            "TENANT_HEADER": "X-Tenant-ID",
+            "UPSTREAM_MAX_CONCURRENCY": "8",
+            "UPSTREAM_RESERVED_INTERACTIVE": "2",
+            "UPSTREAM_DEADLINE_BACKGROUND_SECONDS": "2.5",
+            "USAGE_DB": "usage.db",
+            "USAGE_PRICES": '{"gpt-4o": [2.5, 10, 1.25], "local": [0, 0]}',
+        }
+    )
+
+    assert settings.rag_top_k == 3
+    assert settings.max_content_parts == 0
+    assert settings.stream_replay_ttl == 1.5
+    assert settings.backup_dir == "backups"
+    assert settings.backup_interval_hours == 0.5
+    assert settings.tenant_header == "X-Tenant-ID"
+    assert settings.conversation_shards == 1
+    assert (settings.upstream_max_concurrency, settings.upstream_reserved_interactive) == (8, 2)
+    assert settings.upstream_deadline_background == 2.5
+    assert settings.upstream_deadline_interactive == 30.0
+    assert settings.usage_db == "usage.db" and settings.usage_flush_seconds == 5.0
+    assert settings.usage_prices == (("gpt-4o", (2.5, 10.0, 1.25)), ("local", (0.0, 0.0)))
+    assert not settings.warm_up_clients
+
+
+def test_local_model_without_upstream():
+    settings = load_settings({"LOCAL_MODEL_PATH": "model.npz", "LOCAL_MAX_BATCH": "32"})
+
+    assert settings.openai_api_key == ""
+    assert (settings.local_model_path, settings.local_model_name, settings.local_max_batch) == ("model.npz", "local", 32)
+
+
+@pytest.mark.parametrize(
+    "env, message",
+    [
+        ({}, "OPENAI_API_KEY"),
+        ({"OPENAI_API_KEY": "key", "RAG_TOP_K": "many"}, "RAG_TOP_K must be a number"),
+        ({"OPENAI_API_KEY": "key", "RAG_NPROBE": "0"}, "RAG_NPROBE must be at least 1"),
+        ({"OPENAI_API_KEY": "key", "RAG_EMBEDDER": "bert"}, "Unknown RAG_EMBEDDER: bert"),
+        ({"OPENAI_API_KEY": "key", "CONVERSATION_CACHE_BYTES": "-1"}, "must not be negative"),
+        ({"OPENAI_API_KEY": "key", "MAX_REQUEST_MESSAGES": "lots"}, "MAX_REQUEST_MESSAGES"),
+        ({"OPENAI_API_KEY": "key", "SHARED_STATE_URL": "ftp://x"}, "SHARED_STATE_URL"),
+        ({"OPENAI_API_KEY": "key", "CONVERSATION_STORE_URL": "lmdb:///x"}, "CONVERSATION_STORE_URL"),
+        (
+            {"OPENAI_API_KEY": "key", "CONVERSATION_STORE_URL": "log:///x", "ARCHIVE_DIR": "archive"},
+            "ARCHIVE_DIR",
+        ),
+        (
+            {"OPENAI_API_KEY": "key", "CONVERSATION_STORE_URL": "log:///x", "BACKUP_DIR": "backups"},
+            "BACKUP_DIR",
+        ),
+        ({"OPENAI_API_KEY": "key", "CONVERSATION_SHARDS": "0"}, "CONVERSATION_SHARDS must be at least 1"),
+        (
+            {"OPENAI_API_KEY": "key", "CONVERSATION_SHARDS": "4", "ARCHIVE_DIR": "archive"},
+            "ARCHIVE_DIR is only supported with CONVERSATION_SHARDS=1",
+        ),
+        (
+            {"OPENAI_API_KEY": "key", "UPSTREAM_MAX_CONCURRENCY": "2", "UPSTREAM_RESERVED_INTERACTIVE": "2"},
+            "UPSTREAM_RESERVED_INTERACTIVE must be less than UPSTREAM_MAX_CONCURRENCY",
+        ),
+        ({"OPENAI_API_KEY": "key", "USAGE_PRICES": "[1, 2]"}, "USAGE_PRICES must be a JSON object"),
+        ({"OPENAI_API_KEY": "key", "USAGE_PRICES": '{"gpt-4o": [1]}'}, "USAGE_PRICES for 'gpt-4o'"),
+        ({"LOCAL_MODEL_PATH": "model.npz", "LOCAL_MAX_BATCH": "0"}, "LOCAL_MAX_BATCH must be at least 1"),
+    ],
+)
+def test_invalid_configuration(env, message):
+    with pytest.raises(ValueError, match=message):
+        load_settings(env)
+
+
+def test_importing_the_app_loads_no_settings(tmp_path):
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", "import src.main"], cwd=tmp_path, env=env, check=True)
+
+    assert list(tmp_path.iterdir()) == []
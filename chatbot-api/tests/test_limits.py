@@ -0,0 +1,82 @@
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+from src.limits import (
+    BodySizeLimitMiddleware,
+    RequestLimits,
+    check_messages,
+    enforce_request_limits,
+    get_request_limits,
+    image_bytes,
+)
+
+
+def test_image_bytes():
+    assert image_bytes("data:image/png;base64," + "A" * 400) == 300
+    assert image_bytes("data:text/plain,hello") == 5
+    assert image_bytes("https://example.com/cat.png") == 0
+
+
+@pytest.mark.parametrize(
+    "messages, reason",
+    [
+        ([{"role": "user", "content": "hi"}] * 3, "Too many messages"),
+        ([{"role": "user", "content": [{"type": "text", "text": "hi"}] * 3}], "Too many content parts"),
+        (
+            [{"role": "user", "content": {"type": "image_url", "image_url": {"url": "data:,12345"}}}],
+            "Image too large",
+        ),
+    ],
+)
+def test_check_messages_rejects(messages, reason):
+    limits = RequestLimits(max_messages=2, max_content_parts=2, max_image_bytes=4)
+
+    assert reason in check_messages(messages, limits)
+
+
+def test_check_messages_accepts_within_limits_and_disabled_limits():
+    messages = [{"role": "user", "content": [{"type": "text", "text": "hi"}] * 3}] * 3
+
+    assert check_messages(messages, RequestLimits(max_messages=3, max_content_parts=3)) is None
+    assert check_messages(messages, RequestLimits(max_messages=0, max_content_parts=0)) is None
+    assert check_messages("not a list", RequestLimits()) is None
+
+
+def make_client(max_bytes: int, limits: RequestLimits) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, max_bytes=lambda: max_bytes)
+
+    @app.post("/echo", dependencies=[Depends(enforce_request_limits)])
+    async def echo(request: Request) -> dict:
+        return {"size": len(await request.body())}
+
+    app.dependency_overrides[get_request_limits] = lambda: limits
+    return TestClient(app)
+
+
+def test_body_size_limit():
+    client = make_client(100, RequestLimits())
+
+    assert client.post("/echo", json={"messages": []}).json() == {"size": 15}
+    response = client.post("/echo", content=b"x" * 101, headers={"content-type": "application/json"})
+    assert response.status_code == 413
+    assert "limit 100 bytes" in response.json()["detail"]
+
+
+def test_body_size_limit_without_content_length():
+    client = make_client(100, RequestLimits())
+
+    def chunks():
+        for _ in range(5):
+            yield b"x" * 30
+
+    response = client.post("/echo", content=chunks())
+    assert response.status_code == 413
+
+
+def test_message_limits_are_checked_before_the_handler():
+    client = make_client(0, RequestLimits(max_messages=1))
+
+    response = client.post("/echo", json={"messages": [{"role": "user", "content": "hi"}] * 2})
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Too many messages: 2 (limit 1)"
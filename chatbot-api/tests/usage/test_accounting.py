@@ -0,0 +1,100 @@
+import threading
+import pytest
+from src.usage.accounting import ModelPrice, UsageRecorder, UsageStore
+
+DAY = 86400
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UsageStore(str(tmp_path / "usage.db"))
+
+
+def _at(recorder, monkeypatch, when, *args, **kwargs):
+    monkeypatch.setattr("src.usage.accounting.time.time", lambda: when)
+    recorder.record(*args, **kwargs)
+
+
+def test_flush_sums_calls_into_minute_buckets(store, monkeypatch):
+    recorder = UsageRecorder(store, prices={"m": ModelPrice(input=1.0, output=2.0, cached=0.5)})
+    for second in (0, 30, 59):
+        _at(recorder, monkeypatch, DAY + second, "alice", "m", 1000, 100, cached_tokens=400)
+    _at(recorder, monkeypatch, DAY + 60, "alice", "m", 1000, 100, cached_tokens=400)
+    _at(recorder, monkeypatch, DAY + 60, "bob", "unpriced", 10, 1, estimated=True)
+
+    assert recorder.flush() == 3
+    assert recorder.flush() == 0
+    rows = store.query(DAY, DAY + 120, interval=60)
+    assert [(row["start"], row["user"], row["model"], row["requests"]) for row in rows] == [
+        (DAY, "alice", "m", 3),
+        (DAY + 60, "alice", "m", 1),
+        (DAY + 60, "bob", "unpriced", 1),
+    ]
+    # 600 uncached and 400 cached prompt tokens, 100 completion tokens, per call
+    assert rows[0]["cost_usd"] == pytest.approx(3 * (600 * 1.0 + 400 * 0.5 + 100 * 2.0) / 1e6)
+    assert rows[2]["cost_usd"] == 0 and rows[2]["estimated_requests"] == 1
+
+    # Later flushes add to the same bucket
+    _at(recorder, monkeypatch, DAY + 90, "bob", "unpriced", 10, 1)
+    recorder.flush()
+    [bob] = store.query(DAY, DAY + 120, interval=None, user="bob")
+    assert (bob["requests"], bob["prompt_tokens"], bob["estimated_requests"]) == (2, 20, 1)
+
+
+def test_query_windows_and_groups(store, monkeypatch):
+    recorder = UsageRecorder(store)
+    for hour in range(48):
+        _at(recorder, monkeypatch, hour * 3600, f"user-{hour % 2}", "gpt-4o" if hour < 24 else "gpt-4o-mini", 100, 10)
+    recorder.flush()
+
+    daily = store.query(0, 2 * DAY, interval=DAY, group_by=["model"])
+    assert [(row["start"], row["model"], row["requests"]) for row in daily] == [
+        (0, "gpt-4o", 24),
+        (DAY, "gpt-4o-mini", 24),
+    ]
+    # The window starts at the minute containing start and ends before end
+    [total] = store.query(3600 + 30, 5 * 3600, interval=None, group_by=[])
+    assert total["requests"] == 4 and total["completion_tokens"] == 40
+    assert store.query(3 * DAY, 4 * DAY, interval=None) == []
+    with pytest.raises(ValueError):
+        store.query(0, DAY, group_by=["bucket; DROP TABLE usage"])
+
+
+def test_failed_flush_is_retried(store, monkeypatch):
+    recorder = UsageRecorder(store)
+    recorder.record("alice", "gpt-4o", 100, 10)
+    add = store.add
+
+    def fail(totals):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "add", fail)
+    with pytest.raises(OSError):
+        recorder.flush()
+    recorder.record("alice", "gpt-4o", 100, 10)
+    monkeypatch.setattr(store, "add", add)
+
+    assert recorder.flush() == 1
+    [row] = store.query(0, 2**40, interval=None)
+    assert row["requests"] == 2
+
+
+def test_recording_from_many_threads_loses_nothing(store):
+    recorder = UsageRecorder(store)
+
+    def work(n):
+        for _ in range(2000):
+            recorder.record(f"user-{n}", "gpt-4o", 3, 1)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    # Flushing while recording continues
+    while any(thread.is_alive() for thread in threads):
+        recorder.flush()
+    for thread in threads:
+        thread.join()
+    recorder.flush()
+
+    [total] = store.query(0, 2**40, interval=None, group_by=[])
+    assert (total["requests"], total["prompt_tokens"]) == (16000, 48000)
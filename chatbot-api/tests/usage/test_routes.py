@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.conversation.routes import get_tenant_id
+from src.usage.accounting import UsageRecorder, UsageStore
+from src.usage.routes import router, get_usage_store
+
+
+def _client(store, tenant_id=None):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_usage_store] = lambda: store
+    app.dependency_overrides[get_tenant_id] = lambda: tenant_id
+    return TestClient(app)
+
+
+def _store(tmp_path):
+    store = UsageStore(str(tmp_path / "usage.db"))
+    recorder = UsageRecorder(store)
+    recorder.record("alice", "gpt-4o", 1000, 100)
+    recorder.record("alice", "gpt-4o-mini", 1000, 100)
+    recorder.record("bob", "gpt-4o", 500, 50)
+    recorder.flush()
+    return store
+
+
+def test_usage_over_time_and_summary(tmp_path):
+    client = _client(_store(tmp_path))
+
+    response = client.get("/api/usage", params={"interval": "day", "group_by": "user"})
+    assert response.status_code == 200
+    rows = response.json()["rows"]
+    assert [(row["user"], row["requests"], row["model"]) for row in rows] == [("alice", 2, None), ("bob", 1, None)]
+    assert datetime.fromisoformat(rows[0]["start"]) <= datetime.now(timezone.utc)
+
+    summary = client.get("/api/usage/summary", params={"model": "gpt-4o"}).json()["rows"]
+    assert [(row["user"], row["prompt_tokens"]) for row in summary] == [("alice", 1000), ("bob", 500)]
+    assert summary[0]["cost_usd"] > summary[1]["cost_usd"] > 0
+    assert summary[0]["start"] is None
+
+    assert client.get("/api/usage", params={"start": "2030-01-02T00:00:00Z", "end": "2030-01-01T00:00:00Z"}).status_code == 400
+
+
+def test_tenants_only_see_their_own_usage(tmp_path):
+    client = _client(_store(tmp_path), tenant_id="bob")
+
+    rows = client.get("/api/usage/summary", params={"group_by": "user"}).json()["rows"]
+    assert [row["user"] for row in rows] == ["bob"]
+    assert client.get("/api/usage/summary", params={"user": "alice"}).status_code == 403
+
+
+def test_usage_not_configured():
+    assert _client(None).get("/api/usage").status_code == 503